@@ -53,9 +53,12 @@ keeping the risk of deadlock low.
 
 
 import abc
+import collections
 from collections import deque
 import ctypes
 import functools
+import heapq
+import itertools
 import logging
 import os
 import signal
@@ -97,8 +100,62 @@ MAX_CONCURRENT_THREADS = 200
 flags.DEFINE_integer(
     'max_concurrent_threads', None, 'Maximum number of concurrent threads to '
     'use when running a benchmark.')
+
+PER_CALL_EXECUTOR = 'per_call'
+SHARED_EXECUTOR = 'shared'
+flags.DEFINE_enum(
+    'background_task_executor', PER_CALL_EXECUTOR,
+    [PER_CALL_EXECUTOR, SHARED_EXECUTOR],
+    'How RunThreaded, RunParallelThreads and RunParallelProcesses execute '
+    'tasks. "per_call" starts new threads or a new process pool for every '
+    'call. "shared" reuses a process wide pool of at most '
+    '--max_concurrent_threads threads that serves tasks in priority order, and '
+    'a process pool that is reused across calls, so tasks run in processes '
+    'must not rely on fresh process state.')
+flags.DEFINE_list(
+    'background_task_rate_limits', [],
+    'Comma separated list of KEY=TASKS_PER_SECOND pairs limiting how quickly '
+    'background tasks started with a matching rate limit key may start. For '
+    'example, --background_task_rate_limits=GCP=10,AWS=5 limits VM creation '
+    'to 10 per second on GCP and 5 per second on AWS.')
 FLAGS = flags.FLAGS
 
+# Seconds an idle thread of the shared thread pool waits for a new task before
+# exiting.
+_IDLE_THREAD_TIMEOUT = 60.
+
+# The number of most recent task timings kept for GetTaskTimings.
+_MAX_TASK_TIMINGS = 10000
+
+TaskTiming = collections.namedtuple(
+    'TaskTiming', ['call', 'queue_wait', 'run_time'])
+_task_timings = deque(maxlen=_MAX_TASK_TIMINGS)
+
+
+def _ParseRateLimits(rate_limits):
+  """Parses --background_task_rate_limits into a dict of key to rate."""
+  result = {}
+  for rate_limit in rate_limits:
+    key, _, rate = rate_limit.rpartition('=')
+    if not key or float(rate) <= 0:
+      raise ValueError(rate_limit)
+    result[key] = float(rate)
+  return result
+
+
+def _ValidateRateLimits(rate_limits):
+  try:
+    _ParseRateLimits(rate_limits)
+  except ValueError:
+    return False
+  return True
+
+
+flags.register_validator(
+    'background_task_rate_limits', _ValidateRateLimits,
+    message='--background_task_rate_limits must be a list of '
+    'KEY=TASKS_PER_SECOND pairs with positive rates.')
+
 
 def _GetCallString(target_arg_tuple):
   """Returns the string representation of a function call."""
@@ -204,6 +261,48 @@ class _NonPollingSingleReaderQueue(object):
     self._SignalAvailableItem()
 
 
+class _RateLimiter(object):
+  """Spaces out task starts so that at most a fixed number start per second."""
+
+  def __init__(self, tasks_per_second):
+    self._interval = 1. / tasks_per_second
+    self._lock = threading.Lock()
+    self._next_start_time = 0.
+
+  def Acquire(self):
+    """Blocks until the caller may start its task."""
+    with self._lock:
+      now = time.time()
+      start_time = max(now, self._next_start_time)
+      self._next_start_time = start_time + self._interval
+    if start_time > now:
+      time.sleep(start_time - now)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def _GetRateLimiter(key):
+  """Returns the shared _RateLimiter for key, or None if key is unlimited."""
+  if key is None:
+    return None
+  with _rate_limiters_lock:
+    if key not in _rate_limiters:
+      rate = _ParseRateLimits(FLAGS.background_task_rate_limits).get(key)
+      _rate_limiters[key] = rate and _RateLimiter(rate)
+    return _rate_limiters[key]
+
+
+def GetTaskTimings():
+  """Returns TaskTimings of the most recently completed background tasks.
+
+  Each TaskTiming holds the call string of the task, the seconds it spent
+  waiting to start (including any rate limiting) and the seconds it ran for.
+  """
+  return list(_task_timings)
+
+
 class _BackgroundTaskThreadContext(object):
   """Thread-specific information that can be inherited by a background task.
 
@@ -235,23 +334,36 @@ class _BackgroundTask(object):
         otherwise.
     traceback: The traceback string if the call raised an exception, or None
         otherwise.
+    rate_limiter: _RateLimiter acquired before the target is invoked, or None.
+    submit_time: Time at which the task was created.
+    start_time: Time at which the target was invoked, or None.
+    end_time: Time at which the target returned, or None.
   """
 
-  def __init__(self, target, args, kwargs, thread_context):
+  def __init__(self, target, args, kwargs, thread_context, rate_limiter=None):
     self.target = target
     self.args = args
     self.kwargs = kwargs
     self.context = thread_context
     self.return_value = None
     self.traceback = None
+    self.rate_limiter = rate_limiter
+    self.submit_time = time.time()
+    self.start_time = None
+    self.end_time = None
 
   def Run(self):
     """Sets the current thread context and executes the target."""
     self.context.CopyToCurrentThread()
+    if self.rate_limiter:
+      self.rate_limiter.Acquire()
+    self.start_time = time.time()
     try:
       self.return_value = self.target(*self.args, **self.kwargs)
     except Exception:
       self.traceback = traceback.format_exc()
+    finally:
+      self.end_time = time.time()
 
 
 class _BackgroundTaskManager(six.with_metaclass(abc.ABCMeta, object)):
@@ -273,7 +385,7 @@ class _BackgroundTaskManager(six.with_metaclass(abc.ABCMeta, object)):
     pass
 
   @abc.abstractmethod
-  def StartTask(self, target, args, kwargs, thread_context):
+  def StartTask(self, target, args, kwargs, thread_context, rate_limiter=None):
     """Creates and starts a _BackgroundTask.
 
     The created task is appended to self.tasks.
@@ -284,6 +396,7 @@ class _BackgroundTaskManager(six.with_metaclass(abc.ABCMeta, object)):
       kwargs: dict. Keyword arguments to be passed to the target.
       thread_context: _BackgroundTaskThreadContext. Thread-specific state to be
           inherited from parent to child thread.
+      rate_limiter: Optional _RateLimiter acquired before the target runs.
     """
     raise NotImplementedError()
 
@@ -379,10 +492,10 @@ class _BackgroundThreadTaskManager(_BackgroundTaskManager):
     for thread in self._threads:
       _WaitForCondition(lambda: not thread.is_alive())
 
-  def StartTask(self, target, args, kwargs, thread_context):
+  def StartTask(self, target, args, kwargs, thread_context, rate_limiter=None):
     assert self._available_worker_ids, ('StartTask called when no threads were '
                                         'available')
-    task = _BackgroundTask(target, args, kwargs, thread_context)
+    task = _BackgroundTask(target, args, kwargs, thread_context, rate_limiter)
     task_id = len(self.tasks)
     self.tasks.append(task)
     worker_id = self._available_worker_ids.pop()
@@ -420,10 +533,11 @@ def _ExecuteProcessTask(task):
     task: _BackgroundTask to execute.
 
   Returns:
-    (result, traceback) tuple. The first element is the return value from the
-    task function, or None if the function raised an exception. The second
-    element is the exception traceback string, or None if the function
-    succeeded.
+    (result, traceback, start_time, end_time) tuple. The first element is the
+    return value from the task function, or None if the function raised an
+    exception. The second element is the exception traceback string, or None if
+    the function succeeded. The last two are the times at which the function
+    was started and returned.
   """
   def handle_sigint(signum, frame):
     # Ignore any new SIGINTs since we are already tearing down.
@@ -433,7 +547,7 @@ def _ExecuteProcessTask(task):
     signal.default_int_handler(signum, frame)
   signal.signal(signal.SIGINT, handle_sigint)
   task.Run()
-  return task.return_value, task.traceback
+  return task.return_value, task.traceback, task.start_time, task.end_time
 
 
 class _BackgroundProcessTaskManager(_BackgroundTaskManager):
@@ -459,8 +573,12 @@ class _BackgroundProcessTaskManager(_BackgroundTaskManager):
     # Note: This invokes a non-interruptable wait.
     return self._executor.__exit__(*args, **kwargs)
 
-  def StartTask(self, target, args, kwargs, thread_context):
+  def StartTask(self, target, args, kwargs, thread_context, rate_limiter=None):
+    # Rate limiters cannot be shared with child processes, so the parent waits
+    # for its turn before submitting the task.
     task = _BackgroundTask(target, args, kwargs, thread_context)
+    if rate_limiter:
+      rate_limiter.Acquire()
     task_id = len(self.tasks)
     self.tasks.append(task)
     future = self._executor.submit(_ExecuteProcessTask, task)
@@ -475,7 +593,8 @@ class _BackgroundProcessTaskManager(_BackgroundTaskManager):
     future = completed_tasks.pop()
     task_id = self._active_futures.pop(future)
     task = self.tasks[task_id]
-    task.return_value, task.traceback = future.result()
+    (task.return_value, task.traceback, task.start_time,
+     task.end_time) = future.result()
     return task_id
 
   def HandleKeyboardInterrupt(self):
@@ -486,8 +605,238 @@ class _BackgroundProcessTaskManager(_BackgroundTaskManager):
     self._executor.shutdown(wait=True)
 
 
+class _SharedThreadPool(object):
+  """A process wide pool of reusable worker threads.
+
+  Work items are served in priority order from a single queue. Threads are
+  started on demand, up to a maximum, and exit after being idle for
+  _IDLE_THREAD_TIMEOUT seconds. A pool thread that waits for tasks it submitted
+  itself runs queued work items while it waits (see RunQueuedItem), so nested
+  parallel calls cannot deadlock even when every thread of the pool is busy.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._item_available = threading.Condition(self._lock)
+    self._heap = []
+    self._sequence = itertools.count()
+    self._threads = set()
+    self._idle_thread_count = 0
+
+  def Submit(self, item, priority=0):
+    """Queues a work item.
+
+    Args:
+      item: Callable invoked without arguments on a pool thread.
+      priority: Items with lower values run before items with higher values.
+          Items with equal priority run in submission order.
+    """
+    max_threads = FLAGS.max_concurrent_threads or MAX_CONCURRENT_THREADS
+    with self._lock:
+      heapq.heappush(self._heap, (priority, next(self._sequence), item))
+      if (len(self._heap) > self._idle_thread_count and
+          len(self._threads) < max_threads):
+        thread = threading.Thread(target=self._Work)
+        thread.daemon = True
+        self._threads.add(thread)
+        thread.start()
+      self._item_available.notify()
+
+  def Remove(self, predicate):
+    """Removes the queued items for which predicate returns True."""
+    with self._lock:
+      self._heap = [entry for entry in self._heap if not predicate(entry[2])]
+      heapq.heapify(self._heap)
+
+  def IsPoolThread(self):
+    return threading.current_thread() in self._threads
+
+  def RunQueuedItem(self):
+    """Runs the next queued item on the calling thread.
+
+    Returns:
+      True if an item was run, or False if the queue was empty.
+    """
+    with self._lock:
+      if not self._heap:
+        return False
+      _, _, item = heapq.heappop(self._heap)
+    # The item replaces the thread context of the calling thread, which is
+    # restored once it has run.
+    saved_context = _BackgroundTaskThreadContext()
+    try:
+      item()
+    finally:
+      saved_context.CopyToCurrentThread()
+    return True
+
+  def _Work(self):
+    """Runs queued items until the thread has been idle for too long."""
+    while True:
+      with self._lock:
+        while not self._heap:
+          self._idle_thread_count += 1
+          self._item_available.wait(_IDLE_THREAD_TIMEOUT)
+          self._idle_thread_count -= 1
+          if not self._heap:
+            self._threads.discard(threading.current_thread())
+            return
+        _, _, item = heapq.heappop(self._heap)
+      try:
+        item()
+      except KeyboardInterrupt:
+        logging.debug('Shared pool thread received a KeyboardInterrupt.',
+                      exc_info=True)
+
+
+_shared_thread_pool = _SharedThreadPool()
+
+
+class _SharedThreadTaskManager(_BackgroundTaskManager):
+  """Manages state for background tasks run on the shared thread pool."""
+
+  def __init__(self, max_concurrency, priority=0):
+    super(_SharedThreadTaskManager, self).__init__(max_concurrency)
+    self._priority = priority
+    self._response_queue = _SingleReaderQueue()
+    self._running_threads = {}
+    self._running_threads_lock = threading.Lock()
+    self._outstanding_task_ids = set()
+
+  def _RunTask(self, task_id):
+    """Runs a task on the current thread and reports its completion."""
+    with self._running_threads_lock:
+      self._running_threads[task_id] = threading.current_thread()
+    try:
+      self.tasks[task_id].Run()
+    finally:
+      with self._running_threads_lock:
+        self._running_threads.pop(task_id, None)
+      self._response_queue.Put(task_id)
+
+  def StartTask(self, target, args, kwargs, thread_context, rate_limiter=None):
+    task = _BackgroundTask(target, args, kwargs, thread_context, rate_limiter)
+    task_id = len(self.tasks)
+    self.tasks.append(task)
+    self._outstanding_task_ids.add(task_id)
+    item = functools.partial(self._RunTask, task_id)
+    _shared_thread_pool.Submit(item, self._priority)
+
+  def AwaitAnyTask(self):
+    # A pool thread waiting on its own tasks helps run queued work instead of
+    # blocking, which keeps nested calls from exhausting the pool.
+    if _shared_thread_pool.IsPoolThread():
+      while True:
+        try:
+          task_id = self._response_queue.Get(timeout=0)
+          break
+        except queue.Empty:
+          if not _shared_thread_pool.RunQueuedItem():
+            try:
+              task_id = self._response_queue.Get(
+                  timeout=_WAIT_MAX_RECHECK_DELAY)
+              break
+            except queue.Empty:
+              pass
+    else:
+      task_id = self._response_queue.Get()
+    self._outstanding_task_ids.discard(task_id)
+    return task_id
+
+  def HandleKeyboardInterrupt(self):
+    # Drop tasks that have not started yet.
+    _shared_thread_pool.Remove(
+        lambda item: getattr(item, 'func', None) == self._RunTask)
+    with self._running_threads_lock:
+      running_task_ids = set(self._running_threads)
+      for thread in self._running_threads.values():
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(
+            ctypes.c_long(thread.ident), ctypes.py_object(KeyboardInterrupt))
+    # Wait for the interrupted tasks to report back.
+    while running_task_ids & self._outstanding_task_ids:
+      try:
+        self._outstanding_task_ids.discard(
+            self._response_queue.Get(timeout=_LONG_TIMEOUT))
+      except queue.Empty:
+        pass
+
+
+_shared_process_pool = None
+# Number of task managers using each process pool. A pool replaced by a larger
+# one is shut down once the last task manager using it is done.
+_process_pool_users = collections.Counter()
+_shared_process_pool_lock = threading.Lock()
+
+
+class _SharedProcessTaskManager(_BackgroundProcessTaskManager):
+  """Manages state for background tasks run on the shared process pool.
+
+  The pool is created on first use and grown by replacing it when a call needs
+  more concurrency than it has. Calls already using the replaced pool keep
+  using it until they are done.
+  """
+
+  def __init__(self, max_concurrency):
+    global _shared_process_pool
+    _BackgroundTaskManager.__init__(self, max_concurrency)
+    self._active_futures = {}
+    with _shared_process_pool_lock:
+      pool = _shared_process_pool
+      if getattr(pool, '_max_workers', 0) < max_concurrency:
+        _shared_process_pool = futures.ProcessPoolExecutor(max_concurrency)
+        if pool is not None and not _process_pool_users[pool]:
+          pool.shutdown(wait=False)
+      self._executor = _shared_process_pool
+      _process_pool_users[self._executor] += 1
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args, **kwargs):
+    with _shared_process_pool_lock:
+      _process_pool_users[self._executor] -= 1
+      if _process_pool_users[self._executor] > 0:
+        return
+      del _process_pool_users[self._executor]
+      if self._executor is not _shared_process_pool:
+        self._executor.shutdown(wait=False)
+
+  def HandleKeyboardInterrupt(self):
+    global _shared_process_pool
+    with _shared_process_pool_lock:
+      if _shared_process_pool is self._executor:
+        _shared_process_pool = None
+    super(_SharedProcessTaskManager, self).HandleKeyboardInterrupt()
+
+
+def _GetThreadTaskManager(priority=0):
+  """Returns the thread task manager class selected by flags."""
+  if FLAGS.background_task_executor == SHARED_EXECUTOR:
+    return functools.partial(_SharedThreadTaskManager, priority=priority)
+  return _BackgroundThreadTaskManager
+
+
+def _RecordTaskTiming(call_string, task):
+  """Records the queue wait and run time of a completed _BackgroundTask."""
+  if task.start_time is None:
+    return
+  timing = TaskTiming(call_string, task.start_time - task.submit_time,
+                      task.end_time - task.start_time)
+  _task_timings.append(timing)
+  logging.debug('Task %s waited %.3fs and ran for %.3fs.', *timing)
+
+
+def _GetRateLimitKey(rate_limit_key, target_arg_tuple):
+  """Returns the rate limit key of a task given a key or key function."""
+  if callable(rate_limit_key):
+    _, args, kwargs = target_arg_tuple
+    return rate_limit_key(*args, **kwargs)
+  return rate_limit_key
+
+
 def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
-                      parallel_exception_class, post_task_delay=0):
+                      parallel_exception_class, post_task_delay=0,
+                      rate_limit_key=None):
   """Executes function calls concurrently in separate threads or processes.
 
   Args:
@@ -500,6 +849,9 @@ def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
     parallel_exception_class: Type of exception to raise upon an exception in
         one of the called functions.
     post_task_delay: Delay in seconds between parallel task invocations.
+    rate_limit_key: Optional string, or function called with each task's args
+        and kwargs that returns a string, naming the entry of
+        --background_task_rate_limits that limits how fast tasks start.
 
   Returns:
     list of function return values in the order corresponding to the order of
@@ -514,14 +866,24 @@ def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
   error_strings = []
   started_task_count = 0
   active_task_count = 0
+  # The shared executor spaces out task starts on the worker threads rather
+  # than sleeping here, so dispatching the remaining tasks is not delayed.
+  delay_limiter = None
+  if post_task_delay and FLAGS.background_task_executor == SHARED_EXECUTOR:
+    delay_limiter = _RateLimiter(1. / post_task_delay)
+    post_task_delay = 0
   with get_task_manager(max_concurrency) as task_manager:
     try:
       while started_task_count < len(target_arg_tuples) or active_task_count:
         if (started_task_count < len(target_arg_tuples) and
             active_task_count < max_concurrency):
           # Start a new task.
-          target, args, kwargs = target_arg_tuples[started_task_count]
-          task_manager.StartTask(target, args, kwargs, thread_context)
+          target_arg_tuple = target_arg_tuples[started_task_count]
+          target, args, kwargs = target_arg_tuple
+          rate_limiter = delay_limiter or _GetRateLimiter(
+              _GetRateLimitKey(rate_limit_key, target_arg_tuple))
+          task_manager.StartTask(target, args, kwargs, thread_context,
+                                 rate_limiter)
           started_task_count += 1
           active_task_count += 1
           if post_task_delay:
@@ -531,6 +893,8 @@ def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
         # Wait for a task to complete.
         task_id = task_manager.AwaitAnyTask()
         active_task_count -= 1
+        _RecordTaskTiming(_GetCallString(target_arg_tuples[task_id]),
+                          task_manager.tasks[task_id])
         # If the task failed, it may still be a long time until all remaining
         # tasks complete. Log the failure immediately before continuing to wait
         # for other tasks.
@@ -561,7 +925,8 @@ def _RunParallelTasks(target_arg_tuples, max_concurrency, get_task_manager,
   return results
 
 
-def RunParallelThreads(target_arg_tuples, max_concurrency, post_task_delay=0):
+def RunParallelThreads(target_arg_tuples, max_concurrency, post_task_delay=0,
+                       priority=0, rate_limit_key=None):
   """Executes function calls concurrently in separate threads.
 
   Args:
@@ -570,6 +935,11 @@ def RunParallelThreads(target_arg_tuples, max_concurrency, post_task_delay=0):
     max_concurrency: int or None. The maximum number of concurrent new
         threads.
     post_task_delay: Delay in seconds between parallel task invocations.
+    priority: Tasks with lower values are started first when the shared
+        executor is busy. Only used with --background_task_executor=shared.
+    rate_limit_key: Optional string, or function called with each task's args
+        and kwargs that returns a string, naming the entry of
+        --background_task_rate_limits that limits how fast tasks start.
 
   Returns:
     list of function return values in the order corresponding to the order of
@@ -580,14 +950,16 @@ def RunParallelThreads(target_arg_tuples, max_concurrency, post_task_delay=0):
         called functions.
   """
   return _RunParallelTasks(
-      target_arg_tuples, max_concurrency, _BackgroundThreadTaskManager,
-      errors.VmUtil.ThreadException, post_task_delay)
+      target_arg_tuples, max_concurrency, _GetThreadTaskManager(priority),
+      errors.VmUtil.ThreadException, post_task_delay, rate_limit_key)
 
 
 def RunThreaded(target,
                 thread_params,
                 max_concurrent_threads=None,
-                post_task_delay=0):
+                post_task_delay=0,
+                priority=0,
+                rate_limit_key=None):
   """Runs the target method in parallel threads.
 
   The method starts up threads with one arg from thread_params as the first arg.
@@ -599,6 +971,8 @@ def RunThreaded(target,
         Usually this is a list of VMs.
     max_concurrent_threads: The maximum number of concurrent threads to allow.
     post_task_delay: Delay in seconds between commands.
+    priority: See RunParallelThreads.
+    rate_limit_key: See RunParallelThreads.
 
   Returns:
     List of the same length as thread_params. Contains the return value from
@@ -646,11 +1020,167 @@ def RunThreaded(target,
 
   return RunParallelThreads(target_arg_tuples,
                             max_concurrency=max_concurrent_threads,
-                            post_task_delay=post_task_delay)
+                            post_task_delay=post_task_delay,
+                            priority=priority,
+                            rate_limit_key=rate_limit_key)
+
+
+GraphTask = collections.namedtuple(
+    'GraphTask', ['name', 'target', 'dependencies'])
+
+
+def _GetGraphDependencies(tasks, reverse):
+  """Returns a dict mapping each task name to the names it must wait for.
+
+  Raises:
+    ValueError: If task names are not unique or the dependencies have a cycle.
+  """
+  dependencies = collections.OrderedDict((task.name, set()) for task in tasks)
+  if len(dependencies) != len(tasks):
+    raise ValueError('Task names must be unique: %s' %
+                     [task.name for task in tasks])
+  for task in tasks:
+    for dependency in task.dependencies:
+      if dependency not in dependencies:
+        continue
+      if reverse:
+        dependencies[dependency].add(task.name)
+      else:
+        dependencies[task.name].add(dependency)
+  # Check that the tasks can be ordered by repeatedly removing tasks whose
+  # dependencies have all been removed.
+  remaining = dict(dependencies)
+  while remaining:
+    ready = [name for name, names in six.iteritems(remaining)
+             if not names & set(remaining)]
+    if not ready:
+      raise ValueError('Task dependencies contain a cycle among: %s' %
+                       sorted(remaining))
+    for name in ready:
+      del remaining[name]
+  return dependencies
+
+
+def RunTaskGraph(tasks, max_concurrency=None, reverse=False,
+                 continue_on_failure=False):
+  """Executes interdependent function calls concurrently in separate threads.
+
+  A task starts as soon as all of the tasks it depends on have completed, so
+  that independent tasks run at the same time. When more tasks are ready than
+  may run, they are started in the order in which they are listed.
+
+  Args:
+    tasks: list of GraphTask. Each names a function that is called without
+        arguments and the names of the tasks that must complete before it
+        starts. Dependencies on names that are not in tasks are ignored.
+    max_concurrency: int or None. The maximum number of concurrent threads.
+        Defaults to the number of tasks.
+    reverse: If True, every dependency is reversed so that a task only starts
+        after all tasks that depend on it have completed, and ready tasks start
+        in reverse order. Used to tear down what a graph has set up.
+    continue_on_failure: If False, tasks that depend directly or indirectly on
+        a failed task are not started. If True, a failed task counts as
+        completed for the tasks depending on it.
+
+  Returns:
+    dict mapping the name of each task that ran to its (start_time, end_time).
+
+  Raises:
+    ValueError: If task names are not unique or the dependencies have a cycle.
+    Exception: The exception raised by the first task that failed. It is
+        raised after all running tasks have completed.
+  """
+  dependencies = _GetGraphDependencies(tasks, reverse)
+  if reverse:
+    tasks = tasks[::-1]
+  max_concurrency = min(max_concurrency or len(tasks), len(tasks))
+  if not tasks:
+    return {}
+  thread_context = _BackgroundTaskThreadContext()
+  pending = list(tasks)
+  started_names = []
+  completed = set()
+  exceptions = {}
+  first_failure = None
+  times = {}
+
+  def _RunTask(task):
+    try:
+      task.target()
+    except Exception as e:
+      exceptions[task.name] = e
+      raise
+
+  with _GetThreadTaskManager()(max_concurrency) as task_manager:
+    try:
+      while pending or len(started_names) > len(times):
+        active_task_count = len(started_names) - len(times)
+        ready = [task for task in pending
+                 if dependencies[task.name] <= completed]
+        if ready and active_task_count < max_concurrency:
+          task = ready[0]
+          pending.remove(task)
+          task_manager.StartTask(_RunTask, (task,), {}, thread_context)
+          started_names.append(task.name)
+          continue
+        if not active_task_count:
+          # Everything left depends on a task that failed.
+          break
+
+        task_id = task_manager.AwaitAnyTask()
+        name = started_names[task_id]
+        task = task_manager.tasks[task_id]
+        times[name] = (task.start_time, task.end_time)
+        _RecordTaskTiming(name, task)
+        if task.traceback:
+          logging.error('Exception occurred while running %s:%s%s', name,
+                        os.linesep, task.traceback)
+          first_failure = first_failure or name
+          if not continue_on_failure:
+            continue
+        completed.add(name)
+
+    except KeyboardInterrupt:
+      logging.error(
+          'Received KeyboardInterrupt while executing task graph. Waiting '
+          'for %s tasks to clean up.', len(started_names) - len(times))
+      task_manager.HandleKeyboardInterrupt()
+      raise
+
+  if pending:
+    logging.error('Did not run %s because a task they depend on failed.',
+                  ', '.join(task.name for task in pending))
+  if first_failure:
+    raise exceptions[first_failure]
+  return times
+
+
+def GetCriticalPath(tasks, times):
+  """Returns the chain of tasks that bounded the run time of RunTaskGraph.
+
+  Starting from the task that finished last, the path repeatedly steps to the
+  dependency that finished last, since that is the one the task waited for.
+
+  Args:
+    tasks: list of GraphTask passed to RunTaskGraph.
+    times: dict returned by RunTaskGraph.
+
+  Returns:
+    list of task names in the order in which they ran.
+  """
+  dependencies = {task.name: task.dependencies for task in tasks}
+  path = []
+  candidates = list(times)
+  while candidates:
+    name = max(candidates, key=lambda candidate: times[candidate][1])
+    path.append(name)
+    candidates = [dependency for dependency in dependencies[name]
+                  if dependency in times]
+  return path[::-1]
 
 
 def RunParallelProcesses(target_arg_tuples, max_concurrency,
-                         post_process_delay=0):
+                         post_process_delay=0, rate_limit_key=None):
   """Executes function calls concurrently in separate processes.
 
   Args:
@@ -660,6 +1190,7 @@ def RunParallelProcesses(target_arg_tuples, max_concurrency,
         processes. If None, it will default to the number of processors on the
         machine.
     post_process_delay: Delay in seconds between parallel process invocations.
+    rate_limit_key: See RunParallelThreads.
 
   Returns:
     list of function return values in the order corresponding to the order of
@@ -677,10 +1208,14 @@ def RunParallelProcesses(target_arg_tuples, max_concurrency,
   old_handler = None
   try:
     old_handler = signal.signal(signal.SIGINT, handle_sigint)
+    if FLAGS.background_task_executor == SHARED_EXECUTOR:
+      get_task_manager = _SharedProcessTaskManager
+    else:
+      get_task_manager = _BackgroundProcessTaskManager
     ret_val = _RunParallelTasks(
-        target_arg_tuples, max_concurrency, _BackgroundProcessTaskManager,
+        target_arg_tuples, max_concurrency, get_task_manager,
         errors.VmUtil.CalledProcessException,
-        post_task_delay=post_process_delay)
+        post_task_delay=post_process_delay, rate_limit_key=rate_limit_key)
   finally:
     if old_handler:
       signal.signal(signal.SIGINT, old_handler)
@@ -17,6 +17,7 @@
 import contextlib
 import copy
 import datetime
+import functools
 import importlib
 import logging
 import os
@@ -25,6 +26,7 @@ import threading
 import uuid
 
 from absl import flags
+from perfkitbenchmarker import background_tasks
 from perfkitbenchmarker import benchmark_status
 from perfkitbenchmarker import capacity_reservation
 from perfkitbenchmarker import cloud_tpu
@@ -41,8 +43,10 @@ from perfkitbenchmarker import placement_group
 from perfkitbenchmarker import provider_info
 from perfkitbenchmarker import providers
 from perfkitbenchmarker import relational_db
+from perfkitbenchmarker import sample
 from perfkitbenchmarker import smb_service
 from perfkitbenchmarker import spark_service
+from perfkitbenchmarker import ssh_session
 from perfkitbenchmarker import stages
 from perfkitbenchmarker import static_virtual_machine as static_vm
 from perfkitbenchmarker import virtual_machine
@@ -89,6 +93,11 @@ flags.DEFINE_string('postrun_script', None,
                     'Script to run right after run stage.')
 flags.DEFINE_integer('create_and_boot_post_task_delay', None,
                      'Delay in seconds to delay in between boot tasks.')
+flags.DEFINE_boolean('sequential_provisioning', False,
+                     'Create and delete the benchmark\'s resources, such as '
+                     'networks, VMs and managed services, one at a time in a '
+                     'fixed order instead of concurrently as soon as the '
+                     'resources they depend on are ready.')
 # pyformat: disable
 flags.DEFINE_enum('benchmark_compatibility_checking', SUPPORTED,
                   [SUPPORTED, NOT_EXCLUDED, SKIP_CHECK],
@@ -169,6 +178,9 @@ class BenchmarkSpec(object):
 
     self.restore_spec = None
     self.freeze_path = None
+    # (resource name, seconds to create) pairs along the chain of dependent
+    # resources that bounded provisioning time.
+    self.provision_critical_path = []
 
     # Modules can't be pickled, but functions can, so we store the functions
     # necessary to run the benchmark.
@@ -586,9 +598,19 @@ class BenchmarkSpec(object):
     targets = [(vm.PrepareBackgroundWorkload, (), {}) for vm in self.vms]
     vm_util.RunParallelThreads(targets, len(targets))
 
-  def Provision(self):
-    """Prepares the VMs and networks necessary for the benchmark to run."""
+  def _GetResourceGraph(self):
+    """Returns the benchmark's resources and the dependencies between them.
+
+    Returns:
+      A list of (name, create function, delete function, dependencies) tuples.
+      A resource is only created after the resources named in its dependencies
+      have been created and is deleted before them. The list is ordered so
+      that creating the resources one at a time in this order is valid.
+    """
+    graph = []
     should_restore = hasattr(self, 'restore_spec') and self.restore_spec
+    should_freeze = hasattr(self, 'freeze_path') and self.freeze_path
+
     # Create capacity reservations if the cloud supports it. Note that the
     # capacity reservation class may update the VMs themselves. This is true
     # on AWS, because the VM needs to be aware of the capacity reservation id
@@ -598,18 +620,103 @@ class BenchmarkSpec(object):
     # In this case the VM's zone attribute, and the VMs network instance
     # need to be updated as well.
     if self.capacity_reservations:
-      vm_util.RunThreaded(lambda res: res.Create(), self.capacity_reservations)
+      # Reservations are deleted by Delete before the graph is walked.
+      graph.append(('capacity_reservations', self._CreateCapacityReservations,
+                    None, []))
+
+    graph.append(('networks', self._CreateNetworks, self._DeleteNetworks,
+                  ['capacity_reservations']))
+
+    if self.container_registry:
+      graph.append(('container_registry', self._CreateContainerRegistry,
+                    self.container_registry.Delete, []))
+
+    if self.container_cluster:
+      graph.append(('container_cluster', self.container_cluster.Create,
+                    self._DeleteContainerCluster, ['networks']))
+
+    vm_dependencies = ['capacity_reservations', 'networks',
+                       'container_cluster', 'smb_service', 'placement_groups']
+    if self.nfs_service:
+      # A managed NFS service is created before the VMs that mount it, while an
+      # unmanaged one is served from one of the VMs.
+      if self.nfs_service.CLOUD != nfs_service.UNMANAGED:
+        graph.append(('nfs_service', self.nfs_service.Create,
+                      self.nfs_service.Delete, ['networks']))
+        vm_dependencies.append('nfs_service')
+      else:
+        graph.append(('nfs_service', None, self.nfs_service.Delete, ['vms']))
+
+    if self.smb_service:
+      graph.append(('smb_service', self.smb_service.Create,
+                    self.smb_service.Delete, ['networks']))
+
+    if hasattr(self, 'placement_groups') and self.placement_groups:
+      graph.append(('placement_groups', self._CreatePlacementGroups,
+                    self._DeletePlacementGroups, ['networks']))
+
+    if self.vms:
+      graph.append(('vms', self._CreateVms, self._DeleteVms, vm_dependencies))
+
+    if self.spark_service:
+      graph.append(('spark_service', self.spark_service.Create,
+                    self.spark_service.Delete, ['vms']))
+
+    if self.dpb_service:
+      graph.append(('dpb_service', self.dpb_service.Create,
+                    self.dpb_service.Delete, ['vms']))
+
+    if hasattr(self, 'relational_db') and self.relational_db:
+      dependencies = ['networks']
+      if self.relational_db.create_depends_on_vms:
+        dependencies.append('vms')
+      graph.append(('relational_db', self._CreateRelationalDb,
+                    self.relational_db.Delete, dependencies))
+
+    if hasattr(self, 'non_relational_db') and self.non_relational_db:
+      graph.append((
+          'non_relational_db',
+          functools.partial(self.non_relational_db.Create,
+                            restore=should_restore),
+          functools.partial(self.non_relational_db.Delete,
+                            freeze=should_freeze), []))
+
+    if hasattr(self, 'spanner') and self.spanner:
+      graph.append(('spanner',
+                    functools.partial(self.spanner.Create,
+                                      restore=should_restore),
+                    functools.partial(self.spanner.Delete,
+                                      freeze=should_freeze), []))
+
+    if self.tpus:
+      graph.append(('tpus',
+                    lambda: vm_util.RunThreaded(lambda tpu: tpu.Create(),
+                                                self.tpus),
+                    lambda: vm_util.RunThreaded(lambda tpu: tpu.Delete(),
+                                                self.tpus), ['networks']))
+
+    if self.edw_service:
+      graph.append(('edw_service', self._CreateEdwService,
+                    self.edw_service.Delete, ['networks']))
+
+    if hasattr(self, 'vpn_service') and self.vpn_service:
+      graph.append(('vpn_service', self.vpn_service.Create,
+                    self.vpn_service.Delete, ['networks']))
+    return graph
+
+  def _CreateCapacityReservations(self):
+    vm_util.RunThreaded(lambda res: res.Create(), self.capacity_reservations)
 
-    # Sort networks into a guaranteed order of creation based on dict key.
+  def _GetSortedNetworks(self):
+    """Returns the networks in a guaranteed order of creation."""
     # There is a finite limit on the number of threads that are created to
-    # provision networks. Until support is added to provision resources in an
-    # order based on dependencies, this key ordering can be used to avoid
-    # deadlock by placing dependent networks later and their dependencies
-    # earlier.
-    networks = [
-        self.networks[key] for key in sorted(six.iterkeys(self.networks))
-    ]
+    # provision networks. Networks do not declare dependencies on each other,
+    # so this key ordering can be used to avoid deadlock by placing dependent
+    # networks later and their dependencies earlier.
+    return [self.networks[key] for key in sorted(six.iterkeys(self.networks))]
 
+  def _CreateNetworks(self):
+    networks = self._GetSortedNetworks()
     vm_util.RunThreaded(lambda net: net.Create(), networks)
 
     # VPC peering is currently only supported for connecting 2 VPC networks
@@ -622,121 +729,103 @@ class BenchmarkSpec(object):
       elif len(networks) == 2:
         networks[0].Peer(networks[1])
 
-    if self.container_registry:
-      self.container_registry.Create()
-      for container_spec in six.itervalues(self.container_specs):
-        if container_spec.static_image:
-          continue
-        container_spec.image = self.container_registry.GetOrBuild(
-            container_spec.image)
-
-    if self.container_cluster:
-      self.container_cluster.Create()
-
-    # do after network setup but before VM created
-    if self.nfs_service and self.nfs_service.CLOUD != nfs_service.UNMANAGED:
-      self.nfs_service.Create()
-    if self.smb_service:
-      self.smb_service.Create()
+  def _CreateContainerRegistry(self):
+    self.container_registry.Create()
+    for container_spec in six.itervalues(self.container_specs):
+      if container_spec.static_image:
+        continue
+      container_spec.image = self.container_registry.GetOrBuild(
+          container_spec.image)
 
+  def _CreatePlacementGroups(self):
     for placement_group_object in self.placement_groups.values():
       placement_group_object.Create()
 
-    if self.vms:
+  def _CreateVms(self):
+    # We separate out creating, booting, and preparing the VMs into two phases
+    # so that we don't slow down the creation of all the VMs by running
+    # commands on the VMs that booted.
+    vm_util.RunThreaded(
+        self.CreateAndBootVm,
+        self.vms,
+        post_task_delay=FLAGS.create_and_boot_post_task_delay,
+        rate_limit_key=lambda vm: vm.CLOUD)
+    if self.nfs_service and self.nfs_service.CLOUD == nfs_service.UNMANAGED:
+      self.nfs_service.Create()
+    vm_util.RunThreaded(self.PrepareVmAfterBoot, self.vms)
 
-      # We separate out creating, booting, and preparing the VMs into two phases
-      # so that we don't slow down the creation of all the VMs by running
-      # commands on the VMs that booted.
-      vm_util.RunThreaded(
-          self.CreateAndBootVm,
-          self.vms,
-          post_task_delay=FLAGS.create_and_boot_post_task_delay)
-      if self.nfs_service and self.nfs_service.CLOUD == nfs_service.UNMANAGED:
-        self.nfs_service.Create()
-      vm_util.RunThreaded(self.PrepareVmAfterBoot, self.vms)
-
-      sshable_vms = [
-          vm for vm in self.vms if vm.OS_TYPE not in os_types.WINDOWS_OS_TYPES
+    sshable_vms = [
+        vm for vm in self.vms if vm.OS_TYPE not in os_types.WINDOWS_OS_TYPES
+    ]
+    sshable_vm_groups = {}
+    for group_name, group_vms in six.iteritems(self.vm_groups):
+      sshable_vm_groups[group_name] = [
+          vm for vm in group_vms
+          if vm.OS_TYPE not in os_types.WINDOWS_OS_TYPES
       ]
-      sshable_vm_groups = {}
-      for group_name, group_vms in six.iteritems(self.vm_groups):
-        sshable_vm_groups[group_name] = [
-            vm for vm in group_vms
-            if vm.OS_TYPE not in os_types.WINDOWS_OS_TYPES
-        ]
-      vm_util.GenerateSSHConfig(sshable_vms, sshable_vm_groups)
-    if self.spark_service:
-      self.spark_service.Create()
-    if self.dpb_service:
-      self.dpb_service.Create()
-    if hasattr(self, 'relational_db') and self.relational_db:
-      self.relational_db.SetVms(self.vm_groups)
-      self.relational_db.Create()
-    if self.non_relational_db:
-      self.non_relational_db.Create(restore=should_restore)
-    if self.spanner:
-      self.spanner.Create(restore=should_restore)
-    if self.tpus:
-      vm_util.RunThreaded(lambda tpu: tpu.Create(), self.tpus)
-    if self.edw_service:
-      if (not self.edw_service.user_managed and
-          self.edw_service.SERVICE_TYPE == 'redshift'):
-        # The benchmark creates the Redshift cluster's subnet group in the
-        # already provisioned virtual private cloud (vpc).
-        for network in networks:
-          if network.__class__.__name__ == 'AwsNetwork':
-            self.edw_service.cluster_subnet_group.subnet_id = network.subnet.id
-      self.edw_service.Create()
-    if self.vpn_service:
-      self.vpn_service.Create()
-
-  def Delete(self):
-    if self.deleted:
-      return
-
-    should_freeze = hasattr(self, 'freeze_path') and self.freeze_path
+    vm_util.GenerateSSHConfig(sshable_vms, sshable_vm_groups)
+
+  def _CreateRelationalDb(self):
+    self.relational_db.SetVms(self.vm_groups)
+    self.relational_db.Create()
+
+  def _CreateEdwService(self):
+    if (not self.edw_service.user_managed and
+        self.edw_service.SERVICE_TYPE == 'redshift'):
+      # The benchmark creates the Redshift cluster's subnet group in the
+      # already provisioned virtual private cloud (vpc).
+      for network in self._GetSortedNetworks():
+        if network.__class__.__name__ == 'AwsNetwork':
+          self.edw_service.cluster_subnet_group.subnet_id = network.subnet.id
+    self.edw_service.Create()
 
-    if self.container_registry:
-      self.container_registry.Delete()
-    if self.spark_service:
-      self.spark_service.Delete()
-    if self.dpb_service:
-      self.dpb_service.Delete()
-    if hasattr(self, 'relational_db') and self.relational_db:
-      self.relational_db.Delete()
-    if hasattr(self, 'non_relational_db') and self.non_relational_db:
-      self.non_relational_db.Delete(freeze=should_freeze)
-    if hasattr(self, 'spanner') and self.spanner:
-      self.spanner.Delete(freeze=should_freeze)
-    if self.tpus:
-      vm_util.RunThreaded(lambda tpu: tpu.Delete(), self.tpus)
-    if self.edw_service:
-      self.edw_service.Delete()
-    if self.nfs_service:
-      self.nfs_service.Delete()
-    if self.smb_service:
-      self.smb_service.Delete()
+  def Provision(self):
+    """Prepares the VMs and networks necessary for the benchmark to run.
 
+    Resources are created concurrently as soon as the resources they depend on
+    exist, unless --sequential_provisioning is set.
+    """
+    tasks = [
+        background_tasks.GraphTask(name, create, dependencies)
+        for name, create, _, dependencies in self._GetResourceGraph()
+        if create
+    ]
+    max_concurrency = 1 if FLAGS.sequential_provisioning else None
+    times = background_tasks.RunTaskGraph(tasks, max_concurrency)
+    critical_path = background_tasks.GetCriticalPath(tasks, times)
+    self.provision_critical_path = [
+        (name, times[name][1] - times[name][0]) for name in critical_path]
+    if critical_path:
+      logging.info('Provisioning critical path: %s', ' -> '.join(
+          '%s (%.1fs)' % step for step in self.provision_critical_path))
+
+  def _DeleteCapacityReservations(self):
     # Note: It is ok to delete capacity reservations before deleting the VMs,
     # and will actually save money (mere seconds of usage).
-    if self.capacity_reservations:
-      try:
-        vm_util.RunThreaded(lambda reservation: reservation.Delete(),
-                            self.capacity_reservations)
-      except Exception:  # pylint: disable=broad-except
-        logging.exception('Got an exception deleting CapacityReservations. '
-                          'Attempting to continue tearing down.')
+    try:
+      vm_util.RunThreaded(lambda reservation: reservation.Delete(),
+                          self.capacity_reservations)
+    except Exception:  # pylint: disable=broad-except
+      logging.exception('Got an exception deleting CapacityReservations. '
+                        'Attempting to continue tearing down.')
 
-    if self.vms:
-      try:
-        vm_util.RunThreaded(self.DeleteVm, self.vms)
-      except Exception:
-        logging.exception('Got an exception deleting VMs. '
-                          'Attempting to continue tearing down.')
-    if hasattr(self, 'placement_groups'):
-      for placement_group_object in self.placement_groups.values():
-        placement_group_object.Delete()
+  def _DeleteVms(self):
+    try:
+      vm_util.RunThreaded(self.DeleteVm, self.vms)
+    except Exception:
+      logging.exception('Got an exception deleting VMs. '
+                        'Attempting to continue tearing down.')
+
+  def _DeletePlacementGroups(self):
+    for placement_group_object in self.placement_groups.values():
+      placement_group_object.Delete()
+
+  def _DeleteContainerCluster(self):
+    self.container_cluster.DeleteServices()
+    self.container_cluster.DeleteContainers()
+    self.container_cluster.Delete()
 
+  def _DeleteNetworks(self):
     for firewall in six.itervalues(self.firewalls):
       try:
         firewall.DisallowAllPorts()
@@ -744,11 +833,6 @@ class BenchmarkSpec(object):
         logging.exception('Got an exception disabling firewalls. '
                           'Attempting to continue tearing down.')
 
-    if self.container_cluster:
-      self.container_cluster.DeleteServices()
-      self.container_cluster.DeleteContainers()
-      self.container_cluster.Delete()
-
     for net in six.itervalues(self.networks):
       try:
         net.Delete()
@@ -756,8 +840,27 @@ class BenchmarkSpec(object):
         logging.exception('Got an exception deleting networks. '
                           'Attempting to continue tearing down.')
 
-    if hasattr(self, 'vpn_service') and self.vpn_service:
-      self.vpn_service.Delete()
+  def Delete(self):
+    """Deletes the benchmark's resources in the reverse order of creation.
+
+    A resource is deleted once every resource depending on it has been deleted.
+    Deletion continues past failures, and the first failure is raised at the
+    end.
+    """
+    if self.deleted:
+      return
+
+    if self.capacity_reservations:
+      self._DeleteCapacityReservations()
+
+    tasks = [
+        background_tasks.GraphTask(name, delete or (lambda: None),
+                                   dependencies)
+        for name, _, delete, dependencies in self._GetResourceGraph()
+    ]
+    max_concurrency = 1 if FLAGS.sequential_provisioning else None
+    background_tasks.RunTaskGraph(tasks, max_concurrency, reverse=True,
+                                  continue_on_failure=True)
 
     self.deleted = True
 
@@ -768,6 +871,18 @@ class BenchmarkSpec(object):
       samples.extend(self.container_cluster.GetSamples())
     if self.container_registry:
       samples.extend(self.container_registry.GetSamples())
+    if FLAGS.ssh_transport == ssh_session.SESSION:
+      samples.extend(ssh_session.GetCommandLatencySamples(
+          [vm.name for vm in self.vms]))
+    if self.provision_critical_path:
+      metadata = {'provision_critical_path': ','.join(
+          name for name, _ in self.provision_critical_path)}
+      for name, duration in self.provision_critical_path:
+        metadata['provision_%s_time' % name] = duration
+      samples.append(sample.Sample(
+          'Provision Critical Path Time',
+          sum(duration for _, duration in self.provision_critical_path),
+          'seconds', metadata))
     return samples
 
   def StartBackgroundWorkload(self):
@@ -0,0 +1,72 @@
+# Copyright 2026 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Creates VMs that only differ in their names with one provider call.
+
+BenchmarkSpec creates each VM in its own thread. With --bulk_vm_create, the
+_Create calls of VMs that a provider can create together are gathered into
+one bulk create call, after which each VM goes on to wait for itself to exist
+and boot as usual. Gathering is done by a status_poller.StatusPoller.
+"""
+
+import time
+
+from absl import flags
+from perfkitbenchmarker import status_poller
+
+flags.DEFINE_boolean(
+    'bulk_vm_create', False,
+    'Whether VMs that only differ in their names are created with one call '
+    'to the provider, e.g. "aws ec2 run-instances --count" or "gcloud compute '
+    'instances create" with several names, instead of one call per VM. '
+    'Supported on AWS and GCP.')
+flags.DEFINE_float(
+    'bulk_vm_create_interval', 5.0,
+    'Number of seconds the first VM of a bulk create call waits for other VMs '
+    'to join the call.', lower_bound=0)
+flags.DEFINE_integer(
+    'bulk_vm_create_max_batch_size', 100,
+    'Maximum number of VMs created by one bulk create call.', lower_bound=1)
+
+FLAGS = flags.FLAGS
+
+
+def Create(vm, key, create_func):
+  """Creates vm in one call together with the VMs of other threads.
+
+  The create_start_time of every VM created by a call is set to when the call
+  was issued, so that boot times do not include the time spent gathering VMs.
+
+  Args:
+    vm: The VM to create.
+    key: Hashable identifying the VMs that create_func can create together.
+    create_func: Function taking a list of VMs sharing key, creating them with
+      one call, and returning a dict from each VM to its result.
+
+  Returns:
+    The result of create_func for vm.
+  """
+
+  def _CreateVms(vms):
+    create_start_time = time.time()
+    results = create_func(vms)
+    for created_vm in vms:
+      created_vm.create_start_time = create_start_time
+    return results
+
+  poller = status_poller.GetPoller(
+      ('bulk_vm_create', vm.CLOUD, key), _CreateVms,
+      interval=FLAGS.bulk_vm_create_interval,
+      max_batch_size=FLAGS.bulk_vm_create_max_batch_size)
+  return poller.Get(vm)
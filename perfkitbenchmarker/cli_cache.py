@@ -0,0 +1,192 @@
+# Copyright 2026 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""An on-disk cache for the results of slow cloud CLI lookups.
+
+Lookups such as the zones of a region or the latest image matching a filter
+change rarely, but shelling out to a cloud CLI for them can take seconds and
+happens in every PKB run and process. With --cache_cli_lookups, their results
+are stored in files named by a hash of the lookup and its arguments, and
+reused for --cli_cache_ttl seconds by any PKB process using the same cache
+directory.
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+from absl import flags
+
+flags.DEFINE_boolean(
+    'cache_cli_lookups', False,
+    'Whether the results of slow cloud CLI lookups, such as the zones of a '
+    'region, the account, the default project and the latest image matching '
+    'a filter, are cached on disk and reused by later PKB runs.')
+flags.DEFINE_integer(
+    'cli_cache_ttl', 24 * 60 * 60,
+    'Number of seconds a cached cloud CLI lookup result is reused for.',
+    lower_bound=0)
+flags.DEFINE_string(
+    'cli_cache_dir', None,
+    'Directory of the cloud CLI lookup cache. Defaults to a "cli_cache" '
+    'directory under --temp_dir.')
+flags.DEFINE_list(
+    'cli_cache_invalidate', [],
+    'Names of cloud CLI lookups whose results cached before this run are '
+    'ignored and looked up again, or "all". The names are aws_zones, '
+    'aws_account, aws_images and gcp_config.')
+
+FLAGS = flags.FLAGS
+
+ALL = 'all'
+_CACHE_DIR_NAME = 'cli_cache'
+# Environment variables selecting the account, project or configuration a
+# cloud CLI uses. They are part of the cache key so that lookups made with
+# different credentials do not share results.
+_KEY_ENVIRONMENT_VARIABLES = (
+    'AWS_PROFILE', 'AWS_ACCESS_KEY_ID', 'AWS_DEFAULT_REGION',
+    'CLOUDSDK_ACTIVE_CONFIG_NAME', 'CLOUDSDK_CONFIG', 'CLOUDSDK_CORE_PROJECT',
+    'CLOUDSDK_CORE_ACCOUNT')
+# The gcloud configuration used if none is set, and the files its name and
+# properties are stored in, relative to the gcloud configuration directory.
+_DEFAULT_GCLOUD_CONFIG_NAME = 'default'
+_GCLOUD_ACTIVE_CONFIG_FILE = 'active_config'
+_GCLOUD_CONFIG_FILE = os.path.join('configurations', 'config_{}')
+# Entries written before this time are stale if their lookup is invalidated.
+_START_TIME = time.time()
+
+
+def _GetCacheDir():
+  return FLAGS.cli_cache_dir or os.path.join(FLAGS.temp_dir, _CACHE_DIR_NAME)
+
+
+def _GetModifiedTime(path):
+  """Returns the modification time of a file, or None if it does not exist."""
+  try:
+    return os.path.getmtime(path)
+  except OSError:
+    return None
+
+
+def _GetGcloudConfigName(config_dir):
+  """Returns the name of the active gcloud configuration."""
+  name = os.environ.get('CLOUDSDK_ACTIVE_CONFIG_NAME')
+  if name:
+    return name
+  try:
+    with open(os.path.join(config_dir, _GCLOUD_ACTIVE_CONFIG_FILE)) as f:
+      return f.read().strip() or _DEFAULT_GCLOUD_CONFIG_NAME
+  except (IOError, OSError):
+    return _DEFAULT_GCLOUD_CONFIG_NAME
+
+
+def _GetConfigFiles():
+  """Returns the active gcloud configuration and CLI config file times.
+
+  Running "gcloud config set", "gcloud config configurations activate" or
+  "aws configure" changes the account, project or credentials lookups are
+  made with without changing the environment, so the active gcloud
+  configuration and the modification times of the files these commands write
+  are part of the cache key as well.
+  """
+  gcloud_dir = os.environ.get('CLOUDSDK_CONFIG') or os.path.expanduser(
+      os.path.join('~', '.config', 'gcloud'))
+  gcloud_config = _GetGcloudConfigName(gcloud_dir)
+  paths = [
+      os.path.join(gcloud_dir, _GCLOUD_CONFIG_FILE.format(gcloud_config)),
+      os.environ.get('AWS_CONFIG_FILE') or os.path.expanduser(
+          os.path.join('~', '.aws', 'config')),
+      os.environ.get('AWS_SHARED_CREDENTIALS_FILE') or os.path.expanduser(
+          os.path.join('~', '.aws', 'credentials')),
+  ]
+  return {
+      'gcloud_config': gcloud_config,
+      'modified_times': {path: _GetModifiedTime(path) for path in paths},
+  }
+
+
+def _GetEntryPath(name, args):
+  """Returns the path of the cache file of a lookup."""
+  key = json.dumps({
+      'name': name,
+      'args': args,
+      'environment': {variable: os.environ.get(variable)
+                      for variable in _KEY_ENVIRONMENT_VARIABLES},
+      'config_files': _GetConfigFiles(),
+  }, sort_keys=True)
+  digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+  return os.path.join(_GetCacheDir(), '%s-%s.json' % (name, digest))
+
+
+def _IsFresh(entry, name):
+  """Returns whether a cache entry of the named lookup can be used."""
+  created = entry['created']
+  if ALL in FLAGS.cli_cache_invalidate or name in FLAGS.cli_cache_invalidate:
+    if created < _START_TIME:
+      return False
+  return time.time() - created < FLAGS.cli_cache_ttl
+
+
+def _ReadEntry(path):
+  """Returns the cache entry stored at path, or None."""
+  try:
+    with open(path) as entry_file:
+      return json.load(entry_file)
+  except (IOError, OSError, ValueError):
+    return None
+
+
+def _WriteEntry(path, value):
+  """Atomically replaces the cache entry at path."""
+  fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+  try:
+    with os.fdopen(fd, 'w') as entry_file:
+      json.dump({'created': time.time(), 'value': value}, entry_file)
+    os.rename(temp_path, path)
+  except Exception:
+    os.remove(temp_path)
+    raise
+
+
+def Call(name, func, *args):
+  """Returns func(*args), using a cached result if possible.
+
+  Processes looking up the same uncached result wait for the first of them to
+  store it instead of all calling func. Results are only stored if func
+  returns, so failed lookups are not cached.
+
+  Args:
+    name: The name of the lookup, which --cli_cache_invalidate refers to.
+    func: Function performing the lookup. Its result must be JSON
+      serializable, and tuples in it are returned as lists when cached.
+    *args: JSON serializable arguments to func, which identify the result
+      together with name.
+  """
+  if not FLAGS.cache_cli_lookups:
+    return func(*args)
+  path = _GetEntryPath(name, list(args))
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path + '.lock', 'a') as lock_file:
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    entry = _ReadEntry(path)
+    if entry is not None and _IsFresh(entry, name):
+      logging.debug('Using cached %s lookup from %s', name, path)
+      return entry['value']
+    value = func(*args)
+    _WriteEntry(path, value)
+    return value
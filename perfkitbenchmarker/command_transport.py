@@ -0,0 +1,265 @@
+# Copyright 2026 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs common cloud CLI commands through in-process API clients.
+
+Every gcloud, aws or az command issued by vm_util.IssueCommand starts a new
+CLI process, which can take seconds before the CLI even sends its request.
+With --command_transport=sdk, commands of operations registered with
+RegisterOperation, such as describing, labeling, creating and deleting
+resources, are instead run by functions calling the cloud APIs through
+clients that are created once and keep their connections open. Their output
+mimics the output of the CLI, so that callers are unaffected. All other
+commands, and commands using options an operation does not handle, are still
+run by the CLI.
+
+Providers register their operations in their own modules, which are loaded
+together with the provider.
+"""
+
+import collections
+import logging
+import os
+import threading
+
+from absl import flags
+from perfkitbenchmarker import vm_util
+
+CLI = 'cli'
+SDK = 'sdk'
+
+flags.DEFINE_enum(
+    'command_transport', CLI, [CLI, SDK],
+    'How cloud CLI commands are run. "cli" runs every command with the cloud '
+    'CLI. "sdk" runs the commands of common operations, such as describing, '
+    'labeling, creating and deleting VMs and disks, through in-process API '
+    'clients with pooled connections, and all other commands with the CLI.')
+flags.DEFINE_list(
+    'command_transport_endpoints', [],
+    'Overrides of the API endpoints used by --command_transport=sdk, as '
+    'API=URL pairs, e.g. gce=http://localhost:8080/compute/v1. The APIs are '
+    'gce and ec2.')
+flags.DEFINE_integer(
+    'command_transport_pool_size', 32,
+    'Maximum number of connections kept open to each API endpoint by '
+    '--command_transport=sdk.', lower_bound=1)
+
+FLAGS = flags.FLAGS
+
+# Maps the executable and leading positional arguments of the commands of an
+# operation to the function running it. See RegisterOperation.
+_operations = {}
+# Maps the executable of a CLI to the names of its global flags. See
+# ParseCommand.
+_global_flags = {}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class UnsupportedCommandError(Exception):
+  """Raised by an operation for commands that must be run by the CLI."""
+
+
+class ParsedCommand(collections.namedtuple('ParsedCommand',
+                                           ['executable', 'args', 'flags'])):
+  """A CLI command split into its positional arguments and flags.
+
+  Attributes:
+    executable: string. The basename of the CLI executable, e.g. "gcloud".
+    args: list of strings. The positional arguments of the command.
+    flags: OrderedDict mapping each flag name to the list of its values.
+      Flags passed without a value map to an empty list.
+  """
+
+  def PopFlag(self, name, default=None):
+    """Removes a flag that takes one value and returns its value.
+
+    Args:
+      name: string. The name of the flag.
+      default: The value returned if the flag was not passed.
+
+    Raises:
+      UnsupportedCommandError: If the flag was passed without a value or
+        more than once.
+    """
+    if name not in self.flags:
+      return default
+    values = self.flags.pop(name)
+    if len(values) != 1:
+      raise UnsupportedCommandError(
+          'Flag --%s must have exactly one value.' % name)
+    return values[0]
+
+  def PopListFlag(self, name):
+    """Removes a flag and returns all of its values, split on commas."""
+    values = []
+    for value in self.flags.pop(name, ()):
+      values.extend(value.split(','))
+    return values
+
+  def PopBooleanFlag(self, name):
+    """Removes a flag that takes no value and returns whether it was passed."""
+    if name not in self.flags:
+      return False
+    if self.flags.pop(name):
+      raise UnsupportedCommandError('Flag --%s takes no value.' % name)
+    return True
+
+  def CheckAllFlagsUsed(self):
+    """Raises UnsupportedCommandError if any flag was not popped."""
+    if self.flags:
+      raise UnsupportedCommandError(
+          'Unsupported flags: %s' % ', '.join(self.flags))
+
+
+def ParseCommand(cmd):
+  """Parses a CLI command.
+
+  Positional arguments are the tokens before the first flag. A flag takes the
+  value after "=", or else all of the following tokens up to the next flag,
+  like "--tags Key=a,Value=b Key=c,Value=d" in aws commands. Global flags are
+  flags which take exactly one value and may precede positional arguments,
+  like "--output json" in aws commands. See RegisterGlobalFlags.
+
+  Args:
+    cmd: list of strings. The command, as given to IssueCommand.
+
+  Returns:
+    A ParsedCommand.
+  """
+  executable = os.path.basename(str(cmd[0]))
+  global_flags = _global_flags.get(executable, ())
+  args = []
+  flag_values = collections.OrderedDict()
+  name = None
+  for token in cmd[1:]:
+    token = str(token)
+    if token.startswith('--'):
+      name, has_value, value = token[2:].partition('=')
+      flag_values.setdefault(name, [])
+      if has_value:
+        flag_values[name].append(value)
+        name = None
+    elif name is None:
+      args.append(token)
+    else:
+      flag_values[name].append(token)
+      if name in global_flags:
+        name = None
+  return ParsedCommand(executable, args, flag_values)
+
+
+def RegisterGlobalFlags(executable, *flag_names):
+  """Registers the global flags of a CLI, which take exactly one value.
+
+  Args:
+    executable: string. The basename of the CLI executable, e.g. "aws".
+    *flag_names: strings. The names of the global flags, e.g. "output".
+  """
+  _global_flags[executable] = flag_names
+
+
+def RegisterOperation(executable, *args):
+  """Returns a decorator registering the function running an operation.
+
+  The function is called with a ParsedCommand for each command starting with
+  the executable and args, with those args removed from the ParsedCommand. It
+  returns a tuple of stdout, stderr, and retcode as the CLI would, or raises
+  UnsupportedCommandError for commands it cannot run, which are then run by
+  the CLI.
+
+  Args:
+    executable: string. The basename of the CLI executable, e.g. "gcloud".
+    *args: strings. The leading positional arguments of the commands of the
+      operation, e.g. "compute", "instances", "describe".
+  """
+
+  def Decorator(func):
+    _operations[(executable,) + args] = func
+    return func
+
+  return Decorator
+
+
+def _FindOperation(parsed):
+  """Returns the function running a command and the number of args it takes."""
+  for num_args in range(len(parsed.args), 0, -1):
+    func = _operations.get(
+        (parsed.executable,) + tuple(parsed.args[:num_args]))
+    if func:
+      return func, num_args
+  return None, 0
+
+
+def GetEndpoint(api, default):
+  """Returns the --command_transport_endpoints override of an API or default.
+
+  Args:
+    api: string. The name of the API, e.g. "gce".
+    default: string. The endpoint used if there is no override.
+  """
+  for override in FLAGS.command_transport_endpoints:
+    name, _, url = override.partition('=')
+    if name == api:
+      return url
+  return default
+
+
+def GetClient(key, create_func):
+  """Returns the process wide API client for key, creating it if needed.
+
+  Args:
+    key: Hashable identifying the client, typically the API and region.
+    create_func: Function taking no arguments and returning the client if it
+      is created. Clients must be safe to share between threads.
+  """
+  with _clients_lock:
+    if key not in _clients:
+      _clients[key] = create_func()
+    return _clients[key]
+
+
+def Issue(cmd, env=None, timeout=None):
+  """Runs cmd through a registered operation if possible.
+
+  Commands given an environment are left to the CLI, since the environment
+  may select credentials or configuration the API clients would not use.
+
+  Args:
+    cmd: list of strings. The command, as given to IssueCommand.
+    env: The env argument of IssueCommand.
+    timeout: The timeout argument of IssueCommand, in seconds.
+
+  Returns:
+    A tuple of stdout, stderr, and retcode, or None if the command must be
+    run by the CLI.
+  """
+  if env or not cmd:
+    return None
+  parsed = ParseCommand(cmd)
+  func, num_args = _FindOperation(parsed)
+  if not func:
+    return None
+  del parsed.args[:num_args]
+  try:
+    return func(parsed, timeout=timeout)
+  except UnsupportedCommandError as e:
+    logging.debug('Running command with the CLI: %s', e)
+    return None
+
+
+def Install():
+  """Sets vm_util to run commands with this module per --command_transport."""
+  vm_util.SetCommandTransport(Issue if FLAGS.command_transport == SDK else None)
@@ -23,14 +23,19 @@ This script is downloaded onto cloud launcher VMs by the benchmark. It will
 wait for incoming curl requests from booted vms. When it gets an incoming curl
 request, it first double check that the other vm a valid vm, is reachable,
 then record the system time in nanoseconds.
+
+Boot vms are probed with non-blocking TCP connects from a single asyncio event
+loop rather than one netcat process per attempt, so that probing thousands of
+vms does not load the launcher and skew the recorded times.
 """
 
+import asyncio
 import functools
 from http import server
 import logging
-import multiprocessing
 import os
-import subprocess
+import queue as queue_lib
+import resource
 import sys
 import threading
 import time
@@ -48,33 +53,169 @@ UNDEFINED_HOSTNAME = 'UNDEFINED'
 SEQUENTIAL_IP = 'SEQUENTIAL_IP'
 # Multiplier for nanoseconds
 NANO = 1e9
+# Amount of time in seconds to wait for a single TCP connect. Connects within
+# a VPC complete in milliseconds, so a connect taking longer is to a vm that
+# is not up yet, and only holds a connect slot.
+CONNECT_TIMEOUT_SECONDS = 0.25
+# Default delays in seconds between failed probes of the same host.
+INITIAL_BACKOFF_SECONDS = 0.05
+MAX_BACKOFF_SECONDS = 0.25
+BACKOFF_MULTIPLIER = 2
+# Default maximum number of TCP connects in flight of a Prober.
+MAX_CONCURRENT_CONNECTS = 512
+# Number of open files kept free for the http server, results file and logs.
+RESERVED_FILES = 64
+
+
+def GetMaxConnects(vms_count):
+  """Returns the number of TCP connects in flight to probe vms_count vms.
+
+  One connect per vm lets every vm be probed at its backoff interval. The
+  soft open file limit is raised towards the hard limit to allow that, and the
+  result is capped by the open file limit.
+
+  Args:
+    vms_count: number of vms probed.
+  """
+  wanted = max(vms_count, 1)
+  soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+  if soft != resource.RLIM_INFINITY and soft < wanted + RESERVED_FILES:
+    new_soft = wanted + RESERVED_FILES
+    if hard != resource.RLIM_INFINITY:
+      new_soft = min(new_soft, hard)
+    try:
+      resource.setrlimit(resource.RLIMIT_NOFILE, (new_soft, hard))
+      soft = new_soft
+    except (ValueError, OSError):
+      logging.warning('Could not raise the open file limit to %d.', new_soft)
+  if soft == resource.RLIM_INFINITY:
+    return wanted
+  return max(1, min(wanted, soft - RESERVED_FILES))
+
+
+def _NowNs():
+  """Returns the system time in nanoseconds."""
+  if hasattr(time, 'time_ns'):
+    return time.time_ns()
+  return int(time.time() * NANO)
+
+
+class Prober(object):
+  """Probes boot vms concurrently from one asyncio event loop.
+
+  Failed probes of a host are retried with exponential backoff until the
+  timeout passed to each probe.
+  """
+
+  def __init__(self, port, initial_backoff=INITIAL_BACKOFF_SECONDS,
+               max_backoff=MAX_BACKOFF_SECONDS,
+               max_connects=MAX_CONCURRENT_CONNECTS,
+               connect_timeout=CONNECT_TIMEOUT_SECONDS):
+    """Creates a Prober.
+
+    Args:
+      port: port number to connect to on the boot vms.
+      initial_backoff: seconds to wait after the first failed probe of a host.
+      max_backoff: maximum seconds to wait between probes of a host.
+      max_connects: maximum number of TCP connects in flight.
+      connect_timeout: seconds to wait for a single TCP connect.
+    """
+    self.port = int(port)
+    self.initial_backoff = initial_backoff
+    self.max_backoff = max_backoff
+    self.connect_timeout = connect_timeout
+    self._max_connects = max_connects
+    self._semaphore = None
+
+  async def _Connect(self, client_host):
+    """Attempts one TCP connect and returns its time in ns, or None."""
+    if self._semaphore is None:
+      # Created lazily so that it binds to the loop running the probes.
+      self._semaphore = asyncio.Semaphore(self._max_connects)
+    async with self._semaphore:
+      try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(client_host, self.port),
+            self.connect_timeout)
+      except (OSError, asyncio.TimeoutError):
+        return None
+      connect_time = _NowNs()
+    writer.close()
+    return connect_time
+
+  async def _Retry(self, probe, timeout):
+    """Runs probe with backoff until it returns a time or timeout passes."""
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    delay = self.initial_backoff
+    while True:
+      probe_time = await probe()
+      if probe_time is not None:
+        return probe_time
+      remaining = deadline - loop.time()
+      if remaining <= 0:
+        return None
+      await asyncio.sleep(min(delay, remaining))
+      delay = min(delay * BACKOFF_MULTIPLIER, self.max_backoff)
+
+  async def ConfirmIPAccessible(self, client_host, timeout=MAX_TIME_SECONDS):
+    """Confirm the given host's port is accessible, return the access time."""
+    connect_time = await self._Retry(
+        functools.partial(self._Connect, client_host), timeout)
+    if connect_time is not None:
+      return 'Pass:%s:%d' % (client_host, connect_time)
+    logging.warning('Could not connect to port %s on client vm %s.',
+                    self.port, client_host)
+    return 'Fail:%s:%d' % (client_host, _NowNs())
+
+  async def WaitForRunningStatus(self, client_host, timeout=MAX_TIME_SECONDS):
+    """Wait for the VM to report running status.
+
+    Status command generated from data/large_scale_boot/vm_status.sh.jinja2.
+
+    Args:
+      client_host: client host to check for running status.
+      timeout: Max timeout to wait before declaring failure.
+
+    Returns:
+      host status string.
+    """
+    with open('/tmp/pkb/vm_status.sh', 'r') as reader:
+      command = reader.read()
+
+    async def _CheckStatus():
+      process = await asyncio.create_subprocess_shell(
+          command, stdout=asyncio.subprocess.PIPE,
+          stderr=asyncio.subprocess.PIPE)
+      status, _ = await process.communicate()
+      if 'running' in status.decode('utf-8').lower():
+        return _NowNs()
+      return None
+
+    running_time = await self._Retry(_CheckStatus, timeout)
+    if running_time is not None:
+      return 'Running:%s:%d' % (client_host, running_time)
+    logging.warning('Client vm %s not running yet.', client_host)
+    return 'Fail:%s:%d' % (client_host, _NowNs())
+
+
+def _RunProbe(coroutine):
+  """Runs a single probe coroutine to completion on a new event loop."""
+  loop = asyncio.new_event_loop()
+  try:
+    return loop.run_until_complete(coroutine)
+  finally:
+    loop.close()
 
 
 def ConfirmIPAccessible(client_host, port, timeout=MAX_TIME_SECONDS):
   """Confirm the given host's port is accessible and return the access time."""
-  netcat_command = 'nc -zv -w 1 {client} {port}'.format(
-      client=client_host,
-      port=port)
-  start_time = time.time()
-  while time.time() <= (start_time + timeout):
-    p = subprocess.Popen(netcat_command, shell=True, stdout=subprocess.PIPE,
-                         stderr=subprocess.PIPE)
-    _, stderr = p.communicate()
-    # different versions of netcat uses different stderr strings.
-    if any(word in stderr.decode('utf-8') for word in ['open', 'succeeded']):
-      # return the system time in nanoseconds
-      return 'Pass:%s:%d' % (client_host, time.time() * NANO)
-
-  logging.warning('Could not netcat to port %s on client vm %s.',
-                  port, client_host)
-  return 'Fail:%s:%d' % (client_host, time.time() * NANO)
+  return _RunProbe(Prober(port).ConfirmIPAccessible(client_host, timeout))
 
 
 def WaitForRunningStatus(client_host, timeout=MAX_TIME_SECONDS):
   """Wait for the VM to report running status.
 
-  Status command generated from data/large_scale_boot/vm_status.sh.jinja2.
-
   Args:
     client_host: client host to check for running status.
     timeout: Max timeout to wait before declaring failure.
@@ -82,18 +223,7 @@ def WaitForRunningStatus(client_host, timeout=MAX_TIME_SECONDS):
   Returns:
     host status string.
   """
-  with open('/tmp/pkb/vm_status.sh', 'r') as reader:
-    command = reader.read()
-  start_time = time.time()
-  while time.time() <= (start_time + timeout):
-    p = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE,
-                         universal_newlines=True, stderr=subprocess.PIPE)
-    status, _ = p.communicate()
-    if 'running' in status.lower():
-      return 'Running:%s:%d' % (client_host, time.time() * NANO)
-
-  logging.warning('Client vm %s not running yet.', client_host)
-  return 'Fail:%s:%d' % (client_host, time.time() * NANO)
+  return _RunProbe(Prober(0).WaitForRunningStatus(client_host, timeout))
 
 
 def StoreResult(result_str, queue):
@@ -194,29 +324,36 @@ def GenerateHostIPs(boot_vm_index, count):
   return hostnames
 
 
-def ActAsClient(pool, queue, port, name_pattern, vms_count, use_public_ip):
+async def _ProbeAll(prober, host_names, check_running_status, queue):
+  """Probes all hosts concurrently, storing each result as soon as it is in."""
+  probes = []
+  for host_name in host_names:
+    probes.append(
+        prober.ConfirmIPAccessible(host_name, MAX_TIME_SECONDS_NO_CALLING))
+    if check_running_status:
+      probes.append(
+          prober.WaitForRunningStatus(host_name, MAX_TIME_SECONDS_NO_CALLING))
+  results = []
+  for probe in asyncio.as_completed(probes):
+    result = await probe
+    StoreResult(result, queue)
+    results.append(result)
+  return results
+
+
+def ActAsClient(prober, queue, name_pattern, vms_count, use_public_ip):
   """Use as a client."""
-  store_results = functools.partial(StoreResult, queue=queue)
-  all_jobs = []
-  for host_name in BuildHostNames(name_pattern, vms_count, use_public_ip):
-    job = pool.apply_async(
-        ConfirmIPAccessible,
-        args=(host_name, port, MAX_TIME_SECONDS_NO_CALLING,),
-        callback=store_results)
-    all_jobs.append(job)
-    if vms_count == 1:
-      status_job = pool.apply_async(
-          WaitForRunningStatus,
-          args=(host_name, MAX_TIME_SECONDS_NO_CALLING,),
-          callback=store_results)
-      all_jobs.append(status_job)
-  logging.info([async_job.get() for async_job in all_jobs])
+  host_names = BuildHostNames(name_pattern, vms_count, use_public_ip)
+  logging.info(_RunProbe(_ProbeAll(prober, host_names, vms_count == 1, queue)))
   queue.put(_STOP_QUEUE_ENTRY)
 
 
-def ActAsServer(pool, queue, port, host_name, listening_server):
+def ActAsServer(prober, queue, host_name, listening_server):
   """Use as a server."""
-  handler = functools.partial(RequestHandler, pool, host_name, queue, port)
+  # Probes of vms calling in run on an event loop in a background thread.
+  loop = asyncio.new_event_loop()
+  threading.Thread(target=loop.run_forever, daemon=True).start()
+  handler = functools.partial(RequestHandler, loop, prober, host_name, queue)
   listener = server.HTTPServer(listening_server, handler)
   logging.info('Starting httpserver...\n')
   try:
@@ -230,21 +367,21 @@ def ActAsServer(pool, queue, port, host_name, listening_server):
 class RequestHandler(server.BaseHTTPRequestHandler):
   """Request handler for incoming curl requests from booted vms."""
 
-  def __init__(self, pool, launcher, queue, access_port, *args, **kwargs):
+  def __init__(self, loop, prober, launcher, queue, *args, **kwargs):
     """Creates a RequestHandler for a http request received by the server.
 
     Args:
-      pool: multiprocessing process pool object.
+      loop: asyncio event loop running in another thread to probe vms on.
+      prober: Prober used to call the booted vms.
       launcher: name string of the launcher vm that the server is on.
-      queue: multiprocessing queue object.
-      access_port: port number to call on the booted vms.
+      queue: queue object that results are written to.
       *args: Other argments to apply to the request handler.
       **kwargs: Keyword arguments to apply to the request handler.
     """
-    self.process_pool = pool
+    self.probe_loop = loop
+    self.prober = prober
     self.launcher = launcher
     self.timing_queue = queue
-    self.access_port = access_port
     # BaseHTTPRequestHandler calls do_GET inside __init__
     # So we have to call super().__init__ after setting attributes.
     super(RequestHandler, self).__init__(*args, **kwargs)
@@ -266,10 +403,10 @@ class RequestHandler(server.BaseHTTPRequestHandler):
 
     # Process this client
     logging.info(client_host)
-    store_results_func = functools.partial(StoreResult, queue=self.timing_queue)
-    self.process_pool.apply_async(ConfirmIPAccessible,
-                                  args=(client_host, self.access_port,),
-                                  callback=store_results_func)
+    future = asyncio.run_coroutine_threadsafe(
+        self.prober.ConfirmIPAccessible(client_host), self.probe_loop)
+    future.add_done_callback(
+        lambda f: StoreResult(f.result(), self.timing_queue))
 
   def shutdown(self):
     """Shut down the server."""
@@ -280,9 +417,9 @@ class RequestHandler(server.BaseHTTPRequestHandler):
 
 if __name__ == '__main__':
   logging.basicConfig(level=logging.INFO)
-  if len(sys.argv) != 9:
+  if len(sys.argv) not in (9, 11, 13):
     raise ValueError('Got unexpected number of command-line arguments. '
-                     'There should be at most 7 command-line arguments: '
+                     'There should be 8, 10 or 12 command-line arguments: '
                      '1. name of the server vm, '
                      '2. server port, '
                      '3. results file, '
@@ -290,7 +427,12 @@ if __name__ == '__main__':
                      '5. whether to use the listening server, '
                      '6. launched vm naming pattern, '
                      '7. number of launched vms.'
-                     '8. whether to use public ip address.')
+                     '8. whether to use public ip address.'
+                     '9. optional initial probe backoff in seconds.'
+                     '10. optional maximum probe backoff in seconds.'
+                     '11. optional maximum number of connects in flight, or 0 '
+                     'to size it for the number of vms.'
+                     '12. optional connect timeout in seconds.')
   hostname = sys.argv[1]
   server_address = ('', int(sys.argv[2]))
   results_file_path = sys.argv[3]
@@ -299,18 +441,27 @@ if __name__ == '__main__':
   vms_name_pattern = sys.argv[6]
   num_vms = int(sys.argv[7])
   using_public_ip = sys.argv[8] == 'True'
-  process_pool = multiprocessing.Pool()
-  multiprocessing_manager = multiprocessing.Manager()
-  timing_queue = multiprocessing_manager.Queue()
+  prober_args = {'max_connects': GetMaxConnects(num_vms)}
+  if len(sys.argv) >= 11:
+    prober_args['initial_backoff'] = float(sys.argv[9])
+    prober_args['max_backoff'] = float(sys.argv[10])
+  if len(sys.argv) == 13:
+    if int(sys.argv[11]):
+      prober_args['max_connects'] = int(sys.argv[11])
+    prober_args['connect_timeout'] = float(sys.argv[12])
+  logging.info('Probing with %s', prober_args)
+  boot_prober = Prober(clients_port, **prober_args)
+  timing_queue = queue_lib.Queue()
 
   # Start the worker to move results from queue to file first.
-  process_pool.apply_async(WriteResultsToFile,
-                           args=(results_file_path, timing_queue,))
+  writer_thread = threading.Thread(target=WriteResultsToFile,
+                                   args=(results_file_path, timing_queue,))
+  writer_thread.start()
   if use_listening_server:
-    ActAsServer(process_pool, timing_queue, clients_port, hostname,
-                server_address)
+    ActAsServer(boot_prober, timing_queue, hostname, server_address)
 
   # The start the server to listen and put results on queue.
   else:
-    ActAsClient(process_pool, timing_queue, clients_port,
-                vms_name_pattern, num_vms, using_public_ip)
+    ActAsClient(boot_prober, timing_queue, vms_name_pattern, num_vms,
+                using_public_ip)
+  writer_thread.join()
@@ -37,7 +37,6 @@ from perfkitbenchmarker import units
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import fio
 import six
-from six.moves import range
 
 PKB_FIO_LOG_FILE_NAME = 'pkb_fio_avg'
 LOCAL_JOB_FILE_SUFFIX = '_fio.job'  # used with vm_util.PrependTempDir()
@@ -172,6 +171,10 @@ flags.DEFINE_integer('fio_log_hist_msec', 1000,
                      'Same as fio_log_avg_msec, but logs entries for '
                      'completion latency histograms. If set to 0, histogram '
                      'logging is disabled.')
+flags.DEFINE_boolean('fio_hist_log_percentile_timeseries', False,
+                     'Whether to report clat percentiles of every histogram '
+                     'log interval in addition to the whole run histogram. '
+                     'Requires --fio_hist_log.')
 flags.DEFINE_boolean(  # TODO(user): Add support for simultaneous read.
     'fio_write_against_multiple_clients', False,
     'Whether to run fio against multiple nfs. Only applicable '
@@ -451,6 +454,9 @@ def CheckPrerequisites(benchmark_config):
   """Perform flag checks."""
   del benchmark_config  # unused
   WarnOnBadFlags()
+  if FLAGS.fio_hist_log_percentile_timeseries and not FLAGS.fio_hist_log:
+    raise errors.Setup.InvalidFlagConfigurationError(
+        '--fio_hist_log_percentile_timeseries requires --fio_hist_log.')
 
 
 def Prepare(benchmark_spec):
@@ -619,17 +625,12 @@ def RunWithExec(vm, exec_path, remote_job_file_path, job_file_contents):
   stdout, _ = vm.RobustRemoteCommand(
       fio_command, should_log=True, timeout=FLAGS.fio_command_timeout_sec)
   end_time = time.time()
-  bin_vals = []
   if collect_logs:
     vm.PullFile(vm_util.GetTempDir(), '%s*.log' % log_file_base)
-    if FLAGS.fio_hist_log:
-      num_logs = int(vm.RemoteCommand(
-          'ls %s_clat_hist.*.log | wc -l' % log_file_base)[0])
-      bin_vals += [fio.ComputeHistogramBinVals(
-          vm, '%s_clat_hist.%s.log' % (
-              log_file_base, idx + 1)) for idx in range(num_logs)]
-  samples = fio.ParseResults(job_file_string, json.loads(stdout),
-                             log_file_base=log_file_base, bin_vals=bin_vals)
+  samples = fio.ParseResults(
+      job_file_string, json.loads(stdout), log_file_base=log_file_base,
+      hist_logs=FLAGS.fio_hist_log,
+      hist_percentile_timeseries=FLAGS.fio_hist_log_percentile_timeseries)
 
   samples.append(
       sample.Sample('start_time', start_time, 'sec', samples[0].metadata))
@@ -31,6 +31,7 @@ The way it works is as follows:
 9) total provisioning time is that of the slowest VM.
 10) VMs have startup scripts to shut themselves down after TIMEOUT seconds.
 """
+import collections
 import logging
 import posixpath
 from absl import flags
@@ -107,6 +108,20 @@ flags.DEFINE_boolean('use_public_ip', False, 'Whether launcher should contact '
                      'boot vms using public ip instead of internal ip. Only '
                      'applicable for vms_contact_launcher=False mode. '
                      'Defaults to False.')
+flags.DEFINE_float('boot_probe_initial_backoff', 0.05, 'Seconds the launcher '
+                   'waits after a failed connection attempt to a boot vm '
+                   'before retrying. The wait doubles after every failure up '
+                   'to boot_probe_max_backoff.', lower_bound=0)
+flags.DEFINE_float('boot_probe_max_backoff', 0.25, 'Maximum seconds the '
+                   'launcher waits between connection attempts to a boot vm.',
+                   lower_bound=0)
+flags.DEFINE_float('boot_probe_connect_timeout', 0.25, 'Seconds the launcher '
+                   'waits for a single connection attempt to a boot vm.',
+                   lower_bound=0)
+flags.DEFINE_integer('boot_probe_max_concurrent_connects', None, 'Maximum '
+                     'number of connection attempts to boot vms each launcher '
+                     'has in flight. Defaults to boots_per_launcher, capped by '
+                     'the open file limit of the launcher.', lower_bound=1)
 
 # Tag for undefined hostname, should be synced with listener_server.py script.
 UNDEFINED_HOSTNAME = 'UNDEFINED'
@@ -160,6 +175,12 @@ _AZURE_RESERVED_IPS = 5
 STATUS_PASSING = 'Pass'
 # Status for VM marked as running by the cloud provider.
 STATUS_RUNNING = 'Running'
+# Status for VM whose outgoing port was open but incoming port was closed.
+STATUS_FAILING = 'Fail'
+# Percentiles reported for the boot times of the whole cluster.
+_BOOT_TIME_PERCENTILES = (50, 90, 95, 99, 99.9)
+# Percentiles at which the cumulative distribution of boot times is reported.
+_BOOT_TIME_CDF_PERCENTILES = tuple(range(5, 100, 5))
 # sha256sum for preprovisioned service account credentials.
 # If not using service account credentials from preprovisioned data bucket,
 # use --gcp_service_account_key_file flag to specify the same credentials.
@@ -220,6 +241,7 @@ def _GetServerStartCommand(client_port, launcher_vm):
   return (
       'python3 {server_path} {server_name} {port} {results_path} {client_port} '
       '{use_server} {vms_name_pattern} {vms_count} {use_public_ip} '
+      '{initial_backoff} {max_backoff} {max_connects} {connect_timeout} '
       '> {server_log} 2>&1 &'
       .format(
           server_name=launcher_vm.name,
@@ -232,7 +254,27 @@ def _GetServerStartCommand(client_port, launcher_vm):
           vms_name_pattern=vms_name_pattern,
           vms_count=FLAGS.boots_per_launcher,
           server_log=_LISTENER_SERVER_LOG,
-          use_public_ip=FLAGS.use_public_ip))
+          use_public_ip=FLAGS.use_public_ip,
+          initial_backoff=FLAGS.boot_probe_initial_backoff,
+          max_backoff=FLAGS.boot_probe_max_backoff,
+          # 0 lets the listener size it for the vm count and open file limit.
+          max_connects=FLAGS.boot_probe_max_concurrent_connects or 0,
+          connect_timeout=FLAGS.boot_probe_connect_timeout))
+
+
+def _GetProbeInterval():
+  """Returns the longest expected seconds between probes of a boot vm.
+
+  A vm that is not up is probed again max backoff seconds after its connect
+  attempt times out, unless the launcher runs out of connect slots, in which
+  case all of its vms are probed in turn.
+  """
+  max_connects = (FLAGS.boot_probe_max_concurrent_connects or
+                  FLAGS.boots_per_launcher)
+  return max(
+      FLAGS.boot_probe_max_backoff + FLAGS.boot_probe_connect_timeout,
+      FLAGS.boots_per_launcher * FLAGS.boot_probe_connect_timeout /
+      max_connects)
 
 
 def _IsLinux():
@@ -244,6 +286,53 @@ class InsufficientBootsError(Exception):
   """Error thrown if there are insufficient boots during wait."""
 
 
+class _LauncherResults(object):
+  """Boot results of one launcher vm, collected incrementally.
+
+  The results file on the launcher is only ever appended to, so every update
+  fetches just the lines written since the previous one and folds them into
+  running counts and a boot time sketch.
+
+  Attributes:
+    vm: The launcher vm.
+    counts: Counter of result lines by status.
+    boot_times: sample.PercentileSketch of boot durations in nanoseconds.
+    time_to_running: Nanoseconds until the cloud reported running, or -1.
+  """
+
+  def __init__(self, vm):
+    self.vm = vm
+    self.counts = collections.Counter()
+    self.boot_times = sample.PercentileSketch()
+    self.time_to_running = -1
+    self._start_time = None
+    self._offset = 0
+
+  def Update(self):
+    """Fetches and parses the results written since the last update."""
+    if self._start_time is None:
+      start_time_str, _ = self.vm.RemoteCommand(
+          'cat {startime}'.format(startime=_START_TIME_FILE_PATH))
+      self._start_time = int(start_time_str)
+    stdout, _ = self.vm.RemoteCommand(
+        'tail -c +{offset} {results}'.format(offset=self._offset + 1,
+                                             results=_RESULTS_FILE_PATH),
+        ignore_failure=True)
+    # A line may still be being written; leave it for the next update.
+    complete = stdout[:stdout.rfind('\n') + 1]
+    self._offset += len(complete)
+    durations = []
+    for line in complete.splitlines():
+      state, _, end_time = line.split(':')
+      self.counts[state] += 1
+      duration = int(end_time) - self._start_time
+      if state == STATUS_PASSING:
+        durations.append(duration)
+      elif state == STATUS_RUNNING:
+        self.time_to_running = max(self.time_to_running, duration)
+    self.boot_times.AddMany(durations)
+
+
 def CheckPrerequisites(_):
   """Verifies that the required resources are present.
 
@@ -429,8 +518,9 @@ def _ReportRunningStatus():
 
 @vm_util.Retry(poll_interval=_POLLING_DELAY, timeout=_TIMEOUT_SECONDS,
                retryable_exceptions=(InsufficientBootsError))
-def _WaitForResponses(launcher_vms):
+def _WaitForResponses(launcher_results):
   """Wait for all results or server shutdown or TIMEOUT_SECONDS."""
+  launcher_vms = [results.vm for results in launcher_results]
   # if any listener server exited, stop waiting.
   def _LauncherError(vm):
     error, _ = vm.RemoteCommand('grep ERROR ' + _LISTENER_SERVER_LOG,
@@ -440,28 +530,22 @@ def _WaitForResponses(launcher_vms):
   if any(error_str):
     raise errors.Benchmarks.RunError(
         'Some listening server errored out: %s' % error_str)
-  def _CountState(vm, state):
-    stdout, _ = vm.RemoteCommand(f'grep -c {state} {_RESULTS_FILE_PATH}',
-                                 ignore_failure=True)
-    try:
-      return int(stdout)
-    except ValueError:
-      return -1
-
-  boots = vm_util.RunThreaded(
-      lambda vm: _CountState(vm, STATUS_PASSING), launcher_vms)
-  for vm, boot_count in zip(launcher_vms, boots):
+
+  vm_util.RunThreaded(lambda results: results.Update(), launcher_results)
+  for results in launcher_results:
     logging.info('Launcher %s reported %d/%d booted VMs',
-                 vm.internal_ip, boot_count, FLAGS.boots_per_launcher)
+                 results.vm.internal_ip, results.counts[STATUS_PASSING],
+                 FLAGS.boots_per_launcher)
   total_running_count = 0
   if _ReportRunningStatus():
-    running = vm_util.RunThreaded(
-        lambda vm: _CountState(vm, STATUS_RUNNING), launcher_vms)
-    for vm, running_count in zip(launcher_vms, running):
+    for results in launcher_results:
       logging.info('Launcher %s reported %d/%d running VMs',
-                   vm.internal_ip, running_count, FLAGS.boots_per_launcher)
-    total_running_count = sum(running)
-  reporting_vms_count = sum(boots)
+                   results.vm.internal_ip, results.counts[STATUS_RUNNING],
+                   FLAGS.boots_per_launcher)
+    total_running_count = sum(
+        results.counts[STATUS_RUNNING] for results in launcher_results)
+  reporting_vms_count = sum(
+      results.counts[STATUS_PASSING] for results in launcher_results)
   if (reporting_vms_count != _GetExpectedBoots() or
       (_ReportRunningStatus() and total_running_count != _GetExpectedBoots())):
     raise InsufficientBootsError(
@@ -469,21 +553,19 @@ def _WaitForResponses(launcher_vms):
         (reporting_vms_count, _GetExpectedBoots()))
 
 
-def _ParseResult(launcher_vms):
-  """Parse the results on the launcher VMs and send it back.
+def _ParseResult(launcher_results):
+  """Collect the remaining results from the launcher VMs and report them.
 
-  Boot time is the boot duration of the slowest machine.
+  Boot time is the boot duration of the slowest machine. The distribution of
+  boot times is reported as percentile and CDF samples.
 
   Args:
-    launcher_vms: Launcher server VMs.
+    launcher_results: _LauncherResults of the launcher server VMs.
 
   Returns:
     A list of benchmark samples.
   """
-  vm_count = 0
-  slowest_time = -1
-  get_starttime_cmd = 'cat {startime}'.format(startime=_START_TIME_FILE_PATH)
-  get_results_cmd = 'cat {results}'.format(results=_RESULTS_FILE_PATH)
+  vm_util.RunThreaded(lambda results: results.Update(), launcher_results)
   samples = []
   common_metadata = {
       'cloud': FLAGS.cloud,
@@ -494,49 +576,56 @@ def _ParseResult(launcher_vms):
       'launcher_machine_type': FLAGS.launcher_machine_type,
       'vms_contact_launcher': FLAGS.vms_contact_launcher,
       'use_public_ip': FLAGS.use_public_ip,
+      'boot_probe_initial_backoff': FLAGS.boot_probe_initial_backoff,
+      'boot_probe_max_backoff': FLAGS.boot_probe_max_backoff,
+      'boot_probe_connect_timeout': FLAGS.boot_probe_connect_timeout,
+      'boot_probe_max_concurrent_connects':
+          FLAGS.boot_probe_max_concurrent_connects,
+      'boot_probe_interval_s': _GetProbeInterval(),
   }
-  for vm in launcher_vms:
-    start_time_str, _ = vm.RemoteCommand(get_starttime_cmd)
-    start_time = int(start_time_str)
-    results, _ = vm.RemoteCommand(get_results_cmd)
-    cur_launcher_success = 0
-    cur_launcher_closed_incoming = 0
-    durations = []
-    time_to_running = -1
-    for line in results.splitlines():
-      state, _, duration = line.split(':')
-      end_time = int(duration)
-      if state == STATUS_PASSING:
-        duration_in_ns = end_time - start_time
-        durations.append(duration_in_ns)
-        slowest_time = max(slowest_time, duration_in_ns)
-        cur_launcher_success += 1
-      elif state == STATUS_RUNNING:
-        t = end_time - start_time
-        time_to_running = max(time_to_running, t)
-      elif state == 'Fail':
-        # outgoing port was open but incoming port was closed.
-        cur_launcher_closed_incoming += 1
-
-    vm_count += cur_launcher_success
+  cluster_boot_times = sample.PercentileSketch()
+  for results in launcher_results:
+    cluster_boot_times.Merge(results.boot_times)
     current_metadata = {
-        'zone': vm.zone,
-        'launcher_successes': cur_launcher_success,
-        'launcher_boot_durations_ns': durations,
-        'launcher_closed_incoming': cur_launcher_closed_incoming,
+        'zone': results.vm.zone,
+        'launcher_successes': results.counts[STATUS_PASSING],
+        # outgoing port was open but incoming port was closed.
+        'launcher_closed_incoming': results.counts[STATUS_FAILING],
     }
+    if results.boot_times.count:
+      percentiles = results.boot_times.GetPercentiles(_BOOT_TIME_PERCENTILES)
+      for stat, value in percentiles.items():
+        current_metadata['launcher_boot_time_%s_ns' % stat] = value
     current_metadata.update(common_metadata)
     samples.append(sample.Sample('Launcher Boot Details', -1,
                                  '', current_metadata))
 
+  # The sketch keeps the exact maximum.
+  slowest_time = -1
+  if cluster_boot_times.count:
+    slowest_time = int(cluster_boot_times.max)
   samples.append(sample.Sample('Cluster Max Boot Time', slowest_time,
                                'nanoseconds', common_metadata))
   samples.append(sample.Sample('Cluster Expected Boots', _GetExpectedBoots(),
                                '', common_metadata))
-  samples.append(sample.Sample('Cluster Success Boots', vm_count,
-                               '', common_metadata))
-  samples.append(sample.Sample('Cluster Max Time to Running', time_to_running,
-                               'nanoseconds', common_metadata))
+  samples.append(sample.Sample('Cluster Success Boots',
+                               cluster_boot_times.count, '', common_metadata))
+  samples.append(sample.Sample(
+      'Cluster Max Time to Running',
+      max(results.time_to_running for results in launcher_results),
+      'nanoseconds', common_metadata))
+  if cluster_boot_times.count:
+    percentiles = cluster_boot_times.GetPercentiles(_BOOT_TIME_PERCENTILES)
+    for stat, value in sorted(percentiles.items()):
+      samples.append(sample.Sample('Cluster Boot Time %s' % stat, value,
+                                   'nanoseconds', common_metadata))
+    cdf = cluster_boot_times.GetPercentiles(_BOOT_TIME_CDF_PERCENTILES)
+    for percentile in _BOOT_TIME_CDF_PERCENTILES:
+      cdf_metadata = common_metadata.copy()
+      cdf_metadata['percentile'] = percentile
+      samples.append(sample.Sample('Cluster Boot Time CDF',
+                                   cdf['p%s' % percentile], 'nanoseconds',
+                                   cdf_metadata))
   return samples
 
 
@@ -554,12 +643,13 @@ def Run(benchmark_spec):
   vm_util.RunThreaded(
       lambda vm: vm.RemoteCommand('bash {} 2>&1 | tee log'.format(_BOOT_PATH)),
       launcher_vms)
+  launcher_results = [_LauncherResults(vm) for vm in launcher_vms]
   try:
-    _WaitForResponses(launcher_vms)
+    _WaitForResponses(launcher_results)
   except InsufficientBootsError:
     # On really large-scale boots, some failures are expected.
     logging.info('Some VMs failed to boot.')
-  return _ParseResult(launcher_vms)
+  return _ParseResult(launcher_results)
 
 
 def Cleanup(benchmark_spec):
@@ -33,11 +33,13 @@ category:
 import datetime
 import enum
 import glob
+import itertools
 import json
 import logging
 import os
 import posixpath
 import re
+import struct
 import threading
 import time
 import uuid
@@ -162,6 +164,23 @@ flags.DEFINE_boolean('object_storage_dont_delete_bucket', False,
                      'for running the api_multistream_reads scenario multiple '
                      'times against the same objects.')
 
+flags.DEFINE_float('object_storage_payload_compressibility', 0,
+                   'The fraction of each written object that is compressible, '
+                   'for testing compression or deduplication by the service. '
+                   '0 writes incompressible random data. Applies to the '
+                   'api_data and api_multistream scenarios.',
+                   lower_bound=0, upper_bound=1)
+
+JSON_WORKER_OUTPUT = 'json'
+BINARY_WORKER_OUTPUT = 'binary'
+flags.DEFINE_enum('object_storage_worker_output_format', BINARY_WORKER_OUTPUT,
+                  [JSON_WORKER_OUTPUT, BINARY_WORKER_OUTPUT],
+                  'How multistream workers send their per-operation results '
+                  'back. "binary" writes packed arrays to a file that is '
+                  'copied back and memory-mapped. "json" prints them to '
+                  'stdout, which is slower and uses more memory for large '
+                  'runs.')
+
 flags.DEFINE_string('object_storage_worker_output', None,
                     'If set, the worker threads\' output will be written to the'
                     'path provided.')
@@ -764,7 +783,7 @@ def SingleStreamThroughputBenchmark(results, metadata, vm, command_builder,
 
   single_stream_throughput_cmd = command_builder.BuildCommand([
       '--bucket=%s' % bucket_name,
-      '--scenario=SingleStreamThroughput'])
+      '--scenario=SingleStreamThroughput'] + _GetPayloadArgs())
 
   _, raw_result = vm.RemoteCommand(single_stream_throughput_cmd)
   logging.info('SingleStreamThroughput raw result is %s', raw_result)
@@ -854,6 +873,18 @@ def ListConsistencyBenchmark(results, metadata, vm, command_builder,
                                    metadata)
 
 
+# Must match the binary format written by WriteBinaryStreams in the API test
+# script: a header holding a magic string, the stream number and the number of
+# operations, followed by little endian start time, latency and size arrays.
+_BINARY_STREAM_HEADER = struct.Struct('<8sqq')
+_BINARY_STREAM_MAGIC = b'PKBOSS01'
+WORKER_OUTPUT_FILE = 'pkb-worker-output'
+# Numbers the local copies of worker output files. LoadBinaryWorkerOutput maps
+# them into memory, so every run pulls its output into a new file instead of
+# overwriting one that arrays of an earlier run may still point into.
+_worker_output_counter = itertools.count()
+
+
 def LoadWorkerOutput(output):
   """Load output from worker processes to our internal format.
 
@@ -902,7 +933,61 @@ def LoadWorkerOutput(output):
   return start_times, latencies, sizes
 
 
-def _RunMultiStreamProcesses(vms, command_builder, cmd_args, streams_per_vm):
+def LoadBinaryWorkerOutput(paths):
+  """Load binary output files from worker processes to our internal format.
+
+  The files are memory-mapped and the returned arrays point into them, so
+  loading is fast and only the pages that are used are read into memory.
+
+  Args:
+    paths: list of strings. Paths of the binary output files of all worker
+        processes.
+
+  Returns:
+    A tuple of start_time, latency, size in the same format as
+    LoadWorkerOutput.
+
+  Raises:
+    ValueError, if a file is not in the expected format.
+  """
+  start_times = []
+  latencies = []
+  sizes = []
+
+  for path in paths:
+    if not os.path.getsize(path):
+      continue
+    # Copy-on-write mapping, so callers can modify the arrays.
+    data = np.memmap(path, dtype=np.uint8, mode='c')
+    offset = 0
+    while offset < data.size:
+      if offset + _BINARY_STREAM_HEADER.size > data.size:
+        raise ValueError('Truncated worker output in %s.' % path)
+      magic, _, count = _BINARY_STREAM_HEADER.unpack_from(data, offset)
+      offset += _BINARY_STREAM_HEADER.size
+      if magic != _BINARY_STREAM_MAGIC:
+        raise ValueError('Unexpected worker output format in %s.' % path)
+      if offset + 24 * count > data.size:
+        raise ValueError('Truncated worker output in %s.' % path)
+      for columns, dtype in ((start_times, '<f8'), (latencies, '<f8'),
+                             (sizes, '<i8')):
+        columns.append(np.frombuffer(data, dtype=dtype, count=count,
+                                     offset=offset))
+        offset += 8 * count
+
+  return start_times, latencies, sizes
+
+
+def _WorkerOutputToJson(start_times, latencies, sizes):
+  """Formats loaded worker output as the JSON that workers print."""
+  return json.dumps([
+      {'start_times': start_time.tolist(), 'latencies': latency.tolist(),
+       'sizes': size.tolist()}
+      for start_time, latency, size in zip(start_times, latencies, sizes)])
+
+
+def _RunMultiStreamProcesses(vms, command_builder, cmd_args, streams_per_vm,
+                             operation_name='multistream'):
   """Runs all of the multistream read or write processes and doesn't return
      until they complete.
 
@@ -911,17 +996,38 @@ def _RunMultiStreamProcesses(vms, command_builder, cmd_args, streams_per_vm):
     command_builder: an APIScriptCommandBuilder.
     cmd_args: arguments for the command_builder.
     streams_per_vm: number of threads per vm.
+    operation_name: name of the operation, used in the names of the local
+        copies of binary worker output files.
+
+  Returns:
+    A list with an entry per VM. With binary worker output, the entries are
+    local paths of the output files. Otherwise they are the stdouts of the
+    worker processes.
   """
 
   output = [None] * len(vms)
+  binary_output = (
+      FLAGS.object_storage_worker_output_format == BINARY_WORKER_OUTPUT)
+  remote_output_file = posixpath.join(vm_util.VM_TMP_DIR, WORKER_OUTPUT_FILE)
+  run_index = next(_worker_output_counter)
 
   def RunOneProcess(vm_idx):
     logging.info('Running on VM %s.', vm_idx)
+    output_args = []
+    if binary_output:
+      output_args = ['--worker_output_format=%s' % BINARY_WORKER_OUTPUT,
+                     '--worker_output_file=%s' % remote_output_file]
     cmd = command_builder.BuildCommand(cmd_args + [
         '--stream_num_start=%s' % (vm_idx * streams_per_vm),
         '--vm_id=%s' % vm_idx
-    ])
+    ] + output_args)
     out, _ = vms[vm_idx].RobustRemoteCommand(cmd, should_log=False)
+    if binary_output:
+      local_output_file = os.path.join(
+          vm_util.GetTempDir(), '%s-%s-%s-%s' % (
+              WORKER_OUTPUT_FILE, operation_name, run_index, vm_idx))
+      vms[vm_idx].PullFile(local_output_file, remote_output_file)
+      out = local_output_file
     output[vm_idx] = out
 
   # Each vm/process has a thread managing it.
@@ -980,6 +1086,14 @@ def _ColdObjectsWrittenFileAgeHours(filename):
   return write_timedelta.total_seconds() / _SECONDS_PER_HOUR
 
 
+def _GetPayloadArgs():
+  """Returns the API test script arguments describing write payloads."""
+  if not FLAGS.object_storage_payload_compressibility:
+    return []
+  return ['--payload_compressibility=%s' %
+          FLAGS.object_storage_payload_compressibility]
+
+
 def _MultiStreamOneWay(results, metadata, vms, command_builder,
                        service, bucket_name, operation):
   """Measures multi-stream latency and throughput in one direction.
@@ -1030,7 +1144,7 @@ def _MultiStreamOneWay(results, metadata, vms, command_builder,
     cmd_args += [
         '--object_sizes="%s"' % size_distribution,
         '--object_naming_scheme=%s' % FLAGS.object_storage_object_naming_scheme,
-        '--scenario=MultiStreamWrite']
+        '--scenario=MultiStreamWrite'] + _GetPayloadArgs()
   elif operation == MultistreamOperationType.download:
     cmd_args += ['--scenario=MultiStreamRead']
   elif operation == MultistreamOperationType.delete:
@@ -1048,8 +1162,13 @@ def _MultiStreamOneWay(results, metadata, vms, command_builder,
                     'Value is: \'' + operation.name + '\'')
 
   output = _RunMultiStreamProcesses(vms, command_builder, cmd_args,
-                                    streams_per_vm)
-  start_times, latencies, sizes = LoadWorkerOutput(output)
+                                    streams_per_vm, operation.name)
+  if FLAGS.object_storage_worker_output_format == BINARY_WORKER_OUTPUT:
+    start_times, latencies, sizes = LoadBinaryWorkerOutput(output)
+    if FLAGS.object_storage_worker_output:
+      output = [_WorkerOutputToJson(start_times, latencies, sizes)]
+  else:
+    start_times, latencies, sizes = LoadWorkerOutput(output)
   if FLAGS.object_storage_worker_output:
     with open(FLAGS.object_storage_worker_output, 'w') as out_file:
       out_file.write(json.dumps(output))
@@ -1560,7 +1679,9 @@ def Run(benchmark_spec):
   service = benchmark_spec.service
   bucket_name = benchmark_spec.bucket_name
 
-  metadata = {'storage_provider': FLAGS.storage}
+  metadata = {'storage_provider': FLAGS.storage,
+              'payload_compressibility':
+                  FLAGS.object_storage_payload_compressibility}
 
   vms = benchmark_spec.vms
 
@@ -87,19 +87,21 @@ def _Install(vm):
   vm.Install('build_tools')
   vm.Install('openjdk')
   vm.Install('curl')
-  vm.RemoteCommand('cd {0}; git clone {1}; cd {2}; git checkout {3}'.format(
-      linux_packages.INSTALL_DIR, CASSANDRA_GIT_REPRO, CASSANDRA_DIR,
-      CASSANDRA_VERSION))
-  if FLAGS.cassandra_maven_repo_url:
-    # sets maven repo properties in the build.properties
-    file_contents = _MAVEN_REPO_PARAMS.format(FLAGS.cassandra_maven_repo_url)
-    vm.RemoteCommand('echo "{}" > {}/build.properties'.format(
-        file_contents, CASSANDRA_DIR))
-  vm.RemoteCommand('cd {}; {}/bin/ant'.format(CASSANDRA_DIR, ANT_HOME_DIR))
-  # Add JNA
-  vm.RemoteCommand('cd {0} && curl -LJO {1}'.format(
-      posixpath.join(CASSANDRA_DIR, 'lib'),
-      JNA_JAR_URL))
+  with vm.RemoteCommandBatch() as batch:
+    batch.RemoteCommand(
+        'cd {0}; git clone {1}; cd {2}; git checkout {3}'.format(
+            linux_packages.INSTALL_DIR, CASSANDRA_GIT_REPRO, CASSANDRA_DIR,
+            CASSANDRA_VERSION))
+    if FLAGS.cassandra_maven_repo_url:
+      # sets maven repo properties in the build.properties
+      file_contents = _MAVEN_REPO_PARAMS.format(FLAGS.cassandra_maven_repo_url)
+      batch.RemoteCommand('echo "{}" > {}/build.properties'.format(
+          file_contents, CASSANDRA_DIR))
+    batch.RemoteCommand('cd {}; {}/bin/ant'.format(CASSANDRA_DIR, ANT_HOME_DIR))
+    # Add JNA
+    batch.RemoteCommand('cd {0} && curl -LJO {1}'.format(
+        posixpath.join(CASSANDRA_DIR, 'lib'),
+        JNA_JAR_URL))
 
 
 def YumInstall(vm):
@@ -203,11 +205,14 @@ def IsRunning(vm):
     vm.RemoteCommand('kill -0 {0}'.format(cassandra_pid))
     return True
   except errors.VirtualMachine.RemoteCommandError:
+    with vm.RemoteCommandBatch() as batch:
+      startup_out = batch.RemoteCommand('cat ' + CASSANDRA_OUT)
+      startup_err = batch.RemoteCommand('cat ' + CASSANDRA_ERR)
     logging.warn('%s: Cassandra is not running. '
                  'Startup STDOUT:\n%s\n\nSTDERR:\n%s',
                  vm,
-                 vm.RemoteCommand('cat ' + CASSANDRA_OUT),
-                 vm.RemoteCommand('cat ' + CASSANDRA_ERR))
+                 (startup_out.stdout, startup_out.stderr),
+                 (startup_err.stdout, startup_err.stderr))
     return False
 
 
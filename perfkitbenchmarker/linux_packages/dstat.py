@@ -30,6 +30,21 @@ def ParseCsvFile(fp):
   Returns:
     A tuple of list of dstat labels and ndarray containing parsed data.
   """
+  labels, chunks = ParseCsvFileInChunks(fp)
+  return labels, np.concatenate(list(chunks) or [np.zeros((0, len(labels)))])
+
+
+def ParseCsvFileInChunks(fp, chunk_rows=4096):
+  """Parse dstat results file in csv format, a few rows at a time.
+
+  Args:
+    fp: file object or iterable of the lines of the dstat csv output.
+    chunk_rows: int. Maximum number of rows in each parsed chunk.
+
+  Returns:
+    A tuple of list of dstat labels and a generator of ndarrays, each holding
+    up to chunk_rows consecutive rows of parsed data.
+  """
   reader = csv.reader(fp)
   headers = list(itertools.islice(reader, 5))
   if len(headers) != 5:
@@ -61,21 +76,28 @@ def ParseCsvFile(fp):
   # Generate new column names
   labels = ['%s__%s' % x for x in zip(labels, categories)]
 
-  data = []
-  for i, row in enumerate(reader):
-    # Remove the trailing comma
-    if len(row) == len(labels) + 1:
-      if row[-1]:
-        raise ValueError(('Expected the last element of row {0} to be empty,'
-                          ' found {1}').format(row, row[-1]))
-      row = row[:-1]
-
-    if len(labels) != len(row):
-      raise ValueError(('Number of labels ({}) does not match number of '
-                        'columns ({}) in row {}:\n{}').format(
-                            len(labels), len(row), i, row))
-    data.append(row)
-  return labels, np.array(data, dtype=float)
+  def _ParseChunks():
+    data = []
+    for i, row in enumerate(reader):
+      # Remove the trailing comma
+      if len(row) == len(labels) + 1:
+        if row[-1]:
+          raise ValueError(('Expected the last element of row {0} to be empty,'
+                            ' found {1}').format(row, row[-1]))
+        row = row[:-1]
+
+      if len(labels) != len(row):
+        raise ValueError(('Number of labels ({}) does not match number of '
+                          'columns ({}) in row {}:\n{}').format(
+                              len(labels), len(row), i, row))
+      data.append(row)
+      if len(data) == chunk_rows:
+        yield np.array(data, dtype=float)
+        data = []
+    if data:
+      yield np.array(data, dtype=float)
+
+  return labels, _ParseChunks()
 
 
 def _Install(vm):
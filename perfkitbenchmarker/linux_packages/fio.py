@@ -16,17 +16,15 @@
 
 import collections
 import configparser
-import csv
 import io
+import itertools
 import json
-import logging
 import time
-from absl import flags
-from perfkitbenchmarker import errors
 from perfkitbenchmarker import linux_packages
 from perfkitbenchmarker import regex_util
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
+import numpy as np
 
 FIO_DIR = '%s/fio' % linux_packages.INSTALL_DIR
 GIT_REPO = 'https://github.com/axboe/fio.git'
@@ -45,11 +43,14 @@ JOB_STONEWALL_PARAMETER = 'stonewall'
 # Defined in fio
 DATA_DIRECTION = {0: 'read', 1: 'write', 2: 'trim'}
 HIST_BUCKET_START_IDX = 3
-
-# Patch fiologparser to return mean bucket.
-FIO_HIST_LOG_PARSER_PATCH = 'fiologparser_hist.patch'
-FIO_HIST_LOG_PARSER_PATH = '%s/tools/hist' % FIO_DIR
-FIO_HIST_LOG_PARSER = 'fiologparser_hist.py'
+# Latency bins per histogram, FIO_IO_U_PLAT_NR in fio's stat.h. fio 2.x has 19
+# groups of 64 bins and fio 3.x has 29. Coarse logs merge 2^N adjacent bins.
+FIO_IO_U_PLAT_BITS = 6
+FIO_IO_U_PLAT_VAL = 1 << FIO_IO_U_PLAT_BITS
+FIO_IO_U_PLAT_NRS = (19 * FIO_IO_U_PLAT_VAL, 29 * FIO_IO_U_PLAT_VAL)
+# Number of histogram log rows parsed at once.
+HIST_LOG_CHUNK_ROWS = 4096
+HIST_TIMESERIES_PERCENTILES = (50, 90, 99, 99.9)
 
 
 def GetFioExec():
@@ -58,22 +59,10 @@ def GetFioExec():
 
 def _Install(vm):
   """Installs the fio package on the VM."""
-  # TODO(user): Upgrade to python3.
-  for p in ['build_tools', 'python', 'pip', 'python_dev']:
-    vm.Install(p)
-  for package in ('numpy', 'pandas'):
-    vm.RemoteCommand(f'sudo pip install {package}')
+  vm.Install('build_tools')
   vm.RemoteCommand('git clone {0} {1}'.format(GIT_REPO, FIO_DIR))
   vm.RemoteCommand('cd {0} && git checkout {1}'.format(FIO_DIR, GIT_TAG))
   vm.RemoteCommand('cd {0} && ./configure && make'.format(FIO_DIR))
-  if flags.FLAGS.fio_hist_log:
-    vm.PushDataFile(FIO_HIST_LOG_PARSER_PATCH)
-    vm.RemoteCommand(
-        ('cp {log_parser_path}/{log_parser} ./; '
-         'patch {log_parser} {patch}').format(
-             log_parser_path=FIO_HIST_LOG_PARSER_PATH,
-             log_parser=FIO_HIST_LOG_PARSER,
-             patch=FIO_HIST_LOG_PARSER_PATCH))
 
 
 def YumInstall(vm):
@@ -148,7 +137,8 @@ def FioParametersToJob(fio_parameters):
 
 def ParseResults(job_file, fio_json_result, base_metadata=None,
                  log_file_base='', bin_vals=None,
-                 skip_latency_individual_stats=False):
+                 skip_latency_individual_stats=False, hist_logs=False,
+                 hist_percentile_timeseries=False):
   """Parse fio json output into samples.
 
   Args:
@@ -156,11 +146,15 @@ def ParseResults(job_file, fio_json_result, base_metadata=None,
     fio_json_result: Fio results in json format.
     base_metadata: Extra metadata to annotate the samples with.
     log_file_base: String. Base name for fio log files.
-    bin_vals: A 2-D list of int. Each list represents a list of
-      bin values in histgram log. Calculated from remote VM using
-      fio/tools/hist/fiologparser_hist.py
+    bin_vals: A 2-D list of float. Each list overrides the mean bin values
+      of the histogram log with the same index. If not set and hist_logs is
+      True, they are computed from the number of columns in each log.
     skip_latency_individual_stats: Bool. If true, skips pulling latency stats
       that are not aggregate.
+    hist_logs: Bool. If true, parse the clat histogram logs pulled from the
+      VM into the run's temp directory.
+    hist_percentile_timeseries: Bool. If true, also report latency
+      percentiles of every histogram log interval.
 
   Returns:
     A list of sample.Sample objects.
@@ -254,38 +248,81 @@ def ParseResults(job_file, fio_json_result, base_metadata=None,
         samples.append(
             sample.Sample('%s:iops' % metric_name,
                           job[mode]['iops'], '', parameters, timestamp))
-    if log_file_base and bin_vals:
+    if log_file_base and (hist_logs or bin_vals):
       # Parse histograms
-      aggregates = collections.defaultdict(collections.Counter)
+      aggregates = {}
+      mean_bin_vals = {}
+      intervals = collections.defaultdict(list)
       for _ in range(int(parameters.get('numjobs', 1))):
         clat_hist_idx += 1
         hist_file_path = vm_util.PrependTempDir(
             '%s_clat_hist.%s.log' % (log_file_base, str(clat_hist_idx)))
-        hists = _ParseHistogram(hist_file_path, bin_vals[clat_hist_idx - 1])
-
-        for key in hists:
-          aggregates[key].update(hists[key])
-      samples += _BuildHistogramSamples(aggregates, job_name, parameters)
+        hists, hist_intervals = _ParseHistogram(
+            hist_file_path, keep_intervals=hist_percentile_timeseries)
+        for key, counts in hists.items():
+          if bin_vals:
+            mean_bin_vals[key] = np.asarray(bin_vals[clat_hist_idx - 1])
+          else:
+            mean_bin_vals[key] = ComputeHistogramBinVals(counts.size)
+          if key in aggregates:
+            aggregates[key] += counts
+          else:
+            aggregates[key] = counts
+        for key, series in hist_intervals.items():
+          intervals[key].append(series)
+      samples += _BuildHistogramSamples(
+          _HistogramsToDicts(aggregates, mean_bin_vals), job_name, parameters)
+      if hist_percentile_timeseries:
+        samples += _BuildHistogramTimeseriesSamples(
+            intervals, mean_bin_vals, job_name, parameters)
 
   return samples
 
 
-def ComputeHistogramBinVals(vm, log_file):
+def ComputeHistogramBinVals(num_bins):
   """Calculate bin values for histogram.
 
+  This matches fio/tools/hist/fiologparser_hist.py, which maps each
+  (possibly coarse) bin to the middle of its latency range.
+
   Args:
-    vm: VirtualMachine object.
-    log_file: String. Name of the log file.
+    num_bins: Int. Number of histogram columns in the log file.
 
   Returns:
-    A list of float. Representing the mean value of the bin.
+    A numpy array of float. Representing the mean value of each bin.
+
+  Raises:
+    ValueError: If num_bins does not match any fio histogram layout.
   """
-  try:
-    return [float(v) for v in vm.RemoteCommand(
-        './%s %s' % (FIO_HIST_LOG_PARSER, log_file))[0].split()]
-  except errors.VirtualMachine.RemoteCommandError:
-    logging.exception('Calculate bin values for %s failed.', log_file)
-    return []
+  for plat_nr in FIO_IO_U_PLAT_NRS:
+    stride, remainder = divmod(plat_nr, num_bins)
+    if not remainder and stride & (stride - 1) == 0:
+      break
+  else:
+    raise ValueError('Unexpected number of histogram bins: %d' % num_bins)
+  idx = np.arange(num_bins, dtype=np.int64) * stride
+  lower = _PlatIdxToVal(idx, 0.0)
+  upper = _PlatIdxToVal(idx + stride, 1.0)
+  return lower + (upper - lower) * 0.5
+
+
+def _PlatIdxToVal(idx, edge):
+  """Vectorized plat_idx_to_val() from fio's stat.c.
+
+  Args:
+    idx: Numpy array of int. Non-coarse bin indexes.
+    edge: Float in [0, 1]. How far into each bin the value is computed.
+
+  Returns:
+    A numpy array of float latencies.
+  """
+  # MSB <= (FIO_IO_U_PLAT_BITS-1), cannot be rounded off. Use all bits of
+  # the sample as index.
+  error_bits = np.maximum((idx >> FIO_IO_U_PLAT_BITS) - 1, 0)
+  base = (1 << (error_bits + FIO_IO_U_PLAT_BITS)).astype(float)
+  k = idx % FIO_IO_U_PLAT_VAL
+  values = base + (k + edge) * (1 << error_bits)
+  return np.where(idx < (FIO_IO_U_PLAT_VAL << 1), idx, values)
 
 
 def DeleteParameterFromJobFile(job_file, parameter):
@@ -304,38 +341,60 @@ def DeleteParameterFromJobFile(job_file, parameter):
     return job_file
 
 
-def _ParseHistogram(hist_log_file, mean_bin_vals):
+def _ParseHistogram(hist_log_file, keep_intervals=False):
   """Parses histogram log file reported by fio.
 
+  The log is read HIST_LOG_CHUNK_ROWS rows at a time, so that the memory used
+  does not grow with the length of the run.
+
   Args:
     hist_log_file: String. File name of fio histogram log. Format:
       time (msec), data direction (0: read, 1: write, 2: trim), block size,
       bin 0, .., etc
-    mean_bin_vals: List of float. Representing the mean value of each bucket.
+    keep_intervals: Bool. If true, also return the rows of each key.
 
   Returns:
-    A dict of the histograms, keyed by (data direction, block size).
+    A tuple of two dicts keyed by (data direction, block size). The first maps
+    to a numpy array of the summed bin counts. The second maps to a tuple of
+    the row times in msec and a 2-D array of the bin counts of each row, and
+    is empty unless keep_intervals is set.
   """
-  if not mean_bin_vals:
-    logging.warning('Skipping log file %s.', hist_log_file)
-    return {}
-  aggregates = dict()
+  aggregates = {}
+  intervals = collections.defaultdict(list)
   with open(hist_log_file) as f:
-    reader = csv.reader(f, delimiter=',')
-    for r in reader:
-      # Use (data direction, block size) as key
-      key = (DATA_DIRECTION[int(r[1])], int(r[2]))
-
-      hist_list = []
-      for idx, v in enumerate(r[HIST_BUCKET_START_IDX:]):
-        if int(v):
-          hist_list.append((mean_bin_vals[idx], int(v)))
-      todict = dict(hist_list)
-      if key not in aggregates:
-        aggregates[key] = collections.Counter()
-      aggregates[key].update(todict)
-
-  return aggregates
+    while True:
+      lines = list(itertools.islice(f, HIST_LOG_CHUNK_ROWS))
+      if not lines:
+        break
+      rows = np.loadtxt(lines, delimiter=',', dtype=np.int64, ndmin=2)
+      keys, key_index = np.unique(
+          rows[:, 1:HIST_BUCKET_START_IDX], axis=0, return_inverse=True)
+      for i, (direction, block_size) in enumerate(keys.tolist()):
+        # Use (data direction, block size) as key
+        key = (DATA_DIRECTION[direction], block_size)
+        key_rows = rows[key_index.ravel() == i]
+        counts = key_rows[:, HIST_BUCKET_START_IDX:].sum(axis=0)
+        if key in aggregates:
+          aggregates[key] += counts
+        else:
+          aggregates[key] = counts
+        if keep_intervals:
+          intervals[key].append(key_rows)
+  series = {}
+  for key, key_rows in intervals.items():
+    key_rows = np.concatenate(key_rows)
+    series[key] = key_rows[:, 0], key_rows[:, HIST_BUCKET_START_IDX:]
+  return aggregates, series
+
+
+def _HistogramsToDicts(aggregates, mean_bin_vals):
+  """Converts bin count arrays to dicts of mean bin value to count."""
+  histograms = {}
+  for key, counts in aggregates.items():
+    nonzero = np.flatnonzero(counts)
+    histograms[key] = dict(zip(mean_bin_vals[key][nonzero].tolist(),
+                               counts[nonzero].tolist()))
+  return histograms
 
 
 def _BuildHistogramSamples(aggregates, metric_prefix='',
@@ -359,3 +418,51 @@ def _BuildHistogramSamples(aggregates, metric_prefix='',
             ':'.join([metric_prefix, str(bs), rw, 'histogram']),
             0, 'us', metadata))
   return samples
+
+
+def _BuildHistogramTimeseriesSamples(intervals, mean_bin_vals,
+                                     metric_prefix='',
+                                     additional_metadata=None):
+  """Builds latency percentile samples for each histogram log interval.
+
+  The n-th rows of the logs of all inner jobs are combined, since fio writes
+  them every log_hist_msec.
+
+  Args:
+    intervals: dict. Maps (data direction, block size) to a list of
+      (row times, row bin counts) tuples, one per log file.
+    mean_bin_vals: dict. Maps (data direction, block size) to the mean value
+      of each bin.
+    metric_prefix: String. Prefix of the metric name to use.
+    additional_metadata: dict. Additional metadata attaching to Sample.
+
+  Returns:
+    A list of sample.Sample objects.
+  """
+  samples = []
+  for (rw, bs), series in intervals.items():
+    num_rows = max(len(times) for times, _ in series)
+    num_bins = series[0][1].shape[1]
+    times = np.zeros(num_rows, dtype=np.int64)
+    counts = np.zeros((num_rows, num_bins), dtype=np.int64)
+    for log_times, log_counts in series:
+      times[:len(log_times)] = np.maximum(times[:len(log_times)], log_times)
+      counts[:len(log_counts)] += log_counts
+    totals = counts.sum(axis=1)
+    has_ios = totals > 0
+    times, totals = times[has_ios], totals[has_ios]
+    cumulative = np.cumsum(counts[has_ios], axis=1)
+    for percentile in HIST_TIMESERIES_PERCENTILES:
+      targets = totals * (percentile / 100.0)
+      # Index of the first bin whose cumulative count reaches the target.
+      indexes = (cumulative < targets[:, np.newaxis]).sum(axis=1)
+      values = mean_bin_vals[(rw, bs)][indexes]
+      metric = ':'.join([metric_prefix, str(bs), rw, 'latency',
+                         'p%g' % percentile])
+      for sample_time, value in zip(times.tolist(), values.tolist()):
+        metadata = {'sample_time_ms': sample_time}
+        if additional_metadata:
+          metadata.update(additional_metadata)
+        samples.append(sample.Sample(metric + ':timeseries', value, 'us',
+                                     metadata))
+  return samples
@@ -197,11 +197,13 @@ def ConfigureAndStart(master, workers, start_yarn=True):
       workers=workers)
   vm_util.RunThreaded(fn, vms)
 
-  master.RemoteCommand(
-      "rm -f {0} && ssh-keygen -q -t rsa -N '' -f {0}".format(
-          HADOOP_PRIVATE_KEY))
-
-  public_key = master.RemoteCommand('cat {0}.pub'.format(HADOOP_PRIVATE_KEY))[0]
+  with master.RemoteCommandBatch() as batch:
+    batch.RemoteCommand(
+        "rm -f {0} && ssh-keygen -q -t rsa -N '' -f {0}".format(
+            HADOOP_PRIVATE_KEY))
+    cat_public_key = batch.RemoteCommand(
+        'cat {0}.pub'.format(HADOOP_PRIVATE_KEY))
+  public_key = cat_public_key.stdout
 
   def AddKey(vm):
     vm.RemoteCommand('echo "{0}" >> ~/.ssh/authorized_keys'.format(public_key))
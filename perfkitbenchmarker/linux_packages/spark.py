@@ -133,10 +133,12 @@ def ConfigureAndStart(leader, workers):
   fn = functools.partial(_RenderConfig, leader=leader, workers=workers)
   vm_util.RunThreaded(fn, vms)
 
-  leader.RemoteCommand("rm -f {0} && ssh-keygen -q -t rsa -N '' -f {0}".format(
-      SPARK_PRIVATE_KEY))
-
-  public_key = leader.RemoteCommand('cat {0}.pub'.format(SPARK_PRIVATE_KEY))[0]
+  with leader.RemoteCommandBatch() as batch:
+    batch.RemoteCommand("rm -f {0} && ssh-keygen -q -t rsa -N '' -f {0}".format(
+        SPARK_PRIVATE_KEY))
+    cat_public_key = batch.RemoteCommand(
+        'cat {0}.pub'.format(SPARK_PRIVATE_KEY))
+  public_key = cat_public_key.stdout
 
   def AddKey(vm):
     vm.RemoteCommand('echo "{0}" >> ~/.ssh/authorized_keys'.format(public_key))
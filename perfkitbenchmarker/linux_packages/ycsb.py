@@ -36,10 +36,12 @@ per client VM, with an initial database size of 1GB (1k records).
 Each workload runs for at most 30 minutes.
 """
 
+import base64
 import bisect
 import collections
 import copy
 import csv
+import functools
 import itertools
 import json
 import logging
@@ -48,7 +50,9 @@ import operator
 import os
 import posixpath
 import re
+import struct
 import time
+import zlib
 from absl import flags
 from perfkitbenchmarker import data
 from perfkitbenchmarker import errors
@@ -57,6 +61,7 @@ from perfkitbenchmarker import linux_packages
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.linux_packages import maven
+import numpy as np
 import six
 from six.moves import filter
 from six.moves import range
@@ -73,6 +78,8 @@ HDRHISTOGRAM_DIR = posixpath.join(linux_packages.INSTALL_DIR,
 HDRHISTOGRAM_TAR_URL = ('https://github.com/HdrHistogram/HdrHistogram/archive/'
                         'HdrHistogram-2.1.10.tar.gz')
 HDRHISTOGRAM_GROUPS = ['READ', 'UPDATE']
+HDR_MERGE_LOCAL = 'local'
+HDR_MERGE_REMOTE = 'remote'
 
 _DEFAULT_PERCENTILES = 50, 75, 90, 95, 99, 99.9
 
@@ -195,8 +202,42 @@ flags.DEFINE_float('ycsb_dynamic_load_sustain_throughput_ratio', 0.95,
 flags.DEFINE_integer('ycsb_dynamic_load_sustain_timelimit', 300,
                      'Run duration in seconds for each throughput target '
                      'if we have already reached sustained throughput.')
+flags.DEFINE_boolean('ycsb_slo_search', False,
+                     'Search for the highest target throughput at which the '
+                     'system under test meets a latency SLO, given by '
+                     'ycsb_slo_latency_ms and ycsb_slo_latency_percentile. '
+                     'Targets are probed with short runs of '
+                     'ycsb_slo_probe_timelimit seconds, bisecting between '
+                     'the highest target meeting the SLO and the lowest '
+                     'failing it, and the result is confirmed with a run '
+                     'of ycsb_timelimit seconds.')
+flags.DEFINE_float('ycsb_slo_latency_ms', None,
+                   'Latency in milliseconds that the '
+                   'ycsb_slo_latency_percentile latency of every operation '
+                   'must not exceed to meet the SLO of ycsb_slo_search.')
+flags.DEFINE_enum('ycsb_slo_latency_percentile', '99',
+                  [str(p) for p in _DEFAULT_PERCENTILES],
+                  'Latency percentile of the SLO of ycsb_slo_search.')
+flags.DEFINE_integer('ycsb_slo_probe_timelimit', 60,
+                     'Run duration in seconds of each probe of '
+                     'ycsb_slo_search.', lower_bound=1)
+flags.DEFINE_float('ycsb_slo_search_precision', 0.05,
+                   'ycsb_slo_search stops probing once the gap between the '
+                   'highest target meeting the SLO and the lowest failing it '
+                   'is at most this fraction of the latter.', lower_bound=0)
+flags.DEFINE_integer('ycsb_slo_max_probes', 8,
+                     'Maximum number of probe runs of ycsb_slo_search per '
+                     'workload and thread count.', lower_bound=1)
 flags.DEFINE_integer('ycsb_sleep_after_load_in_sec', 0,
                      'Sleep duration in seconds between load and run stage.')
+flags.DEFINE_enum('ycsb_hdr_merge', HDR_MERGE_LOCAL,
+                  [HDR_MERGE_LOCAL, HDR_MERGE_REMOTE],
+                  'Where hdrhistogram logs from multiple clients are merged '
+                  'when --ycsb_measurement_type=hdrhistogram. "local" pulls '
+                  'the interval logs and merges every interval of every '
+                  'client in PKB. "remote" appends the last interval of each '
+                  'client on the first client VM and runs the Java '
+                  'HistogramLogProcessor there.')
 
 # Default loading thread count for non-batching backends.
 DEFAULT_PRELOAD_THREADS = 32
@@ -289,17 +330,28 @@ def CheckPrerequisites():
   per_thread_target = any([
       ':' in thread_qps for thread_qps in FLAGS.ycsb_threads_per_client])
   dynamic_load = FLAGS.ycsb_dynamic_load
+  slo_search = FLAGS.ycsb_slo_search
 
-  if run_target + per_thread_target + dynamic_load > 1:
+  if run_target + per_thread_target + dynamic_load + slo_search > 1:
     raise errors.Config.InvalidValue(
         'Setting YCSB target in ycsb_threads_per_client '
         'or ycsb_run_parameters or applying ycsb_dynamic_load_* flags'
-        ' are mutally exclusive.')
+        ' or ycsb_slo_search are mutally exclusive.')
 
   if FLAGS.ycsb_dynamic_load_throughput_lower_bound and not dynamic_load:
     raise errors.Config.InvalidValue(
         'To apply dynamic load, set --ycsb_dynamic_load.')
 
+  if slo_search and FLAGS.ycsb_slo_latency_ms is None:
+    raise errors.Config.InvalidValue(
+        'To search for the throughput meeting a latency SLO, set '
+        '--ycsb_slo_latency_ms.')
+
+  if slo_search and FLAGS.ycsb_measurement_type == TIMESERIES:
+    raise errors.Config.InvalidValue(
+        '--ycsb_slo_search needs latency percentiles, which are not '
+        'reported with --ycsb_measurement_type=timeseries.')
+
 
 def _Install(vm):
   """Installs the YCSB and, if needed, hdrhistogram package on the VM."""
@@ -309,17 +361,23 @@ def _Install(vm):
               YCSB_URL_TEMPLATE.format(FLAGS.ycsb_version))
   install_cmd = ('mkdir -p {0} && curl -L {1} | '
                  'tar -C {0} --strip-components=1 -xzf -')
-  vm.RemoteCommand(install_cmd.format(YCSB_DIR, ycsb_url))
-  if _GetVersionIndex(FLAGS.ycsb_version) >= 11:
+  # HistogramLogProcessor is only needed to merge hdrhistograms remotely.
+  install_hdrhistogram = (_GetVersionIndex(FLAGS.ycsb_version) >= 11 and
+                          FLAGS.ycsb_hdr_merge == HDR_MERGE_REMOTE)
+  if install_hdrhistogram:
     vm.Install('maven')
-    vm.RemoteCommand(install_cmd.format(HDRHISTOGRAM_DIR, HDRHISTOGRAM_TAR_URL))
-    # _JAVA_OPTIONS needed to work around this issue:
-    # https://stackoverflow.com/questions/53010200/maven-surefire-could-not-find-forkedbooter-class
-    vm.RemoteCommand('cd {hist_dir}; _JAVA_OPTIONS=-Djdk.net.URLClassPath.'
-                     'disableClassPathURLCheck=true '
-                     '{mvn_cmd}'.format(
-                         hist_dir=HDRHISTOGRAM_DIR,
-                         mvn_cmd=maven.GetRunCommand('install')))
+  with vm.RemoteCommandBatch() as batch:
+    batch.RemoteCommand(install_cmd.format(YCSB_DIR, ycsb_url))
+    if install_hdrhistogram:
+      batch.RemoteCommand(
+          install_cmd.format(HDRHISTOGRAM_DIR, HDRHISTOGRAM_TAR_URL))
+      # _JAVA_OPTIONS needed to work around this issue:
+      # https://stackoverflow.com/questions/53010200/maven-surefire-could-not-find-forkedbooter-class
+      batch.RemoteCommand('cd {hist_dir}; _JAVA_OPTIONS=-Djdk.net.URLClassPath.'
+                          'disableClassPathURLCheck=true '
+                          '{mvn_cmd}'.format(
+                              hist_dir=HDRHISTOGRAM_DIR,
+                              mvn_cmd=maven.GetRunCommand('install')))
 
 
 def YumInstall(vm):
@@ -577,6 +635,208 @@ def ParseHdrLogs(hdrlogs):
   return parsed_hdr_histograms
 
 
+# Cookies identifying the V2 hdrhistogram encodings. The low nibble holds the
+# word size and is ignored.
+_HDR_V2_ENCODING_COOKIE = 0x1c849303
+_HDR_V2_COMPRESSED_ENCODING_COOKIE = 0x1c849304
+_HDR_COOKIE_MASK = ~0xf0
+_HDR_COMPRESSED_HEADER = struct.Struct('>ii')
+_HDR_V2_HEADER = struct.Struct('>iiiiqqd')
+# Percentile ticks per half distance used by HistogramLogProcessor.
+_HDR_PERCENTILE_TICKS_PER_HALF_DISTANCE = 5
+
+
+def _DecodeZigZagLeb128(payload):
+  """Decodes the ZigZag LEB128 varints of a V2 hdrhistogram payload.
+
+  Args:
+    payload: bytes. The encoded counts.
+
+  Returns:
+    A numpy int64 array of the decoded values.
+
+  Raises:
+    ValueError: If the payload is truncated or holds a value wider than 56
+      bits, which hdrhistogram only produces for counts no benchmark reaches.
+  """
+  data = np.frombuffer(payload, dtype=np.uint8)
+  if not data.size:
+    return np.zeros(0, dtype=np.int64)
+  if data[-1] & 0x80:
+    raise ValueError('Truncated hdrhistogram payload.')
+  ends = np.flatnonzero(data < 0x80)
+  starts = np.concatenate(([0], ends[:-1] + 1))
+  lengths = ends - starts + 1
+  if lengths.max() > 8:
+    raise ValueError('Unsupported hdrhistogram count width.')
+  # Position of each byte within its varint gives its 7-bit shift.
+  positions = np.arange(data.size) - np.repeat(starts, lengths)
+  groups = (data & 0x7f).astype(np.int64) << (7 * positions)
+  values = np.add.reduceat(groups, starts)
+  return (values >> 1) ^ -(values & 1)
+
+
+class HdrHistogram(object):
+  """An integer hdrhistogram decoded from a YCSB hdrhistogram log.
+
+  Histograms recorded with the same precision share a bucket layout, so
+  merging them is a lossless element-wise sum of their counts.
+
+  Attributes:
+    lowest_discernible_value: int. Smallest value that can be told apart
+      from 0.
+    significant_digits: int. Number of significant decimal digits kept.
+    counts: numpy int64 array of counts indexed like the Java counts array.
+  """
+
+  def __init__(self, lowest_discernible_value, significant_digits, counts):
+    self.lowest_discernible_value = lowest_discernible_value
+    self.significant_digits = significant_digits
+    self.counts = counts
+
+  @classmethod
+  def FromCompressed(cls, encoded):
+    """Decodes a base64 compressed histogram from a hdrhistogram log line.
+
+    Args:
+      encoded: str. The base64 histogram column of an interval log line.
+
+    Returns:
+      HdrHistogram.
+
+    Raises:
+      ValueError: If the histogram is not in the V2 encoding.
+    """
+    raw = base64.b64decode(encoded)
+    cookie, length = _HDR_COMPRESSED_HEADER.unpack_from(raw)
+    if cookie & _HDR_COOKIE_MASK != _HDR_V2_COMPRESSED_ENCODING_COOKIE:
+      raise ValueError(
+          'Unsupported compressed hdrhistogram cookie: {0:#x}'.format(cookie))
+    raw = zlib.decompress(
+        raw[_HDR_COMPRESSED_HEADER.size:_HDR_COMPRESSED_HEADER.size + length])
+    (cookie, payload_length, normalizing_index_offset, significant_digits,
+     lowest_discernible_value, _, _) = _HDR_V2_HEADER.unpack_from(raw)
+    if cookie & _HDR_COOKIE_MASK != _HDR_V2_ENCODING_COOKIE:
+      raise ValueError(
+          'Unsupported hdrhistogram cookie: {0:#x}'.format(cookie))
+    if normalizing_index_offset:
+      raise ValueError('Shifted hdrhistogram encodings are not supported.')
+    values = _DecodeZigZagLeb128(
+        raw[_HDR_V2_HEADER.size:_HDR_V2_HEADER.size + payload_length])
+    # Negative values encode runs of empty buckets.
+    counts = np.repeat(np.maximum(values, 0), np.where(values < 0, -values, 1))
+    return cls(lowest_discernible_value, significant_digits, counts)
+
+  def _CheckCompatible(self, other):
+    if (self.lowest_discernible_value != other.lowest_discernible_value or
+        self.significant_digits != other.significant_digits):
+      raise ValueError(
+          'Cannot merge hdrhistograms with different precision: '
+          '({0}, {1}) != ({2}, {3})'.format(
+              self.lowest_discernible_value, self.significant_digits,
+              other.lowest_discernible_value, other.significant_digits))
+
+  def Merge(self, other):
+    """Adds the counts of another histogram to this one.
+
+    Args:
+      other: HdrHistogram with the same precision.
+
+    Raises:
+      ValueError: If the histograms have different precision.
+    """
+    self._CheckCompatible(other)
+    if other.counts.size > self.counts.size:
+      self.counts, other_counts = other.counts.copy(), self.counts
+    else:
+      other_counts = other.counts
+    self.counts[:other_counts.size] += other_counts
+
+  def GetHighestEquivalentValues(self):
+    """Returns the largest value recorded by each bucket of counts."""
+    unit_magnitude = int(math.floor(math.log2(self.lowest_discernible_value)))
+    sub_bucket_count_magnitude = int(
+        math.ceil(math.log2(2 * 10 ** self.significant_digits)))
+    sub_bucket_half_count_magnitude = max(sub_bucket_count_magnitude, 1) - 1
+    sub_bucket_half_count = 1 << sub_bucket_half_count_magnitude
+    index = np.arange(self.counts.size, dtype=np.int64)
+    bucket_index = (index >> sub_bucket_half_count_magnitude) - 1
+    sub_bucket_index = (index & (sub_bucket_half_count - 1)) + (
+        sub_bucket_half_count)
+    first_bucket = bucket_index < 0
+    sub_bucket_index[first_bucket] -= sub_bucket_half_count
+    bucket_index[first_bucket] = 0
+    return ((sub_bucket_index + 1) << (bucket_index + unit_magnitude)) - 1
+
+  def GetPercentileTuples(self):
+    """Reports the histogram like ParseHdrLogFile parses HistogramLogProcessor.
+
+    Percentile levels are iterated the way the Java PercentileIterator does,
+    but the matching buckets are found with a single vectorized search over
+    the cumulative counts.
+
+    Returns:
+      List of (percent, value in ms, count) tuples.
+    """
+    nonzero = np.flatnonzero(self.counts)
+    if not nonzero.size:
+      return []
+    cumulative = np.cumsum(self.counts[nonzero])
+    total = cumulative[-1]
+    current_percentiles = 100.0 * cumulative / total
+    # Levels past the one reaching the last bucket would repeat its row.
+    last_level = current_percentiles[-2] if nonzero.size > 1 else 0.0
+    levels = [0.0]
+    while levels[-1] <= last_level:
+      ticks = _HDR_PERCENTILE_TICKS_PER_HALF_DISTANCE * 2 ** (
+          int(math.log2(100.0 / (100.0 - levels[-1]))) + 1)
+      levels.append(levels[-1] + 100.0 / ticks)
+    indices = np.searchsorted(current_percentiles, levels, side='left')
+    values_ms = self.GetHighestEquivalentValues()[nonzero] / 1000.0
+
+    result = []
+    prev_total_count = 0
+    last_percent_value = -1
+    for level, i in zip(levels, indices.tolist()):
+      # Mirror the rounding of the printed and then parsed percentile column.
+      percentile = math.floor(round(level / 100, 12) * 100000) / 1000.0
+      current_total_count = int(cumulative[i])
+      if (percentile > last_percent_value and
+          current_total_count > prev_total_count):
+        result.append((percentile, float(values_ms[i]),
+                       current_total_count - prev_total_count))
+        last_percent_value = percentile
+        prev_total_count = current_total_count
+    return result
+
+
+def MergeHdrLogs(hdr_logs):
+  """Merges every interval histogram of several hdrhistogram logs.
+
+  YCSB writes one interval histogram per status interval, so the sum of all
+  intervals of all clients is the histogram of the whole run.
+
+  Args:
+    hdr_logs: Iterable of hdrhistogram interval log file contents.
+
+  Returns:
+    The merged HdrHistogram, or None if the logs hold no histograms.
+  """
+  merged = None
+  for hdr_log in hdr_logs:
+    for line in hdr_log.splitlines():
+      line = line.strip()
+      # Skip comments, the legend and the header line.
+      if not line or line.startswith('#') or line.startswith('"'):
+        continue
+      histogram = HdrHistogram.FromCompressed(line.rsplit(',', 1)[-1])
+      if merged is None:
+        merged = histogram
+      else:
+        merged.Merge(histogram)
+  return merged
+
+
 def _CumulativeSum(xs):
   total = 0
   for x in xs:
@@ -880,6 +1140,61 @@ def _CreateSamples(ycsb_result, include_histogram=False, **kwargs):
                             average_latency, 'ms', timeseries_meta)
 
 
+def _GetSloLatency(run_samples):
+  """Returns the highest SLO percentile latency of any operation of a run.
+
+  Args:
+    run_samples: List of sample.Sample objects of the run.
+
+  Returns:
+    The highest --ycsb_slo_latency_percentile latency in milliseconds of any
+    operation other than cleanup and failed operations, or None if the run
+    reported none.
+  """
+  suffix = ' p{0} latency'.format(FLAGS.ycsb_slo_latency_percentile)
+  latencies = []
+  for s in run_samples:
+    if not s.metric.endswith(suffix):
+      continue
+    operation = s.metric[:-len(suffix)]
+    if operation.startswith('CLEANUP') or operation.endswith('-FAILED'):
+      continue
+    latencies.append(s.value)
+  return max(latencies) if latencies else None
+
+
+def _SearchMaxTarget(probe_func, upper_bound, precision, max_probes):
+  """Searches for the highest target throughput passing probe_func.
+
+  The first probe is at upper_bound. Each following probe bisects the range
+  between the highest passing target and the lowest failing one, until the
+  range is at most precision times the failing target or max_probes targets
+  were probed.
+
+  Args:
+    probe_func: Function taking a target throughput and returning whether the
+      system under test meets the SLO at it.
+    upper_bound: float. The highest target throughput to probe.
+    precision: float. See --ycsb_slo_search_precision.
+    max_probes: int. The maximum number of calls to probe_func.
+
+  Returns:
+    The highest target throughput that passed, or None if none did.
+  """
+  low, high = 0, upper_bound
+  best = None
+  target = upper_bound
+  for _ in range(max_probes):
+    if probe_func(target):
+      best = low = target
+    else:
+      high = target
+    if high - low <= precision * high:
+      break
+    target = (low + high) / 2
+  return best
+
+
 class YCSBExecutor(object):
   """Load data and run benchmarks using YCSB.
 
@@ -1148,6 +1463,76 @@ class YCSBExecutor(object):
     else:
       return current_load / FLAGS.ycsb_dynamic_load_sustain_throughput_ratio
 
+  def _RunSloSearch(self, run_func, max_throughput, num_vms, **metadata):
+    """Finds the highest target throughput meeting the latency SLO.
+
+    Probes targets up to max_throughput with short runs as described in
+    _SearchMaxTarget, then confirms the highest target meeting the SLO with a
+    run of --ycsb_timelimit seconds. A target meets the SLO if the latency
+    returned by _GetSloLatency is at most --ycsb_slo_latency_ms and the
+    throughput is sustained as defined by
+    --ycsb_dynamic_load_sustain_throughput_ratio.
+
+    Args:
+      run_func: Function taking the target throughput per client VM and a
+        max_execution_time keyword argument, running the workload, and
+        returning its overall throughput and samples.
+      max_throughput: float. The unthrottled throughput, which is the highest
+        target probed.
+      num_vms: int. The number of client VMs.
+      **metadata: Metadata added to the samples describing the search.
+
+    Returns:
+      List of sample.Sample objects. These are the samples of every run, a
+      "SLO search latency" sample per run tracing the throughput-latency
+      curve, and a "Max throughput meeting SLO" sample if a target met the
+      SLO.
+    """
+    results = []
+    slo_metadata = {
+        'slo_latency_ms': FLAGS.ycsb_slo_latency_ms,
+        'slo_latency_percentile': FLAGS.ycsb_slo_latency_percentile,
+    }
+    slo_metadata.update(metadata)
+
+    def _Run(target, stage, max_execution_time):
+      """Runs the workload at target and returns its result and throughput."""
+      throughput, run_samples = run_func(
+          max(target / num_vms, 1), max_execution_time=max_execution_time)
+      latency = _GetSloLatency(run_samples)
+      slo_met = (
+          latency is not None and latency <= FLAGS.ycsb_slo_latency_ms and
+          throughput >= (
+              target * FLAGS.ycsb_dynamic_load_sustain_throughput_ratio))
+      for s in run_samples:
+        s.metadata.update(slo_search_stage=stage, slo_met=slo_met)
+      results.extend(run_samples)
+      if latency is not None:
+        curve_metadata = slo_metadata.copy()
+        curve_metadata.update(slo_search_stage=stage, slo_met=slo_met,
+                              target_throughput=target, throughput=throughput)
+        results.append(sample.Sample('SLO search latency', latency, 'ms',
+                                     curve_metadata))
+      logging.info('YCSB SLO search %s at target %s: throughput %s, '
+                   'latency %s ms, SLO met: %s', stage, target, throughput,
+                   latency, slo_met)
+      return slo_met, throughput
+
+    best_target = _SearchMaxTarget(
+        lambda target: _Run(target, 'probe', FLAGS.ycsb_slo_probe_timelimit)[0],
+        max_throughput, FLAGS.ycsb_slo_search_precision,
+        FLAGS.ycsb_slo_max_probes)
+    if best_target is None:
+      logging.warning('No target throughput up to %s met the YCSB latency '
+                      'SLO.', max_throughput)
+      return results
+    confirmed, throughput = _Run(best_target, 'confirm', FLAGS.ycsb_timelimit)
+    max_metadata = slo_metadata.copy()
+    max_metadata.update(target_throughput=best_target, confirmed=confirmed)
+    results.append(sample.Sample('Max throughput meeting SLO', throughput,
+                                 'ops/sec', max_metadata))
+    return results
+
   def RunStaircaseLoads(self, vms, workloads, **kwargs):
     """Run each workload in 'workloads' in succession.
 
@@ -1212,7 +1597,8 @@ class YCSBExecutor(object):
         def _DoRunStairCaseLoad(client_count,
                                 target_qps_per_vm,
                                 workload_meta,
-                                is_sustained=False):
+                                is_sustained=False,
+                                max_execution_time=None):
           parameters['threads'] = client_count
           if target_qps_per_vm:
             parameters['target'] = int(target_qps_per_vm * len(vms))
@@ -1221,6 +1607,8 @@ class YCSBExecutor(object):
           if is_sustained:
             parameters['maxexecutiontime'] = (
                 FLAGS.ycsb_dynamic_load_sustain_timelimit)
+          elif max_execution_time is not None:
+            parameters['maxexecutiontime'] = max_execution_time
           start = time.time()
           results = self._RunThreaded(vms, **parameters)
           events.record_event.send(
@@ -1241,9 +1629,13 @@ class YCSBExecutor(object):
                   **client_meta))
 
           if self.measurement_type == HDRHISTOGRAM:
-            combined_log = self.CombineHdrHistogramLogFiles(
-                parameters['hdrhistogram.output.path'], vms)
-            parsed_hdr = ParseHdrLogs(combined_log)
+            if FLAGS.ycsb_hdr_merge == HDR_MERGE_LOCAL:
+              parsed_hdr = self.MergeHdrHistogramLogFiles(
+                  parameters['hdrhistogram.output.path'], vms)
+            else:
+              combined_log = self.CombineHdrHistogramLogFiles(
+                  parameters['hdrhistogram.output.path'], vms)
+              parsed_hdr = ParseHdrLogs(combined_log)
             combined = _CombineResults(
                 results, self.measurement_type, parsed_hdr)
           else:
@@ -1260,7 +1652,19 @@ class YCSBExecutor(object):
           return overall_throughput, run_samples
 
         target_throughput, run_samples = _DoRunStairCaseLoad(
-            client_count, target_qps_per_vm, workload_meta)
+            client_count, target_qps_per_vm, workload_meta,
+            max_execution_time=(FLAGS.ycsb_slo_probe_timelimit
+                                if FLAGS.ycsb_slo_search else None))
+
+        if FLAGS.ycsb_slo_search:
+          all_results.extend(run_samples)
+          all_results.extend(self._RunSloSearch(
+              functools.partial(_DoRunStairCaseLoad, client_count,
+                                workload_meta=workload_meta),
+              target_throughput, len(vms),
+              workload_name=workload_meta['workload_name'],
+              threads_per_client_vm=client_count))
+          continue
 
         # Uses 5 * unthrottled throughput as starting point.
         target_throughput *= 5
@@ -1284,6 +1688,38 @@ class YCSBExecutor(object):
 
     return all_results
 
+  def MergeHdrHistogramLogFiles(self, hdr_files_dir, vms):
+    """Merge the hdr histogram logs of all vms locally by group type.
+
+    Every interval histogram logged by every client is decoded and summed in
+    PKB, which is lossless and does not need HistogramLogProcessor on the vms.
+
+    Args:
+      hdr_files_dir: directory on the remote vms where hdr files are stored.
+      vms: remote vms
+
+    Returns:
+      dict of group type to (percentile, latency, count) tuples in the format
+      returned by ParseHdrLogFile.
+    """
+    def _ReadLogs(vm):
+      logs = {}
+      for grouptype in HDRHISTOGRAM_GROUPS:
+        logs[grouptype], _ = vm.RemoteCommand(
+            'touch {0}{1}.hdr && cat {0}{1}.hdr'.format(
+                hdr_files_dir, grouptype))
+      return logs
+
+    vm_logs = vm_util.RunThreaded(_ReadLogs, vms)
+    hdrhistograms = {}
+    for grouptype in HDRHISTOGRAM_GROUPS:
+      merged = MergeHdrLogs(logs[grouptype] for logs in vm_logs)
+      # It's possible that there is no result for certain group, e.g., read
+      # only, update only.
+      if merged is not None:
+        hdrhistograms[grouptype.lower()] = merged.GetPercentileTuples()
+    return hdrhistograms
+
   def CombineHdrHistogramLogFiles(self, hdr_files_dir, vms):
     """Combine multiple hdr histograms by group type.
 
@@ -27,12 +27,16 @@ for you.
 """
 
 import abc
+import base64
+import codecs
 import collections
 import logging
 import os
 import pipes
 import posixpath
 import re
+import selectors
+import subprocess
 import threading
 import time
 from typing import Dict, Set
@@ -45,6 +49,7 @@ from perfkitbenchmarker import errors
 from perfkitbenchmarker import linux_packages
 from perfkitbenchmarker import os_types
 from perfkitbenchmarker import regex_util
+from perfkitbenchmarker import ssh_session
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker import vm_util
 
@@ -137,6 +142,12 @@ flags.DEFINE_integer(
 flags.DEFINE_integer(
     'scp_connect_timeout', 30, 'timeout for SCP connection.', lower_bound=0)
 
+flags.DEFINE_bool(
+    'robust_remote_command_streaming', False,
+    'If true, RobustRemoteCommand keeps a single ssh channel open that tails '
+    'the command\'s stdout and stderr as they are produced, reattaching only '
+    'if the connection drops, instead of repeatedly polling for completion.')
+
 flags.DEFINE_string(
     'append_kernel_command_line', None,
     'String to append to the kernel command line. The presence of any '
@@ -176,6 +187,144 @@ flags.DEFINE_boolean('disable_smt', False,
 
 RETRYABLE_SSH_RETCODE = 255
 
+# Prefix of the per-command result lines printed by a RemoteCommandBatch.
+_BATCH_RESULT_PREFIX = '__PKB_BATCH_RESULT__'
+
+
+class BatchedCommand(object):
+  """A command queued in a RemoteCommandBatch.
+
+  The result attributes are filled in once the batch has run. Commands that
+  were not run, because an earlier command in the batch failed, keep a retcode
+  of None.
+
+  Attributes:
+    command: The bash command.
+    ignore_failure: Whether a non-zero return code should stop the batch.
+    stdout: The command's stdout.
+    stderr: The command's stderr.
+    retcode: The command's return code.
+  """
+
+  def __init__(self, command, ignore_failure=False):
+    self.command = command
+    self.ignore_failure = ignore_failure
+    self.stdout = ''
+    self.stderr = ''
+    self.retcode = None
+
+
+class RemoteCommandBatch(object):
+  """Runs several remote commands in a single remote shell invocation.
+
+  Commands are run in the order they were added, each in its own bash process,
+  and the batch stops at the first command that fails unless that command was
+  added with ignore_failure=True. Each command's stdout, stderr and return code
+  are reported separately, so failures are attributed to the command that
+  caused them. Use it through BaseLinuxMixin.RemoteCommandBatch:
+
+    with vm.RemoteCommandBatch() as batch:
+      batch.RemoteCommand('mkdir -p /opt/foo')
+      version = batch.RemoteCommand('cat /opt/foo/VERSION')
+    print(version.stdout)
+  """
+
+  def __init__(self, vm, should_log=False, timeout=None):
+    """Initializes the batch.
+
+    Args:
+      vm: The BaseLinuxMixin VM to run the commands on.
+      should_log: Whether the combined result should be logged at info level.
+      timeout: The timeout for the whole batch, passed to vm.RemoteCommand.
+    """
+    self._vm = vm
+    self._should_log = should_log
+    self._timeout = timeout
+    self.commands = []
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if exc_type is None:
+      self.Run()
+
+  def RemoteCommand(self, command, ignore_failure=False):
+    """Queues a command to run when the batch is run.
+
+    Args:
+      command: A valid bash command.
+      ignore_failure: Continue with the rest of the batch and do not raise if
+          this command fails.
+
+    Returns:
+      The BatchedCommand that will hold the result.
+    """
+    batched_command = BatchedCommand(command, ignore_failure)
+    self.commands.append(batched_command)
+    return batched_command
+
+  def _BuildScript(self):
+    """Returns a bash script that runs all queued commands."""
+    lines = [
+        '__pkb_dir=$(mktemp -d)',
+        '__pkb_run() {',
+        '  bash -c "$2" >"$__pkb_dir/out" 2>"$__pkb_dir/err" </dev/null',
+        '  local rc=$?',
+        '  echo "%s $1 $rc $(base64 -w0 <"$__pkb_dir/out")'
+        ' $(base64 -w0 <"$__pkb_dir/err")"' % _BATCH_RESULT_PREFIX,
+        '  return $rc',
+        '}',
+    ]
+    for index, batched_command in enumerate(self.commands):
+      run = '__pkb_run %d %s' % (index, pipes.quote(batched_command.command))
+      if not batched_command.ignore_failure:
+        run += ' || { rm -rf "$__pkb_dir"; exit 0; }'
+      lines.append(run)
+    lines.append('rm -rf "$__pkb_dir"')
+    return '\n'.join(lines)
+
+  def Run(self):
+    """Runs all queued commands on the VM.
+
+    Returns:
+      A list of (stdout, stderr, return code) tuples, one per queued command.
+
+    Raises:
+      RemoteCommandError: If a command that does not ignore failures returned a
+          non-zero return code, or the batch could not be run.
+    """
+    if not self.commands:
+      return []
+    stdout, stderr = self._vm.RemoteCommand(
+        self._BuildScript(), should_log=self._should_log, ignore_failure=True,
+        timeout=self._timeout)
+    for line in stdout.splitlines():
+      fields = line.split(' ')
+      if len(fields) != 5 or fields[0] != _BATCH_RESULT_PREFIX:
+        continue
+      batched_command = self.commands[int(fields[1])]
+      batched_command.retcode = int(fields[2])
+      batched_command.stdout = base64.b64decode(fields[3]).decode(
+          'ascii', 'ignore')
+      batched_command.stderr = base64.b64decode(fields[4]).decode(
+          'ascii', 'ignore')
+
+    for index, batched_command in enumerate(self.commands):
+      if batched_command.retcode is None:
+        raise errors.VirtualMachine.RemoteCommandError(
+            'Batch stopped before executing %s (command %d of %d)\n'
+            'STDOUT: %sSTDERR: %s' % (batched_command.command, index + 1,
+                                      len(self.commands), stdout, stderr))
+      if batched_command.retcode and not batched_command.ignore_failure:
+        raise errors.VirtualMachine.RemoteCommandError(
+            'Got non-zero return code (%s) executing %s (command %d of %d in '
+            'batch)\nSTDOUT: %sSTDERR: %s' %
+            (batched_command.retcode, batched_command.command, index + 1,
+             len(self.commands), batched_command.stdout,
+             batched_command.stderr))
+    return [(c.stdout, c.stderr, c.retcode) for c in self.commands]
+
 
 class CpuVulnerabilities:
   """The 3 different vulnerablity statuses from vm.cpu_vulernabilities.
@@ -273,6 +422,11 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     self._proccpu_cache = None
     self._smp_affinity_script = None
 
+  def _PreDelete(self):
+    """See base class."""
+    super(BaseLinuxMixin, self)._PreDelete()
+    ssh_session.CloseSessionPool(self.name)
+
   def _CreateVmTmpDir(self):
     self.RemoteCommand('mkdir -p %s' % vm_util.VM_TMP_DIR)
 
@@ -304,7 +458,7 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
         self._has_remote_command_script = True
 
   def RobustRemoteCommand(self, command, should_log=False, timeout=None,
-                          ignore_failure=False):
+                          ignore_failure=False, output_callback=None):
     """Runs a command on the VM in a more robust way than RemoteCommand.
 
     This is used for long-running commands that might experience network issues
@@ -325,12 +479,20 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     remote command actually returns 255, SSH will return 1 instead to bypass
     retry behavior.
 
+    If --robust_remote_command_streaming is set or output_callback is given,
+    WAIT_FOR_COMMAND is not used. Instead a single ssh channel tails the
+    command's output files until EXECUTE_COMMAND exits, and is only reopened,
+    from the last received byte, if the connection drops.
+
     Args:
       command: The command to run.
       should_log: Whether to log the command's output at the info level. The
           output is always logged at the debug level.
       timeout: The timeout for the command in seconds.
       ignore_failure: Ignore any failure if set to true.
+      output_callback: Optional function called with (stdout, stderr) strings
+          as output is produced by the command. Either string may be empty.
+          Implies streaming mode.
 
     Returns:
       A tuple of stdout, stderr from running the command.
@@ -368,6 +530,11 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
 
     start_command = '%s 1> %s 2>&1 &' % (' '.join(start_command),
                                          wrapper_log)
+    if FLAGS.robust_remote_command_streaming or output_callback:
+      wrapper_pid, _ = self.RemoteCommand(start_command + ' echo $!')
+      return self._StreamRobustCommand(
+          command, wrapper_pid.strip(), file_base, should_log, ignore_failure,
+          output_callback)
     self.RemoteCommand(start_command)
 
     def _WaitForCommand():
@@ -396,6 +563,132 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
                         'Wrapper script log:\n%s', stdout)
       raise
 
+  def _TailRobustCommandOutput(self, wrapper_pid, stdout_file, stderr_file,
+                               offsets, decoders, output_callback):
+    """Streams a RobustRemoteCommand's output until its wrapper exits.
+
+    Args:
+      wrapper_pid: The pid of the EXECUTE_COMMAND process on the VM.
+      stdout_file: The remote file the command's stdout is written to.
+      stderr_file: The remote file the command's stderr is written to.
+      offsets: A list of the number of stdout and stderr bytes already
+          received. Updated in place as output arrives.
+      decoders: A list of the incremental UTF-8 decoders of stdout and
+          stderr, which keep characters split across chunks or connections.
+      output_callback: Function called with (stdout, stderr) chunks.
+
+    Returns:
+      The return code of the ssh process. 255 means the connection dropped.
+    """
+    # GNU tail exits once --pid has exited and the file has been fully read.
+    # The tail following stderr discards its own diagnostics, such as the
+    # file not existing yet, and writes the followed content to stderr.
+    tail = 'tail -c +{offset} -F --pid={pid} {path}'
+    script = '{0} 2>/dev/null & {1} 1>&2 2>/dev/null & wait'.format(
+        tail.format(offset=offsets[0] + 1, pid=wrapper_pid, path=stdout_file),
+        tail.format(offset=offsets[1] + 1, pid=wrapper_pid, path=stderr_file))
+    # ssh's own diagnostics, such as the host key warning printed on every
+    # connection, would be counted as output of the command.
+    ssh_cmd = self._GetSshCommand(quiet=True) + [script]
+    logging.info('Streaming: %s', ' '.join(ssh_cmd))
+    process = subprocess.Popen(ssh_cmd, stdin=subprocess.DEVNULL,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    streams = [process.stdout, process.stderr]
+    with selectors.DefaultSelector() as selector:
+      for stream in streams:
+        selector.register(stream, selectors.EVENT_READ)
+      open_streams = len(streams)
+      while open_streams:
+        for key, _ in selector.select():
+          chunk = os.read(key.fileobj.fileno(), 65536)
+          if not chunk:
+            selector.unregister(key.fileobj)
+            open_streams -= 1
+            continue
+          index = streams.index(key.fileobj)
+          offsets[index] += len(chunk)
+          text = decoders[index].decode(chunk)
+          output_callback(*((text, '') if index == 0 else ('', text)))
+    process.stdout.close()
+    process.stderr.close()
+    return process.wait()
+
+  def _StreamRobustCommand(self, command, wrapper_pid, file_base, should_log,
+                           ignore_failure, output_callback):
+    """Waits for a RobustRemoteCommand by streaming its output.
+
+    Args:
+      command: The command that was started.
+      wrapper_pid: The pid of the EXECUTE_COMMAND process on the VM.
+      file_base: The common prefix of the command's remote files.
+      should_log: Whether to log the command's output at the info level.
+      ignore_failure: Ignore any failure if set to true.
+      output_callback: Optional function called with (stdout, stderr) chunks.
+
+    Returns:
+      A tuple of stdout, stderr from running the command.
+
+    Raises:
+      RemoteCommandError: If the output could not be streamed, or the command
+          fails.
+    """
+    stdout_file = file_base + '.stdout'
+    stderr_file = file_base + '.stderr'
+    status_file = file_base + '.status'
+    stdout_chunks = []
+    stderr_chunks = []
+
+    def _Collect(stdout, stderr):
+      stdout_chunks.append(stdout)
+      stderr_chunks.append(stderr)
+      if output_callback:
+        output_callback(stdout, stderr)
+
+    offsets = [0, 0]
+    decoders = [codecs.getincrementaldecoder('utf-8')('replace')
+                for _ in offsets]
+    for _ in range(FLAGS.ssh_retries):
+      retcode = self._TailRobustCommandOutput(
+          wrapper_pid, stdout_file, stderr_file, offsets, decoders, _Collect)
+      if retcode != RETRYABLE_SSH_RETCODE:
+        break
+      logging.warning('Lost connection streaming output of "%s" on %s after '
+                      '%s bytes of stdout and %s bytes of stderr; reattaching.',
+                      command, self.name, offsets[0], offsets[1])
+    # Flush incomplete characters at the end of the output.
+    remaining = [decoder.decode(b'', final=True) for decoder in decoders]
+    if any(remaining):
+      _Collect(*remaining)
+    stdout = ''.join(stdout_chunks)
+    stderr = ''.join(stderr_chunks)
+    if retcode:
+      raise errors.VirtualMachine.RemoteCommandError(
+          'Got non-zero return code (%s) streaming output of %s\n'
+          'STDOUT: %sSTDERR: %s' % (retcode, command, stdout, stderr))
+
+    with self.RemoteCommandBatch() as batch:
+      status = batch.RemoteCommand('cat %s' % status_file)
+      wrapper_log = batch.RemoteCommand('cat %s.log' % file_base)
+      batch.RemoteCommand('rm -f %s %s %s' %
+                          (stdout_file, stderr_file, status_file))
+    debug_text = 'Ran (streaming): %s\nSTDOUT: %s\nSTDERR: %s' % (
+        command, stdout, stderr)
+    if should_log:
+      logging.info(debug_text)
+    else:
+      logging.debug(debug_text)
+    if status.stdout.strip():
+      return_code = int(status.stdout)
+    else:
+      logging.warning('Exception during RobustRemoteCommand. '
+                      'Wrapper script log:\n%s', wrapper_log.stdout)
+      return_code = 1
+    if return_code and not ignore_failure:
+      raise errors.VirtualMachine.RemoteCommandError(
+          'Got non-zero return code (%s) executing %s\nSTDOUT: %sSTDERR: %s' %
+          (return_code, command, stdout, stderr))
+    return stdout, stderr
+
   def SetupRemoteFirewall(self):
     """Sets up IP table configurations on the VM."""
     self.RemoteHostCommand('sudo iptables -A INPUT -j ACCEPT')
@@ -918,6 +1211,22 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
     """
     return self.RemoteHostCommandWithReturnCode(*args, **kwargs)
 
+  def _GetSshCommand(self, quiet=False):
+    """Returns the ssh command line, without a remote command, for this VM.
+
+    Args:
+      quiet: Whether ssh suppresses its warning and diagnostic messages.
+    """
+    ip_address = self.GetConnectionIp()
+    user_host = '%s@%s' % (self.user_name, ip_address)
+    ssh_cmd = ['ssh', '-A', '-p', str(self.ssh_port), user_host]
+    if quiet:
+      ssh_cmd.insert(1, '-q')
+    ssh_private_key = (self.ssh_private_key if self.is_static else
+                       vm_util.GetPrivateKeyPath())
+    ssh_cmd.extend(vm_util.GetSshOptions(ssh_private_key))
+    return ssh_cmd
+
   def RemoteHostCommandWithReturnCode(self,
                                       command,
                                       should_log=False,
@@ -957,24 +1266,31 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
       # Multi-line commands passed to ssh won't work on Windows unless the
       # newlines are escaped.
       command = command.replace('\n', '\\n')
-    ip_address = self.GetConnectionIp()
-    user_host = '%s@%s' % (self.user_name, ip_address)
-    ssh_cmd = ['ssh', '-A', '-p', str(self.ssh_port), user_host]
-    ssh_private_key = (self.ssh_private_key if self.is_static else
-                       vm_util.GetPrivateKeyPath())
-    ssh_cmd.extend(vm_util.GetSshOptions(ssh_private_key))
+    ssh_cmd = self._GetSshCommand()
     try:
-      if login_shell:
+      # Login shells need a pseudo-tty, which a shared session cannot
+      # provide, so they always use a dedicated ssh process.
+      use_session = (FLAGS.ssh_transport == ssh_session.SESSION and
+                     not login_shell and not vm_util.RunningOnWindows())
+      if use_session:
+        pool = ssh_session.GetSessionPool(self.name, ssh_cmd + ['bash'])
+        ssh_cmd.append(command)
+      elif login_shell:
         ssh_cmd.extend(['-t', '-t', 'bash -l -c "%s"' % command])
         self._pseudo_tty_lock.acquire()
       else:
         ssh_cmd.append(command)
 
       for _ in range(retries):
-        stdout, stderr, retcode = vm_util.IssueCommand(
-            ssh_cmd, force_info_log=should_log,
-            suppress_warning=suppress_warning,
-            timeout=timeout, raise_on_failure=False)
+        if use_session:
+          stdout, stderr, retcode = pool.RunCommand(
+              command, force_info_log=should_log,
+              suppress_warning=suppress_warning, timeout=timeout)
+        else:
+          stdout, stderr, retcode = vm_util.IssueCommand(
+              ssh_cmd, force_info_log=should_log,
+              suppress_warning=suppress_warning,
+              timeout=timeout, raise_on_failure=False)
         # Retry on 255 because this indicates an SSH failure
         if retcode != RETRYABLE_SSH_RETCODE:
           break
@@ -992,6 +1308,19 @@ class BaseLinuxMixin(virtual_machine.BaseOsMixin):
 
     return (stdout, stderr, retcode)
 
+  def RemoteCommandBatch(self, should_log=False, timeout=None):
+    """Returns a RemoteCommandBatch that runs commands in one round trip.
+
+    Args:
+      should_log: Whether the combined result should be logged at info level.
+      timeout: The timeout for the whole batch.
+
+    Returns:
+      A RemoteCommandBatch, usable as a context manager that runs the queued
+      commands on exit.
+    """
+    return RemoteCommandBatch(self, should_log=should_log, timeout=timeout)
+
   def RemoteHostCommand(self, *args, **kwargs):
     """Runs a command on the VM.
 
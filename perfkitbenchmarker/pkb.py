@@ -79,6 +79,7 @@ from perfkitbenchmarker import benchmark_lookup
 from perfkitbenchmarker import benchmark_sets
 from perfkitbenchmarker import benchmark_spec
 from perfkitbenchmarker import benchmark_status
+from perfkitbenchmarker import command_transport
 from perfkitbenchmarker import configs
 from perfkitbenchmarker import context
 from perfkitbenchmarker import disk
@@ -89,6 +90,7 @@ from perfkitbenchmarker import linux_benchmarks
 from perfkitbenchmarker import log_util
 from perfkitbenchmarker import os_types
 from perfkitbenchmarker import package_lookup
+from perfkitbenchmarker import publisher
 from perfkitbenchmarker import requirements
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import spark_service
@@ -264,7 +266,9 @@ flags.DEFINE_boolean(
     'publish_after_run', False,
     'If true, PKB will publish all samples available immediately after running '
     'each benchmark. This may be useful in scenarios where the PKB run time '
-    'for all benchmarks is much greater than a single benchmark.')
+    'for all benchmarks is much greater than a single benchmark. With '
+    '--run_processes, benchmarks send their samples to the main process, '
+    'which publishes them as they arrive.')
 flags.DEFINE_integer(
     'publish_period', None,
     'The period in seconds to publish samples from repeated run stages. '
@@ -1108,13 +1112,15 @@ def MakeFailedRunSample(spec, error_message, run_stage_that_failed):
   return [sample.Sample('Run Failed', 1, 'Run Failed', metadata)]
 
 
-def RunBenchmarkTask(spec):
+def RunBenchmarkTask(spec, sample_queue=None):
   """Task that executes RunBenchmark.
 
   This is designed to be used with RunParallelProcesses.
 
   Arguments:
     spec: BenchmarkSpec. The spec to call RunBenchmark with.
+    sample_queue: Optional queue. If given, samples are published by putting
+        them on this queue instead of to the configured publishers.
 
   Returns:
     A tuple of BenchmarkSpec, list of samples.
@@ -1130,7 +1136,10 @@ def RunBenchmarkTask(spec):
     # Unset run_uri so the config value takes precedence.
     FLAGS['run_uri'].present = 0
 
-  collector = SampleCollector()
+  # Samples published with publisher.PublishRunStageSamples also go to the
+  # queue.
+  publisher.SetSampleQueue(sample_queue)
+  collector = publisher.CreateSampleCollector()
   try:
     RunBenchmark(spec, collector)
   except BaseException as e:
@@ -1146,6 +1155,7 @@ def RunBenchmarkTask(spec):
     # We need to return both the spec and samples so that we know
     # the status of the test and can publish any samples that
     # haven't yet been published.
+    publisher.SetSampleQueue(None)
     return spec, collector.samples
 
 
@@ -1215,6 +1225,7 @@ def SetUpPKB():
 
   benchmark_lookup.SetBenchmarkModuleFunction(benchmark_sets.BenchmarkModule)
   package_lookup.SetPackageModuleFunction(benchmark_sets.PackageModule)
+  command_transport.Install()
 
   # Update max_concurrent_threads to use at least as many threads as VMs. This
   # is important for the cluster_boot benchmark where we want to launch the VMs
@@ -1239,6 +1250,17 @@ def RunBenchmarkTasksInSeries(tasks):
   return [func(*args, **kwargs) for func, args, kwargs in tasks]
 
 
+def _PublishQueuedSamples(sample_queue, collector):
+  """Publishes lists of samples read from sample_queue until it reads None."""
+  for samples in iter(sample_queue.get, None):
+    collector.samples.extend(samples)
+    try:
+      collector.PublishSamples()
+    except Exception:  # pylint: disable=broad-except
+      # The failure was logged; keep publishing the samples that follow.
+      pass
+
+
 def RunBenchmarks():
   """Runs all benchmarks in PerfKitBenchmarker.
 
@@ -1256,14 +1278,30 @@ def RunBenchmarks():
     return 0
 
   collector = SampleCollector()
+  task_kwargs = {}
+  if FLAGS.publish_after_run and FLAGS.run_processes is not None:
+    # Child processes hand their samples to this process as they are
+    # published, so that all sinks are written by one SampleCollector.
+    manager = multiprocessing.Manager()
+    task_kwargs['sample_queue'] = manager.Queue()
+    publish_thread = threading.Thread(
+        target=_PublishQueuedSamples,
+        args=(task_kwargs['sample_queue'], collector))
+    publish_thread.start()
   try:
-    tasks = [(RunBenchmarkTask, (spec,), {})
+    tasks = [(RunBenchmarkTask, (spec,), task_kwargs)
              for spec in benchmark_specs]
-    if FLAGS.run_processes is None:
-      spec_sample_tuples = RunBenchmarkTasksInSeries(tasks)
-    else:
-      spec_sample_tuples = background_tasks.RunParallelProcesses(
-          tasks, FLAGS.run_processes, FLAGS.run_processes_delay)
+    try:
+      if FLAGS.run_processes is None:
+        spec_sample_tuples = RunBenchmarkTasksInSeries(tasks)
+      else:
+        spec_sample_tuples = background_tasks.RunParallelProcesses(
+            tasks, FLAGS.run_processes, FLAGS.run_processes_delay)
+    finally:
+      if task_kwargs:
+        task_kwargs['sample_queue'].put(None)
+        publish_thread.join()
+        manager.shutdown()
     benchmark_specs, sample_lists = list(zip(*spec_sample_tuples))
     for sample_list in sample_lists:
       collector.samples.extend(sample_list)
@@ -133,6 +133,12 @@ class AwsRelationalDb(relational_db.BaseRelationalDb):
 
     self.unmanaged_db_exists = None if self.is_managed_db else False
 
+  @property
+  def create_depends_on_vms(self):
+    # RDS instances only need the client VM's network, which exists before the
+    # VMs are created, so they can be created alongside the VMs.
+    return not self.is_managed_db
+
   def GetResourceMetadata(self):
     """Returns the metadata associated with the resource.
 
@@ -0,0 +1,182 @@
+# Copyright 2026 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs common aws ec2 commands through boto3.
+
+Registers operations with command_transport describing, tagging, creating and
+deleting instances and volumes through one boto3 client per region, for use
+with --command_transport=sdk. boto3 is optional; without it, or without
+credentials it can find, commands are run by the aws CLI.
+"""
+
+import datetime
+import functools
+import json
+
+from absl import flags
+from perfkitbenchmarker import command_transport
+
+try:
+  import boto3
+  from botocore import config as botocore_config
+  from botocore import exceptions as botocore_exceptions
+except ImportError:
+  boto3 = None
+
+FLAGS = flags.FLAGS
+
+API = 'ec2'
+# Exit code of the aws CLI when a request fails.
+_ERROR_RETCODE = 255
+
+
+def _Strings(values):
+  """Returns the values of a list flag, like --instance-ids=a,b."""
+  return [item for value in values for item in value.split(',') if item]
+
+
+def _String(values):
+  if len(values) != 1:
+    raise command_transport.UnsupportedCommandError(
+        'Expected one value, got %s.' % values)
+  return values[0]
+
+
+def _Integer(values):
+  return int(_String(values))
+
+
+def _Shorthand(value, first_key, second_key):
+  """Parses shorthand such as "Name=a,Values=b,c" into its two values."""
+  first, separator, second = value.partition(',%s=' % second_key)
+  prefix = '%s=' % first_key
+  if not separator or not first.startswith(prefix):
+    raise command_transport.UnsupportedCommandError(
+        'Unsupported shorthand %s.' % value)
+  return first[len(prefix):], second
+
+
+def _Filters(values):
+  filters = []
+  for value in values:
+    name, filter_values = _Shorthand(value, 'Name', 'Values')
+    filters.append({'Name': name, 'Values': filter_values.split(',')})
+  return filters
+
+
+def _Tags(values):
+  tags = []
+  for value in values:
+    key, tag_value = _Shorthand(value, 'Key', 'Value')
+    tags.append({'Key': key, 'Value': tag_value})
+  return tags
+
+
+# Maps the ec2 commands run by boto3 to the parameters their flags set, and
+# the functions converting the flag values to parameter values.
+_OPERATIONS = {
+    'describe-instances': {
+        'instance-ids': ('InstanceIds', _Strings),
+        'filters': ('Filters', _Filters),
+        'filter': ('Filters', _Filters),
+    },
+    'describe-volumes': {
+        'volume-ids': ('VolumeIds', _Strings),
+        'filters': ('Filters', _Filters),
+        'filter': ('Filters', _Filters),
+    },
+    'create-tags': {
+        'resources': ('Resources', _Strings),
+        'tags': ('Tags', _Tags),
+    },
+    'create-volume': {
+        'size': ('Size', _Integer),
+        'volume-type': ('VolumeType', _String),
+        'availability-zone': ('AvailabilityZone', _String),
+        'iops': ('Iops', _Integer),
+        'throughput': ('Throughput', _Integer),
+    },
+    'terminate-instances': {
+        'instance-ids': ('InstanceIds', _Strings),
+    },
+    'delete-volume': {
+        'volume-id': ('VolumeId', _String),
+    },
+}
+
+
+def _JsonDefault(value):
+  if isinstance(value, datetime.datetime):
+    return value.isoformat()
+  raise TypeError('%r is not JSON serializable' % value)
+
+
+def _CreateClient(region):
+  return boto3.session.Session().client(
+      API, region_name=region,
+      endpoint_url=command_transport.GetEndpoint(API, None),
+      config=botocore_config.Config(
+          max_pool_connections=FLAGS.command_transport_pool_size))
+
+
+def _Run(command, parsed, timeout=None):
+  """Runs an ec2 command with boto3.
+
+  Args:
+    command: string. The ec2 command, e.g. "describe-instances".
+    parsed: The ParsedCommand.
+    timeout: Unused. boto3 retries and times out requests itself.
+
+  Returns:
+    A tuple of stdout, stderr, and retcode.
+  """
+  del timeout  # Unused.
+  if boto3 is None:
+    raise command_transport.UnsupportedCommandError('boto3 is not installed.')
+  if parsed.PopFlag('output') != 'json' or parsed.args:
+    raise command_transport.UnsupportedCommandError(
+        'Output is not JSON or command has extra arguments.')
+  region = parsed.PopFlag('region')
+  if not region:
+    raise command_transport.UnsupportedCommandError('Command has no region.')
+  params = {}
+  parameters = _OPERATIONS[command]
+  for name, values in parsed.flags.items():
+    if name not in parameters:
+      raise command_transport.UnsupportedCommandError(
+          'Unsupported flag --%s.' % name)
+    param, convert = parameters[name]
+    value = convert(values)
+    if param in params:
+      params[param] += value
+    else:
+      params[param] = value
+  client = command_transport.GetClient(
+      (API, region), functools.partial(_CreateClient, region))
+  try:
+    response = getattr(client, command.replace('-', '_'))(**params)
+  except botocore_exceptions.NoCredentialsError as e:
+    raise command_transport.UnsupportedCommandError(str(e))
+  except (botocore_exceptions.ClientError,
+          botocore_exceptions.BotoCoreError) as e:
+    return '', '\n%s\n' % e, _ERROR_RETCODE
+  response.pop('ResponseMetadata', None)
+  stdout = json.dumps(response, indent=4, default=_JsonDefault) + '\n'
+  return (stdout if response else ''), '', 0
+
+
+command_transport.RegisterGlobalFlags('aws', 'output')
+for _command in _OPERATIONS:
+  command_transport.RegisterOperation('aws', API, _command)(
+      functools.partial(_Run, _command))
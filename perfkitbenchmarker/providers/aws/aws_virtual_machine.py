@@ -21,6 +21,7 @@ operate on the VM: boot, shutdown, etc.
 
 import base64
 import collections
+import functools
 import json
 import logging
 import posixpath
@@ -29,11 +30,14 @@ import threading
 import uuid
 
 from absl import flags
+from perfkitbenchmarker import bulk_vm_create
+from perfkitbenchmarker import cli_cache
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import linux_virtual_machine
 from perfkitbenchmarker import placement_group
 from perfkitbenchmarker import resource
+from perfkitbenchmarker import status_poller
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker import windows_virtual_machine
@@ -233,6 +237,61 @@ def GetBlockDeviceMap(machine_type, root_volume_size_gb=None,
   return None
 
 
+# Maps the describe-instances filters used for batched status lookups to the
+# instance field holding the filtered value.
+_INSTANCE_FILTER_FIELDS = {
+    'client-token': 'ClientToken',
+    'instance-id': 'InstanceId',
+}
+
+
+def _DescribeInstances(region, filter_name, values):
+  """Describes the instances matching any of the values of a filter.
+
+  Args:
+    region: The region of the instances.
+    filter_name: One of the keys of _INSTANCE_FILTER_FIELDS.
+    values: List of values of the filter.
+
+  Returns:
+    A dict from the filter value of each instance found to the instance.
+  """
+  describe_cmd = util.AWS_PREFIX + [
+      'ec2',
+      'describe-instances',
+      '--region=%s' % region,
+      '--filters=Name=%s,Values=%s' % (filter_name, ','.join(values))]
+  stdout, _ = util.IssueRetryableCommand(describe_cmd)
+  field = _INSTANCE_FILTER_FIELDS[filter_name]
+  return {instance[field]: instance
+          for reservation in json.loads(stdout)['Reservations']
+          for instance in reservation['Instances']}
+
+
+def _BulkRunInstances(create_cmd, vms):
+  """Creates VMs with one run-instances call.
+
+  Args:
+    create_cmd: The run-instances command of the VMs without a client token.
+    vms: List of AwsVirtualMachines to create.
+
+  Returns:
+    A dict from each VM to a tuple of its instance ID, or None if the call
+    failed, the client token of the call, and the stderr and return code of
+    the call.
+  """
+  client_token = str(uuid.uuid4())
+  stdout, stderr, retcode = vm_util.IssueCommand(
+      create_cmd + ['--client-token=%s' % client_token,
+                    '--count=%d' % len(vms)], raise_on_failure=False)
+  instance_ids = [None] * len(vms)
+  if not retcode:
+    instance_ids = [instance['InstanceId']
+                    for instance in json.loads(stdout)['Instances']]
+  return {vm: (instance_id, client_token, stderr, retcode)
+          for vm, instance_id in zip(vms, instance_ids)}
+
+
 def IsPlacementGroupCompatible(machine_type):
   """Returns True if VMs of 'machine_type' can be put in a placement group."""
   prefix = machine_type.split('.')[0]
@@ -502,6 +561,7 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
     self.spot_block_duration_minutes = vm_spec.spot_block_duration_minutes
     self.boot_disk_size = vm_spec.boot_disk_size
     self.client_token = str(uuid.uuid4())
+    self.created_in_bulk = False
     self.host = None
     self.id = None
     self.metadata.update({
@@ -600,7 +660,8 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
       describe_cmd.extend(['Name=description,Values=%s' %
                            cls.IMAGE_DESCRIPTION_FILTER])
     describe_cmd.extend(['--owners'] + cls.IMAGE_OWNER)
-    stdout, _ = util.IssueRetryableCommand(describe_cmd)
+    stdout, _ = cli_cache.Call('aws_images', util.IssueRetryableCommand,
+                               describe_cmd)
 
     if not stdout:
       raise AwsImageNotFoundError('aws describe-images did not produce valid '
@@ -631,19 +692,40 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
 
     return max(images, key=lambda image: image['CreationDate'])['ImageId']
 
+  def _GetPolledInstance(self, filter_name, value):
+    """Returns the instance matching a filter value, or None.
+
+    The lookup shares its describe-instances call with the lookups of other
+    VMs in the region made at about the same time.
+
+    Args:
+      filter_name: One of the keys of _INSTANCE_FILTER_FIELDS.
+      value: The value of the filter identifying this VM.
+    """
+    poller = status_poller.GetPoller(
+        (self.CLOUD, self.region, filter_name),
+        functools.partial(_DescribeInstances, self.region, filter_name))
+    return poller.Get(value)
+
   @vm_util.Retry(max_retries=2)
   def _PostCreate(self):
     """Get the instance's data and tag it."""
-    describe_cmd = util.AWS_PREFIX + [
-        'ec2',
-        'describe-instances',
-        '--region=%s' % self.region,
-        '--instance-ids=%s' % self.id]
     logging.info('Getting instance %s public IP. This will fail until '
                  'a public IP is available, but will be retried.', self.id)
-    stdout, _ = util.IssueRetryableCommand(describe_cmd)
-    response = json.loads(stdout)
-    instance = response['Reservations'][0]['Instances'][0]
+    if FLAGS.batch_status_polls:
+      instance = self._GetPolledInstance('instance-id', self.id)
+      if not instance:
+        raise errors.Resource.RetryableGetError(
+            'Instance %s not found.' % self.id)
+    else:
+      describe_cmd = util.AWS_PREFIX + [
+          'ec2',
+          'describe-instances',
+          '--region=%s' % self.region,
+          '--instance-ids=%s' % self.id]
+      stdout, _ = util.IssueRetryableCommand(describe_cmd)
+      response = json.loads(stdout)
+      instance = response['Reservations'][0]['Instances'][0]
     self.internal_ip = instance['PrivateIpAddress']
     if util.IsRegion(self.zone):
       self.zone = str(instance['Placement']['AvailabilityZone'])
@@ -746,14 +828,13 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
           self.host.Delete()
           self.deleted_hosts.add(self.host)
 
-  def _Create(self):
-    """Create a VM instance."""
+  def _GenerateCreateCommand(self):
+    """Returns the run-instances command creating the VM."""
     placement = []
     if not util.IsRegion(self.zone):
       placement.append('AvailabilityZone=%s' % self.zone)
     if self.use_dedicated_host:
       placement.append('Tenancy=host,HostId=%s' % self.host.id)
-      num_hosts = len(self.host_list)
     elif self.placement_group:
       if IsPlacementGroupCompatible(self.machine_type):
         placement.append('GroupName=%s' % self.placement_group.name)
@@ -835,8 +916,25 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
       instance_market_options['SpotOptions'] = spot_options
       create_cmd.append(
           '--instance-market-options=%s' % json.dumps(instance_market_options))
-    _, stderr, retcode = vm_util.IssueCommand(create_cmd,
-                                              raise_on_failure=False)
+    return create_cmd
+
+  def _Create(self):
+    """Create a VM instance."""
+    if self.use_dedicated_host:
+      num_hosts = len(self.host_list)
+    create_cmd = self._GenerateCreateCommand()
+    self.created_in_bulk = (FLAGS.bulk_vm_create and
+                            not self.use_dedicated_host)
+    if self.created_in_bulk:
+      # VMs whose commands only differ in their client tokens are created by
+      # one run-instances call.
+      create_cmd.remove('--client-token=%s' % self.client_token)
+      key = tuple(create_cmd)
+      self.id, self.client_token, stderr, retcode = bulk_vm_create.Create(
+          self, key, functools.partial(_BulkRunInstances, create_cmd))
+    else:
+      _, stderr, retcode = vm_util.IssueCommand(create_cmd,
+                                                raise_on_failure=False)
 
     machine_type_prefix = self.machine_type.split('.')[0]
     host_arch = _MACHINE_TYPE_PREFIX_TO_HOST_ARCH.get(machine_type_prefix)
@@ -937,15 +1035,25 @@ class AwsVirtualMachine(virtual_machine.BaseVirtualMachine):
       AwsUnknownStatusError: If an unknown status is returned from AWS.
       AwsTransitionalVmRetryableError: If the VM is pending. This is retried.
     """
-    describe_cmd = util.AWS_PREFIX + [
-        'ec2',
-        'describe-instances',
-        '--region=%s' % self.region,
-        '--filter=Name=client-token,Values=%s' % self.client_token]
+    # VMs created by one run-instances call share its client token, so they
+    # are told apart by their instance IDs.
+    if self.created_in_bulk:
+      filter_name, filter_value = 'instance-id', self.id
+    else:
+      filter_name, filter_value = 'client-token', self.client_token
+    if FLAGS.batch_status_polls:
+      instance = self._GetPolledInstance(filter_name, filter_value)
+      reservations = [{'Instances': [instance]}] if instance else []
+    else:
+      describe_cmd = util.AWS_PREFIX + [
+          'ec2',
+          'describe-instances',
+          '--region=%s' % self.region,
+          '--filter=Name=%s,Values=%s' % (filter_name, filter_value)]
 
-    stdout, _ = util.IssueRetryableCommand(describe_cmd)
-    response = json.loads(stdout)
-    reservations = response['Reservations']
+      stdout, _ = util.IssueRetryableCommand(describe_cmd)
+      response = json.loads(stdout)
+      reservations = response['Reservations']
     assert len(reservations) < 2, 'Too many reservations.'
     if not reservations:
       if not self.create_start_time:
@@ -20,6 +20,7 @@ import json
 import re
 import string
 from absl import flags
+from perfkitbenchmarker import cli_cache
 from perfkitbenchmarker import context
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import vm_util
@@ -75,7 +76,8 @@ def GetZonesInRegion(region):
       'describe-availability-zones',
       '--region={0}'.format(region)
   ]
-  stdout, _, _ = vm_util.IssueCommand(get_zones_cmd)
+  stdout, _, _ = cli_cache.Call('aws_zones', vm_util.IssueCommand,
+                                get_zones_cmd)
   response = json.loads(stdout)
   zones = [item['ZoneName'] for item in response['AvailabilityZones']
            if item['State'] == 'available']
@@ -200,7 +202,7 @@ def GetAccount():
   """
 
   cmd = AWS_PREFIX + ['sts', 'get-caller-identity']
-  stdout, _, _ = vm_util.IssueCommand(cmd)
+  stdout, _, _ = cli_cache.Call('aws_account', vm_util.IssueCommand, cmd)
   return json.loads(stdout)['Account']
 
 
@@ -0,0 +1,262 @@
+# Copyright 2026 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Runs common gcloud compute commands through the Compute Engine API.
+
+Registers operations with command_transport describing, labeling, creating and
+deleting instances and disks through one shared, authorized HTTP session, for
+use with --command_transport=sdk. The session uses the application default
+credentials. google-auth and requests are optional; without them, or without
+credentials, commands are run by gcloud.
+"""
+
+import functools
+import json
+import time
+
+from absl import flags
+from perfkitbenchmarker import command_transport
+from perfkitbenchmarker import errors
+
+FLAGS = flags.FLAGS
+
+API = 'gce'
+_DEFAULT_ENDPOINT = 'https://compute.googleapis.com/compute/v1'
+_SCOPES = ('https://www.googleapis.com/auth/cloud-platform',)
+_COLLECTIONS = ('instances', 'disks')
+_OPERATION_DONE = 'DONE'
+
+
+class _ApiError(Exception):
+  """An error returned by the API, formatted as gcloud would print it."""
+
+
+def _CreateSession():
+  """Returns an authorized session keeping its connections open."""
+  try:
+    # Imported here so that loading the provider does not require them.
+    # pylint: disable=g-import-not-at-top
+    import google.auth
+    from google.auth import exceptions as auth_exceptions
+    from google.auth.transport import requests as auth_requests
+    import requests
+    # pylint: enable=g-import-not-at-top
+  except ImportError as e:
+    raise command_transport.UnsupportedCommandError(str(e))
+  try:
+    credentials, _ = google.auth.default(scopes=_SCOPES)
+  except auth_exceptions.DefaultCredentialsError as e:
+    raise command_transport.UnsupportedCommandError(str(e))
+  session = auth_requests.AuthorizedSession(credentials)
+  adapter = requests.adapters.HTTPAdapter(
+      pool_maxsize=FLAGS.command_transport_pool_size)
+  session.mount('https://', adapter)
+  session.mount('http://', adapter)
+  return session
+
+
+def _Request(method, path, command_name, timeout, body=None):
+  """Sends a request to the API and returns its decoded response.
+
+  Args:
+    method: string. The HTTP method.
+    path: string. The path of the request below the API endpoint.
+    command_name: string. The gcloud command the request is made for, e.g.
+      "compute.instances.describe", used in error messages.
+    timeout: Number of seconds to wait for the response, or None.
+    body: The request body, encoded as JSON if not None.
+
+  Raises:
+    _ApiError: If the request failed or the API returned an error.
+    IssueCommandTimeoutError: If there was no response within timeout.
+  """
+  session = command_transport.GetClient(API, _CreateSession)
+  # Imported by _CreateSession, which fails if they are missing.
+  # pylint: disable=g-import-not-at-top
+  from google.auth import exceptions as auth_exceptions
+  import requests
+  # pylint: enable=g-import-not-at-top
+  url = command_transport.GetEndpoint(API, _DEFAULT_ENDPOINT) + path
+  try:
+    response = session.request(method, url, json=body, timeout=timeout)
+  except requests.Timeout as e:
+    raise errors.VmUtil.IssueCommandTimeoutError(
+        'ERROR: (gcloud.%s) %s\n' % (command_name, e))
+  except (requests.RequestException, auth_exceptions.GoogleAuthError) as e:
+    raise _ApiError('ERROR: (gcloud.%s) %s\n' % (command_name, e))
+  try:
+    content = response.json()
+  except ValueError:
+    content = {}
+  if response.status_code >= 400:
+    message = content.get('error', {}).get('message') or response.text
+    raise _ApiError('ERROR: (gcloud.%s) Could not fetch resource:\n - %s\n' %
+                    (command_name, message))
+  return content
+
+
+def _WaitForOperation(operation, project, zone, command_name, timeout):
+  """Waits for a zonal operation to finish and returns it.
+
+  Args:
+    operation: dict. The operation returned by the API.
+    project: string. The project of the operation.
+    zone: string. The zone of the operation.
+    command_name: string. The gcloud command the operation is waited for by.
+    timeout: Number of seconds to wait for the operation, or None to wait
+      until it finishes.
+
+  Raises:
+    _ApiError: If the operation failed.
+    IssueCommandTimeoutError: If the operation did not finish within timeout.
+  """
+  path = '/projects/%s/zones/%s/operations/%s/wait' % (
+      project, zone, operation['name'])
+  deadline = None if timeout is None else time.time() + timeout
+  while operation.get('status') != _OPERATION_DONE:
+    remaining = None if deadline is None else deadline - time.time()
+    if remaining is not None and remaining <= 0:
+      raise errors.VmUtil.IssueCommandTimeoutError(
+          'ERROR: (gcloud.%s) Operation %s did not finish within %s seconds.\n'
+          % (command_name, operation['name'], timeout))
+    operation = _Request('POST', path, command_name, remaining)
+  if 'error' in operation:
+    messages = [error.get('message', '')
+                for error in operation['error'].get('errors', [])]
+    raise _ApiError('ERROR: (gcloud.%s) Could not fetch resource:\n%s\n' % (
+        command_name, '\n'.join(' - %s' % message for message in messages)))
+  return operation
+
+
+def _ParseLocation(parsed):
+  """Pops the common flags of a command and returns its name and location.
+
+  Returns:
+    A tuple of the name of the resource, its project and its zone.
+
+  Raises:
+    UnsupportedCommandError: If the command does not name exactly one resource
+      in an explicit project and zone, or does not ask for JSON output.
+  """
+  if parsed.PopFlag('format') != 'json':
+    raise command_transport.UnsupportedCommandError('Output is not JSON.')
+  parsed.PopBooleanFlag('quiet')
+  project = parsed.PopFlag('project')
+  zone = parsed.PopFlag('zone')
+  if len(parsed.args) != 1 or not project or not zone:
+    raise command_transport.UnsupportedCommandError(
+        'Command does not name one resource in a project and zone.')
+  return parsed.args[0], project, zone
+
+
+def _ParseLabels(values):
+  """Returns the dict of labels given as KEY=VALUE strings."""
+  return dict(value.split('=', 1) for value in values if value)
+
+
+def _Run(collection, verb, run_func, parsed, timeout=None):
+  """Runs a command on a resource with run_func and formats its result.
+
+  Args:
+    collection: string. The collection of the resource, e.g. "instances".
+    verb: string. The gcloud command run, e.g. "describe".
+    run_func: Function taking the path of the resource, its project and zone,
+      the ParsedCommand without its common flags, the gcloud command name and
+      the timeout, and returning stdout and stderr.
+    parsed: The ParsedCommand.
+    timeout: Number of seconds to wait for each response, or None.
+
+  Returns:
+    A tuple of stdout, stderr, and retcode.
+  """
+  name, project, zone = _ParseLocation(parsed)
+  path = '/projects/%s/zones/%s/%s/%s' % (project, zone, collection, name)
+  command_name = 'compute.%s.%s' % (collection, verb)
+  try:
+    stdout, stderr = run_func(path, project, zone, parsed, command_name,
+                              timeout)
+  except _ApiError as e:
+    return '', str(e), 1
+  return stdout, stderr, 0
+
+
+def _FormatResource(resource):
+  return json.dumps(resource, indent=2, sort_keys=True) + '\n'
+
+
+def _Describe(path, project, zone, parsed, command_name, timeout):
+  del project, zone  # Unused.
+  parsed.CheckAllFlagsUsed()
+  return _FormatResource(_Request('GET', path, command_name, timeout)), ''
+
+
+def _Delete(path, project, zone, parsed, command_name, timeout):
+  parsed.CheckAllFlagsUsed()
+  operation = _Request('DELETE', path, command_name, timeout)
+  operation = _WaitForOperation(operation, project, zone, command_name,
+                                timeout)
+  return '[]\n', 'Deleted [%s].\n' % operation.get('targetLink', path)
+
+
+def _AddLabels(path, project, zone, parsed, command_name, timeout):
+  labels = _ParseLabels(parsed.PopListFlag('labels'))
+  parsed.CheckAllFlagsUsed()
+  resource = _Request('GET', path, command_name, timeout)
+  new_labels = dict(resource.get('labels', {}), **labels)
+  operation = _Request(
+      'POST', path + '/setLabels', command_name, timeout,
+      body={'labels': new_labels,
+            'labelFingerprint': resource.get('labelFingerprint')})
+  _WaitForOperation(operation, project, zone, command_name, timeout)
+  return _FormatResource(_Request('GET', path, command_name, timeout)), ''
+
+
+def _CreateDisk(path, project, zone, parsed, command_name, timeout):
+  """Creates a disk like "gcloud compute disks create"."""
+  name = path.rsplit('/', 1)[-1]
+  size = parsed.PopFlag('size', '')
+  if size.upper().endswith('GB'):
+    size = size[:-2]
+  body = {
+      'name': name,
+      'type': 'projects/%s/zones/%s/diskTypes/%s' % (
+          project, zone, parsed.PopFlag('type', 'pd-standard')),
+      'labels': _ParseLabels(parsed.PopListFlag('labels')),
+  }
+  if size:
+    if not size.isdigit():
+      raise command_transport.UnsupportedCommandError(
+          'Unsupported disk size %s.' % size)
+    body['sizeGb'] = size
+  image = parsed.PopFlag('image')
+  image_project = parsed.PopFlag('image-project', project)
+  if image:
+    body['sourceImage'] = 'projects/%s/global/images/%s' % (image_project,
+                                                            image)
+  parsed.CheckAllFlagsUsed()
+  operation = _Request('POST', path.rsplit('/', 1)[0], command_name, timeout,
+                       body=body)
+  _WaitForOperation(operation, project, zone, command_name, timeout)
+  disk = _Request('GET', path, command_name, timeout)
+  return json.dumps([disk], indent=2, sort_keys=True) + '\n', ''
+
+
+for _collection in _COLLECTIONS:
+  for _verb, _run_func in (('describe', _Describe), ('delete', _Delete),
+                           ('add-labels', _AddLabels)):
+    command_transport.RegisterOperation(
+        'gcloud', 'compute', _collection, _verb)(
+            functools.partial(_Run, _collection, _verb, _run_func))
+command_transport.RegisterOperation('gcloud', 'compute', 'disks', 'create')(
+    functools.partial(_Run, 'disks', 'create', _CreateDisk))
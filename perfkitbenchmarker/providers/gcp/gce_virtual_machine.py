@@ -27,6 +27,8 @@ operate on the VM: boot, shutdown, etc.
 
 import abc
 import collections
+import copy
+import functools
 import itertools
 import json
 import logging
@@ -36,6 +38,7 @@ import threading
 import time
 
 from absl import flags
+from perfkitbenchmarker import bulk_vm_create
 from perfkitbenchmarker import custom_virtual_machine_spec
 from perfkitbenchmarker import disk
 from perfkitbenchmarker import errors
@@ -43,6 +46,7 @@ from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import linux_virtual_machine as linux_vm
 from perfkitbenchmarker import placement_group
 from perfkitbenchmarker import resource
+from perfkitbenchmarker import status_poller
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker import windows_virtual_machine
@@ -66,6 +70,9 @@ _INSUFFICIENT_HOST_CAPACITY = ('does not have enough resources available '
 _FAILED_TO_START_DUE_TO_PREEMPTION = (
     'Instance failed to start due to preemption.')
 _GCE_VM_CREATE_TIMEOUT = 600
+# Stands in for the path of the sshKeys metadata file in the create commands
+# compared to find VMs that can be created in bulk.
+_BULK_SSH_KEYS_PATH = 'BULK_SSH_KEYS_PATH'
 _GCE_NVIDIA_GPU_PREFIX = 'nvidia-tesla-'
 _SHUTDOWN_SCRIPT = 'su "{user}" -c "echo | gsutil cp - {preempt_marker}"'
 _WINDOWS_SHUTDOWN_SCRIPT_PS1 = 'Write-Host | gsutil cp - {preempt_marker}'
@@ -344,6 +351,58 @@ def GenerateAcceleratorSpecString(accelerator_type, accelerator_count):
       accelerator_count)
 
 
+def _ListInstances(resource, names):
+  """Lists the instances with any of the given names.
+
+  Args:
+    resource: A GCE resource whose project and zone the instances are in.
+    names: List of instance names.
+
+  Returns:
+    A dict from the name of each instance found to its describe response.
+    Like a failed describe command, a failed list finds no instances.
+  """
+  list_cmd = util.GcloudCommand(resource, 'compute', 'instances', 'list')
+  list_cmd.flags['zones'] = list_cmd.flags.pop('zone')
+  list_cmd.flags['filter'] = 'name=(%s)' % ' '.join(names)
+  stdout, _, retcode = list_cmd.Issue(suppress_warning=True,
+                                      raise_on_failure=False)
+  if retcode:
+    return {}
+  try:
+    instances = json.loads(stdout)
+  except ValueError:
+    return {}
+  return {instance['name']: instance for instance in instances}
+
+
+def _BulkCreateInstances(create_cmd, vms):
+  """Creates VMs with one gcloud compute instances create command.
+
+  Args:
+    create_cmd: GcloudCommand creating the VMs, without the VM name and with
+      _BULK_SSH_KEYS_PATH as the path of the sshKeys metadata file.
+    vms: List of GceVirtualMachines to create.
+
+  Returns:
+    A dict from each VM to a tuple of the stderr and return code of the
+    command, and whether it was rate limited.
+  """
+  bulk_cmd = copy.deepcopy(create_cmd)
+  bulk_cmd.args.extend(vm.name for vm in vms)
+  with open(vms[0].ssh_public_key) as f:
+    public_key = f.read().rstrip('\n')
+  with vm_util.NamedTemporaryFile(mode='w', dir=vm_util.GetTempDir(),
+                                  prefix='key-metadata') as tf:
+    tf.write('%s:%s\n' % (vms[0].user_name, public_key))
+    tf.close()
+    bulk_cmd.flags['metadata-from-file'] = bulk_cmd.flags[
+        'metadata-from-file'].replace(_BULK_SSH_KEYS_PATH, tf.name)
+    _, stderr, retcode = bulk_cmd.Issue(timeout=_GCE_VM_CREATE_TIMEOUT,
+                                        raise_on_failure=False)
+  return {vm: (stderr, retcode, bulk_cmd.rate_limited) for vm in vms}
+
+
 class GceVirtualMachine(virtual_machine.BaseVirtualMachine):
   """Object representing a Google Compute Engine Virtual Machine."""
 
@@ -557,15 +616,27 @@ class GceVirtualMachine(virtual_machine.BaseVirtualMachine):
   def _Create(self):
     """Create a GCE VM instance."""
     num_hosts = len(self.host_list)
-    with open(self.ssh_public_key) as f:
-      public_key = f.read().rstrip('\n')
-    with vm_util.NamedTemporaryFile(mode='w', dir=vm_util.GetTempDir(),
-                                    prefix='key-metadata') as tf:
-      tf.write('%s:%s\n' % (self.user_name, public_key))
-      tf.close()
-      create_cmd = self._GenerateCreateCommand(tf.name)
-      _, stderr, retcode = create_cmd.Issue(timeout=_GCE_VM_CREATE_TIMEOUT,
-                                            raise_on_failure=False)
+    if (FLAGS.bulk_vm_create and not self.use_dedicated_host and
+        not self.preemptible):
+      # VMs whose commands only differ in their names are created by one
+      # command listing all of their names.
+      create_cmd = self._GenerateCreateCommand(_BULK_SSH_KEYS_PATH)
+      create_cmd.args.remove(self.name)
+      key = (tuple(create_cmd.GetCommand()), self.user_name,
+             self.ssh_public_key)
+      stderr, retcode, rate_limited = bulk_vm_create.Create(
+          self, key, functools.partial(_BulkCreateInstances, create_cmd))
+    else:
+      with open(self.ssh_public_key) as f:
+        public_key = f.read().rstrip('\n')
+      with vm_util.NamedTemporaryFile(mode='w', dir=vm_util.GetTempDir(),
+                                      prefix='key-metadata') as tf:
+        tf.write('%s:%s\n' % (self.user_name, public_key))
+        tf.close()
+        create_cmd = self._GenerateCreateCommand(tf.name)
+        _, stderr, retcode = create_cmd.Issue(timeout=_GCE_VM_CREATE_TIMEOUT,
+                                              raise_on_failure=False)
+      rate_limited = create_cmd.rate_limited
 
     if (self.use_dedicated_host and retcode and
         _INSUFFICIENT_HOST_CAPACITY in stderr):
@@ -593,7 +664,7 @@ class GceVirtualMachine(virtual_machine.BaseVirtualMachine):
           util.STOCKOUT_MESSAGE)
     util.CheckGcloudResponseKnownFailures(stderr, retcode)
     if retcode:
-      if (create_cmd.rate_limited and 'already exists' in stderr and
+      if (rate_limited and 'already exists' in stderr and
           FLAGS.retry_on_rate_limited):
         # Gcloud create commands may still create VMs despite being rate
         # limited.
@@ -658,14 +729,31 @@ class GceVirtualMachine(virtual_machine.BaseVirtualMachine):
     """Returns whether the ID and IP addresses still need to be set."""
     return not self.id or not self.internal_ip or not self.ip_address
 
+  def _GetPolledInstance(self):
+    """Returns the describe response of the instance, or None.
+
+    The lookup shares its list call with the lookups of other VMs in the zone
+    made at about the same time.
+    """
+    poller = status_poller.GetPoller(
+        (self.CLOUD, self.project, self.zone),
+        functools.partial(_ListInstances, self))
+    return poller.Get(self.name)
+
   @vm_util.Retry()
   def _PostCreate(self):
     """Get the instance's data."""
     if self._NeedsToParseDescribeResponse():
-      getinstance_cmd = util.GcloudCommand(self, 'compute', 'instances',
-                                           'describe', self.name)
-      stdout, _, _ = getinstance_cmd.Issue()
-      response = json.loads(stdout)
+      if FLAGS.batch_status_polls:
+        response = self._GetPolledInstance()
+        if not response:
+          raise errors.Resource.RetryableGetError(
+              'Instance %s not found.' % self.name)
+      else:
+        getinstance_cmd = util.GcloudCommand(self, 'compute', 'instances',
+                                             'describe', self.name)
+        stdout, _, _ = getinstance_cmd.Issue()
+        response = json.loads(stdout)
       self._ParseDescribeResponse(response)
     if not all((self.image, self.boot_disk_size, self.boot_disk_type)):
       getdisk_cmd = util.GcloudCommand(
@@ -688,14 +776,19 @@ class GceVirtualMachine(virtual_machine.BaseVirtualMachine):
 
   def _Exists(self):
     """Returns true if the VM exists."""
-    getinstance_cmd = util.GcloudCommand(self, 'compute', 'instances',
-                                         'describe', self.name)
-    stdout, _, _ = getinstance_cmd.Issue(suppress_warning=True,
-                                         raise_on_failure=False)
-    try:
-      response = json.loads(stdout)
-    except ValueError:
-      return False
+    if FLAGS.batch_status_polls:
+      response = self._GetPolledInstance()
+      if not response:
+        return False
+    else:
+      getinstance_cmd = util.GcloudCommand(self, 'compute', 'instances',
+                                           'describe', self.name)
+      stdout, _, _ = getinstance_cmd.Issue(suppress_warning=True,
+                                           raise_on_failure=False)
+      try:
+        response = json.loads(stdout)
+      except ValueError:
+        return False
     try:
       # The VM may exist before we can fully parse the describe response for the
       # IP address or ID of the VM. For example, if the VM has a status of
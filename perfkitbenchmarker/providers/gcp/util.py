@@ -19,6 +19,7 @@ import json
 import logging
 import re
 from absl import flags
+from perfkitbenchmarker import cli_cache
 from perfkitbenchmarker import context
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import virtual_machine
@@ -51,7 +52,7 @@ STOCKOUT_MESSAGE = ('Creation failed due to insufficient capacity indicating a '
 def GetDefaultProject():
   """Get the default project."""
   cmd = [FLAGS.gcloud_path, 'config', 'list', '--format=json']
-  stdout, _, _ = vm_util.IssueCommand(cmd)
+  stdout, _, _ = cli_cache.Call('gcp_config', vm_util.IssueCommand, cmd)
   result = json.loads(stdout)
   return result['core']['project']
 
@@ -60,7 +61,7 @@ def GetDefaultProject():
 def GetDefaultUser():
   """Get the default project."""
   cmd = [FLAGS.gcloud_path, 'config', 'list', '--format=json']
-  stdout, _, _ = vm_util.IssueCommand(cmd)
+  stdout, _, _ = cli_cache.Call('gcp_config', vm_util.IssueCommand, cmd)
   result = json.loads(stdout)
   return result['core']['account']
 
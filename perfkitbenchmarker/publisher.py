@@ -27,8 +27,10 @@ import json
 import logging
 import math
 import operator
+import os
 import pprint
 import sys
+import threading
 import time
 import uuid
 
@@ -36,6 +38,7 @@ from absl import flags
 from perfkitbenchmarker import events
 from perfkitbenchmarker import flag_util
 from perfkitbenchmarker import log_util
+from perfkitbenchmarker import results_warehouse
 from perfkitbenchmarker import version
 from perfkitbenchmarker import vm_util
 import six
@@ -128,10 +131,62 @@ flags.DEFINE_string(
     'influx_db_name', 'perfkit',
     'Name of Influx DB database that you wish to publish to or create')
 
+flags.DEFINE_string(
+    'results_db_path', None,
+    'A path to a SQLite database that samples are added to. The database is '
+    'created if it does not exist, and can be queried with '
+    '"python -m perfkitbenchmarker.results_warehouse".')
+
 flags.DEFINE_boolean(
     'record_log_publisher', True,
     'Whether to use the log publisher or not.')
 
+flags.DEFINE_integer(
+    'publish_batch_size', 5000,
+    'Maximum number of samples written to a sink in one request or write. '
+    'Applies to the JSON, Elasticsearch and InfluxDB publishers.',
+    lower_bound=1)
+flags.DEFINE_integer(
+    'publish_max_concurrency', 1,
+    'Maximum number of publishers publishing samples at the same time. By '
+    'default publishers run one after another.', lower_bound=1)
+flags.DEFINE_integer(
+    'publish_retries', 0,
+    'Number of times a failed batch is retried by the Elasticsearch and '
+    'InfluxDB publishers.', lower_bound=0)
+flags.DEFINE_integer(
+    'publish_retry_interval', 5,
+    'Maximum number of seconds between retries of a failed batch.',
+    lower_bound=0)
+flags.DEFINE_list(
+    'republish_run_uris', [],
+    'If set, only samples with one of these run_uris are republished from a '
+    'JSON file.')
+flags.DEFINE_list(
+    'republish_tests', [],
+    'If set, only samples of these tests are republished from a JSON file.')
+flags.DEFINE_list(
+    'republish_metrics', [],
+    'If set, only samples of these metrics are republished from a JSON file.')
+flags.DEFINE_float(
+    'republish_start_time', None,
+    'If set, only samples with a timestamp at or after this Unix time are '
+    'republished from a JSON file.')
+flags.DEFINE_float(
+    'republish_end_time', None,
+    'If set, only samples with a timestamp before this Unix time are '
+    'republished from a JSON file.')
+flags.DEFINE_integer(
+    'republish_block_size', 10000,
+    'Number of lines of a JSON file that are read and republished at a time.',
+    lower_bound=1)
+flags.DEFINE_boolean(
+    'republish_index', False,
+    'Whether republishing a JSON file uses a <file>.index sidecar file that '
+    'records the run_uris, tests, metrics and time range of each block of the '
+    'file, so that blocks without matching samples are skipped. The index is '
+    'created, or recreated if the file changed, while republishing.')
+
 DEFAULT_JSON_OUTPUT_NAME = 'perfkitbenchmarker_results.json'
 DEFAULT_CREDENTIALS_JSON = 'credentials.json'
 GCS_OBJECT_NAME_LENGTH = 20
@@ -142,6 +197,50 @@ GCS_OBJECT_NAME_LENGTH = 20
 # call PublishSamples using Publishers added via this method.
 EXTERNAL_PUBLISHERS = []
 
+# Paths of the output files written by publishers in this process. Later
+# writes to these files add to them instead of overwriting them, so that
+# samples published at different times all end up in the file exactly once.
+_written_paths = set()
+_written_paths_lock = threading.Lock()
+
+
+def _MarkWritten(path):
+  """Records that path is being written, returning whether it already was."""
+  with _written_paths_lock:
+    written = path in _written_paths
+    _written_paths.add(path)
+  return written
+
+
+# Queue that the samples of the benchmark task running in this process are
+# forwarded to instead of the configured publishers, if it runs in a child
+# process. See SetSampleQueue.
+_sample_queue = None
+
+
+def SetSampleQueue(sample_queue):
+  """Sets the queue that samples published in this process are forwarded to.
+
+  Args:
+    sample_queue: Queue read by the parent process, or None to publish to the
+      configured publishers.
+  """
+  global _sample_queue
+  _sample_queue = sample_queue
+
+
+def CreateSampleCollector():
+  """Returns a SampleCollector for the benchmark task running in this process.
+
+  If a queue was set with SetSampleQueue, the collector only forwards samples
+  to it, so that only the parent process writes to the configured publishers.
+  """
+  if _sample_queue is None:
+    return SampleCollector()
+  return SampleCollector(publishers=[QueuePublisher(_sample_queue)],
+                         publishers_from_flags=False,
+                         add_default_publishers=False)
+
 
 def PublishRunStageSamples(benchmark_spec, samples):
   """Publishes benchmark run-stage samples immediately.
@@ -160,11 +259,39 @@ def PublishRunStageSamples(benchmark_spec, samples):
   """
   events.samples_created.send(
       events.RUN_PHASE, benchmark_spec=benchmark_spec, samples=samples)
-  collector = SampleCollector()
+  collector = CreateSampleCollector()
   collector.AddSamples(samples, benchmark_spec.name, benchmark_spec)
   collector.PublishSamples()
 
 
+def _Batches(items, batch_size):
+  """Yields successive lists of at most batch_size items."""
+  iterator = iter(items)
+  batch = list(itertools.islice(iterator, batch_size))
+  while batch:
+    yield batch
+    batch = list(itertools.islice(iterator, batch_size))
+
+
+def _PublishWithRetries(func, *args, **kwargs):
+  """Calls func, retrying failures up to --publish_retries times.
+
+  Args:
+    func: function sending one batch of samples to a sink.
+    *args: arguments passed to func.
+    **kwargs: keyword arguments passed to func. 'retryable_exceptions' is
+        the tuple of exceptions to retry, defaulting to all exceptions.
+
+  Returns:
+    The return value of func.
+  """
+  retry = vm_util.Retry(
+      poll_interval=FLAGS.publish_retry_interval,
+      max_retries=FLAGS.publish_retries, timeout=-1,
+      retryable_exceptions=kwargs.pop('retryable_exceptions', None))
+  return retry(func)(*args, **kwargs)
+
+
 def GetLabelsFromDict(metadata):
   """Converts a metadata dictionary to a string of labels sorted by key.
 
@@ -181,7 +308,16 @@ def GetLabelsFromDict(metadata):
 
 
 class MetadataProvider(six.with_metaclass(abc.ABCMeta, object)):
-  """A provider of sample metadata."""
+  """A provider of sample metadata.
+
+  Attributes:
+    DEPENDS_ON_SAMPLE_METADATA: Whether the metadata added depends on the
+      metadata passed in. If False, AddMetadata only adds keys derived from the
+      benchmark spec, and SampleCollector computes them once per AddSamples
+      call rather than once per sample.
+  """
+
+  DEPENDS_ON_SAMPLE_METADATA = True
 
   @abc.abstractmethod
   def AddMetadata(self, metadata, benchmark_spec):
@@ -202,6 +338,8 @@ class MetadataProvider(six.with_metaclass(abc.ABCMeta, object)):
 class DefaultMetadataProvider(MetadataProvider):
   """Adds default metadata to samples."""
 
+  DEPENDS_ON_SAMPLE_METADATA = False
+
   def AddMetadata(self, metadata, benchmark_spec):
     metadata = metadata.copy()
     metadata['perfkitbenchmarker_version'] = version.VERSION
@@ -272,7 +410,8 @@ class SamplePublisher(six.with_metaclass(abc.ABCMeta, object)):
     overwritten.
 
     Args:
-      samples: list of dicts to publish.
+      samples: list of dicts to publish. Samples may share the same metadata
+          dict, so publishers must not modify it.
     """
     raise NotImplementedError()
 
@@ -281,7 +420,8 @@ class CSVPublisher(SamplePublisher):
   """Publisher which writes results in CSV format to a specified path.
 
   The default field names are written first, followed by all unique metadata
-  keys found in the data.
+  keys found in the data. If the file was already written in this process, its
+  rows are kept and the header extended with any new metadata keys.
   """
 
   _DEFAULT_FIELDS = ('timestamp', 'test', 'metric', 'value', 'unit',
@@ -294,14 +434,21 @@ class CSVPublisher(SamplePublisher):
 
   def PublishSamples(self, samples):
     samples = list(samples)
+    rows = []
+    if _MarkWritten(self._path):
+      with open(self._path) as fp:
+        rows = list(csv.DictReader(fp))
     # Union of all metadata keys.
     meta_keys = sorted(
-        set(key for sample in samples for key in sample['metadata']))
+        set(key for sample in samples for key in sample['metadata']).union(
+            key for row in rows for key in row).difference(
+                self._DEFAULT_FIELDS))
 
     logging.info('Writing CSV results to %s', self._path)
     with open(self._path, 'w') as fp:
       writer = csv.DictWriter(fp, list(self._DEFAULT_FIELDS) + meta_keys)
       writer.writeheader()
+      writer.writerows(rows)
 
       for sample in samples:
         d = {}
@@ -470,7 +617,8 @@ class NewlineDelimitedJSONPublisher(SamplePublisher):
 
   Attributes:
     file_path: string. Destination path to write samples.
-    mode: Open mode for 'file_path'. Set to 'a' to append.
+    mode: Open mode for 'file_path'. Set to 'a' to append. Once 'file_path'
+      has been written in this process, it is always appended to.
     collapse_labels: boolean. If true, collapse sample metadata.
   """
 
@@ -487,13 +635,44 @@ class NewlineDelimitedJSONPublisher(SamplePublisher):
   def PublishSamples(self, samples):
     logging.info('Publishing %d samples to %s', len(samples),
                  self.file_path)
-    with open(self.file_path, self.mode) as fp:
+    mode = self.mode
+    if _MarkWritten(self.file_path):
+      mode = mode.replace('w', 'a')
+    with open(self.file_path, mode) as fp:
       fcntl.flock(fp, fcntl.LOCK_EX)
-      for sample in samples:
-        sample = sample.copy()
-        if self.collapse_labels:
-          sample['labels'] = GetLabelsFromDict(sample.pop('metadata', {}))
-        fp.write(json.dumps(sample) + '\n')
+      # Samples are serialized and written a batch at a time so that the
+      # whole file is never held in memory.
+      for batch in _Batches(samples, FLAGS.publish_batch_size):
+        lines = []
+        for sample in batch:
+          sample = sample.copy()
+          if self.collapse_labels:
+            sample['labels'] = GetLabelsFromDict(sample.pop('metadata', {}))
+          lines.append(json.dumps(sample) + '\n')
+        fp.write(''.join(lines))
+
+
+class SQLitePublisher(SamplePublisher):
+  """Adds samples to a local SQLite results database.
+
+  See results_warehouse for the schema and a CLI to query the database.
+
+  Attributes:
+    db_path: string. Path of the database file.
+  """
+
+  def __init__(self, db_path):
+    super().__init__()
+    self.db_path = db_path
+
+  def __repr__(self):
+    return '<{0} db_path="{1}">'.format(type(self).__name__, self.db_path)
+
+  def PublishSamples(self, samples):
+    logging.info('Publishing %d samples to %s', len(samples), self.db_path)
+    with results_warehouse.Warehouse(self.db_path) as warehouse:
+      for batch in _Batches(samples, FLAGS.publish_batch_size):
+        warehouse.AddSamples(batch)
 
 
 class BigQueryPublisher(SamplePublisher):
@@ -683,6 +862,7 @@ class ElasticsearchPublisher(SamplePublisher):
     """Publish samples to Elasticsearch service."""
     try:
       from elasticsearch import Elasticsearch
+      from elasticsearch import helpers
     except ImportError:
       raise ImportError('The "elasticsearch" package is required to use '
                         'the Elasticsearch publisher. Please make sure it '
@@ -702,18 +882,26 @@ class ElasticsearchPublisher(SamplePublisher):
         logging.info('Create index %s and default mappings for'
                      ' elasticsearch version < 5.0.0',
                      self.es_index)
-    for s in samples:
-      sample = copy.deepcopy(s)
-      # Make timestamp understandable by ES and human.
-      sample['timestamp'] = self._FormatTimestampForElasticsearch(
-          sample['timestamp']
-      )
-      # Keys cannot have dots for ES
-      sample = self._deDotKeys(sample)
-      # Add sample to the "perfkit index" of "result type" and using sample_uri
-      # as each ES's document's unique _id
-      es.create(index=self.es_index, doc_type=self.es_type,
-                id=sample['sample_uri'], body=json.dumps(sample))
+    for batch in _Batches(samples, FLAGS.publish_batch_size):
+      # Documents are indexed rather than created under their sample_uri so
+      # that a retried batch overwrites the documents it already wrote.
+      actions = [{
+          '_op_type': 'index',
+          '_index': self.es_index,
+          '_type': self.es_type,
+          '_id': sample['sample_uri'],
+          '_source': self._FormatSample(sample),
+      } for sample in batch]
+      _PublishWithRetries(helpers.bulk, es, actions)
+
+  def _FormatSample(self, s):
+    sample = copy.deepcopy(s)
+    # Make timestamp understandable by ES and human.
+    sample['timestamp'] = self._FormatTimestampForElasticsearch(
+        sample['timestamp']
+    )
+    # Keys cannot have dots for ES
+    return self._deDotKeys(sample)
 
   def _FormatTimestampForElasticsearch(self, epoch_us):
     """Convert the floating epoch timestamp in micro seconds epoch_us to
@@ -726,7 +914,7 @@ class ElasticsearchPublisher(SamplePublisher):
 
   def _deDotKeys(self, res):
     """Recursively replace dot with underscore in all keys in a dictionary."""
-    for key, value in res.items():
+    for key, value in list(res.items()):
       if isinstance(value, dict):
         self._deDotKeys(value)
       new_key = key.replace('.', '_')
@@ -761,13 +949,17 @@ class InfluxDBPublisher(SamplePublisher):
   def _Publish(self, formated_samples):
     try:
       self._CreateDB()
-      body = '\n'.join(formated_samples)
-      self._WriteData(body)
+      for batch in _Batches(formated_samples, FLAGS.publish_batch_size):
+        _PublishWithRetries(
+            self._WriteData, '\n'.join(batch),
+            retryable_exceptions=(IOError, httplib.HTTPException))
     except (IOError, httplib.HTTPException) as http_exception:
       logging.error('Error connecting to the database:  %s', http_exception)
 
   def _ConstructSample(self, sample):
-    sample['product_name'] = FLAGS.product_name
+    # Samples may be shared with publishers running concurrently, so the
+    # product name is overridden in a copy.
+    sample = dict(sample, product_name=FLAGS.product_name)
     timestamp = str(int((10 ** 9) * sample['timestamp']))
     measurement = 'perfkitbenchmarker'
 
@@ -836,6 +1028,27 @@ class InfluxDBPublisher(SamplePublisher):
       raise httplib.HTTPException
 
 
+class QueuePublisher(SamplePublisher):
+  """Forwards samples to a queue read by another SampleCollector.
+
+  Used to hand samples from benchmarks run in child processes to the parent
+  process as they are published, so that only the parent writes to sinks.
+
+  Attributes:
+    sample_queue: Queue to put each published list of samples on.
+  """
+
+  def __init__(self, sample_queue):
+    super().__init__()
+    self.sample_queue = sample_queue
+
+  def __repr__(self):
+    return '<{0}>'.format(type(self).__name__)
+
+  def PublishSamples(self, samples):
+    self.sample_queue.put(list(samples))
+
+
 class SampleCollector(object):
   """A performance sample collector.
 
@@ -849,6 +1062,8 @@ class SampleCollector(object):
     publishers: A list of SamplePublisher objects to publish to.
     publishers_from_flags: If True, construct publishers based on FLAGS and add
       those to the publishers list.
+    publish_latencies: A dict from publisher to a list of the number of
+      seconds each of its PublishSamples calls took.
     add_default_publishers: If True, add a LogPublisher,
       PrettyPrintStreamPublisher, and NewlineDelimitedJSONPublisher targeting
       the run directory to the publishers list.
@@ -858,6 +1073,7 @@ class SampleCollector(object):
   def __init__(self, metadata_providers=None, publishers=None,
                publishers_from_flags=True, add_default_publishers=True):
     self.samples = []
+    self.publish_latencies = collections.defaultdict(list)
 
     if metadata_providers is not None:
       self.metadata_providers = metadata_providers
@@ -902,6 +1118,9 @@ class SampleCollector(object):
           mode=FLAGS.json_write_mode,
           collapse_labels=FLAGS.collapse_labels))
 
+    if FLAGS.results_db_path:
+      publishers.append(SQLitePublisher(FLAGS.results_db_path))
+
     if FLAGS.bigquery_table:
       publishers.append(BigQueryPublisher(
           FLAGS.bigquery_table,
@@ -926,6 +1145,41 @@ class SampleCollector(object):
 
     return publishers
 
+  def _GetMetadataFunction(self, benchmark_spec):
+    """Returns a function applying the metadata providers to sample metadata.
+
+    Providers that do not depend on the sample metadata are evaluated once,
+    here. The returned function evaluates the rest once per distinct metadata
+    object, and returns the same dict for samples that shared their metadata.
+    Those dicts must not be modified.
+
+    Args:
+      benchmark_spec: BenchmarkSpec. Benchmark specification.
+    """
+    providers = [
+        (provider, None if provider.DEPENDS_ON_SAMPLE_METADATA else
+         provider.AddMetadata({}, benchmark_spec))
+        for provider in self.metadata_providers]
+    # Maps the id of the sample metadata to (sample metadata, result). The
+    # sample metadata is kept so that its id is not reused.
+    interned = {}
+
+    def _AddMetadata(metadata):
+      key = id(metadata) if metadata else None
+      if key in interned:
+        return interned[key][1]
+      result = metadata
+      for provider, spec_metadata in providers:
+        if spec_metadata is None:
+          result = provider.AddMetadata(result, benchmark_spec)
+        else:
+          result = result.copy()
+          result.update(spec_metadata)
+      interned[key] = (metadata, result)
+      return result
+
+    return _AddMetadata
+
   def AddSamples(self, samples, benchmark, benchmark_spec):
     """Adds data samples to the publisher.
 
@@ -934,20 +1188,26 @@ class SampleCollector(object):
       benchmark: string. The name of the benchmark.
       benchmark_spec: BenchmarkSpec. Benchmark specification.
     """
-    for s in samples:
+    samples = list(samples)
+    add_metadata = self._GetMetadataFunction(benchmark_spec)
+    product_name = FLAGS.product_name
+    official = FLAGS.official
+    owner = FLAGS.owner
+    run_uri = benchmark_spec.uuid
+    # One read of random bytes for all sample_uris, which are otherwise the
+    # same as uuid.uuid4().
+    random_bytes = os.urandom(16 * len(samples))
+    for i, s in enumerate(samples):
       # Annotate the sample.
-      sample = dict(s.asdict())
+      sample = s.asdict()
+      sample['metadata'] = add_metadata(sample['metadata'])
       sample['test'] = benchmark
-
-      for meta_provider in self.metadata_providers:
-        sample['metadata'] = meta_provider.AddMetadata(
-            sample['metadata'], benchmark_spec)
-
-      sample['product_name'] = FLAGS.product_name
-      sample['official'] = FLAGS.official
-      sample['owner'] = FLAGS.owner
-      sample['run_uri'] = benchmark_spec.uuid
-      sample['sample_uri'] = str(uuid.uuid4())
+      sample['product_name'] = product_name
+      sample['official'] = official
+      sample['owner'] = owner
+      sample['run_uri'] = run_uri
+      sample['sample_uri'] = str(
+          uuid.UUID(bytes=random_bytes[16 * i:16 * i + 16], version=4))
       self.samples.append(sample)
 
   def PublishSamples(self):
@@ -955,32 +1215,197 @@ class SampleCollector(object):
     if not self.samples:
       logging.warn('No samples to publish.')
       return
-    for publisher in self.publishers:
-      publisher.PublishSamples(self.samples)
-    self.samples = []
+    # Samples are offered to every publisher even if one of them fails, and
+    # are dropped afterwards so that they are never published twice.
+    try:
+      if FLAGS.publish_max_concurrency == 1:
+        error = None
+        for publisher in self.publishers:
+          try:
+            self._PublishTo(publisher, self.samples)
+          except Exception as e:  # pylint: disable=broad-except
+            logging.exception('Failed publishing samples via %r.', publisher)
+            error = error or e
+        if error:
+          raise error
+      else:
+        vm_util.RunThreaded(
+            self._PublishTo,
+            [((p, self.samples), {}) for p in self.publishers],
+            max_concurrent_threads=FLAGS.publish_max_concurrency)
+    finally:
+      self.samples = []
+
+  def _PublishTo(self, publisher, samples):
+    """Publishes samples via publisher, recording how long it took."""
+    start_time = time.time()
+    publisher.PublishSamples(samples)
+    latency = time.time() - start_time
+    self.publish_latencies[publisher].append(latency)
+    logging.info('Published %d samples via %r in %.3f seconds.', len(samples),
+                 publisher, latency)
+
+
+class _SampleFilter(object):
+  """Selects samples to republish by run_uri, test, metric and time."""
+
+  def __init__(self, run_uris=(), tests=(), metrics=(), start_time=None,
+               end_time=None):
+    self.run_uris = frozenset(run_uris)
+    self.tests = frozenset(tests)
+    self.metrics = frozenset(metrics)
+    self.start_time = start_time
+    self.end_time = end_time
+
+  @classmethod
+  def FromFlags(cls):
+    return cls(FLAGS.republish_run_uris, FLAGS.republish_tests,
+               FLAGS.republish_metrics, FLAGS.republish_start_time,
+               FLAGS.republish_end_time)
+
+  def MatchesBlock(self, block):
+    """Returns whether a block of the index may hold matching samples."""
+    if self.run_uris and self.run_uris.isdisjoint(block['run_uris']):
+      return False
+    if self.tests and self.tests.isdisjoint(block['tests']):
+      return False
+    if self.metrics and self.metrics.isdisjoint(block['metrics']):
+      return False
+    if (self.start_time is not None and
+        block['max_timestamp'] < self.start_time):
+      return False
+    return self.end_time is None or block['min_timestamp'] < self.end_time
+
+  def Matches(self, sample):
+    return ((not self.run_uris or sample.get('run_uri') in self.run_uris) and
+            (not self.tests or sample.get('test') in self.tests) and
+            (not self.metrics or sample.get('metric') in self.metrics) and
+            (self.start_time is None or
+             sample['timestamp'] >= self.start_time) and
+            (self.end_time is None or sample['timestamp'] < self.end_time))
+
+
+def _ParseLabels(labels):
+  """Converts labels made by GetLabelsFromDict back to a metadata dict."""
+  if not labels:
+    return {}
+  # Chop '|' at the beginning and end of labels and split labels by '|,|'
+  return dict(field.split(':', 1) for field in labels[1:-1].split('|,|'))
+
+
+def _ParseJSONLines(lines):
+  """Parses a list of JSON lines, in bytes, in a single call."""
+  lines = [line for line in lines if line.strip()]
+  if not lines:
+    return []
+  return json.loads(b'[' + b','.join(lines) + b']')
+
+
+def _SummarizeBlock(offset, length, samples):
+  """Returns the index entry of a block of a JSON file."""
+  timestamps = [sample['timestamp'] for sample in samples] or [0]
+  return {
+      'offset': offset,
+      'length': length,
+      'run_uris': sorted(set(sample.get('run_uri', '') for sample in samples)),
+      'tests': sorted(set(sample.get('test', '') for sample in samples)),
+      'metrics': sorted(set(sample.get('metric', '') for sample in samples)),
+      'min_timestamp': min(timestamps),
+      'max_timestamp': max(timestamps),
+  }
+
+
+def _LoadIndex(path):
+  """Returns the blocks of the index of path, or None if it is not usable."""
+  try:
+    with open(path + '.index') as fp:
+      index = json.load(fp)
+  except (IOError, ValueError):
+    return None
+  stat = os.stat(path)
+  if (index.get('size') != stat.st_size or
+      index.get('mtime') != stat.st_mtime or
+      index.get('block_size') != FLAGS.republish_block_size):
+    return None
+  return index['blocks']
+
+
+def _WriteIndex(path, blocks):
+  stat = os.stat(path)
+  with open(path + '.index', 'w') as fp:
+    json.dump({'size': stat.st_size, 'mtime': stat.st_mtime,
+               'block_size': FLAGS.republish_block_size, 'blocks': blocks}, fp)
+
+
+def _ReadJSONSampleBlocks(path, sample_filter):
+  """Yields the samples of each block of a JSON file that may match.
+
+  Args:
+    path: the path to the JSON file.
+    sample_filter: _SampleFilter used to skip blocks when an index is used.
+
+  Yields:
+    Lists of sample dicts as written by NewlineDelimitedJSONPublisher.
+  """
+  blocks = _LoadIndex(path) if FLAGS.republish_index else None
+  with open(path, 'rb') as fp:
+    if blocks is not None:
+      for block in blocks:
+        if sample_filter.MatchesBlock(block):
+          fp.seek(block['offset'])
+          yield _ParseJSONLines(fp.read(block['length']).splitlines())
+      return
+    new_blocks = []
+    offset = 0
+    while True:
+      lines = list(itertools.islice(fp, FLAGS.republish_block_size))
+      if not lines:
+        break
+      length = sum(len(line) for line in lines)
+      samples = _ParseJSONLines(lines)
+      if FLAGS.republish_index:
+        new_blocks.append(_SummarizeBlock(offset, length, samples))
+      offset += length
+      yield samples
+  if FLAGS.republish_index:
+    _WriteIndex(path, new_blocks)
 
 
 def RepublishJSONSamples(path):
   """Read samples from a JSON file and re-export them.
 
+  The file is read a block at a time. Samples not selected by the
+  --republish_* flags, and samples whose sample_uri was already republished,
+  are skipped.
+
   Args:
     path: the path to the JSON file.
-  """
 
-  with open(path, 'r') as file:
-    samples = [json.loads(s) for s in file if s]
-  for sample in samples:
-    # Chop '|' at the beginning and end of labels and split labels by '|,|'
-    fields = sample.pop('labels')[1:-1].split('|,|')
-    # Turn the fields into [[key, value], ...]
-    key_values = [field.split(':', 1) for field in fields]
-    sample['metadata'] = {k: v for k, v in key_values}
-
-  # We can't use a SampleCollector because SampleCollector.AddSamples depends on
-  # having a benchmark and a benchmark_spec.
-  publishers = SampleCollector._PublishersFromFlags()
-  for publisher in publishers:
-    publisher.PublishSamples(samples)
+  Returns:
+    The number of samples republished.
+  """
+  sample_filter = _SampleFilter.FromFlags()
+  # We can't use SampleCollector.AddSamples because it depends on having a
+  # benchmark and a benchmark_spec, but the collector can publish.
+  collector = SampleCollector(publishers_from_flags=False,
+                              add_default_publishers=False)
+  collector.publishers = SampleCollector._PublishersFromFlags()
+  seen_sample_uris = set()
+  count = 0
+  for samples in _ReadJSONSampleBlocks(path, sample_filter):
+    for sample in samples:
+      sample_uri = sample.get('sample_uri')
+      if sample_uri in seen_sample_uris or not sample_filter.Matches(sample):
+        continue
+      if sample_uri:
+        seen_sample_uris.add(sample_uri)
+      if 'labels' in sample:
+        sample['metadata'] = _ParseLabels(sample.pop('labels'))
+      collector.samples.append(sample)
+    count += len(collector.samples)
+    if collector.samples:
+      collector.PublishSamples()
+  return count
 
 
 if __name__ == '__main__':
@@ -243,6 +243,15 @@ class BaseRelationalDb(resource.BaseResource):
   def server_vm(self, server_vm):
     self._server_vm = server_vm
 
+  @property
+  def create_depends_on_vms(self):
+    """Whether Create must wait until the benchmark's VMs have been created.
+
+    Unmanaged databases are installed on the server VM, and managed databases
+    usually authorize the client VM's IP address when they are created.
+    """
+    return True
+
   def SetVms(self, vm_groups):
     self.client_vm = vm_groups['clients' if 'clients' in
                                vm_groups else 'default'][0]
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+
+# Copyright 2026 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A local SQLite store of PKB samples, and a CLI to query it.
+
+Samples are appended to a single table indexed on metric, test, run_uri and
+timestamp. Sample metadata is stored once per distinct metadata dict, so the
+store stays compact when many samples share their metadata.
+
+Example usage:
+  python -m perfkitbenchmarker.results_warehouse results.db summary \\
+      --metrics=Throughput --by_run
+  python -m perfkitbenchmarker.results_warehouse results.db compare \\
+      --baseline=run1 --candidate=run2 --threshold=5
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import operator
+import sqlite3
+import sys
+
+from perfkitbenchmarker import sample as sample_lib
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+  id INTEGER PRIMARY KEY,
+  digest TEXT NOT NULL UNIQUE,
+  json TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS samples (
+  id INTEGER PRIMARY KEY,
+  sample_uri TEXT UNIQUE,
+  run_uri TEXT,
+  test TEXT,
+  metric TEXT,
+  value REAL,
+  unit TEXT,
+  timestamp REAL,
+  product_name TEXT,
+  owner TEXT,
+  official INTEGER,
+  metadata_id INTEGER REFERENCES metadata (id)
+);
+CREATE INDEX IF NOT EXISTS samples_metric
+  ON samples (metric, test, timestamp);
+CREATE INDEX IF NOT EXISTS samples_test ON samples (test, timestamp);
+CREATE INDEX IF NOT EXISTS samples_run_uri ON samples (run_uri);
+CREATE INDEX IF NOT EXISTS samples_timestamp ON samples (timestamp);
+"""
+
+_SAMPLE_COLUMNS = ('sample_uri', 'run_uri', 'test', 'metric', 'value', 'unit',
+                   'timestamp', 'product_name', 'owner', 'official')
+
+SUMMARY_PERCENTILES = (50, 90, 99)
+
+
+class Warehouse(object):
+  """A SQLite database of samples.
+
+  Attributes:
+    path: The path of the database file.
+  """
+
+  def __init__(self, path):
+    self.path = path
+    self._connection = sqlite3.connect(path)
+    self._connection.execute('PRAGMA journal_mode=WAL')
+    self._connection.execute('PRAGMA synchronous=NORMAL')
+    self._connection.executescript(_SCHEMA)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *unused_args):
+    self.Close()
+
+  def Close(self):
+    self._connection.close()
+
+  def _GetMetadataId(self, metadata):
+    """Returns the id of the metadata row for a metadata dict, adding it."""
+    text = json.dumps(metadata, sort_keys=True, default=str)
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+    self._connection.execute(
+        'INSERT OR IGNORE INTO metadata (digest, json) VALUES (?, ?)',
+        (digest, text))
+    return self._connection.execute(
+        'SELECT id FROM metadata WHERE digest = ?', (digest,)).fetchone()[0]
+
+  def AddSamples(self, samples):
+    """Adds samples in one transaction.
+
+    Samples whose sample_uri is already stored are skipped, so publishing the
+    same samples again does not duplicate them.
+
+    Args:
+      samples: A list of sample dicts, as published by a SampleCollector.
+
+    Returns:
+      The number of samples added.
+    """
+    # Samples often share their metadata dict, so each distinct dict is only
+    # serialized once. The samples list keeps the dicts, and their ids, alive.
+    metadata_ids = {}
+    rows = []
+    with self._connection:
+      for sample in samples:
+        metadata = sample.get('metadata') or {}
+        key = id(metadata)
+        if key not in metadata_ids:
+          metadata_ids[key] = self._GetMetadataId(metadata)
+        rows.append(tuple(sample.get(column) for column in _SAMPLE_COLUMNS) +
+                    (metadata_ids[key],))
+      query = 'INSERT OR IGNORE INTO samples ({0}, metadata_id) VALUES ({1})'
+      cursor = self._connection.executemany(
+          query.format(', '.join(_SAMPLE_COLUMNS),
+                       ', '.join('?' * (len(_SAMPLE_COLUMNS) + 1))),
+          rows)
+    return cursor.rowcount
+
+  def _Select(self, columns, metrics=None, tests=None, run_uris=None,
+              start_time=None, end_time=None, order_by=None):
+    """Yields rows of the selected columns of matching samples."""
+    conditions = []
+    parameters = []
+    for column, values in (('metric', metrics), ('test', tests),
+                           ('run_uri', run_uris)):
+      if values:
+        conditions.append('{0} IN ({1})'.format(
+            column, ', '.join('?' * len(values))))
+        parameters.extend(values)
+    if start_time is not None:
+      conditions.append('timestamp >= ?')
+      parameters.append(start_time)
+    if end_time is not None:
+      conditions.append('timestamp < ?')
+      parameters.append(end_time)
+    query = 'SELECT {0} FROM samples'.format(', '.join(columns))
+    if conditions:
+      query += ' WHERE ' + ' AND '.join(conditions)
+    if order_by:
+      query += ' ORDER BY ' + ', '.join(order_by)
+    return self._connection.execute(query, parameters)
+
+  def GetSamples(self, **filters):
+    """Yields matching samples as dicts, in the order they were added.
+
+    Args:
+      **filters: Keyword arguments restricting the samples: metrics, tests and
+        run_uris are lists of accepted values, and start_time and end_time
+        bound the timestamp.
+    """
+    columns = ['samples.' + column for column in _SAMPLE_COLUMNS]
+    rows = self._Select(columns + ['metadata_id'], order_by=['samples.id'],
+                        **filters)
+    metadata = {}
+    for row in rows:
+      metadata_id = row[-1]
+      if metadata_id not in metadata:
+        metadata[metadata_id] = json.loads(self._connection.execute(
+            'SELECT json FROM metadata WHERE id = ?',
+            (metadata_id,)).fetchone()[0])
+      result = dict(zip(_SAMPLE_COLUMNS, row))
+      result['metadata'] = metadata[metadata_id]
+      yield result
+
+  def Summarize(self, by_run=False, percentiles=SUMMARY_PERCENTILES,
+                **filters):
+    """Summarizes the values of matching samples.
+
+    Args:
+      by_run: If True, summarize each run separately.
+      percentiles: The percentiles to compute.
+      **filters: Restrict the samples, as for GetSamples.
+
+    Returns:
+      A list of dicts, one per test, metric, unit and, if by_run is True,
+      run_uri, with the count, min, max, average, stddev and percentiles of
+      their values.
+    """
+    keys = ['test', 'metric', 'unit'] + (['run_uri'] if by_run else [])
+    rows = self._Select(keys + ['value'], order_by=keys, **filters)
+    summaries = []
+    group_key = operator.itemgetter(slice(0, len(keys)))
+    for group, group_rows in itertools.groupby(rows, key=group_key):
+      values = [row[-1] for row in group_rows]
+      summary = dict(zip(keys, group))
+      summary['count'] = len(values)
+      summary['min'] = min(values)
+      summary['max'] = max(values)
+      summary.update(sample_lib.PercentileCalculator(values, percentiles))
+      summaries.append(summary)
+    return summaries
+
+  def Compare(self, baseline_run_uris, candidate_run_uris, threshold=0.0,
+              **filters):
+    """Compares the median value of each metric between sets of runs.
+
+    Args:
+      baseline_run_uris: List of run_uris making up the baseline.
+      candidate_run_uris: List of run_uris compared against the baseline.
+      threshold: Only changes of at least this many percent are returned.
+      **filters: Restrict the samples, as for GetSamples, except for run_uris.
+
+    Returns:
+      A list of dicts, one per test, metric and unit present in both the
+      baseline and candidate runs, with the baseline and candidate medians and
+      the change in percent, sorted by decreasing absolute change.
+    """
+    medians = []
+    for run_uris in (baseline_run_uris, candidate_run_uris):
+      medians.append({
+          (s['test'], s['metric'], s['unit']): s['p50']
+          for s in self.Summarize(run_uris=run_uris, percentiles=(50,),
+                                  **filters)})
+    baseline, candidate = medians
+    changes = []
+    for key in sorted(set(baseline) & set(candidate)):
+      if baseline[key]:
+        change = 100.0 * (candidate[key] - baseline[key]) / abs(baseline[key])
+      elif candidate[key]:
+        change = float('inf')
+      else:
+        change = 0.0
+      if abs(change) >= threshold:
+        changes.append(dict(zip(('test', 'metric', 'unit'), key),
+                            baseline=baseline[key], candidate=candidate[key],
+                            change=change))
+    changes.sort(key=lambda c: -abs(c['change']))
+    return changes
+
+
+def _FormatTable(rows, columns, output):
+  """Writes rows of dicts as a table with aligned columns."""
+  cells = [columns] + [
+      ['%.6g' % row[c] if isinstance(row[c], float) else str(row[c])
+       for c in columns] for row in rows]
+  widths = [max(len(row[i]) for row in cells) for i in range(len(columns))]
+  for row in cells:
+    output.write('  '.join(
+        cell.ljust(width) for cell, width in zip(row, widths)).rstrip() + '\n')
+
+
+def _ParseList(value):
+  return [item for item in value.split(',') if item]
+
+
+def _ParsePercentiles(value):
+  return [float(p) if '.' in p else int(p) for p in _ParseList(value)]
+
+
+def main(argv=None, output=sys.stdout):
+  parser = argparse.ArgumentParser(
+      description='Query a results database written by --results_db_path.')
+  parser.add_argument('database', help='Path of the results database.')
+  subparsers = parser.add_subparsers(dest='command')
+  subparsers.required = True
+  summary_parser = subparsers.add_parser(
+      'summary', help='Percentiles of the values of each metric.')
+  summary_parser.add_argument(
+      '--by_run', action='store_true', help='Summarize each run separately.')
+  summary_parser.add_argument(
+      '--percentiles', type=_ParsePercentiles,
+      default=list(SUMMARY_PERCENTILES),
+      help='Comma separated percentiles to compute.')
+  summary_parser.add_argument(
+      '--run_uris', type=_ParseList, help='Comma separated run_uris.')
+  compare_parser = subparsers.add_parser(
+      'compare', help='Change of the median of each metric between runs.')
+  compare_parser.add_argument(
+      '--baseline', type=_ParseList, required=True,
+      help='Comma separated run_uris of the baseline.')
+  compare_parser.add_argument(
+      '--candidate', type=_ParseList, required=True,
+      help='Comma separated run_uris compared against the baseline.')
+  compare_parser.add_argument(
+      '--threshold', type=float, default=0.0,
+      help='Only show changes of at least this many percent.')
+  export_parser = subparsers.add_parser(
+      'export', help='Write samples as newline delimited JSON.')
+  export_parser.add_argument(
+      '--run_uris', type=_ParseList, help='Comma separated run_uris.')
+  for subparser in (summary_parser, compare_parser, export_parser):
+    subparser.add_argument(
+        '--metrics', type=_ParseList, help='Comma separated metrics.')
+    subparser.add_argument(
+        '--tests', type=_ParseList, help='Comma separated tests.')
+    subparser.add_argument(
+        '--start_time', type=float,
+        help='Only include samples at or after this Unix time.')
+    subparser.add_argument(
+        '--end_time', type=float,
+        help='Only include samples before this Unix time.')
+  args = parser.parse_args(argv)
+
+  filters = {'metrics': args.metrics, 'tests': args.tests,
+             'start_time': args.start_time, 'end_time': args.end_time}
+  with Warehouse(args.database) as warehouse:
+    if args.command == 'summary':
+      summaries = warehouse.Summarize(
+          by_run=args.by_run, percentiles=args.percentiles,
+          run_uris=args.run_uris, **filters)
+      columns = (['test', 'metric', 'unit'] +
+                 (['run_uri'] if args.by_run else []) +
+                 ['count', 'min', 'average', 'stddev'] +
+                 ['p%s' % p for p in args.percentiles] + ['max'])
+      _FormatTable(summaries, columns, output)
+    elif args.command == 'compare':
+      changes = warehouse.Compare(args.baseline, args.candidate,
+                                  threshold=args.threshold, **filters)
+      _FormatTable(changes, ['test', 'metric', 'unit', 'baseline',
+                             'candidate', 'change'], output)
+    else:
+      for sample in warehouse.GetSamples(run_uris=args.run_uris, **filters):
+        output.write(json.dumps(sample) + '\n')
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -21,9 +21,30 @@ PERCENTILES_LIST = 0.1, 1, 5, 10, 50, 90, 95, 99, 99.9
 _SAMPLE_FIELDS = 'metric', 'value', 'unit', 'metadata', 'timestamp'
 
 
+# Inputs with at least this many numbers are summarized with NumPy.
+_VECTORIZE_MIN_SIZE = 1000
+
+
+def _CheckPercentile(percentile):
+  float(percentile)  # verify type
+  if percentile < 0.0 or percentile > 100.0:
+    raise ValueError('Invalid percentile %s' % percentile)
+
+
+def _GetPercentileIndex(count, percentile):
+  """Returns the index of a percentile in a sorted list of count numbers."""
+  index = int(count * float(percentile) / 100.0)
+  return min(index, count - 1)  # Correction to handle 100th percentile.
+
+
 def PercentileCalculator(numbers, percentiles=PERCENTILES_LIST):
   """Computes percentiles, stddev and mean on a set of numbers.
 
+  NumPy arrays, and sequences of at least _VECTORIZE_MIN_SIZE numbers, are
+  summarized with NumPy. Percentiles are the same as for the pure Python path,
+  while the average and stddev may differ in the last few bits because NumPy
+  sums in a different order.
+
   Args:
     numbers: A sequence of numbers to compute percentiles for.
     percentiles: If given, a list of percentiles to compute. Can be
@@ -42,19 +63,20 @@ def PercentileCalculator(numbers, percentiles=PERCENTILES_LIST):
   if not len(numbers):
     raise ValueError("Can't compute percentiles of empty list.")
 
+  if isinstance(numbers, np.ndarray) or len(numbers) >= _VECTORIZE_MIN_SIZE:
+    array = np.asarray(numbers)
+    if array.dtype.kind in 'iuf':
+      return _VectorizedPercentileCalculator(array.ravel(), percentiles)
+
   numbers_sorted = sorted(numbers)
   count = len(numbers_sorted)
   total = sum(numbers_sorted)
   result = {}
   for percentile in percentiles:
-    float(percentile)  # verify type
-    if percentile < 0.0 or percentile > 100.0:
-      raise ValueError('Invalid percentile %s' % percentile)
-
+    _CheckPercentile(percentile)
     percentile_string = 'p%s' % str(percentile)
-    index = int(count * float(percentile) / 100.0)
-    index = min(index, count - 1)  # Correction to handle 100th percentile.
-    result[percentile_string] = numbers_sorted[index]
+    result[percentile_string] = numbers_sorted[_GetPercentileIndex(
+        count, percentile)]
 
   average = total / float(count)
   result['average'] = average
@@ -67,6 +89,203 @@ def PercentileCalculator(numbers, percentiles=PERCENTILES_LIST):
   return result
 
 
+def _VectorizedPercentileCalculator(array, percentiles):
+  """PercentileCalculator for a non-empty 1-D numeric NumPy array."""
+  count = array.size
+  for percentile in percentiles:
+    _CheckPercentile(percentile)
+  indices = {percentile: _GetPercentileIndex(count, percentile)
+             for percentile in percentiles}
+  result = {}
+  if indices:
+    # Partitioning around the needed indices avoids a full sort.
+    partitioned = np.partition(array, sorted(set(indices.values())))
+    for percentile, index in indices.items():
+      result['p%s' % str(percentile)] = partitioned[index].item()
+  average = float(array.sum(dtype=np.float64)) / count
+  result['average'] = average
+  if count > 1:
+    result['stddev'] = float(np.std(array, dtype=np.float64, ddof=1))
+  else:
+    result['stddev'] = 0
+  return result
+
+
+class PercentileSketch(object):
+  """Mergeable, fixed relative error summary of a stream of numbers.
+
+  Numbers are counted in logarithmically sized buckets, so the memory used
+  grows with the log of the range of the numbers rather than with how many
+  there are. Sketches built from parts of a data set, e.g. by different
+  workers, can be merged into a sketch of the whole.
+
+  Error bound: a percentile returned by GetPercentiles is within
+  relative_accuracy * |v| of the value v that PercentileCalculator returns for
+  the same percentile of the same numbers. The count, average, min and max are
+  exact and the stddev is exact up to floating point rounding. Numbers whose
+  magnitude is below min_value are counted as 0.
+
+  Attributes:
+    relative_accuracy: Maximum relative error of the percentiles.
+    count: Number of numbers added.
+    min: The smallest number added, or None.
+    max: The largest number added, or None.
+  """
+
+  def __init__(self, relative_accuracy=0.01, min_value=1e-9):
+    if not 0 < relative_accuracy < 1:
+      raise ValueError('relative_accuracy must be between 0 and 1, got %s' %
+                       relative_accuracy)
+    self.relative_accuracy = relative_accuracy
+    self.min_value = min_value
+    self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+    self._log_gamma = np.log(self._gamma)
+    # Maps bucket indexes to counts for positive and negative numbers.
+    self._positive = collections.Counter()
+    self._negative = collections.Counter()
+    self._zero_count = 0
+    self.count = 0
+    self._mean = 0.
+    self._sum_of_squared_deviations = 0.
+    self.min = None
+    self.max = None
+
+  def _GetBucketIndexes(self, magnitudes):
+    return np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+
+  def _GetBucketValue(self, index):
+    """Returns the value with the least relative error to the bucket."""
+    return 2 * self._gamma ** index / (self._gamma + 1)
+
+  def Add(self, value):
+    """Adds a single number."""
+    self.AddMany([value])
+
+  def AddMany(self, values):
+    """Adds a sequence or NumPy array of numbers."""
+    values = np.asarray(values, dtype=np.float64).ravel()
+    if not values.size:
+      return
+    positive = values[values >= self.min_value]
+    negative = -values[values <= -self.min_value]
+    for buckets, magnitudes in ((self._positive, positive),
+                                (self._negative, negative)):
+      if magnitudes.size:
+        indexes, counts = np.unique(self._GetBucketIndexes(magnitudes),
+                                    return_counts=True)
+        buckets.update(dict(zip(indexes.tolist(), counts.tolist())))
+    self._zero_count += values.size - positive.size - negative.size
+    mean = float(values.mean())
+    self._Combine(values.size, mean, float(((values - mean) ** 2).sum()),
+                  float(values.min()), float(values.max()))
+
+  def _Combine(self, count, mean, sum_of_squared_deviations, minimum, maximum):
+    """Combines the moments of another set of numbers into this sketch."""
+    total = self.count + count
+    delta = mean - self._mean
+    self._sum_of_squared_deviations += (
+        sum_of_squared_deviations + delta ** 2 * self.count * count / total)
+    self._mean += delta * count / total
+    self.count = total
+    self.min = minimum if self.min is None else min(self.min, minimum)
+    self.max = maximum if self.max is None else max(self.max, maximum)
+
+  def Merge(self, other):
+    """Adds the numbers summarized by another PercentileSketch.
+
+    Raises:
+      ValueError: If the sketches have different accuracies.
+    """
+    if (other.relative_accuracy != self.relative_accuracy or
+        other.min_value != self.min_value):
+      raise ValueError('Cannot merge sketches with different accuracies.')
+    if not other.count:
+      return
+    self._positive.update(other._positive)
+    self._negative.update(other._negative)
+    self._zero_count += other._zero_count
+    self._Combine(other.count, other._mean,
+                  other._sum_of_squared_deviations,
+                  other.min, other.max)
+
+  def _GetValueAtIndex(self, index):
+    """Returns the approximate index-th smallest number added."""
+    rank = index + 1
+    for bucket in sorted(self._negative, reverse=True):
+      rank -= self._negative[bucket]
+      if rank <= 0:
+        return -self._GetBucketValue(bucket)
+    rank -= self._zero_count
+    if rank <= 0:
+      return 0.
+    for bucket in sorted(self._positive):
+      rank -= self._positive[bucket]
+      if rank <= 0:
+        return self._GetBucketValue(bucket)
+    return self.max
+
+  def GetPercentiles(self, percentiles=PERCENTILES_LIST):
+    """Computes percentiles, stddev and mean like PercentileCalculator.
+
+    Args:
+      percentiles: A list of percentiles to compute.
+
+    Returns:
+      A dictionary with the same keys as PercentileCalculator returns.
+
+    Raises:
+      ValueError, if the sketch is empty or if a percentile is outside of
+      [0, 100].
+    """
+    if not self.count:
+      raise ValueError("Can't compute percentiles of empty sketch.")
+    result = {}
+    for percentile in percentiles:
+      _CheckPercentile(percentile)
+      value = self._GetValueAtIndex(_GetPercentileIndex(self.count, percentile))
+      # The exact extremes are known, so never report a value outside them.
+      result['p%s' % str(percentile)] = min(max(value, self.min), self.max)
+    result['average'] = self._mean
+    if self.count > 1:
+      result['stddev'] = (self._sum_of_squared_deviations /
+                          (self.count - 1)) ** 0.5
+    else:
+      result['stddev'] = 0
+    return result
+
+  def ToDict(self):
+    """Returns a JSON serializable representation of the sketch."""
+    return {
+        'relative_accuracy': self.relative_accuracy,
+        'min_value': self.min_value,
+        'positive': {str(k): v for k, v in self._positive.items()},
+        'negative': {str(k): v for k, v in self._negative.items()},
+        'zero_count': self._zero_count,
+        'count': self.count,
+        'mean': self._mean,
+        'sum_of_squared_deviations': self._sum_of_squared_deviations,
+        'min': self.min,
+        'max': self.max,
+    }
+
+  @classmethod
+  def FromDict(cls, sketch_dict):
+    """Creates a PercentileSketch from the output of ToDict."""
+    sketch = cls(sketch_dict['relative_accuracy'], sketch_dict['min_value'])
+    sketch._positive.update(
+        {int(k): v for k, v in sketch_dict['positive'].items()})
+    sketch._negative.update(
+        {int(k): v for k, v in sketch_dict['negative'].items()})
+    sketch._zero_count = sketch_dict['zero_count']
+    sketch.count = sketch_dict['count']
+    sketch._mean = sketch_dict['mean']
+    sketch._sum_of_squared_deviations = (
+        sketch_dict['sum_of_squared_deviations'])
+    sketch.min = sketch_dict['min']
+    sketch.max = sketch_dict['max']
+    return sketch
+
+
 def GeoMean(iterable):
   """Calculate the geometric mean of a collection of numbers.
 
@@ -75,10 +75,9 @@ class GcsService(object_storage_interface.ObjectStorageServiceBase):
   def WriteObjectFromBuffer(self, bucket_name, object_name, stream, size):
     stream.seek(0)
     start_time = time.time()
-    data = str(stream.read(size))
     bucket = storage.bucket.Bucket(self.client, bucket_name)
     obj = storage.blob.Blob(object_name, bucket)
-    obj.upload_from_string(data, client=self.client)
+    obj.upload_from_string(stream.read(size), client=self.client)
     latency = time.time() - start_time
     return start_time, latency
 
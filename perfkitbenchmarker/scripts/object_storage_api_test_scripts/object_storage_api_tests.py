@@ -23,12 +23,13 @@
 """
 
 
+import array
 import json
 import logging
 import multiprocessing as mp
 import os
 import random
-import string
+import struct
 import sys
 from threading import Thread
 import time
@@ -132,12 +133,38 @@ flags.DEFINE_boolean(
     'and records individual delete latency'
 )
 
+flags.DEFINE_float('payload_compressibility', 0,
+                   'The fraction of each written object that is compressible. '
+                   '0 writes random data that neither compresses nor '
+                   'deduplicates; 0.5 writes data that compresses to about '
+                   'half its size.', lower_bound=0, upper_bound=1)
+
+flags.DEFINE_enum('worker_output_format', 'json', ['json', 'binary'],
+                  'How the multistream scenarios report the start time, '
+                  'latency and size of each operation. "json" prints them to '
+                  'stdout. "binary" writes them to --worker_output_file as '
+                  'packed little endian arrays, see WriteBinaryStreams.')
+flags.DEFINE_string('worker_output_file', None,
+                    'The file that binary worker output is written to.')
+
 flags.DEFINE_integer('vm_id', 0, 'ID of VM.')
 flags.DEFINE_float('delete_delay', 0,
                    'Time to delay inbetween delete API call.')
 
 STORAGE_TO_SCHEMA_DICT = {'GCS': 'gs', 'S3': 's3', 'AZURE': 'azure'}
 
+# Write payloads are made of blocks of this many bytes. The compressible part
+# of each block is zero filled and the rest is random.
+PAYLOAD_BLOCK_SIZE = 64 * 1024
+
+# Payloads generated so far, keyed by (size, compressibility).
+_payload_cache = {}
+
+# Each stream in binary worker output starts with this header, which holds a
+# magic string, the stream number and the number of operations.
+BINARY_STREAM_HEADER = struct.Struct('<8sqq')
+BINARY_STREAM_MAGIC = b'PKBOSS01'
+
 # If more than 5% of our upload or download operations fail for an iteration,
 # there is an availability issue with the service provider or the connection
 # between the test VM and the service provider. For this reason, we consider
@@ -364,24 +391,40 @@ def CleanupBucket(service):
     objects_to_cleanup = service.ListObjects(FLAGS.bucket, prefix=None)
 
 
-def GenerateWritePayload(size):
+def GenerateWritePayload(size, compressibility=None):
   """Generate random data for use with WriteObjectFromBuffer.
 
+  Payloads are cached, so asking for the same size again is free. The payload
+  is an immutable bytes object, which io.BytesIO wraps without copying and
+  which worker processes forked after it was generated share with the parent.
+
   Args:
     size: the amount of data needed, in bytes.
+    compressibility: the fraction of the payload that is compressible, between
+        0 and 1. Defaults to --payload_compressibility.
 
   Returns:
-    A byte array of the length requested, filled with random data.
+    A bytes object of the length requested, filled with random data.
   """
-
-  payload_bytes = bytearray(size)
-  # don't use a for...range(100M), range(100M) will create a list of 100mm items
-  # with each item being the default object size of 30 bytes or so, it will lead
-  # to out of memory error.
-  for i in range(size):
-    payload_bytes[i] = ord(random.choice(string.ascii_letters))
-
-  return payload_bytes
+  if compressibility is None:
+    compressibility = FLAGS.payload_compressibility
+  key = (size, compressibility)
+  if key not in _payload_cache:
+    random_size = int(round(PAYLOAD_BLOCK_SIZE * (1 - compressibility)))
+    if random_size == PAYLOAD_BLOCK_SIZE:
+      payload = os.urandom(size)
+    else:
+      # Every block gets fresh random bytes so that the payload cannot be
+      # deduplicated at block granularity.
+      zeros = bytes(PAYLOAD_BLOCK_SIZE - random_size)
+      parts = []
+      for offset in range(0, size, PAYLOAD_BLOCK_SIZE):
+        block_size = min(PAYLOAD_BLOCK_SIZE, size - offset)
+        parts.append(os.urandom(min(random_size, block_size)))
+        parts.append(zeros[:max(block_size - random_size, 0)])
+      payload = b''.join(parts)
+    _payload_cache[key] = payload
+  return _payload_cache[key]
 
 
 def WriteObjects(service, bucket, object_prefix, count,
@@ -685,7 +728,8 @@ def MultiStreamWrites(service):
    ...]
 
   Both kinds of output are written as JSON, for easy serialization and
-  deserialization.
+  deserialization. With --worker_output_format=binary, the timing information
+  is written to FLAGS.worker_output_file by WriteBinaryStreams instead.
 
   """
 
@@ -737,7 +781,7 @@ def MultiStreamWrites(service):
         'Wrote %s objects out of %s requested (%s requred)' %
         (num_writes, num_writes_requested, min_writes_required))
 
-  json.dump(streams, sys.stdout, indent=0)
+  WriteStreams(streams)
 
 
 def MultiStreamReads(service):
@@ -794,7 +838,7 @@ def MultiStreamReads(service):
         'Read %s objects out of %s requested (%s requred)' %
         (num_reads, num_reads_requested, min_reads_required))
 
-  json.dump(streams, sys.stdout, indent=0)
+  WriteStreams(streams)
 
 
 def MultiStreamDelete(service):
@@ -843,7 +887,47 @@ def MultiStreamDelete(service):
     result_keys = ('stream_num', 'start_times', 'latencies', 'sizes')
     streams.append({k: result[k] for k in result_keys})
 
-  json.dump(streams, sys.stdout, indent=0)
+  WriteStreams(streams)
+
+
+def WriteBinaryStreams(streams, out):
+  """Writes multistream results in the packed binary format.
+
+  For every stream, a BINARY_STREAM_HEADER is followed by its start times and
+  latencies as float64 arrays and its sizes as an int64 array, each holding
+  one entry per operation and stored in little endian byte order. The header
+  size keeps the arrays 8 byte aligned so that readers can map them in place.
+
+  Args:
+    streams: list of dicts with 'stream_num', 'start_times', 'latencies' and
+        'sizes' keys.
+    out: a binary file object to write to.
+  """
+  for stream in streams:
+    count = len(stream['start_times'])
+    assert len(stream['latencies']) == count
+    assert len(stream['sizes']) == count
+    out.write(BINARY_STREAM_HEADER.pack(
+        BINARY_STREAM_MAGIC, stream['stream_num'], count))
+    for typecode, values in (('d', stream['start_times']),
+                             ('d', stream['latencies']),
+                             ('q', stream['sizes'])):
+      column = array.array(typecode, values)
+      if sys.byteorder != 'little':
+        column.byteswap()
+      out.write(column.tobytes())
+
+
+def WriteStreams(streams):
+  """Reports multistream results in the format given by flags."""
+  if FLAGS.worker_output_format == 'binary':
+    if not FLAGS.worker_output_file:
+      raise ValueError('--worker_output_file is required with '
+                       '--worker_output_format=binary.')
+    with open(FLAGS.worker_output_file, 'wb') as out:
+      WriteBinaryStreams(streams, out)
+  else:
+    json.dump(streams, sys.stdout, indent=0)
 
 
 def SleepUntilTime(when):
@@ -870,7 +954,7 @@ def WriteWorker(service, payload,
 
   Args:
     service: the ObjectStorageServiceBase object to use.
-    payload: a byte array. The bytes to upload.
+    payload: a bytes object. The bytes to upload.
     size_distribution: the distribution of object sizes to use.
     num_objects: the number of objects to upload.
     start_time: a POSIX timestamp. When to start uploading.
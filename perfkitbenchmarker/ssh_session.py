@@ -0,0 +1,329 @@
+# Copyright 2020 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Pool of persistent SSH sessions used to run remote commands.
+
+By default every remote command forks a new ssh process through
+vm_util.IssueCommand. With --ssh_transport=session, commands are instead
+written to a long-lived remote bash process whose output is framed with a
+unique marker, so that many short commands can share one ssh process. Each VM
+gets a small pool of these sessions so that concurrent commands on the same VM
+do not serialize behind each other.
+
+A session that loses its connection is discarded and the command reports
+return code 255, which lets callers keep their existing retry-on-255 logic.
+"""
+
+import base64
+import logging
+import os
+import selectors
+import subprocess
+import threading
+import time
+import uuid
+
+from absl import flags
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import sample
+
+FLAGS = flags.FLAGS
+
+PROCESS = 'process'
+SESSION = 'session'
+
+flags.DEFINE_enum(
+    'ssh_transport', PROCESS, [PROCESS, SESSION],
+    'How remote commands are sent to Linux VMs. "process" forks a new ssh '
+    'process for every command. "session" keeps a pool of long-lived ssh '
+    'sessions per VM and multiplexes commands over them.')
+flags.DEFINE_integer(
+    'ssh_sessions_per_vm', 4,
+    'Maximum number of persistent ssh sessions opened to a single VM when '
+    '--ssh_transport=session. Commands beyond this limit wait for a free '
+    'session.', lower_bound=1)
+
+# Return code reported by ssh when the connection fails.
+_SSH_FAILURE_RETCODE = 255
+_READ_SIZE = 65536
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class SshSession(object):
+  """A single long-lived remote shell.
+
+  Attributes:
+    alive: Whether the session can accept more commands.
+  """
+
+  def __init__(self, cmd):
+    """Starts the remote shell.
+
+    Args:
+      cmd: A list of strings that starts a bash process reading commands from
+          stdin, e.g. an ssh command line ending in 'bash'.
+    """
+    self._cmd = cmd
+    self._token = uuid.uuid4().hex
+    self._sequence = 0
+    self._process = subprocess.Popen(
+        cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE)
+    self.alive = True
+
+  def _BuildScript(self, command, marker):
+    """Returns the shell input that runs command and prints the markers."""
+    encoded = base64.b64encode(command.encode('utf-8')).decode('ascii')
+    # The command runs in its own bash so that "cd", "exit" etc. do not leak
+    # into the session. A newline is always written before the marker so that
+    # the marker can be found even if the command output lacks a trailing
+    # newline; it is stripped again when parsing.
+    return ('bash -c "$(echo {encoded} | base64 -d)" </dev/null; '
+            'printf "\\n{marker}%d\\n" $?; '
+            'printf "\\n{marker}\\n" >&2\n').format(
+                encoded=encoded, marker=marker)
+
+  def Run(self, command, timeout=None):
+    """Runs a command in the session.
+
+    Args:
+      command: A valid bash command.
+      timeout: Seconds to wait for the command to finish. None waits forever.
+
+    Returns:
+      A tuple of stdout, stderr and return code. If the connection was lost the
+      return code is that of the ssh process (usually 255).
+
+    Raises:
+      IssueCommandTimeoutError: If the command did not finish before timeout.
+          The session is killed and may not be reused.
+    """
+    self._sequence += 1
+    marker = '__PKB_SESSION_%s_%d__' % (self._token, self._sequence)
+    stdout_marker = ('\n' + marker).encode('ascii')
+    stderr_marker = ('\n' + marker + '\n').encode('ascii')
+    try:
+      self._process.stdin.write(
+          self._BuildScript(command, marker).encode('ascii'))
+      self._process.stdin.flush()
+    except (IOError, OSError):
+      return self._Fail(b'', b'')
+
+    deadline = None if timeout is None else time.time() + timeout
+    buffers = {self._process.stdout: b'', self._process.stderr: b''}
+    done = {self._process.stdout: False, self._process.stderr: False}
+    retcode = None
+    with selectors.DefaultSelector() as selector:
+      for stream in buffers:
+        selector.register(stream, selectors.EVENT_READ)
+      while not all(done.values()):
+        wait = None if deadline is None else deadline - time.time()
+        if wait is not None and wait <= 0:
+          self.Close()
+          raise errors.VmUtil.IssueCommandTimeoutError(
+              'Session command timed out after {0} seconds: {1}\n'
+              'STDOUT: {2}\nSTDERR: {3}'.format(
+                  timeout, command,
+                  _Decode(buffers[self._process.stdout]),
+                  _Decode(buffers[self._process.stderr])))
+        for key, _ in selector.select(wait):
+          stream = key.fileobj
+          chunk = os.read(stream.fileno(), _READ_SIZE)
+          if not chunk:
+            return self._Fail(buffers[self._process.stdout],
+                              buffers[self._process.stderr])
+          buffers[stream] += chunk
+          if stream is self._process.stdout:
+            index = buffers[stream].find(stdout_marker)
+            end = buffers[stream].find(b'\n', index + len(stdout_marker))
+            if index >= 0 and end >= 0:
+              retcode = int(buffers[stream][index + len(stdout_marker):end])
+              buffers[stream] = buffers[stream][:index]
+              done[stream] = True
+              selector.unregister(stream)
+          elif buffers[stream].endswith(stderr_marker):
+            buffers[stream] = buffers[stream][:-len(stderr_marker)]
+            done[stream] = True
+            selector.unregister(stream)
+    return (_Decode(buffers[self._process.stdout]),
+            _Decode(buffers[self._process.stderr]), retcode)
+
+  def _Fail(self, stdout, stderr):
+    """Handles a lost connection and returns the partial command result."""
+    self.Close()
+    retcode = self._process.returncode
+    if retcode is None or retcode <= 0:
+      retcode = _SSH_FAILURE_RETCODE
+    return _Decode(stdout), _Decode(stderr), retcode
+
+  def Close(self):
+    """Terminates the remote shell."""
+    self.alive = False
+    if self._process.poll() is None:
+      self._process.kill()
+    self._process.wait()
+    for stream in (self._process.stdin, self._process.stdout,
+                   self._process.stderr):
+      try:
+        stream.close()
+      except (IOError, OSError):
+        pass
+
+
+def _Decode(output):
+  return output.decode('ascii', 'ignore')
+
+
+class SshSessionPool(object):
+  """A bounded pool of SshSessions to a single VM.
+
+  Attributes:
+    latencies: List of wall times in seconds of every command run through the
+        pool, including commands that failed, from when the command got a
+        session until it finished.
+  """
+
+  def __init__(self, cmd, max_sessions):
+    """Initializes the pool.
+
+    Args:
+      cmd: A list of strings passed to SshSession to start a remote shell.
+      max_sessions: The maximum number of sessions kept open at once.
+    """
+    self._cmd = cmd
+    self._idle_sessions = []
+    self._lock = threading.Lock()
+    self._semaphore = threading.BoundedSemaphore(max_sessions)
+    self.latencies = []
+
+  def _AcquireSession(self):
+    with self._lock:
+      while self._idle_sessions:
+        session = self._idle_sessions.pop()
+        if session.alive:
+          return session
+    return SshSession(self._cmd)
+
+  def _ReleaseSession(self, session):
+    if session.alive:
+      with self._lock:
+        self._idle_sessions.append(session)
+
+  def RunCommand(self, command, force_info_log=False, suppress_warning=False,
+                 timeout=None):
+    """Runs a command on a pooled session, mirroring vm_util.IssueCommand.
+
+    Args:
+      command: A valid bash command.
+      force_info_log: A boolean indicating whether the command result should
+          always be logged at the info level.
+      suppress_warning: A boolean indicating whether the results should not be
+          logged at the info level in the event of a non-zero return code.
+      timeout: Timeout for the command in seconds, or None for no timeout.
+
+    Returns:
+      A tuple of stdout, stderr and return code.
+
+    Raises:
+      IssueCommandTimeoutError: If the command exceeded timeout.
+    """
+    full_cmd = '%s %s' % (' '.join(self._cmd), command)
+    logging.info('Running (session): %s', full_cmd)
+    with self._semaphore:
+      session = self._AcquireSession()
+      # Time spent waiting for a free session is not part of the latency.
+      start_time = time.time()
+      try:
+        stdout, stderr, retcode = session.Run(command, timeout=timeout)
+      except BaseException:
+        session.Close()
+        raise
+      finally:
+        self._ReleaseSession(session)
+        with self._lock:
+          self.latencies.append(time.time() - start_time)
+
+    debug_text = ('Ran: {%s}\nReturnCode:%s\nSTDOUT: %s\nSTDERR: %s' %
+                  (full_cmd, retcode, stdout, stderr))
+    if force_info_log or (retcode and not suppress_warning):
+      logging.info(debug_text)
+    else:
+      logging.debug(debug_text)
+    return stdout, stderr, retcode
+
+  def Close(self):
+    """Closes all idle sessions."""
+    with self._lock:
+      sessions, self._idle_sessions = self._idle_sessions, []
+    for session in sessions:
+      session.Close()
+
+
+def GetSessionPool(vm_name, cmd):
+  """Returns the session pool for a VM, creating it if necessary.
+
+  Pools are kept in a module level registry rather than on the VM object so
+  that VMs remain picklable.
+
+  Args:
+    vm_name: The name of the VM. Used to key the pool and its latency stats.
+    cmd: A list of strings that starts a remote shell on the VM.
+
+  Returns:
+    SshSessionPool.
+  """
+  with _pools_lock:
+    pool = _pools.get(vm_name)
+    if pool is None or pool._cmd != cmd:  # pylint: disable=protected-access
+      if pool is not None:
+        pool.Close()
+      pool = SshSessionPool(cmd, FLAGS.ssh_sessions_per_vm)
+      _pools[vm_name] = pool
+    return pool
+
+
+def CloseSessionPool(vm_name):
+  """Closes the open sessions to a VM, keeping its latency stats."""
+  with _pools_lock:
+    pool = _pools.get(vm_name)
+  if pool:
+    pool.Close()
+
+
+def GetCommandLatencySamples(vm_names):
+  """Creates samples summarizing command latencies of the given VMs' pools.
+
+  Args:
+    vm_names: Names of the VMs to report on.
+
+  Returns:
+    A list of sample.Sample objects with latencies in milliseconds.
+  """
+  samples = []
+  for vm_name in vm_names:
+    with _pools_lock:
+      pool = _pools.get(vm_name)
+    if not pool or not pool.latencies:
+      continue
+    metadata = {'vm_name': vm_name, 'ssh_transport': SESSION}
+    latencies_ms = [latency * 1000 for latency in pool.latencies]
+    samples.append(sample.Sample('SSH Command Count', len(latencies_ms), '',
+                                 metadata))
+    stats = sample.PercentileCalculator(latencies_ms, percentiles=[50, 90, 99])
+    stats['max'] = max(latencies_ms)
+    for stat, value in sorted(stats.items()):
+      samples.append(sample.Sample('SSH Command Latency %s' % stat, value,
+                                   'ms', metadata))
+  return samples
@@ -0,0 +1,146 @@
+# Copyright 2026 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Coalesces the status lookups of many resources into batched calls.
+
+Resources waiting to exist or become ready each poll their own status. When
+many resources are created at once, a StatusPoller shared by all resources in a
+region or zone merges the lookups made at about the same time into a single
+describe or list call, and hands each resource its own result.
+"""
+
+import threading
+import time
+
+from absl import flags
+
+flags.DEFINE_boolean(
+    'batch_status_polls', False,
+    'Whether VMs of providers that support it look up their status through a '
+    'describe call shared by all VMs in the same region or zone, instead of '
+    'one describe call per VM. Supported on AWS and GCP.')
+flags.DEFINE_float(
+    'status_poll_interval', 1.0,
+    'Number of seconds a batched status lookup waits for lookups of other '
+    'resources to join it before issuing its describe call.', lower_bound=0)
+flags.DEFINE_integer(
+    'status_poll_max_batch_size', 100,
+    'Maximum number of resources described by one batched status lookup '
+    'call.', lower_bound=1)
+
+FLAGS = flags.FLAGS
+
+# Maps the key passed to GetPoller to its StatusPoller.
+_pollers = {}
+_pollers_lock = threading.Lock()
+
+
+class _Poll(object):
+  """The keys described by one round of a StatusPoller, and their results."""
+
+  def __init__(self):
+    self.keys = []
+    self.results = {}
+    self.error = None
+    self.done = threading.Event()
+
+
+class StatusPoller(object):
+  """Batches lookups of resources by key into calls to a describe function.
+
+  A lookup that finds no poll gathering keys starts one, waits interval
+  seconds for lookups from other threads to join it, and then describes all of
+  the gathered keys, max_batch_size at a time. Every lookup of the poll then
+  returns its own result.
+
+  Attributes:
+    num_calls: The number of times the describe function was called.
+  """
+
+  def __init__(self, describe_func, interval, max_batch_size):
+    """Initializes the poller.
+
+    Args:
+      describe_func: Function taking a list of keys and returning a dict from
+        each key that was found to its result.
+      interval: Number of seconds a poll gathers keys for.
+      max_batch_size: Maximum number of keys passed to describe_func at once.
+    """
+    self._describe_func = describe_func
+    self._interval = interval
+    self._max_batch_size = max_batch_size
+    self._lock = threading.Lock()
+    self._gathering = None
+    self.num_calls = 0
+
+  def _Run(self, poll):
+    """Describes the keys of a poll and wakes the lookups waiting on it."""
+    try:
+      keys = list(dict.fromkeys(poll.keys))
+      for start in range(0, len(keys), self._max_batch_size):
+        self.num_calls += 1
+        poll.results.update(
+            self._describe_func(keys[start:start + self._max_batch_size]))
+    except Exception as e:  # pylint: disable=broad-except
+      poll.error = e
+    finally:
+      poll.done.set()
+
+  def Get(self, key):
+    """Returns the result for key, or None if it was not found.
+
+    Args:
+      key: The key to describe.
+
+    Raises:
+      Exception: Whatever the describe function raised while describing the
+        poll that key was part of.
+    """
+    with self._lock:
+      poll = self._gathering
+      starts_poll = poll is None
+      if starts_poll:
+        poll = self._gathering = _Poll()
+      poll.keys.append(key)
+    if starts_poll:
+      time.sleep(self._interval)
+      with self._lock:
+        self._gathering = None
+      self._Run(poll)
+    poll.done.wait()
+    if poll.error:
+      raise poll.error
+    return poll.results.get(key)
+
+
+def GetPoller(key, describe_func, interval=None, max_batch_size=None):
+  """Returns the process wide StatusPoller for key, creating it if needed.
+
+  Args:
+    key: Hashable identifying the poller, typically the cloud, the region or
+      zone, and the kind of lookup.
+    describe_func: The describe function of the poller if it is created. See
+      StatusPoller.
+    interval: The interval of the poller if it is created. Defaults to
+      --status_poll_interval.
+    max_batch_size: The max_batch_size of the poller if it is created.
+      Defaults to --status_poll_max_batch_size.
+  """
+  with _pollers_lock:
+    if key not in _pollers:
+      _pollers[key] = StatusPoller(
+          describe_func,
+          FLAGS.status_poll_interval if interval is None else interval,
+          max_batch_size or FLAGS.status_poll_max_batch_size)
+    return _pollers[key]
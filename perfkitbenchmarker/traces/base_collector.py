@@ -16,7 +16,10 @@
 
 
 import abc
+import collections
 import functools
+import gzip
+from http import server as http_server
 import logging
 import os
 import posixpath
@@ -29,8 +32,50 @@ from perfkitbenchmarker import events
 from perfkitbenchmarker import vm_util
 import six
 
+TRACE_COMPRESSION_NONE = 'none'
+TRACE_COMPRESSION_GZIP = 'gzip'
+flags.DEFINE_enum(
+    'trace_compression', TRACE_COMPRESSION_NONE,
+    [TRACE_COMPRESSION_NONE, TRACE_COMPRESSION_GZIP],
+    'Whether collector output files are compressed on the VM before they '
+    'are copied back. Compressed files are kept compressed in the output '
+    'directory and are read as is by the collectors.')
+flags.DEFINE_boolean(
+    'trace_remote_reduction', False,
+    'Whether collectors that only analyze part of their output drop the rest '
+    'of it on the VM before it is copied back. Only mpstat does so; dstat '
+    'and sar analyze all of their output and ignore this flag.')
+flags.DEFINE_integer(
+    'trace_max_concurrent_vms', 50,
+    'Maximum number of VMs that collectors are started on, or stopped on '
+    'and fetched from, at the same time.', lower_bound=1)
+flags.DEFINE_boolean(
+    'trace_streaming', False,
+    'Whether collectors poll their output on each VM during the run and keep '
+    'the most recent rows in memory for live monitoring. The live values are '
+    'written in the Prometheus text format to <collector>_live.prom in the '
+    'collector output directory. With --ssh_transport=session each poll '
+    'reuses the VM\'s open ssh connection. collectd output is not streamed.')
+flags.DEFINE_integer(
+    'trace_streaming_interval', 30,
+    'Seconds between polls of the collector output when --trace_streaming '
+    'is set.', lower_bound=1)
+flags.DEFINE_integer(
+    'trace_streaming_buffer_rows', 600,
+    'Maximum number of streamed rows kept in memory per collector and VM.',
+    lower_bound=1)
+flags.DEFINE_integer(
+    'trace_streaming_port', None,
+    'If set along with --trace_streaming, the live values of all collectors '
+    'are also served in the Prometheus text format at '
+    'http://localhost:<port>/metrics.', lower_bound=0)
+
 FLAGS = flags.FLAGS
 
+_live_buffers = []
+_live_server = None
+_live_lock = threading.Lock()
+
 
 def Register(parsed_flags):
   """Registers the collector if FLAGS.<collector> is set.
@@ -43,6 +88,150 @@ def Register(parsed_flags):
   del parsed_flags  # unused
 
 
+def _EscapeLabelValue(value):
+  return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+          .replace('\n', '\\n'))
+
+
+def _FormatPrometheus(buffers):
+  """Formats the latest values of buffers in the Prometheus text format.
+
+  Args:
+    buffers: list of _LiveTraceBuffer.
+
+  Returns:
+    The text exposition of the buffers, one family per metric name.
+  """
+  families = collections.OrderedDict()
+  for buf in buffers:
+    for name, metric_type, labels, value in buf.Snapshot():
+      families.setdefault((name, metric_type), []).append((labels, value))
+  lines = []
+  for (name, metric_type), series in six.iteritems(families):
+    lines.append('# TYPE {0} {1}'.format(name, metric_type))
+    for labels, value in series:
+      label_text = ','.join(
+          '{0}="{1}"'.format(k, _EscapeLabelValue(v)) for k, v in labels)
+      lines.append('{0}{{{1}}} {2!r}'.format(name, label_text, float(value)))
+  return ''.join(line + '\n' for line in lines)
+
+
+class _LiveTraceHandler(http_server.BaseHTTPRequestHandler):
+  """Serves the live values of all streaming collectors at /metrics."""
+
+  def do_GET(self):  # pylint: disable=invalid-name
+    if self.path != '/metrics':
+      self.send_error(404)
+      return
+    with _live_lock:
+      buffers = list(_live_buffers)
+    body = _FormatPrometheus(buffers).encode()
+    self.send_response(200)
+    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    del args  # Scrapes are not worth logging.
+
+
+def _ServeLiveBuffer(live_buffer):
+  """Adds live_buffer to the endpoint, starting it on first use."""
+  global _live_server
+  with _live_lock:
+    if live_buffer not in _live_buffers:
+      _live_buffers.append(live_buffer)
+    if FLAGS.trace_streaming_port is None or _live_server:
+      return
+    _live_server = http_server.ThreadingHTTPServer(
+        ('localhost', FLAGS.trace_streaming_port), _LiveTraceHandler)
+  logging.info('Serving live trace values at http://localhost:%s/metrics',
+               _live_server.server_address[1])
+  thread = threading.Thread(target=_live_server.serve_forever)
+  thread.daemon = True
+  thread.start()
+
+
+class _LiveTraceBuffer(object):
+  """The most recent rows streamed from each VM by one collector.
+
+  Memory is bounded by keeping at most max_rows rows per VM.
+  """
+
+  def __init__(self, collector_name, max_rows):
+    self.collector_name = collector_name
+    self._max_rows = max_rows
+    self._lock = threading.Lock()
+    self._bytes = {}
+    self._update_times = {}
+    self._labels = {}
+    self._rows = {}
+
+  def Add(self, vm_name, num_bytes, labels=None, rows=()):
+    """Records output streamed from a VM.
+
+    Args:
+      vm_name: name of the VM the output was read from.
+      num_bytes: number of bytes the collector wrote since the last call.
+      labels: list of the names of the values in each row.
+      rows: list of (timestamp, values) tuples parsed from the output. A
+          timestamp of None stands for the current time.
+    """
+    now = time.time()
+    with self._lock:
+      self._bytes[vm_name] = self._bytes.get(vm_name, 0) + num_bytes
+      if num_bytes or vm_name not in self._update_times:
+        self._update_times[vm_name] = now
+      if labels is not None:
+        self._labels[vm_name] = labels
+      if rows:
+        self._rows.setdefault(
+            vm_name, collections.deque(maxlen=self._max_rows)).extend(
+                (now if timestamp is None else timestamp, values)
+                for timestamp, values in rows)
+
+  def GetRows(self, vm_name):
+    """Returns the labels and buffered (timestamp, values) rows of a VM."""
+    with self._lock:
+      return (self._labels.get(vm_name),
+              list(self._rows.get(vm_name, ())))
+
+  def GetLastUpdateTimes(self):
+    """Returns a dict from VM name to when its output last grew."""
+    with self._lock:
+      return dict(self._update_times)
+
+  def Snapshot(self):
+    """Returns (name, type, labels, value) tuples of the latest values."""
+    result = []
+    with self._lock:
+      for vm_name, num_bytes in six.iteritems(self._bytes):
+        labels = (('collector', self.collector_name), ('vm', vm_name))
+        result.append(('pkb_trace_bytes_total', 'counter', labels, num_bytes))
+        result.append(('pkb_trace_last_update_timestamp_seconds', 'gauge',
+                       labels, self._update_times[vm_name]))
+        rows = self._rows.get(vm_name)
+        if not rows:
+          continue
+        timestamp, values = rows[-1]
+        result.append(('pkb_trace_row_timestamp_seconds', 'gauge', labels,
+                       timestamp))
+        for label, value in zip(self._labels.get(vm_name, ()), values):
+          result.append(('pkb_trace_value', 'gauge',
+                         labels + (('metric', label),), value))
+    return result
+
+
+class _VmStream(object):
+  """Where streaming of one VM's collector output left off."""
+
+  def __init__(self, parser):
+    self.parser = parser
+    self.offset = 0
+    self.partial_line = ''
+
+
 class BaseCollector(object):
   """Object representing a Base Collector.
 
@@ -68,6 +257,11 @@ class BaseCollector(object):
     self._pid_files = {}
     self._role_mapping = {}  # mapping vm role to output file
     self._start_time = 0
+    self._vm_streams = {}
+    self._streaming_vms = {}
+    self._stream_thread = None
+    self._stream_stop = threading.Event()
+    self.live_buffer = None
 
     if not os.path.isdir(self.output_directory):
       raise IOError('collector output directory does not exist: {0}'.format(
@@ -89,6 +283,57 @@ class BaseCollector(object):
     """Command to kill off the collector."""
     return 'kill {0}'.format(pid)
 
+  def _ReduceCommand(self, collector_file):
+    """Command printing the part of collector_file that Analyze uses.
+
+    Used when --trace_remote_reduction is set. Collectors that analyze their
+    whole output return None.
+
+    Args:
+      collector_file: path of the collector output on the VM.
+    """
+    del collector_file  # unused
+    return None
+
+  def _CreateStreamParser(self):
+    """Returns a parser for output streamed with --trace_streaming, or None.
+
+    The parser has a Parse(lines) method returning a list of (timestamp,
+    values) tuples, where timestamp may be None for the time it was read, and
+    a labels attribute naming the values once it is known. A parser is
+    created per VM. Collectors returning None only report how much output
+    they have written and when it last grew.
+    """
+    return None
+
+  def _GetPostProcessCommands(self, collector_file):
+    """Returns commands run on the VM before fetching and the fetched file."""
+    commands = []
+    reduce_command = (FLAGS.trace_remote_reduction and
+                      self._ReduceCommand(collector_file))
+    if reduce_command:
+      commands.append('{0} > {1}.reduced && mv {1}.reduced {1}'.format(
+          reduce_command, collector_file))
+    if FLAGS.trace_compression == TRACE_COMPRESSION_GZIP:
+      commands.append('gzip -f {0}'.format(collector_file))
+      collector_file += '.gz'
+    return commands, collector_file
+
+  def _OpenOutputFile(self, collector_file):
+    """Opens a fetched collector output file for reading text.
+
+    Args:
+      collector_file: path of the collector output on the VM, or its name.
+
+    Returns:
+      A file object, decompressing the file if it was compressed on the VM.
+    """
+    path = os.path.join(self.output_directory,
+                        os.path.basename(collector_file))
+    if path.endswith('.gz'):
+      return gzip.open(path, 'rt')
+    return open(path, 'r')
+
   def _StartOnVm(self, vm, suffix=''):
     """Start collector, having it write to an output file."""
     self._InstallCollector(vm)
@@ -101,6 +346,87 @@ class BaseCollector(object):
     stdout, _ = vm.RemoteCommand(cmd)
     with self._lock:
       self._pid_files[vm.name] = (stdout.strip(), collector_file)
+      if FLAGS.trace_streaming:
+        self._vm_streams[vm.name] = _VmStream(self._CreateStreamParser())
+        self._streaming_vms[vm.name] = vm
+
+  def _PollOnVm(self, vm):
+    """Reads the output written by the collector on 'vm' since last poll."""
+    with self._lock:
+      stream = self._vm_streams.get(vm.name)
+      _, file_name = self._pid_files.get(vm.name, (None, None))
+    if not stream or not file_name:
+      return
+    if not stream.parser:
+      stdout, _ = vm.RemoteCommand('stat -c %s {0}'.format(file_name),
+                                   ignore_failure=True, suppress_warning=True)
+      size = int(stdout) if stdout.strip().isdigit() else stream.offset
+      self.live_buffer.Add(vm.name, size - stream.offset)
+      stream.offset = size
+      return
+    stdout, _ = vm.RemoteCommand(
+        'tail -c +{0} {1}'.format(stream.offset + 1, file_name),
+        ignore_failure=True, suppress_warning=True)
+    stream.offset += len(stdout)
+    data = stream.partial_line + stdout
+    end = data.rfind('\n') + 1
+    stream.partial_line = data[end:]
+    try:
+      rows = stream.parser.Parse(data[:end].splitlines())
+    except ValueError:
+      logging.warning('Could not parse streamed %s output of %s; only its '
+                      'size is reported from now on.', self._CollectorName(),
+                      vm.name, exc_info=True)
+      stream.parser = None
+      rows = []
+    self.live_buffer.Add(vm.name, len(stdout),
+                         stream.parser and stream.parser.labels, rows)
+
+  def _PollStreams(self):
+    """Polls every streaming VM once and rewrites the live file."""
+    with self._lock:
+      vms = list(self._streaming_vms.values())
+    try:
+      vm_util.RunThreaded(
+          self._PollOnVm, vms,
+          max_concurrent_threads=FLAGS.trace_max_concurrent_vms)
+    except errors.VmUtil.ThreadException:
+      logging.warning('Failed polling %s output.', self._CollectorName(),
+                      exc_info=True)
+    self._WriteLiveFile()
+
+  def _WriteLiveFile(self):
+    path = os.path.join(self.output_directory,
+                        '{0}_live.prom'.format(self._CollectorName()))
+    with open(path + '.tmp', 'w') as f:
+      f.write(_FormatPrometheus([self.live_buffer]))
+    os.replace(path + '.tmp', path)
+
+  def _StreamLoop(self):
+    while not self._stream_stop.wait(FLAGS.trace_streaming_interval):
+      self._PollStreams()
+
+  def _StartStreaming(self):
+    """Starts polling the collector output, unless already polling."""
+    if self._stream_thread:
+      return
+    if not self.live_buffer:
+      self.live_buffer = _LiveTraceBuffer(
+          self._CollectorName(), FLAGS.trace_streaming_buffer_rows)
+    _ServeLiveBuffer(self.live_buffer)
+    self._stream_stop.clear()
+    self._stream_thread = threading.Thread(target=self._StreamLoop)
+    self._stream_thread.daemon = True
+    self._stream_thread.start()
+
+  def _StopStreaming(self):
+    """Stops polling once in-flight polls finish."""
+    if not self._stream_thread:
+      return
+    self._stream_stop.set()
+    self._stream_thread.join()
+    self._stream_thread = None
+    self._WriteLiveFile()
 
   def _StopOnVm(self, vm, vm_role):
     """Stop collector on 'vm' and copy the files back."""
@@ -110,7 +436,11 @@ class BaseCollector(object):
     else:
       with self._lock:
         pid, file_name = self._pid_files.pop(vm.name)
+        self._vm_streams.pop(vm.name, None)
     vm.RemoteCommand(self._KillCommand(pid), ignore_failure=True)
+    commands, file_name = self._GetPostProcessCommands(file_name)
+    if commands:
+      vm.RemoteCommand(' && '.join(commands))
 
     try:
       vm.PullFile(self.output_directory, file_name)
@@ -134,8 +464,11 @@ class BaseCollector(object):
     """
     del sender  # unused
     func = functools.partial(self._StartOnVm, suffix=id_suffix)
-    vm_util.RunThreaded(func, vms)
+    vm_util.RunThreaded(func, vms,
+                        max_concurrent_threads=FLAGS.trace_max_concurrent_vms)
     self._start_time = time.time()
+    if FLAGS.trace_streaming:
+      self._StartStreaming()
     return
 
   def Stop(self, sender, benchmark_spec, name=''):
@@ -158,7 +491,14 @@ class BaseCollector(object):
     for role, vms in six.iteritems(vm_groups):
       args.extend([((
           vm, '%s_%s' % (role, idx)), {}) for idx, vm in enumerate(vms)])
-    vm_util.RunThreaded(self._StopOnVm, args)
+    with self._lock:
+      for (vm, _), _ in args:
+        self._streaming_vms.pop(vm.name, None)
+      streaming = bool(self._streaming_vms)
+    if not streaming:
+      self._StopStreaming()
+    vm_util.RunThreaded(self._StopOnVm, args,
+                        max_concurrent_threads=FLAGS.trace_max_concurrent_vms)
     return
 
   @abc.abstractmethod
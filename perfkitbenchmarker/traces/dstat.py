@@ -18,6 +18,7 @@ http://dag.wiee.rs/home-made/dstat/
 
 
 import copy
+import csv
 import logging
 import os
 import re
@@ -51,8 +52,128 @@ flags.DEFINE_string('dstat_publish_regex', None, 'Requires setting '
                     'the time since the epoch in the metadata. Examples. Use '
                     '".*" to record all samples. Use "net" to record '
                     'networking statistics.')
+DSTAT_PUBLISH_SAMPLES = 'samples'
+DSTAT_PUBLISH_COMPACT = 'compact'
+flags.DEFINE_enum('dstat_publish_mode', DSTAT_PUBLISH_SAMPLES,
+                  [DSTAT_PUBLISH_SAMPLES, DSTAT_PUBLISH_COMPACT],
+                  'How dstat statistics are published. "samples" loads each '
+                  'dstat file into memory, publishes the average of every '
+                  'statistic for each event and publishes statistics '
+                  'matching dstat_publish_regex as one sample per row. '
+                  '"compact" streams each dstat file and also reports the '
+                  'min, max and percentiles of every statistic in the '
+                  'metadata of the average, while rows of statistics '
+                  'matching dstat_publish_regex are published as a single '
+                  'timeseries sample per event and statistic.')
 FLAGS = flags.FLAGS
 
+# Percentiles of each statistic reported by the compact publish mode.
+_COMPACT_PERCENTILES = (50, 90, 99)
+
+
+class _EventAggregate(object):
+  """Running aggregates of the dstat rows falling into one tracing event."""
+
+  def __init__(self, event, num_columns, timeseries_columns):
+    """Initializes the aggregate.
+
+    Args:
+      event: events.TracingEvent whose rows are aggregated.
+      num_columns: int. Number of statistics, excluding the epoch.
+      timeseries_columns: list of int. Indexes of the statistics, excluding
+        the epoch, whose rows are kept.
+    """
+    self.event = event
+    self.count = 0
+    self.sums = np.zeros(num_columns)
+    self.mins = np.full(num_columns, np.inf)
+    self.maxs = np.full(num_columns, -np.inf)
+    self.sketches = [sample.PercentileSketch() for _ in range(num_columns)]
+    self.timeseries_columns = timeseries_columns
+    self.timeseries_chunks = []
+
+  def Update(self, chunk):
+    """Adds the rows of a chunk of dstat output that fall into the event."""
+    rows = chunk[(chunk[:, 0] > self.event.start_timestamp) &
+                 (chunk[:, 0] < self.event.end_timestamp)]
+    if not rows.size:
+      return
+    values = rows[:, 1:]
+    self.count += len(values)
+    self.sums += values.sum(axis=0)
+    np.minimum(self.mins, values.min(axis=0), out=self.mins)
+    np.maximum(self.maxs, values.max(axis=0), out=self.maxs)
+    for sketch, column in zip(self.sketches, values.T):
+      sketch.AddMany(column)
+    if self.timeseries_columns:
+      self.timeseries_chunks.append(
+          rows[:, [0] + [i + 1 for i in self.timeseries_columns]])
+
+  def GetSamples(self, labels, metadata):
+    """Returns the aggregate and timeseries samples of the event.
+
+    Args:
+      labels: list of string. Labels of the statistics, excluding the epoch.
+      metadata: dict. Metadata shared by all samples of the event.
+    """
+    if not self.count:
+      return []
+    samples = []
+    means = self.sums / self.count
+    for idx, label in enumerate(labels):
+      stats_metadata = metadata.copy()
+      stats_metadata['dstat_min'] = self.mins[idx].item()
+      stats_metadata['dstat_max'] = self.maxs[idx].item()
+      percentiles = self.sketches[idx].GetPercentiles(_COMPACT_PERCENTILES)
+      for percentile in _COMPACT_PERCENTILES:
+        key = 'p%s' % percentile
+        stats_metadata['dstat_' + key] = percentiles[key]
+      samples.append(
+          sample.Sample(label, means[idx].item(), '', stats_metadata))
+    if self.timeseries_chunks:
+      rows = np.concatenate(self.timeseries_chunks)
+      # All timeseries samples of the event share the list of epochs.
+      epochs = rows[:, 0].tolist()
+      for i, idx in enumerate(self.timeseries_columns):
+        timeseries_metadata = metadata.copy()
+        timeseries_metadata['dstat_epochs'] = epochs
+        timeseries_metadata['values'] = rows[:, i + 1].tolist()
+        samples.append(sample.Sample(labels[idx] + ' timeseries',
+                                     means[idx].item(), '',
+                                     timeseries_metadata))
+    return samples
+
+
+class _StreamParser(object):
+  """Parses dstat csv output as it is streamed with --trace_streaming."""
+
+  # Five header lines, then the category and label lines.
+  _HEADER_LINES = 7
+
+  def __init__(self):
+    self.labels = None
+    self._header = []
+
+  def Parse(self, lines):
+    rows = []
+    for line in lines:
+      if self.labels is None:
+        self._header.append(line)
+        if len(self._header) == self._HEADER_LINES:
+          labels, _ = dstat.ParseCsvFileInChunks(self._header)
+          self.labels = labels[1:]
+        continue
+      values = next(csv.reader([line]))
+      # Remove the trailing comma
+      if values and not values[-1]:
+        values = values[:-1]
+      if len(values) != len(self.labels) + 1:
+        raise ValueError('Expected {0} columns in row {1}'.format(
+            len(self.labels) + 1, values))
+      values = [float(v) for v in values]
+      rows.append((values[0], values[1:]))
+    return rows
+
 
 class _DStatCollector(base_collector.BaseCollector):
   """dstat collector.
@@ -66,6 +187,9 @@ class _DStatCollector(base_collector.BaseCollector):
   def _InstallCollector(self, vm):
     vm.Install('dstat')
 
+  def _CreateStreamParser(self):
+    return _StreamParser()
+
   def _CollectorRunCommand(self, vm, collector_file):
     num_cpus = vm.num_cpus
 
@@ -119,16 +243,44 @@ class _DStatCollector(base_collector.BaseCollector):
                   sample.Sample(label, value, '', individual_sample_metadata))
 
     def _Analyze(role, file):
-      with open(os.path.join(self.output_directory,
-                             os.path.basename(file)), 'r') as f:
+      with self._OpenOutputFile(file) as f:
         fp = iter(f)
         labels, out = dstat.ParseCsvFile(fp)
         vm_util.RunThreaded(
             _AnalyzeEvent,
             [((role, labels, out, e), {}) for e in events.TracingEvent.events])
 
+    def _AnalyzeCompact(role, file):
+      with self._OpenOutputFile(file) as f:
+        labels, chunks = dstat.ParseCsvFileInChunks(f)
+        assert labels[0] == 'epoch__epoch'
+        labels = labels[1:]
+        timeseries_columns = []
+        if FLAGS.dstat_publish_regex:
+          timeseries_columns = [
+              i for i, label in enumerate(labels)
+              if re.search(FLAGS.dstat_publish_regex, label)]
+        aggregates = [
+            _EventAggregate(event, len(labels), timeseries_columns)
+            for event in events.TracingEvent.events]
+        # Each chunk is read once and folded into every event.
+        for chunk in chunks:
+          for aggregate in aggregates:
+            aggregate.Update(chunk)
+      for aggregate in aggregates:
+        event = aggregate.event
+        metadata = copy.deepcopy(event.metadata)
+        metadata['event'] = event.event
+        metadata['sender'] = event.sender
+        metadata['vm_role'] = role
+        samples.extend(aggregate.GetSamples(labels, metadata))
+
+    if FLAGS.dstat_publish_mode == DSTAT_PUBLISH_COMPACT:
+      analyze = _AnalyzeCompact
+    else:
+      analyze = _Analyze
     vm_util.RunThreaded(
-        _Analyze, [((k, w), {}) for k, w in six.iteritems(self._role_mapping)])
+        analyze, [((k, w), {}) for k, w in six.iteritems(self._role_mapping)])
 
 
 def Register(parsed_flags):
@@ -46,7 +46,6 @@ For more details, see https://linux.die.net/man/1/mpstat.
 
 
 import logging
-import os
 from absl import flags
 from perfkitbenchmarker import events
 from perfkitbenchmarker import sample
@@ -190,6 +189,12 @@ class MpstatCollector(base_collector.BaseCollector):
                 count=FLAGS.mpstat_count,
                 output=collector_file))
 
+  def _ReduceCommand(self, collector_file):
+    # Only the "Average" paragraphs are analyzed. A single blank line is kept
+    # after each of them so that the paragraphs stay separated.
+    return ("awk '/^Average/ {{print; avg=1}} /^$/ && avg {{print; avg=0}}' "
+            "{0}".format(collector_file))
+
   def Analyze(self, sender, benchmark_spec, samples):
     """Analyze mpstat file and record samples.
 
@@ -201,9 +206,7 @@ class MpstatCollector(base_collector.BaseCollector):
 
     def _Analyze(role, output):
       """Parse file and record samples."""
-      with open(
-          os.path.join(self.output_directory, os.path.basename(output)),
-          'r') as fp:
+      with self._OpenOutputFile(output) as fp:
         output = fp.read()
         metadata = {
             'event': 'mpstat',
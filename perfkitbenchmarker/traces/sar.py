@@ -86,6 +86,24 @@ def _AddStealResults(metadata, output, samples):
             metric=metric, value=value, unit='%', metadata=my_metadata))
 
 
+class _StreamParser(object):
+  """Parses sar -u output as it is streamed with --trace_streaming."""
+
+  def __init__(self):
+    self.labels = None
+
+  def Parse(self, lines):
+    rows = []
+    for line in lines:
+      line_split = line.split()
+      if 'CPU' in line_split:
+        self.labels = line_split[line_split.index('CPU') + 1:]
+      elif self.labels and 'all' in line_split and line_split[0] != 'Average:':
+        values = line_split[line_split.index('all') + 1:]
+        rows.append((None, [float(v) for v in values]))
+    return rows
+
+
 class _SarCollector(base_collector.BaseCollector):
   """sar collector.
 
@@ -98,6 +116,9 @@ class _SarCollector(base_collector.BaseCollector):
   def _InstallCollector(self, vm):
     vm.InstallPackages('sysstat')
 
+  def _CreateStreamParser(self):
+    return _StreamParser()
+
   def _CollectorRunCommand(self, vm, collector_file):
     cmd = ('sar -u {sar_interval} {sar_samples} > {output} 2>&1 & '
            'echo $!').format(
@@ -111,8 +132,7 @@ class _SarCollector(base_collector.BaseCollector):
 
     def _Analyze(role, f):
       """Parse file and record samples."""
-      with open(os.path.join(self.output_directory, os.path.basename(f)),
-                'r') as fp:
+      with self._OpenOutputFile(f) as fp:
         output = fp.read()
         metadata = {
             'event': 'sar',
@@ -65,6 +65,10 @@ OUTPUT_EXIT_CODE = 2
 
 _SIMULATE_MAINTENANCE_SEMAPHORE = threading.Semaphore(0)
 
+# Function that may run the commands given to IssueCommand without forking a
+# process. Can be overridden with SetCommandTransport.
+_command_transport = None
+
 flags.DEFINE_integer('default_timeout', TIMEOUT, 'The default timeout for '
                      'retryable commands in seconds.')
 flags.DEFINE_integer('burn_cpu_seconds', 0,
@@ -300,56 +304,45 @@ def _ReadIssueCommandOutput(tf_out, tf_err):
   return stdout, stderr
 
 
-def IssueCommand(cmd, force_info_log=False, suppress_warning=False,
-                 env=None, timeout=DEFAULT_TIMEOUT, cwd=None,
-                 raise_on_failure=True, suppress_failure=None,
-                 raise_on_timeout=True):
-  """Tries running the provided command once.
+def SetCommandTransport(func):
+  """Sets the function that may run IssueCommand commands in process.
 
   Args:
-    cmd: A list of strings such as is given to the subprocess.Popen()
-        constructor.
-    force_info_log: A boolean indicating whether the command result should
-        always be logged at the info level. Command results will always be
-        logged at the debug level if they aren't logged at another level.
-    suppress_warning: A boolean indicating whether the results should
-        not be logged at the info level in the event of a non-zero
-        return code. When force_info_log is True, the output is logged
-        regardless of suppress_warning's value.
-    env: A dict of key/value strings, such as is given to the subprocess.Popen()
-        constructor, that contains environment variables to be injected.
-    timeout: Timeout for the command in seconds. If the command has not finished
-        before the timeout is reached, it will be killed. Set timeout to None to
-        let the command run indefinitely. If the subprocess is killed, the
-        return code will indicate an error, and stdout and stderr will
-        contain what had already been written to them before the process was
-        killed.
-    cwd: Directory in which to execute the command.
-    raise_on_failure: A boolean indicating if non-zero return codes should raise
-        IssueCommandError.
-    suppress_failure: A function passed (stdout, stderr, ret_code) for non-zero
-        return codes to determine if the failure should be suppressed e.g. a
-        delete command which fails because the item to be deleted does not
-        exist.
-    raise_on_timeout: A boolean indicating if killing the process due to the
-        timeout being hit should raise a IssueCommandTimeoutError
+    func: Function taking the command list and the env and timeout arguments
+      of IssueCommand, and returning a tuple of stdout, stderr, and retcode
+      for commands it ran or None for commands that should be run as a
+      process. It raises IssueCommandTimeoutError if the command timed out.
+      None to run all commands as processes.
+  """
+  global _command_transport
+  _command_transport = func
 
-  Returns:
-    A tuple of stdout, stderr, and retcode from running the provided command.
 
-  Raises:
-    IssueCommandError: When raise_on_failure=True and retcode is non-zero.
-    IssueCommandTimeoutError:  When raise_on_timeout=True and
-                               command duration exceeds timeout
+def _IssueCommandWithTransport(cmd, env, timeout):
+  """Runs cmd with the command transport set by SetCommandTransport.
+
+  Returns:
+    A tuple of stdout, stderr, retcode, timing output, whether the command
+    timed out and whether it was killed, or None if the command must be run
+    as a process.
   """
-  if env:
-    logging.debug('Environment variables: %s', env)
+  try:
+    result = _command_transport(cmd, env=env, timeout=timeout)
+  except errors.VmUtil.IssueCommandTimeoutError as e:
+    return '', str(e), 1, '', True, False
+  if result is None:
+    return None
+  stdout, stderr, retcode = result
+  return stdout, stderr, retcode, '', False, False
 
-  # Force conversion to string so you get a nice log statement before hitting a
-  # type error or NPE. subprocess will still catch it.
-  full_cmd = ' '.join(str(w) for w in cmd)
-  logging.info('Running: %s', full_cmd)
 
+def _IssueCommandProcess(cmd, env, timeout, cwd, raise_on_timeout, full_cmd):
+  """Runs cmd as a process, killing it after timeout seconds.
+
+  Returns:
+    A tuple of stdout, stderr, retcode, timing output, whether the command
+    timed out and whether it was killed.
+  """
   time_file_path = '/usr/bin/time'
 
   running_on_windows = RunningOnWindows()
@@ -396,10 +389,71 @@ def IssueCommand(cmd, force_info_log=False, suppress_warning=False,
     timing_output = ''
     if should_time:
       timing_output = tf_timing.read().rstrip('\n')
+  return (stdout, stderr, process.returncode, timing_output, did_timeout.value,
+          was_killed.value)
+
+
+def IssueCommand(cmd, force_info_log=False, suppress_warning=False,
+                 env=None, timeout=DEFAULT_TIMEOUT, cwd=None,
+                 raise_on_failure=True, suppress_failure=None,
+                 raise_on_timeout=True):
+  """Tries running the provided command once.
+
+  Args:
+    cmd: A list of strings such as is given to the subprocess.Popen()
+        constructor.
+    force_info_log: A boolean indicating whether the command result should
+        always be logged at the info level. Command results will always be
+        logged at the debug level if they aren't logged at another level.
+    suppress_warning: A boolean indicating whether the results should
+        not be logged at the info level in the event of a non-zero
+        return code. When force_info_log is True, the output is logged
+        regardless of suppress_warning's value.
+    env: A dict of key/value strings, such as is given to the subprocess.Popen()
+        constructor, that contains environment variables to be injected.
+    timeout: Timeout for the command in seconds. If the command has not finished
+        before the timeout is reached, it will be killed. Set timeout to None to
+        let the command run indefinitely. If the subprocess is killed, the
+        return code will indicate an error, and stdout and stderr will
+        contain what had already been written to them before the process was
+        killed.
+    cwd: Directory in which to execute the command.
+    raise_on_failure: A boolean indicating if non-zero return codes should raise
+        IssueCommandError.
+    suppress_failure: A function passed (stdout, stderr, ret_code) for non-zero
+        return codes to determine if the failure should be suppressed e.g. a
+        delete command which fails because the item to be deleted does not
+        exist.
+    raise_on_timeout: A boolean indicating if killing the process due to the
+        timeout being hit should raise a IssueCommandTimeoutError
+
+  Returns:
+    A tuple of stdout, stderr, and retcode from running the provided command.
+
+  Raises:
+    IssueCommandError: When raise_on_failure=True and retcode is non-zero.
+    IssueCommandTimeoutError:  When raise_on_timeout=True and
+                               command duration exceeds timeout
+  """
+  if env:
+    logging.debug('Environment variables: %s', env)
+
+  # Force conversion to string so you get a nice log statement before hitting a
+  # type error or NPE. subprocess will still catch it.
+  full_cmd = ' '.join(str(w) for w in cmd)
+  logging.info('Running: %s', full_cmd)
+
+  result = None
+  if _command_transport:
+    result = _IssueCommandWithTransport(cmd, env, timeout)
+  if result is None:
+    result = _IssueCommandProcess(cmd, env, timeout, cwd, raise_on_timeout,
+                                  full_cmd)
+  stdout, stderr, retcode, timing_output, did_timeout, was_killed = result
 
   debug_text = ('Ran: {%s}\nReturnCode:%s%s\nSTDOUT: %s\nSTDERR: %s' %
-                (full_cmd, process.returncode, timing_output, stdout, stderr))
-  if force_info_log or (process.returncode and not suppress_warning):
+                (full_cmd, retcode, timing_output, stdout, stderr))
+  if force_info_log or (retcode and not suppress_warning):
     logging.info(debug_text)
   else:
     logging.debug(debug_text)
@@ -407,24 +461,24 @@ def IssueCommand(cmd, force_info_log=False, suppress_warning=False,
   # Raise timeout error regardless of raise_on_failure - as the intended
   # semantics is to ignore expected errors caused by invoking the command
   # not errors from PKB infrastructure.
-  if did_timeout.value and raise_on_timeout:
+  if did_timeout and raise_on_timeout:
     debug_text = (
         '{0}\nIssueCommand timed out after {1} seconds.  '
         '{2} by perfkitbenchmarker.'.format(
             debug_text, timeout,
-            'Process was killed' if was_killed.value else
+            'Process was killed' if was_killed else
             'Process may have been killed'))
     raise errors.VmUtil.IssueCommandTimeoutError(debug_text)
-  elif process.returncode and (raise_on_failure or suppress_failure):
+  elif retcode and (raise_on_failure or suppress_failure):
     if (suppress_failure and
-        suppress_failure(stdout, stderr, process.returncode)):
+        suppress_failure(stdout, stderr, retcode)):
       # failure is suppressible, rewrite the stderr and return code as passing
       # since some callers assume either is a failure e.g.
       # perfkitbenchmarker.providers.aws.util.IssueRetryableCommand()
       return stdout, '', 0
     raise errors.VmUtil.IssueCommandError(debug_text)
 
-  return stdout, stderr, process.returncode
+  return stdout, stderr, retcode
 
 
 def IssueBackgroundCommand(cmd, stdout_path, stderr_path, env=None):
@@ -18,6 +18,7 @@ import json
 import os.path
 import unittest
 from absl import flags
+from absl.testing import flagsaver
 from absl.testing import parameterized
 import mock
 
@@ -25,6 +26,7 @@ from perfkitbenchmarker import benchmark_spec
 from perfkitbenchmarker import context
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import providers
+from perfkitbenchmarker import status_poller
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.configs import benchmark_config_spec
 from perfkitbenchmarker.providers.aws import aws_disk
@@ -75,6 +77,21 @@ class AwsVolumeExistsTestCase(pkb_common_test_case.PkbCommonTestCase):
     self.assertFalse(self.disk._Exists())
 
 
+class AwsGetZonesInRegionTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def testCachedLookup(self):
+    FLAGS.cache_cli_lookups = True
+    FLAGS.cli_cache_dir = self.create_tempdir().full_path
+    response = json.dumps({'AvailabilityZones': [
+        {'ZoneName': 'us-east-1a', 'State': 'available'},
+        {'ZoneName': 'us-east-1b', 'State': 'impaired'}]})
+    with mock.patch.object(vm_util, 'IssueCommand',
+                           return_value=(response, '', 0)) as issue_command:
+      self.assertEqual(['us-east-1a'], util.GetZonesInRegion('us-east-1'))
+      self.assertEqual(['us-east-1a'], util.GetZonesInRegion('us-east-1'))
+    issue_command.assert_called_once()
+
+
 class AwsVpcTestCase(pkb_common_test_case.PkbCommonTestCase):
 
   def setUp(self):
@@ -410,6 +427,48 @@ class AwsVirtualMachineTestCase(pkb_common_test_case.PkbCommonTestCase):
     util.IssueRetryableCommand.side_effect = [(json.dumps(response), None)]
     self.assertFalse(self.vm._Exists())
 
+  @flagsaver.flagsaver(batch_status_polls=True, status_poll_interval=0)
+  def testBatchedStatusPolls(self):
+    response = json.loads(self.response)
+    instance = response['Reservations'][0]['Instances'][0]
+    instance['ClientToken'] = self.vm.client_token
+    instance['InstanceId'] = self.vm.id
+    instance['PublicIpAddress'] = '10.0.0.1'
+    instance['SecurityGroups'][0]['GroupId'] = self.vm.group_id
+    util.IssueRetryableCommand.side_effect = [(json.dumps(response), None)] * 2
+    with mock.patch.dict(status_poller._pollers, clear=True):
+      self.assertTrue(self.vm._Exists())
+      self.vm._PostCreate()
+    self.assertEqual('10.0.0.1', self.vm.ip_address)
+    commands = [call[0][0] for call in
+                util.IssueRetryableCommand.call_args_list]
+    self.assertIn('--filters=Name=client-token,Values=%s' %
+                  self.vm.client_token, commands[0])
+    self.assertIn('--filters=Name=instance-id,Values=i-foo', commands[1])
+
+  @flagsaver.flagsaver(bulk_vm_create=True, bulk_vm_create_interval=0.5)
+  def testBulkCreate(self):
+    vm2 = CreateTestAwsVm()
+    vm2.image = self.vm.image
+    vm2.network = self.vm.network
+    vm2.placement_group = self.vm.placement_group
+    vm_util.IssueCommand.side_effect = [(json.dumps(
+        {'Instances': [{'InstanceId': 'i-1'}, {'InstanceId': 'i-2'}]}), '', 0)]
+    with mock.patch.dict(status_poller._pollers, clear=True):
+      vm_util.RunThreaded(lambda vm: vm._Create(), [self.vm, vm2])
+    vm_util.IssueCommand.assert_called_once()
+    create_cmd = vm_util.IssueCommand.call_args[0][0]
+    self.assertIn('--count=2', create_cmd)
+    self.assertIn('--client-token=%s' % self.vm.client_token, create_cmd)
+    self.assertEqual(self.vm.client_token, vm2.client_token)
+    self.assertCountEqual(['i-1', 'i-2'], [self.vm.id, vm2.id])
+
+    instance_id = self.vm.id
+    util.IssueRetryableCommand.side_effect = [(self.response, None)]
+    self.assertTrue(self.vm._Exists())
+    self.assertIn('--filter=Name=instance-id,Values=%s' % instance_id,
+                  util.IssueRetryableCommand.call_args[0][0])
+
   @mock.patch.object(util, 'FormatTagSpecifications')
   def testCreateSpot(self, mock_cmd):
     mock_cmd.return_value = 'foobar'
@@ -21,8 +21,10 @@ import multiprocessing.managers
 import os
 import signal
 import threading
+import time
 import unittest
 
+import mock
 from perfkitbenchmarker import background_tasks
 from perfkitbenchmarker import errors
 from tests import pkb_common_test_case
@@ -178,5 +180,232 @@ class RunParallelProcessesTestCase(pkb_common_test_case.PkbCommonTestCase):
     self.assertEqual(counter.value, 2)
 
 
+class SharedExecutorTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(SharedExecutorTestCase, self).setUp()
+    background_tasks.FLAGS.background_task_executor = (
+        background_tasks.SHARED_EXECUTOR)
+    self.addCleanup(background_tasks._rate_limiters.clear)
+    self.pool = background_tasks._SharedThreadPool()
+    self.enter_context(
+        mock.patch.object(background_tasks, '_shared_thread_pool', self.pool))
+
+  def testResultsAreOrdered(self):
+    calls = [(_ReturnArgs, ('a',), {'b': i}) for i in range(10)]
+    result = background_tasks.RunParallelThreads(calls, max_concurrency=4)
+    self.assertEqual(result, [(i, 'a') for i in range(10)])
+
+  def testException(self):
+    int_list = []
+    calls = [(_AppendLength, (int_list,), {}), (_RaiseValueError, (), {}),
+             (_AppendLength, (int_list,), {})]
+    with self.assertRaises(errors.VmUtil.ThreadException):
+      background_tasks.RunParallelThreads(calls, max_concurrency=1)
+    self.assertEqual(int_list, [0, 1])
+
+  def testInterrupt(self):
+    int_list = []
+    event = threading.Event()
+    calls = [(_WaitAndAppendInt, (int_list, 0, event, 5), {}),
+             (_WaitAndAppendInt, (int_list, 1), {}),
+             (os.kill, (os.getpid(), signal.SIGINT), {}),
+             (_WaitAndAppendInt, (int_list, 3, event, 5), {})]
+    with self.assertRaises(KeyboardInterrupt):
+      background_tasks.RunParallelThreads(calls, max_concurrency=2)
+    self.assertEqual(int_list, [1])
+
+  def testThreadsAreReused(self):
+    background_tasks.FLAGS.max_concurrent_threads = 1
+    thread_names = background_tasks.RunThreaded(
+        lambda _: threading.current_thread().name, list(range(4)))
+    thread_names += background_tasks.RunThreaded(
+        lambda _: threading.current_thread().name, list(range(4)))
+    self.assertLen(set(thread_names), 1)
+    self.assertLen(self.pool._threads, 1)
+
+  def testNestedCallsDoNotDeadlock(self):
+    background_tasks.FLAGS.max_concurrent_threads = 2
+
+    def _RunNested(i):
+      return sum(background_tasks.RunThreaded(lambda j: i * j, list(range(3))))
+
+    result = background_tasks.RunThreaded(_RunNested, list(range(4)))
+    self.assertEqual(result, [0, 3, 6, 9])
+
+  def testPriority(self):
+    background_tasks.FLAGS.max_concurrent_threads = 1
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def _Block(_):
+      started.set()
+      release.wait(5)
+
+    blocker = threading.Thread(
+        target=background_tasks.RunThreaded, args=(_Block, [0]))
+    blocker.start()
+    started.wait(5)
+    callers = [
+        threading.Thread(
+            target=background_tasks.RunThreaded,
+            args=(order.append, [priority]), kwargs={'priority': priority})
+        for priority in (2, 0, 1)]
+    for caller in callers:
+      caller.start()
+    # Wait for every caller to queue its task behind the blocking one.
+    self.assertTrue(background_tasks._WaitForCondition(
+        lambda: len(self.pool._heap) == 3, 5))
+    release.set()
+    for thread in [blocker] + callers:
+      thread.join(5)
+    self.assertEqual(order, [0, 1, 2])
+
+  def testPostTaskDelay(self):
+    start_times = background_tasks.RunThreaded(
+        lambda _: time.time(), list(range(3)), post_task_delay=0.1)
+    start_times.sort()
+    for earlier, later in zip(start_times, start_times[1:]):
+      self.assertGreaterEqual(later - earlier, 0.09)
+
+  def testProcesses(self):
+    calls = [(_ReturnArgs, ('a',), {'b': i}) for i in range(6)]
+    result = background_tasks.RunParallelProcesses(calls, max_concurrency=2)
+    self.assertEqual(result, [(i, 'a') for i in range(6)])
+
+  def testReplacedProcessPoolIsKeptUntilUnused(self):
+    self.enter_context(
+        mock.patch.object(background_tasks, '_shared_process_pool', None))
+    with background_tasks._SharedProcessTaskManager(1) as small:
+      with background_tasks._SharedProcessTaskManager(2) as large:
+        self.addCleanup(large._executor.shutdown)
+        self.assertIsNot(small._executor, large._executor)
+        self.assertEqual(1, small._executor.submit(abs, -1).result())
+      self.assertEqual(2, small._executor.submit(abs, -2).result())
+    with self.assertRaises(RuntimeError):
+      small._executor.submit(abs, -3)
+    self.assertIs(large._executor, background_tasks._shared_process_pool)
+    self.assertEqual(3, large._executor.submit(abs, -3).result())
+
+
+class RateLimitTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(RateLimitTestCase, self).setUp()
+    self.addCleanup(background_tasks._rate_limiters.clear)
+
+  def testParseRateLimits(self):
+    self.assertEqual(
+        background_tasks._ParseRateLimits(['GCP=10', 'AWS=0.5']),
+        {'GCP': 10., 'AWS': .5})
+    for rate_limits in (['GCP'], ['GCP=0'], ['=1'], ['GCP=x']):
+      with self.assertRaises(ValueError):
+        background_tasks._ParseRateLimits(rate_limits)
+
+  def testRateLimitKeyFunction(self):
+    background_tasks.FLAGS.background_task_rate_limits = ['slow=10']
+    start_times = background_tasks.RunThreaded(
+        lambda _: time.time(), ['slow', 'fast', 'slow', 'fast', 'slow'],
+        rate_limit_key=lambda key: key)
+    slow_start_times = sorted(start_times[::2])
+    fast_start_times = start_times[1::2]
+    for earlier, later in zip(slow_start_times, slow_start_times[1:]):
+      self.assertGreaterEqual(later - earlier, 0.09)
+    # Unlimited tasks do not wait for the limited ones.
+    self.assertLess(max(fast_start_times), slow_start_times[-1])
+
+  def testTaskTimings(self):
+    background_tasks._task_timings.clear()
+    background_tasks.RunThreaded(_ReturnArgs, ['blue'])
+    timings = background_tasks.GetTaskTimings()
+    self.assertLen(timings, 1)
+    self.assertEqual(timings[0].call, '_ReturnArgs(blue)')
+    self.assertGreaterEqual(timings[0].queue_wait, 0)
+    self.assertGreaterEqual(timings[0].run_time, 0)
+
+
+class RunTaskGraphTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def _Task(self, name, dependencies=(), events=None, error=None):
+    """Returns a GraphTask that records its start and end in events."""
+    events = self.events if events is None else events
+
+    def _Run():
+      events.append(('start', name))
+      if error:
+        raise error
+      events.append(('end', name))
+
+    return background_tasks.GraphTask(name, _Run, list(dependencies))
+
+  def setUp(self):
+    super(RunTaskGraphTestCase, self).setUp()
+    self.events = []
+
+  def testDependenciesCompleteFirst(self):
+    tasks = [self._Task('c', ['a', 'b']), self._Task('a'),
+             self._Task('b', ['a'])]
+    times = background_tasks.RunTaskGraph(tasks)
+    self.assertEqual(self.events, [('start', 'a'), ('end', 'a'),
+                                   ('start', 'b'), ('end', 'b'),
+                                   ('start', 'c'), ('end', 'c')])
+    self.assertCountEqual(times, ['a', 'b', 'c'])
+    self.assertLessEqual(times['a'][1], times['b'][0])
+
+  def testIndependentTasksRunConcurrently(self):
+    barrier = threading.Barrier(2, timeout=5)
+    tasks = [background_tasks.GraphTask('a', barrier.wait, []),
+             background_tasks.GraphTask('b', barrier.wait, [])]
+    background_tasks.RunTaskGraph(tasks)
+
+  def testUnknownDependenciesAreIgnored(self):
+    background_tasks.RunTaskGraph([self._Task('a', ['missing'])])
+    self.assertEqual(self.events, [('start', 'a'), ('end', 'a')])
+
+  def testSequentialUsesListOrder(self):
+    tasks = [self._Task('a'), self._Task('b'), self._Task('c', ['a'])]
+    background_tasks.RunTaskGraph(tasks, max_concurrency=1)
+    self.assertEqual([name for event, name in self.events if event == 'start'],
+                     ['a', 'b', 'c'])
+
+  def testReverse(self):
+    tasks = [self._Task('a'), self._Task('b', ['a']), self._Task('c', ['b'])]
+    background_tasks.RunTaskGraph(tasks, reverse=True)
+    self.assertEqual([name for event, name in self.events if event == 'start'],
+                     ['c', 'b', 'a'])
+
+  def testCycle(self):
+    with self.assertRaises(ValueError):
+      background_tasks.RunTaskGraph([self._Task('a', ['b']),
+                                     self._Task('b', ['a'])])
+
+  def testFailureSkipsDependents(self):
+    tasks = [self._Task('a', error=ValueError('a failed')),
+             self._Task('b', ['a']), self._Task('c')]
+    with self.assertRaisesRegex(ValueError, 'a failed'):
+      background_tasks.RunTaskGraph(tasks, max_concurrency=1)
+    self.assertNotIn(('start', 'b'), self.events)
+    self.assertIn(('end', 'c'), self.events)
+
+  def testContinueOnFailure(self):
+    tasks = [self._Task('a'), self._Task('b', ['a']),
+             self._Task('c', ['b'], error=ValueError('c failed'))]
+    with self.assertRaisesRegex(ValueError, 'c failed'):
+      background_tasks.RunTaskGraph(tasks, reverse=True,
+                                    continue_on_failure=True)
+    self.assertEqual([name for event, name in self.events if event == 'start'],
+                     ['c', 'b', 'a'])
+
+  def testCriticalPath(self):
+    tasks = [background_tasks.GraphTask('net', None, []),
+             background_tasks.GraphTask('db', None, ['net']),
+             background_tasks.GraphTask('vms', None, ['net']),
+             background_tasks.GraphTask('app', None, ['vms', 'db'])]
+    times = {'net': (0, 1), 'db': (1, 5), 'vms': (1, 3), 'app': (5, 6)}
+    self.assertEqual(background_tasks.GetCriticalPath(tasks, times),
+                     ['net', 'db', 'app'])
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -13,6 +13,7 @@
 # limitations under the License.
 """Tests for perfkitbenchmarker.benchmark_spec."""
 
+import threading
 import unittest
 from absl import flags
 import mock
@@ -246,6 +247,78 @@ class BenchmarkSupportTestCase(_BenchmarkSpecTestCase):
     self.assertTrue(self.createBenchmarkSpec(config, NEVER_SUPPORTED))
 
 
+class ProvisionTestCase(_BenchmarkSpecTestCase):
+
+  def setUp(self):
+    super(ProvisionTestCase, self).setUp()
+    self.spec = self._CreateBenchmarkSpecFromYaml(SIMPLE_CONFIG)
+    self.calls = []
+    network = mock.Mock()
+    network.Create.side_effect = lambda: self.calls.append('create network')
+    network.Delete.side_effect = lambda: self.calls.append('delete network')
+    self.spec.networks = {'network': network}
+    self.spec.vms = [mock.Mock(CLOUD='GCP', OS_TYPE='debian9')]
+    self.spec.relational_db = mock.Mock(create_depends_on_vms=True)
+    self.spec.relational_db.Create.side_effect = (
+        lambda: self.calls.append('create db'))
+    self.spec.relational_db.Delete.side_effect = (
+        lambda: self.calls.append('delete db'))
+    self.enter_context(mock.patch.object(
+        self.spec, 'CreateAndBootVm',
+        side_effect=lambda vm: self.calls.append('create vm')))
+    self.enter_context(mock.patch.object(
+        self.spec, 'DeleteVm',
+        side_effect=lambda vm: self.calls.append('delete vm')))
+    self.enter_context(mock.patch.object(self.spec, 'PrepareVmAfterBoot'))
+    self.enter_context(
+        mock.patch.object(benchmark_spec.vm_util, 'GenerateSSHConfig'))
+
+  def testProvisionFollowsDependencies(self):
+    self.spec.Provision()
+    self.assertEqual(self.calls, ['create network', 'create vm', 'create db'])
+    self.spec.relational_db.SetVms.assert_called_once_with(
+        self.spec.vm_groups)
+
+  def testDeleteReversesDependencies(self):
+    self.spec.Delete()
+    self.assertEqual(self.calls, ['delete db', 'delete vm', 'delete network'])
+    self.assertTrue(self.spec.deleted)
+
+  def testDeleteContinuesPastFailures(self):
+    self.spec.relational_db.Delete.side_effect = ValueError('db')
+    with self.assertRaises(ValueError):
+      self.spec.Delete()
+    self.assertEqual(self.calls, ['delete vm', 'delete network'])
+    self.assertFalse(self.spec.deleted)
+
+  def testDatabaseCreatedAlongsideVms(self):
+    self.spec.relational_db.create_depends_on_vms = False
+    vm_started = threading.Event()
+    db_started = threading.Event()
+
+    def _CreateVm(vm):
+      vm_started.set()
+      self.assertTrue(db_started.wait(5))
+
+    def _CreateDb():
+      db_started.set()
+      self.assertTrue(vm_started.wait(5))
+
+    self.spec.CreateAndBootVm.side_effect = _CreateVm
+    self.spec.relational_db.Create.side_effect = _CreateDb
+    self.spec.Provision()
+
+  def testCriticalPathSample(self):
+    self.spec.Provision()
+    samples = [s for s in self.spec.GetSamples()
+               if s.metric == 'Provision Critical Path Time']
+    self.assertLen(samples, 1)
+    self.assertEqual(samples[0].unit, 'seconds')
+    self.assertEqual(samples[0].metadata['provision_critical_path'],
+                     'networks,vms,relational_db')
+    self.assertIn('provision_vms_time', samples[0].metadata)
+
+
 class RedirectGlobalFlagsTestCase(pkb_common_test_case.PkbCommonTestCase):
 
   def testNoFlagOverride(self):
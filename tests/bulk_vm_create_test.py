@@ -0,0 +1,74 @@
+# Copyright 2026 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.bulk_vm_create."""
+
+import threading
+import unittest
+
+from absl.testing import flagsaver
+import mock
+from perfkitbenchmarker import bulk_vm_create
+from perfkitbenchmarker import status_poller
+from tests import pkb_common_test_case
+
+
+class _FakeVm(object):
+  CLOUD = 'Fake'
+
+  def __init__(self, name):
+    self.name = name
+    self.create_start_time = None
+
+
+class BulkVmCreateTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(BulkVmCreateTestCase, self).setUp()
+    p = mock.patch.dict(status_poller._pollers, clear=True)
+    p.start()
+    self.addCleanup(p.stop)
+
+  @flagsaver.flagsaver(bulk_vm_create_interval=0.5,
+                       bulk_vm_create_max_batch_size=2)
+  def testCreatesVmsSharingKeyTogether(self):
+    calls = []
+
+    def _CreateVms(vms):
+      calls.append(sorted(vm.name for vm in vms))
+      return {vm: vm.name.upper() for vm in vms}
+
+    vms = [_FakeVm(name) for name in ('a', 'b', 'c')]
+    other_vm = _FakeVm('d')
+    results = {}
+
+    def _Create(vm, key):
+      results[vm.name] = bulk_vm_create.Create(vm, key, _CreateVms)
+
+    threads = [threading.Thread(target=_Create, args=(vm, 'key'))
+               for vm in vms]
+    threads.append(
+        threading.Thread(target=_Create, args=(other_vm, 'other key')))
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual({'a': 'A', 'b': 'B', 'c': 'C', 'd': 'D'}, results)
+    self.assertCountEqual([['a', 'b'], ['c'], ['d']], calls)
+    for vm in vms + [other_vm]:
+      self.assertIsNotNone(vm.create_start_time)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,120 @@
+# Copyright 2026 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.cli_cache."""
+
+import os
+import time
+import unittest
+
+from absl import flags
+import mock
+from perfkitbenchmarker import cli_cache
+from tests import pkb_common_test_case
+
+FLAGS = flags.FLAGS
+
+
+class CliCacheTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(CliCacheTestCase, self).setUp()
+    FLAGS.cache_cli_lookups = True
+    FLAGS.cli_cache_dir = self.create_tempdir().full_path
+    self.lookup = mock.Mock(side_effect=lambda *args: ('out', list(args)))
+
+  def testDisabled(self):
+    FLAGS.cache_cli_lookups = False
+    cli_cache.Call('zones', self.lookup, 'a')
+    cli_cache.Call('zones', self.lookup, 'a')
+    self.assertEqual(2, self.lookup.call_count)
+    self.assertFalse(os.listdir(FLAGS.cli_cache_dir))
+
+  def testCachesPerNameAndArgs(self):
+    self.assertEqual(('out', ['a']), cli_cache.Call('zones', self.lookup, 'a'))
+    self.assertEqual(['out', ['a']], cli_cache.Call('zones', self.lookup, 'a'))
+    cli_cache.Call('zones', self.lookup, 'b')
+    cli_cache.Call('images', self.lookup, 'a')
+    self.assertEqual(3, self.lookup.call_count)
+
+  def testEnvironmentIsPartOfKey(self):
+    cli_cache.Call('zones', self.lookup, 'a')
+    with mock.patch.dict(os.environ, {'AWS_PROFILE': 'other'}):
+      cli_cache.Call('zones', self.lookup, 'a')
+    self.assertEqual(2, self.lookup.call_count)
+
+  def testCliConfigurationIsPartOfKey(self):
+    gcloud_dir = self.create_tempdir()
+    aws_credentials = self.create_tempfile(content='[default]')
+    with mock.patch.dict(os.environ, {
+        'CLOUDSDK_CONFIG': gcloud_dir.full_path,
+        'AWS_SHARED_CREDENTIALS_FILE': aws_credentials.full_path}):
+      gcloud_dir.create_file('active_config', content='first')
+      cli_cache.Call('zones', self.lookup, 'a')
+      cli_cache.Call('zones', self.lookup, 'a')
+      self.assertEqual(1, self.lookup.call_count)
+      # gcloud config configurations activate second
+      gcloud_dir.create_file('active_config', content='second')
+      cli_cache.Call('zones', self.lookup, 'a')
+      self.assertEqual(2, self.lookup.call_count)
+      # gcloud config set project other
+      config = gcloud_dir.create_file(
+          os.path.join('configurations', 'config_second'))
+      cli_cache.Call('zones', self.lookup, 'a')
+      self.assertEqual(3, self.lookup.call_count)
+      os.utime(config.full_path, (1, 1))
+      cli_cache.Call('zones', self.lookup, 'a')
+      self.assertEqual(4, self.lookup.call_count)
+      # aws configure
+      os.utime(aws_credentials.full_path, (1, 1))
+      cli_cache.Call('zones', self.lookup, 'a')
+      self.assertEqual(5, self.lookup.call_count)
+
+  def testExpires(self):
+    cli_cache.Call('zones', self.lookup, 'a')
+    with mock.patch.object(time, 'time', return_value=time.time() + 100):
+      FLAGS.cli_cache_ttl = 200
+      cli_cache.Call('zones', self.lookup, 'a')
+      self.assertEqual(1, self.lookup.call_count)
+      FLAGS.cli_cache_ttl = 50
+      cli_cache.Call('zones', self.lookup, 'a')
+      self.assertEqual(2, self.lookup.call_count)
+
+  def testInvalidate(self):
+    with mock.patch.object(cli_cache, '_START_TIME', time.time() + 10):
+      cli_cache.Call('zones', self.lookup, 'a')
+      cli_cache.Call('images', self.lookup, 'a')
+      FLAGS.cli_cache_invalidate = ['zones']
+      cli_cache.Call('zones', self.lookup, 'a')
+      cli_cache.Call('images', self.lookup, 'a')
+      self.assertEqual(3, self.lookup.call_count)
+      FLAGS.cli_cache_invalidate = [cli_cache.ALL]
+      cli_cache.Call('images', self.lookup, 'a')
+      self.assertEqual(4, self.lookup.call_count)
+    # Entries written during this run are not invalidated again.
+    cli_cache.Call('images', self.lookup, 'a')
+    self.assertEqual(4, self.lookup.call_count)
+
+  def testFailuresAreNotCached(self):
+    self.lookup.side_effect = ValueError()
+    with self.assertRaises(ValueError):
+      cli_cache.Call('zones', self.lookup, 'a')
+    self.lookup.side_effect = None
+    self.lookup.return_value = 'out'
+    self.assertEqual('out', cli_cache.Call('zones', self.lookup, 'a'))
+    self.assertEqual('out', cli_cache.Call('zones', self.lookup, 'a'))
+    self.assertEqual(2, self.lookup.call_count)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,118 @@
+# Copyright 2026 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.command_transport."""
+
+import unittest
+
+from absl import flags
+import mock
+from perfkitbenchmarker import command_transport
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import vm_util
+from tests import pkb_common_test_case
+
+FLAGS = flags.FLAGS
+
+
+class ParseCommandTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def testGcloudCommand(self):
+    parsed = command_transport.ParseCommand(
+        ['path/gcloud', 'compute', 'disks', 'describe', 'disk-1', '--format',
+         'json', '--quiet', '--zone', 'us-central1-a'])
+    self.assertEqual('gcloud', parsed.executable)
+    self.assertEqual(['compute', 'disks', 'describe', 'disk-1'], parsed.args)
+    self.assertEqual({'format': ['json'], 'quiet': [],
+                      'zone': ['us-central1-a']}, parsed.flags)
+
+  def testGlobalFlagsAndValueLists(self):
+    with mock.patch.dict(command_transport._global_flags,
+                         {'aws': ('output',)}):
+      parsed = command_transport.ParseCommand(
+          ['aws', '--output', 'json', 'ec2', 'create-tags', '--region=r',
+           '--resources', 'i-1', '--tags', 'Key=a,Value=1', 'Key=b,Value=2'])
+    self.assertEqual(['ec2', 'create-tags'], parsed.args)
+    self.assertEqual(['json'], parsed.flags['output'])
+    self.assertEqual(['r'], parsed.flags['region'])
+    self.assertEqual(['Key=a,Value=1', 'Key=b,Value=2'], parsed.flags['tags'])
+
+  def testPopFlags(self):
+    parsed = command_transport.ParseCommand(
+        ['gcloud', '--labels', 'a=1,b=2', '--quiet', '--zone', 'z'])
+    self.assertEqual(['a=1', 'b=2'], parsed.PopListFlag('labels'))
+    self.assertTrue(parsed.PopBooleanFlag('quiet'))
+    self.assertIsNone(parsed.PopFlag('project'))
+    with self.assertRaises(command_transport.UnsupportedCommandError):
+      parsed.CheckAllFlagsUsed()
+    self.assertEqual('z', parsed.PopFlag('zone'))
+    parsed.CheckAllFlagsUsed()
+
+
+class IssueTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(IssueTestCase, self).setUp()
+    self.operation = mock.Mock(return_value=('{}', '', 0))
+    patcher = mock.patch.dict(command_transport._operations, clear=True)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    command_transport.RegisterOperation('gcloud', 'compute', 'disks')(
+        self.operation)
+
+  def testRunsRegisteredOperation(self):
+    result = command_transport.Issue(
+        ['gcloud', 'compute', 'disks', 'describe', 'd', '--zone', 'z'],
+        timeout=10)
+    self.assertEqual(('{}', '', 0), result)
+    parsed = self.operation.call_args[0][0]
+    self.assertEqual(['describe', 'd'], parsed.args)
+    self.assertEqual({'zone': ['z']}, parsed.flags)
+    self.assertEqual(10, self.operation.call_args[1]['timeout'])
+
+  def testFallsBackToCli(self):
+    self.assertIsNone(command_transport.Issue(['gcloud', 'compute', 'ssh']))
+    self.assertIsNone(
+        command_transport.Issue(['gcloud', 'compute', 'disks', 'list'],
+                                env={'A': 'b'}))
+    self.operation.side_effect = command_transport.UnsupportedCommandError
+    self.assertIsNone(
+        command_transport.Issue(['gcloud', 'compute', 'disks', 'list']))
+
+  def testVmUtilIssueCommand(self):
+    FLAGS.command_transport = command_transport.SDK
+    command_transport.Install()
+    self.addCleanup(vm_util.SetCommandTransport, None)
+    with mock.patch('subprocess.Popen') as popen:
+      self.assertEqual(
+          ('{}', '', 0),
+          vm_util.IssueCommand(['gcloud', 'compute', 'disks', 'list']))
+      self.operation.return_value = ('', 'ERROR: not found', 1)
+      with self.assertRaises(errors.VmUtil.IssueCommandError):
+        vm_util.IssueCommand(['gcloud', 'compute', 'disks', 'list'])
+    popen.assert_not_called()
+
+  def testGetEndpointAndClient(self):
+    FLAGS.command_transport_endpoints = ['gce=http://localhost:1/v1']
+    self.assertEqual('http://localhost:1/v1',
+                     command_transport.GetEndpoint('gce', 'default'))
+    self.assertEqual('default', command_transport.GetEndpoint('ec2', 'default'))
+    create = mock.Mock(side_effect=object)
+    with mock.patch.dict(command_transport._clients, clear=True):
+      client = command_transport.GetClient('key', create)
+      self.assertIs(client, command_transport.GetClient('key', create))
+    create.assert_called_once_with()
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -22,6 +22,7 @@ import re
 import unittest
 
 from absl import flags
+from absl.testing import flagsaver
 from absl.testing import parameterized
 import mock
 
@@ -30,6 +31,7 @@ from perfkitbenchmarker import context
 from perfkitbenchmarker import errors
 from perfkitbenchmarker import os_types
 from perfkitbenchmarker import providers
+from perfkitbenchmarker import status_poller
 from perfkitbenchmarker import virtual_machine
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.configs import benchmark_config_spec
@@ -653,6 +655,59 @@ class GCEVMCreateTestCase(pkb_common_test_case.PkbCommonTestCase):
       with self.assertRaises(errors.Resource.CreationError):
         vm._Create()
 
+  @flagsaver.flagsaver(batch_status_polls=True, status_poll_interval=0)
+  def testBatchedStatusPolls(self):
+    instance = {
+        'name': 'other-vm',
+        'id': '123',
+        'networkInterfaces': [{
+            'networkIP': '10.0.0.2',
+            'accessConfigs': [{'natIP': '1.2.3.4'}],
+        }],
+    }
+    spec = gce_virtual_machine.GceVmSpec(
+        _COMPONENT, machine_type='n1-standard-1', zone='us-central1-a')
+    vm = pkb_common_test_case.TestGceVirtualMachine(spec)
+    fake_rets = [(json.dumps([instance]), '', 0)]
+    with PatchCriticalObjects(fake_rets) as issue_command, mock.patch.dict(
+        status_poller._pollers, clear=True):
+      self.assertFalse(vm._Exists())
+      instance['name'] = vm.name
+      fake_rets.append((json.dumps([instance]), '', 0))
+      self.assertTrue(vm._Exists())
+    self.assertEqual('1.2.3.4', vm.ip_address)
+    command = ' '.join(issue_command.call_args[0][0])
+    self.assertIn('compute instances list', command)
+    self.assertIn('--filter name=(%s)' % vm.name, command)
+    self.assertIn('--zones us-central1-a', command)
+
+  @flagsaver.flagsaver(batch_status_polls=True, status_poll_interval=0)
+  def testBatchedStatusPollFailure(self):
+    spec = gce_virtual_machine.GceVmSpec(
+        _COMPONENT, machine_type='n1-standard-1', zone='us-central1-a')
+    vm = pkb_common_test_case.TestGceVirtualMachine(spec)
+    fake_rets = [('', 'ERROR: (gcloud.compute.instances.list) error', 1)]
+    with PatchCriticalObjects(fake_rets), mock.patch.dict(
+        status_poller._pollers, clear=True):
+      self.assertFalse(vm._Exists())
+
+  @flagsaver.flagsaver(bulk_vm_create=True, bulk_vm_create_interval=0.5)
+  def testBulkCreate(self):
+    spec = gce_virtual_machine.GceVmSpec(
+        _COMPONENT, machine_type='n1-standard-1', zone='us-central1-a')
+    vms = [pkb_common_test_case.TestGceVirtualMachine(spec) for _ in range(2)]
+    with PatchCriticalObjects() as issue_command, mock.patch.object(
+        vm_util, 'NamedTemporaryFile') as mock_tempfile, mock.patch.dict(
+            status_poller._pollers, clear=True):
+      mock_tempfile.return_value.__enter__.return_value.name = 'keys'
+      vm_util.RunThreaded(lambda vm: vm._Create(), vms)
+    issue_command.assert_called_once()
+    command = issue_command.call_args[0][0]
+    self.assertEqual(
+        ['compute', 'instances', 'create', vms[0].name, vms[1].name],
+        command[1:6])
+    self.assertIn('sshKeys=keys', command)
+
   def testVmWithoutGpu(self):
     with PatchCriticalObjects() as issue_command:
       spec = gce_virtual_machine.GceVmSpec(
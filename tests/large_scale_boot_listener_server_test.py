@@ -14,6 +14,11 @@
 
 """Test for perfkitbenchmarker/data/large_scale?boot/listener_server.py."""
 
+import asyncio
+import queue
+import resource
+import socket
+import time
 import unittest
 import mock
 
@@ -21,32 +26,87 @@ from perfkitbenchmarker.data.large_scale_boot import listener_server
 from tests import pkb_common_test_case
 
 
+def _GetClosedPort():
+  """Returns a local port that nothing listens on."""
+  sock = socket.socket()
+  sock.bind(('127.0.0.1', 0))
+  port = sock.getsockname()[1]
+  sock.close()
+  return port
+
+
 class ListenerServerTest(pkb_common_test_case.PkbCommonTestCase):
 
-  @mock.patch('subprocess.Popen')
-  def testConfirmIPAccessibleSuccess(self, mock_subproc_popen):
-    reply = 'booter.p3rf-scaling.internal [10.150.0.158] 22 (ssh) open'
-    process_mock = mock.Mock()
-    mock_subproc_popen.return_value = process_mock
-    process_mock.communicate.return_value = None, reply.encode('utf-8')
-    fake_client_host = '1.2.3.4'
-    fake_port = 22
-    success = listener_server.ConfirmIPAccessible(fake_client_host, fake_port)
-    self.assertEqual(success.split(':')[0], 'Pass')
-    self.assertEqual(success.split(':')[1], fake_client_host)
-
-  @mock.patch('subprocess.Popen')
-  def testConfirmIPAccessibleFail(self, mock_subproc_popen):
-    reply = 'booter.p3rf-scaling.internal [1.2.3.4] 22 (ssh):Connection refused'
-    process_mock = mock.Mock()
-    mock_subproc_popen.return_value = process_mock
-    process_mock.communicate.return_value = None, reply.encode('utf-8')
-    fake_client_host = '1.2.3.4'
-    fake_port = 22
+  def setUp(self):
+    super(ListenerServerTest, self).setUp()
+    self.listening_socket = socket.socket()
+    self.listening_socket.bind(('127.0.0.1', 0))
+    self.listening_socket.listen(16)
+    self.addCleanup(self.listening_socket.close)
+    self.open_port = self.listening_socket.getsockname()[1]
+
+  def testConfirmIPAccessibleSuccess(self):
+    success = listener_server.ConfirmIPAccessible('127.0.0.1', self.open_port)
+    status, host, timestamp = success.split(':')
+    self.assertEqual(status, 'Pass')
+    self.assertEqual(host, '127.0.0.1')
+    # Timestamps are integer nanoseconds since the epoch.
+    self.assertGreater(int(timestamp), 10**18)
+
+  def testConfirmIPAccessibleFail(self):
     success = listener_server.ConfirmIPAccessible(
-        fake_client_host, fake_port, timeout=1)
+        '127.0.0.1', _GetClosedPort(), timeout=0.3)
     self.assertEqual(success.split(':')[0], 'Fail')
-    self.assertEqual(success.split(':')[1], fake_client_host)
+    self.assertEqual(success.split(':')[1], '127.0.0.1')
+
+  def testProbeBacksOff(self):
+    prober = listener_server.Prober(_GetClosedPort(), initial_backoff=0.01,
+                                    max_backoff=0.04)
+    with mock.patch.object(prober, '_Connect',
+                           wraps=prober._Connect) as mock_connect:
+      listener_server._RunProbe(prober.ConfirmIPAccessible('127.0.0.1', 0.3))
+    # Delays of 0.01, 0.02 and then 0.04 seconds allow at most ~10 attempts.
+    self.assertBetween(mock_connect.call_count, 3, 11)
+
+  def testConnectTimeout(self):
+    async def _SlowConnect(*_):
+      await asyncio.sleep(1)
+
+    prober = listener_server.Prober(self.open_port, connect_timeout=0.01)
+    with mock.patch.object(asyncio, 'open_connection', _SlowConnect):
+      start = time.time()
+      self.assertIsNone(listener_server._RunProbe(prober._Connect('host')))
+    self.assertLess(time.time() - start, 0.5)
+
+  @mock.patch.object(resource, 'setrlimit')
+  @mock.patch.object(resource, 'getrlimit', return_value=(1024, 4096))
+  def testGetMaxConnectsRaisesOpenFileLimit(self, _, mock_setrlimit):
+    self.assertEqual(10, listener_server.GetMaxConnects(10))
+    mock_setrlimit.assert_not_called()
+    self.assertEqual(3000, listener_server.GetMaxConnects(3000))
+    mock_setrlimit.assert_called_with(resource.RLIMIT_NOFILE, (3064, 4096))
+    self.assertEqual(4096 - listener_server.RESERVED_FILES,
+                     listener_server.GetMaxConnects(10000))
+
+  @mock.patch.object(resource, 'setrlimit', side_effect=ValueError)
+  @mock.patch.object(resource, 'getrlimit', return_value=(1024, 4096))
+  def testGetMaxConnectsCappedByOpenFileLimit(self, *_):
+    self.assertEqual(1024 - listener_server.RESERVED_FILES,
+                     listener_server.GetMaxConnects(10000))
+
+  def testActAsClientProbesAllHosts(self):
+    prober = listener_server.Prober(self.open_port)
+    results = queue.Queue()
+    hosts = ['127.0.0.1', 'localhost']
+    with mock.patch.object(listener_server, 'BuildHostNames',
+                           return_value=hosts):
+      listener_server.ActAsClient(prober, results, 'pattern', len(hosts),
+                                  False)
+    lines = [results.get() for _ in range(len(hosts) + 1)]
+    self.assertEqual(listener_server._STOP_QUEUE_ENTRY, lines[-1])
+    self.assertCountEqual(hosts, [line.split(':')[1] for line in lines[:-1]])
+    self.assertTrue(all(line.startswith('Pass:') for line in lines[:-1]))
+
 
 if __name__ == '__main__':
   unittest.main()
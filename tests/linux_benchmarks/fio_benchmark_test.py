@@ -18,6 +18,7 @@ import unittest
 from absl import flags
 import mock
 
+from perfkitbenchmarker import errors
 from perfkitbenchmarker import temp_dir
 from perfkitbenchmarker import units
 from perfkitbenchmarker import vm_util
@@ -212,5 +213,15 @@ blocksize = 8k
                           expect_format_disk=False)
 
 
+class TestCheckPrerequisites(pkb_common_test_case.PkbCommonTestCase):
+
+  def testPercentileTimeseriesRequiresHistLog(self):
+    FLAGS.fio_hist_log_percentile_timeseries = True
+    with self.assertRaises(errors.Setup.InvalidFlagConfigurationError):
+      fio_benchmark.CheckPrerequisites(None)
+    FLAGS.fio_hist_log = True
+    fio_benchmark.CheckPrerequisites(None)
+
+
 if __name__ == '__main__':
   unittest.main()
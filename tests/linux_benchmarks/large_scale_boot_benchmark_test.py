@@ -33,14 +33,18 @@ class LargeScaleBootBenchmarkTest(pkb_common_test_case.PkbCommonTestCase):
       large_scale_boot_benchmark, '_GetExpectedBoots', return_value=4)
   def testWaitForResponsesSuccess(self, mock_func):
     vm1 = mock.Mock()
-    vm1.RemoteCommand.side_effect = [('', ''), ('2', '')]
+    vm1.RemoteCommand.side_effect = [('', ''), ('0', ''),
+                                     ('Pass:a:1\nPass:b:2\n', '')]
     vm2 = mock.Mock()
-    vm2.RemoteCommand.side_effect = [('', ''), ('2', '')]
-    large_scale_boot_benchmark._WaitForResponses([vm1, vm2])
+    vm2.RemoteCommand.side_effect = [('', ''), ('0', ''),
+                                     ('Pass:c:1\nPass:d:2\n', '')]
+    large_scale_boot_benchmark._WaitForResponses(
+        [large_scale_boot_benchmark._LauncherResults(vm1),
+         large_scale_boot_benchmark._LauncherResults(vm2)])
     vm1.RemoteCommand.assert_called_with(
-        'grep -c Pass /tmp/pkb/results', ignore_failure=True)
+        'tail -c +1 /tmp/pkb/results', ignore_failure=True)
     vm2.RemoteCommand.assert_called_with(
-        'grep -c Pass /tmp/pkb/results', ignore_failure=True)
+        'tail -c +1 /tmp/pkb/results', ignore_failure=True)
 
   @mock.patch.object(
       large_scale_boot_benchmark, '_GetExpectedBoots', return_value=4)
@@ -48,16 +52,23 @@ class LargeScaleBootBenchmarkTest(pkb_common_test_case.PkbCommonTestCase):
     vm1 = mock.Mock()
     vm1.RemoteCommand.side_effect = [('Error: Failed', ''), ('2', '')]
     with self.assertRaises(errors.Benchmarks.RunError):
-      large_scale_boot_benchmark._WaitForResponses([vm1])
+      large_scale_boot_benchmark._WaitForResponses(
+          [large_scale_boot_benchmark._LauncherResults(vm1)])
 
   @mock.patch.object(
       large_scale_boot_benchmark, '_GetExpectedBoots', return_value=5)
   def testWaitForResponsesTwice(self, mock_func):
     vm1 = mock.Mock()
+    # The second poll only fetches the lines written after the first one,
+    # including the end of a line that was partially written.
     vm1.RemoteCommand.side_effect = [
-        ('', ''), ('2', ''), ('', ''), ('5', '')]
-    large_scale_boot_benchmark._WaitForResponses([vm1])
-    self.assertEqual(vm1.RemoteCommand.call_count, 4)
+        ('', ''), ('0', ''), ('Pass:a:1\nPass:b:2\nPa', ''),
+        ('', ''), ('Pass:c:3\nPass:d:4\nPass:e:5\n', '')]
+    large_scale_boot_benchmark._WaitForResponses(
+        [large_scale_boot_benchmark._LauncherResults(vm1)])
+    self.assertEqual(vm1.RemoteCommand.call_count, 5)
+    vm1.RemoteCommand.assert_called_with(
+        'tail -c +19 /tmp/pkb/results', ignore_failure=True)
 
   def testParseResult(self):
     FLAGS['num_vms'].value = 2
@@ -66,13 +77,15 @@ class LargeScaleBootBenchmarkTest(pkb_common_test_case.PkbCommonTestCase):
 
     vm1 = mock.Mock()
     vm1.RemoteCommand.side_effect = [('6', ''),
-                                     ('Pass:a:8\nPass:b:9\nPass:c:13', '')]
+                                     ('Pass:a:8\nPass:b:9\nPass:c:13\n', '')]
     vm1.zone = 'zone'
     vm2 = mock.Mock()
     vm2.RemoteCommand.side_effect = [('2', ''),
-                                     ('Pass:d:4\nFail:e:5\nPass:f:6', '')]
+                                     ('Pass:d:4\nFail:e:5\nPass:f:6\n', '')]
     vm2.zone = 'zone'
-    results = large_scale_boot_benchmark._ParseResult([vm1, vm2])
+    results = large_scale_boot_benchmark._ParseResult(
+        [large_scale_boot_benchmark._LauncherResults(vm1),
+         large_scale_boot_benchmark._LauncherResults(vm2)])
 
     common_metadata = {
         'cloud': 'GCP',
@@ -83,20 +96,23 @@ class LargeScaleBootBenchmarkTest(pkb_common_test_case.PkbCommonTestCase):
         'launcher_machine_type': 'n1-standard-16',
         'vms_contact_launcher': True,
         'use_public_ip': False,
+        'boot_probe_initial_backoff': 0.05,
+        'boot_probe_max_backoff': 0.25,
+        'boot_probe_connect_timeout': 0.25,
+        'boot_probe_max_concurrent_connects': None,
+        'boot_probe_interval_s': 0.5,
     }
 
     metadata1 = copy.deepcopy(common_metadata)
     metadata1.update({
         'zone': 'zone',
         'launcher_successes': 3,
-        'launcher_boot_durations_ns': [2, 3, 7],
         'launcher_closed_incoming': 0
     })
     metadata2 = copy.deepcopy(common_metadata)
     metadata2.update({
         'zone': 'zone',
         'launcher_successes': 2,
-        'launcher_boot_durations_ns': [2, 4],
         'launcher_closed_incoming': 1
     })
     expected = [
@@ -131,9 +147,25 @@ class LargeScaleBootBenchmarkTest(pkb_common_test_case.PkbCommonTestCase):
       self.assertEqual(result.value, expected.value,
                        'Metric value for {} is not equal.'.format(
                            expected.metric))
-      self.assertDictEqual(result.metadata, expected.metadata,
-                           'Metadata for {} is not equal'.format(
-                               expected.metric))
+      self.assertDictContainsSubset(expected.metadata, result.metadata,
+                                    'Metadata for {} is not equal'.format(
+                                        expected.metric))
+    self.assertNotIn('launcher_boot_durations_ns', results[0].metadata)
+    self.assertAlmostEqual(7, results[0].metadata['launcher_boot_time_p99_ns'],
+                           delta=0.1)
+
+    metrics = {r.metric: r for r in results}
+    self.assertAlmostEqual(3, metrics['Cluster Boot Time p50'].value,
+                           delta=0.1)
+    cdf = [r for r in results if r.metric == 'Cluster Boot Time CDF']
+    self.assertEqual(19, len(cdf))
+    cdf_values = [r.value for r in cdf]
+    self.assertEqual(sorted(cdf_values), cdf_values)
+
+  def testProbeIntervalLimitedByConnects(self):
+    FLAGS['boots_per_launcher'].value = 1000
+    FLAGS['boot_probe_max_concurrent_connects'].value = 100
+    self.assertAlmostEqual(2.5, large_scale_boot_benchmark._GetProbeInterval())
 
 
 if __name__ == '__main__':
@@ -15,10 +15,13 @@
 """Tests for object storage service benchmark."""
 
 import datetime
+import json
+import struct
 import time
 import unittest
 from absl import flags
 import mock
+import numpy as np
 
 from perfkitbenchmarker.linux_benchmarks import object_storage_service_benchmark
 from tests import pkb_common_test_case
@@ -47,7 +50,8 @@ class TestBuildCommands(pkb_common_test_case.PkbCommonTestCase):
       with mock.patch(object_storage_service_benchmark.__name__ +
                       '._ProcessMultiStreamResults'):
         with mock.patch(object_storage_service_benchmark.__name__ +
-                        '.LoadWorkerOutput', return_value=(None, None, None)):
+                        '.LoadBinaryWorkerOutput',
+                        return_value=(None, None, None)):
           object_storage_service_benchmark.MultiStreamRWBenchmark(
               [], {}, [vm], command_builder, service, 'bucket')
 
@@ -62,7 +66,9 @@ class TestBuildCommands(pkb_common_test_case.PkbCommonTestCase):
                    '--object_naming_scheme=sequential_by_stream',
                    '--scenario=MultiStreamWrite',
                    '--stream_num_start=0',
-                   '--vm_id=0']))
+                   '--vm_id=0',
+                   '--worker_output_format=binary',
+                   '--worker_output_file=/tmp/pkb/pkb-worker-output']))
 
     self.assertEqual(
         command_builder.BuildCommand.call_args_list[1],
@@ -73,7 +79,62 @@ class TestBuildCommands(pkb_common_test_case.PkbCommonTestCase):
                    '--objects_written_file=/tmp/pkb/pkb-objects-written',
                    '--scenario=MultiStreamRead',
                    '--stream_num_start=0',
-                   '--vm_id=0']))
+                   '--vm_id=0',
+                   '--worker_output_format=binary',
+                   '--worker_output_file=/tmp/pkb/pkb-worker-output']))
+    vm.PullFile.assert_called_with(mock.ANY, '/tmp/pkb/pkb-worker-output')
+    # Each run pulls its output into its own local file, since the arrays
+    # loaded from an earlier file may still map it.
+    local_files = [call[0][0] for call in vm.PullFile.call_args_list]
+    self.assertLen(set(local_files), len(local_files))
+    self.assertIn('pkb-worker-output-upload-', local_files[0])
+    self.assertIn('pkb-worker-output-download-', local_files[1])
+
+
+class TestLoadWorkerOutput(pkb_common_test_case.PkbCommonTestCase):
+
+  def _WriteBinaryOutput(self, streams):
+    """Writes streams in the API test script's binary format."""
+    path = self.create_tempfile().full_path
+    with open(path, 'wb') as out:
+      for stream_num, (start_times, latencies, sizes) in enumerate(streams):
+        out.write(struct.pack('<8sqq', b'PKBOSS01', stream_num,
+                              len(start_times)))
+        out.write(np.asarray(start_times, dtype='<f8').tobytes())
+        out.write(np.asarray(latencies, dtype='<f8').tobytes())
+        out.write(np.asarray(sizes, dtype='<i8').tobytes())
+    return path
+
+  def testBinaryMatchesJson(self):
+    streams = [([1., 2.], [0.5, 0.25], [100, 200]), ([3.], [0.75], [300])]
+    json_output = [json.dumps([
+        {'stream_num': i, 'start_times': start_times, 'latencies': latencies,
+         'sizes': sizes}
+        for i, (start_times, latencies, sizes) in enumerate(streams)])]
+    expected = object_storage_service_benchmark.LoadWorkerOutput(json_output)
+
+    actual = object_storage_service_benchmark.LoadBinaryWorkerOutput(
+        [self._WriteBinaryOutput(streams[:1]),
+         self._WriteBinaryOutput(streams[1:]),
+         self.create_tempfile().full_path])
+
+    for expected_arrays, actual_arrays in zip(expected, actual):
+      self.assertLen(actual_arrays, 2)
+      for expected_array, actual_array in zip(expected_arrays, actual_arrays):
+        np.testing.assert_array_equal(expected_array, actual_array)
+        self.assertEqual(expected_array.dtype, actual_array.dtype)
+
+  def testTruncatedOutput(self):
+    path = self._WriteBinaryOutput([([1., 2.], [0.5, 0.25], [100, 200])])
+    with open(path, 'r+b') as f:
+      f.truncate(40)
+    with self.assertRaises(ValueError):
+      object_storage_service_benchmark.LoadBinaryWorkerOutput([path])
+
+  def testBadMagic(self):
+    path = self.create_tempfile(content=b'x' * 24).full_path
+    with self.assertRaises(ValueError):
+      object_storage_service_benchmark.LoadBinaryWorkerOutput([path])
 
 
 class TestDistributionToBackendFormat(pkb_common_test_case.PkbCommonTestCase):
@@ -16,6 +16,7 @@
 import os
 import unittest
 
+import numpy
 
 from perfkitbenchmarker.linux_packages import dstat
 
@@ -50,6 +51,19 @@ class DstatTestCase(unittest.TestCase):
         'majpf__virtual memory', 'minpf__virtual memory',
         'alloc__virtual memory', 'free__virtual memory'], labels)
 
+  def testParseDstatFileInChunks(self):
+    path = os.path.join(os.path.dirname(__file__), '..', 'data',
+                        'dstat-result.csv')
+    with open(path) as f:
+      expected_labels, expected = dstat.ParseCsvFile(iter(f))
+    with open(path) as f:
+      labels, chunks = dstat.ParseCsvFileInChunks(f, chunk_rows=100)
+      chunks = list(chunks)
+
+    self.assertEqual(expected_labels, labels)
+    self.assertEqual([100, 100, 100, 83], [len(chunk) for chunk in chunks])
+    numpy.testing.assert_array_equal(expected, numpy.concatenate(chunks))
+
 
 if __name__ == '__main__':
   unittest.main()
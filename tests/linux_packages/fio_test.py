@@ -442,7 +442,7 @@ class FioTestCase(unittest.TestCase, test_util.SamplesTestMixin):
             fio.DeleteParameterFromJobFile(original_job_file, 'directory'),
             'filename'))
 
-  def testParseHistogramMultipleJobs(self):
+  def _ParseHistogramResults(self, **kwargs):
     hist_dir = os.path.join(self.data_dir, 'hist')
     job_file = _ReadFileToString(
         os.path.join(hist_dir, 'pkb-7fb0c9d8-0_fio.job'))
@@ -450,12 +450,6 @@ class FioTestCase(unittest.TestCase, test_util.SamplesTestMixin):
         os.path.join(hist_dir, 'pkb-7fb0c9d8-0_fio.json')))
     log_file_base = 'pkb_fio_avg_1506559526.49'
 
-    single_bin_vals = [float(f) for f in _ReadFileToString(
-        os.path.join(hist_dir, 'bin_vals')).split()]
-    # each hist file has its own bin_vals, but they're all the same
-    bin_vals = [single_bin_vals, single_bin_vals,
-                single_bin_vals, single_bin_vals]
-
     # redirect open to the hist subdirectory
     def OpenTestFile(filename):
       return open(os.path.join(hist_dir, os.path.basename(filename)))
@@ -463,9 +457,11 @@ class FioTestCase(unittest.TestCase, test_util.SamplesTestMixin):
     with mock.patch(fio.__name__ + '.open',
                     new=mock.MagicMock(side_effect=OpenTestFile),
                     create=True):
-      results = fio.ParseResults(job_file, fio_json_result, None,
-                                 log_file_base, bin_vals)
+      return fio.ParseResults(job_file, fio_json_result, None,
+                              log_file_base, **kwargs)
 
+  def _AssertExpectedHistograms(self, results):
+    hist_dir = os.path.join(self.data_dir, 'hist')
     actual_read_hist = _ExtractHistogramFromMetric(
         results,
         'rand_16k_read_100%-io-depth-1-num-jobs-2:16384:read:histogram')
@@ -480,6 +476,49 @@ class FioTestCase(unittest.TestCase, test_util.SamplesTestMixin):
         _ReadFileToString(os.path.join(hist_dir, 'expected_write.json')))
     self.assertEqual(expected_write_hist, actual_write_hist)
 
+  def testParseHistogramMultipleJobs(self):
+    single_bin_vals = [float(f) for f in _ReadFileToString(
+        os.path.join(self.data_dir, 'hist', 'bin_vals')).split()]
+    # each hist file has its own bin_vals, but they're all the same
+    bin_vals = [single_bin_vals, single_bin_vals,
+                single_bin_vals, single_bin_vals]
+    self._AssertExpectedHistograms(
+        self._ParseHistogramResults(bin_vals=bin_vals))
+
+  def testParseHistogramLocalBinVals(self):
+    self._AssertExpectedHistograms(
+        self._ParseHistogramResults(hist_logs=True))
+
+  def testParseHistogramInChunks(self):
+    with mock.patch.object(fio, 'HIST_LOG_CHUNK_ROWS', 2):
+      self._AssertExpectedHistograms(
+          self._ParseHistogramResults(hist_logs=True))
+
+  def testComputeHistogramBinVals(self):
+    expected = [float(f) for f in _ReadFileToString(
+        os.path.join(self.data_dir, 'hist', 'bin_vals')).split()]
+    self.assertEqual(expected, fio.ComputeHistogramBinVals(1216).tolist())
+    self.assertEqual([1.0, 3.0, 5.0],
+                     fio.ComputeHistogramBinVals(608)[:3].tolist())
+    self.assertEqual(1856, fio.ComputeHistogramBinVals(1856).size)
+    with self.assertRaises(ValueError):
+      fio.ComputeHistogramBinVals(1000)
+
+  def testParseHistogramPercentileTimeseries(self):
+    results = self._ParseHistogramResults(
+        hist_logs=True, hist_percentile_timeseries=True)
+    self._AssertExpectedHistograms(results)
+    timeseries = [
+        r for r in results if r.metric ==
+        'rand_16k_read_100%-io-depth-1-num-jobs-2:16384:read:latency:p99:'
+        'timeseries']
+    self.assertTrue(timeseries)
+    sample_times = [r.metadata['sample_time_ms'] for r in timeseries]
+    self.assertEqual(sorted(sample_times), sample_times)
+    for r in timeseries:
+      self.assertEqual('us', r.unit)
+      self.assertGreater(r.value, 0)
+
 
 if __name__ == '__main__':
   unittest.main()
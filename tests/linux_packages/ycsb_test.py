@@ -14,11 +14,18 @@
 """Tests for perfkitbenchmarker.packages.ycsb."""
 
 
+import base64
 import copy
 import os
+import struct
 import unittest
+import zlib
 
+from absl.testing import flagsaver
+import mock
+import numpy as np
 from perfkitbenchmarker import errors
+from perfkitbenchmarker import sample
 from perfkitbenchmarker.linux_packages import ycsb
 import six
 from six.moves import range
@@ -263,5 +270,166 @@ class HdrLogsParserTestCase(unittest.TestCase):
     self.assertEqual(actual, expected)
 
 
+def _EncodeHdrHistogram(counts, significant_digits=3, lowest_value=1):
+  """Encodes counts like the Java hdrhistogram compressed V2 encoding."""
+  values = []
+  zeros = 0
+  for count in counts:
+    if count:
+      if zeros:
+        values.append(-zeros)
+        zeros = 0
+      values.append(count)
+    else:
+      zeros += 1
+  payload = bytearray()
+  for value in values:
+    value = (value << 1) ^ (value >> 63)
+    while value >= 0x80:
+      payload.append((value & 0x7f) | 0x80)
+      value >>= 7
+    payload.append(value)
+  raw = struct.pack('>iiiiqqd', 0x1c849313, len(payload), 0,
+                    significant_digits, lowest_value, 3600000000, 1.0)
+  compressed = zlib.compress(raw + bytes(payload))
+  return base64.b64encode(
+      struct.pack('>ii', 0x1c849314, len(compressed)) + compressed).decode()
+
+
+def _HdrLog(*encoded_histograms):
+  lines = ['#[StartTime: 1523565997.000 (seconds since epoch)]',
+           '"StartTimestamp","Interval_Length","Interval_Max","Interval_Compre'
+           'ssed_Histogram"']
+  for i, encoded in enumerate(encoded_histograms):
+    lines.append('{0}.000,10.000,1.000,{1}'.format(i * 10, encoded))
+  return '\n'.join(lines) + '\n'
+
+
+class HdrHistogramTestCase(unittest.TestCase):
+
+  def testDecodeRoundTrip(self):
+    counts = [0, 3, 0, 0, 0, 200, 1] + [0] * 5000 + [70000]
+    histogram = ycsb.HdrHistogram.FromCompressed(_EncodeHdrHistogram(counts))
+    self.assertEqual(3, histogram.significant_digits)
+    self.assertEqual(1, histogram.lowest_discernible_value)
+    np.testing.assert_array_equal(counts, histogram.counts)
+
+  def testHighestEquivalentValues(self):
+    histogram = ycsb.HdrHistogram(1, 3, np.zeros(3074, dtype=np.int64))
+    values = histogram.GetHighestEquivalentValues()
+    # Values below 2048 are exact, then each bucket doubles its width.
+    self.assertEqual([0, 2047, 2049, 4095, 4099],
+                     values[[0, 2047, 2048, 3071, 3072]].tolist())
+
+  def testMergeHdrLogsIsLossless(self):
+    log1 = _HdrLog(_EncodeHdrHistogram([0, 1, 2]),
+                   _EncodeHdrHistogram([0, 0, 0, 4]))
+    log2 = _HdrLog(_EncodeHdrHistogram([5]))
+    merged = ycsb.MergeHdrLogs([log1, log2, ''])
+    self.assertEqual([5, 1, 2, 4], merged.counts.tolist())
+
+  def testMergeHdrLogsEmpty(self):
+    self.assertIsNone(ycsb.MergeHdrLogs([_HdrLog(), '']))
+
+  def testMergeDifferentPrecision(self):
+    with self.assertRaises(ValueError):
+      ycsb.HdrHistogram(1, 3, np.zeros(1, dtype=np.int64)).Merge(
+          ycsb.HdrHistogram(1, 2, np.zeros(1, dtype=np.int64)))
+
+  def testGetPercentileTuples(self):
+    counts = np.zeros(1200, dtype=np.int64)
+    counts[[314, 853, 949, 1033]] = [2, 49953, 50396, 49759]
+    actual = ycsb.HdrHistogram(1, 3, counts).GetPercentileTuples()
+    self.assertEqual([(0.0, 0.314, 2), (10.0, 0.853, 49953),
+                      (40.0, 0.949, 50396), (70.0, 1.033, 49759)], actual)
+
+  def testMergeHdrHistogramLogFiles(self):
+    vms = [mock.Mock(), mock.Mock()]
+    vms[0].RemoteCommand.side_effect = [
+        (_HdrLog(_EncodeHdrHistogram([0, 1000])), ''), ('', '')]
+    vms[1].RemoteCommand.side_effect = [
+        (_HdrLog(_EncodeHdrHistogram([0, 0, 1000])), ''), ('', '')]
+    executor = ycsb.YCSBExecutor('test')
+    actual = executor.MergeHdrHistogramLogFiles('/tmp/', vms)
+    self.assertEqual(
+        {'read': [(0.0, 0.001, 1000), (55.0, 0.002, 1000)]}, actual)
+
+
+def _LatencySamples(read_p99, update_p99, cleanup_p99=1000.0):
+  return [
+      sample.Sample('READ p99 latency', read_p99, 'ms', {}),
+      sample.Sample('UPDATE p99 latency', update_p99, 'ms', {}),
+      sample.Sample('CLEANUP p99 latency', cleanup_p99, 'ms', {}),
+      sample.Sample('READ p50 latency', 1.0, 'ms', {}),
+  ]
+
+
+class SloSearchTestCase(unittest.TestCase):
+
+  @flagsaver.flagsaver(ycsb_slo_latency_percentile='99')
+  def testGetSloLatency(self):
+    self.assertEqual(7.0, ycsb._GetSloLatency(_LatencySamples(5.0, 7.0)))
+    self.assertIsNone(ycsb._GetSloLatency([]))
+
+  def testSearchMaxTargetBisects(self):
+    probed = []
+
+    def _Probe(target):
+      probed.append(target)
+      return target <= 6000
+
+    self.assertEqual(
+        6000, ycsb._SearchMaxTarget(_Probe, 8000, precision=0.1,
+                                    max_probes=10))
+    self.assertEqual([8000, 4000, 6000, 7000, 6500], probed)
+
+  def testSearchMaxTargetStopsAtMaxProbes(self):
+    probe = mock.Mock(return_value=False)
+    self.assertIsNone(ycsb._SearchMaxTarget(probe, 8000, 0.01, 3))
+    self.assertEqual(3, probe.call_count)
+
+  def testSearchMaxTargetUpperBoundPasses(self):
+    probe = mock.Mock(return_value=True)
+    self.assertEqual(8000, ycsb._SearchMaxTarget(probe, 8000, 0.05, 5))
+    probe.assert_called_once_with(8000)
+
+  @flagsaver.flagsaver(ycsb_slo_latency_ms=10.0,
+                       ycsb_slo_latency_percentile='99',
+                       ycsb_slo_probe_timelimit=30, ycsb_timelimit=600,
+                       ycsb_slo_search_precision=0.3, ycsb_slo_max_probes=5,
+                       ycsb_dynamic_load_sustain_throughput_ratio=0.9)
+  def testRunSloSearch(self):
+    runs = []
+
+    def _RunFunc(target_per_vm, max_execution_time):
+      runs.append((target_per_vm, max_execution_time))
+      target = target_per_vm * 2
+      # Latency grows with the load, and throughput saturates at 5000.
+      latency = target / 500.0
+      return min(target, 5000), _LatencySamples(latency, latency / 2)
+
+    executor = ycsb.YCSBExecutor('cloudspanner')
+    results = executor._RunSloSearch(_RunFunc, 8000, 2, workload_name='a')
+
+    # 8000 fails, 4000 meets the SLO, 6000 fails, 5000 meets the SLO and ends
+    # the search, and 5000 is confirmed with a full length run.
+    self.assertEqual(
+        [(4000, 30), (2000, 30), (3000, 30), (2500, 30), (2500, 600)], runs)
+    curve = [(s.value, s.metadata['target_throughput'],
+              s.metadata['slo_search_stage'], s.metadata['slo_met'])
+             for s in results if s.metric == 'SLO search latency']
+    self.assertEqual([(16.0, 8000, 'probe', False),
+                      (8.0, 4000, 'probe', True),
+                      (12.0, 6000, 'probe', False),
+                      (10.0, 5000, 'probe', True),
+                      (10.0, 5000, 'confirm', True)], curve)
+    max_sample = results[-1]
+    self.assertEqual('Max throughput meeting SLO', max_sample.metric)
+    self.assertEqual(5000, max_sample.value)
+    self.assertEqual({'slo_latency_ms': 10.0, 'slo_latency_percentile': '99',
+                      'workload_name': 'a', 'target_throughput': 5000,
+                      'confirmed': True}, max_sample.metadata)
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -14,17 +14,23 @@
 
 """Tests for linux_virtual_machine.py."""
 
+import shutil
+import subprocess
 import unittest
 
 from absl import flags
 from absl.testing import parameterized
 import mock
 
+from perfkitbenchmarker import data
+from perfkitbenchmarker import errors
 from perfkitbenchmarker import linux_virtual_machine
 from perfkitbenchmarker import os_types
 from perfkitbenchmarker import pkb
 from perfkitbenchmarker import sample
+from perfkitbenchmarker import ssh_session
 from perfkitbenchmarker import test_util
+from perfkitbenchmarker import vm_util
 from tests import pkb_common_test_case
 
 FLAGS = flags.FLAGS
@@ -485,5 +491,144 @@ class LinuxVirtualMachineTestCase(pkb_common_test_case.PkbCommonTestCase):
     self.assertEqual(expected_asdict, cpu_vuln.asdict)
 
 
+class SshTransportTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(SshTransportTestCase, self).setUp()
+    FLAGS.ssh_transport = ssh_session.SESSION
+    FLAGS.ssh_retries = 3
+    self.vm = CreateTestLinuxVm()
+    self.vm.ip_address = '1.2.3.4'
+    self.pool = mock.Mock()
+    self.enter_context(mock.patch.object(
+        ssh_session, 'GetSessionPool', return_value=self.pool))
+    self.issue_command = self.enter_context(
+        mock.patch.object(vm_util, 'IssueCommand'))
+
+  def testSessionTransportRetriesOn255(self):
+    self.pool.RunCommand.side_effect = [('', '', 255), ('out', 'err', 0)]
+    self.assertEqual(('out', 'err', 0),
+                     self.vm.RemoteHostCommandWithReturnCode('hostname'))
+    self.assertEqual(2, self.pool.RunCommand.call_count)
+    self.issue_command.assert_not_called()
+
+  def testSessionTransportRaisesOnFailure(self):
+    self.pool.RunCommand.return_value = ('', 'bad', 1)
+    with self.assertRaises(errors.VirtualMachine.RemoteCommandError):
+      self.vm.RemoteHostCommandWithReturnCode('false')
+
+  def testLoginShellUsesProcessTransport(self):
+    self.issue_command.return_value = ('out', '', 0)
+    self.vm.RemoteHostCommandWithReturnCode('hostname', login_shell=True)
+    self.pool.RunCommand.assert_not_called()
+    self.issue_command.assert_called_once()
+
+
+def _RunLocally(command, **unused_kwargs):
+  process = subprocess.run(['bash', '-c', command], stdout=subprocess.PIPE,
+                           stderr=subprocess.PIPE, universal_newlines=True)
+  return process.stdout, process.stderr
+
+
+class RemoteCommandBatchTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(RemoteCommandBatchTestCase, self).setUp()
+    self.vm = CreateTestLinuxVm()
+    self.vm.RemoteCommand = mock.Mock(side_effect=_RunLocally)
+
+  def testRunsAllCommandsInOneRoundTrip(self):
+    with self.vm.RemoteCommandBatch() as batch:
+      first = batch.RemoteCommand('echo "a \'b\'"; echo err >&2')
+      second = batch.RemoteCommand('printf x')
+    self.assertEqual(1, self.vm.RemoteCommand.call_count)
+    self.assertEqual(("a 'b'\n", 'err\n', 0),
+                     (first.stdout, first.stderr, first.retcode))
+    self.assertEqual(('x', '', 0),
+                     (second.stdout, second.stderr, second.retcode))
+
+  def testRunReturnsResults(self):
+    batch = self.vm.RemoteCommandBatch()
+    batch.RemoteCommand('echo 1')
+    batch.RemoteCommand('exit 2', ignore_failure=True)
+    batch.RemoteCommand('echo 3')
+    self.assertEqual([('1\n', '', 0), ('', '', 2), ('3\n', '', 0)],
+                     batch.Run())
+
+  def testFailureIsAttributedAndStopsBatch(self):
+    batch = self.vm.RemoteCommandBatch()
+    batch.RemoteCommand('true')
+    batch.RemoteCommand('echo oops >&2; exit 3')
+    never_run = batch.RemoteCommand('echo never')
+    with self.assertRaisesRegex(errors.VirtualMachine.RemoteCommandError,
+                                r'\(3\) executing echo oops.*2 of 3'):
+      batch.Run()
+    self.assertIsNone(never_run.retcode)
+
+  def testEmptyBatchDoesNotConnect(self):
+    with self.vm.RemoteCommandBatch():
+      pass
+    self.vm.RemoteCommand.assert_not_called()
+
+
+class RobustRemoteCommandStreamingTestCase(
+    pkb_common_test_case.PkbCommonTestCase):
+  """Runs RobustRemoteCommand end to end against the local machine."""
+
+  def setUp(self):
+    super(RobustRemoteCommandStreamingTestCase, self).setUp()
+    tmp_dir = self.create_tempdir().full_path
+    self.enter_context(mock.patch.object(vm_util, 'VM_TMP_DIR', tmp_dir))
+    shutil.copy(
+        data.ResourcePath(linux_virtual_machine.EXECUTE_COMMAND), tmp_dir)
+    self.vm = CreateTestLinuxVm()
+    self.vm._PushRobustCommandScripts = mock.Mock()
+    self.vm.RemoteCommand = mock.Mock(side_effect=_RunLocally)
+    self.vm._GetSshCommand = mock.Mock(return_value=['bash', '-c'])
+
+  def testStreamsOutput(self):
+    chunks = []
+    stdout, stderr = self.vm.RobustRemoteCommand(
+        'echo a; echo b >&2; sleep 0.5; printf c',
+        output_callback=lambda out, err: chunks.append((out, err)))
+    self.assertEqual(('a\nc', 'b\n'), (stdout, stderr))
+    self.assertEqual('a\nc', ''.join(out for out, _ in chunks))
+    self.assertGreater(len(chunks), 1)
+
+  def testDecodesCharactersSplitAcrossChunks(self):
+    stdout, stderr = self.vm.RobustRemoteCommand(
+        r"printf '\303'; sleep 0.5; printf '\251 \342\202'; printf '\254' >&2",
+        output_callback=lambda out, err: None)
+    self.assertEqual(u'\xe9 \ufffd', stdout)
+    self.assertEqual(u'\ufffd', stderr)
+
+  def testStreamsWithQuietSsh(self):
+    self.vm.RobustRemoteCommand('true', output_callback=lambda *_: None)
+    self.vm._GetSshCommand.assert_called_with(quiet=True)
+
+  def testFailure(self):
+    FLAGS.robust_remote_command_streaming = True
+    with self.assertRaisesRegex(errors.VirtualMachine.RemoteCommandError,
+                                r'\(4\) executing exit 4'):
+      self.vm.RobustRemoteCommand('exit 4')
+    _, _ = self.vm.RobustRemoteCommand('exit 4', ignore_failure=True)
+
+  def testReattachesAfterLostConnection(self):
+    FLAGS.robust_remote_command_streaming = True
+    tail_output = self.vm._TailRobustCommandOutput
+    calls = []
+
+    def _DropFirstConnection(*args):
+      calls.append(args)
+      if len(calls) == 1:
+        return linux_virtual_machine.RETRYABLE_SSH_RETCODE
+      return tail_output(*args)
+
+    self.vm._TailRobustCommandOutput = _DropFirstConnection
+    stdout, _ = self.vm.RobustRemoteCommand('echo done')
+    self.assertEqual('done\n', stdout)
+    self.assertLen(calls, 2)
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -14,13 +14,17 @@
 
 """Tests for pkb.py."""
 
+import multiprocessing
 import unittest
 from absl import flags
 import mock
 from perfkitbenchmarker import linux_virtual_machine
 from perfkitbenchmarker import pkb
+from perfkitbenchmarker import publisher
+from perfkitbenchmarker import sample
 from perfkitbenchmarker import stages
 from tests import pkb_common_test_case
+import six
 
 FLAGS = flags.FLAGS
 FLAGS.mark_as_parsed()
@@ -106,6 +110,61 @@ class TestCreateFailedRunSampleFlag(unittest.TestCase):
     self.make_failed_run_sample_mock.assert_not_called()
 
 
+class TestPublishQueuedSamples(unittest.TestCase):
+
+  def testPublishesUntilNone(self):
+    sample_queue = six.moves.queue.Queue()
+    for item in ([{'test': 'a'}], [{'test': 'b'}], None):
+      sample_queue.put(item)
+    collector = mock.Mock(samples=[])
+    published = []
+
+    def _Publish():
+      published.append(list(collector.samples))
+      del collector.samples[:]
+      if len(published) == 1:
+        raise IOError()
+
+    collector.PublishSamples.side_effect = _Publish
+    pkb._PublishQueuedSamples(sample_queue, collector)
+    self.assertEqual([[{'test': 'a'}], [{'test': 'b'}]], published)
+
+  def testRunBenchmarkTaskPublishesToQueue(self):
+    sample_queue = six.moves.queue.Queue()
+    with mock.patch(pkb.__name__ + '.RunBenchmark') as run_benchmark:
+      run_benchmark.side_effect = lambda spec, collector: (
+          collector.publishers[0].PublishSamples([{'test': 'a'}]))
+      spec, samples = pkb.RunBenchmarkTask(mock.MagicMock(), sample_queue)
+    self.assertEqual([], samples)
+    self.assertEqual([{'test': 'a'}], sample_queue.get_nowait())
+    self.assertTrue(sample_queue.empty())
+
+  @mock.patch.object(publisher, 'DEFAULT_METADATA_PROVIDERS', [])
+  def testRunStageSamplesOfChildProcessPublishToQueue(self):
+    sample_queue = multiprocessing.Manager().Queue()
+    spec = mock.MagicMock(uuid='uuid')
+    spec.name = 'benchmark'
+
+    def _RunBenchmark(spec, collector):
+      del collector  # Unused.
+      publisher.PublishRunStageSamples(spec, [sample.Sample('m', 1, 'u')])
+
+    # The default publishers would write to the run directory.
+    with mock.patch.object(publisher.SampleCollector, '_DefaultPublishers',
+                           return_value=[]), \
+        mock.patch(pkb.__name__ + '.RunBenchmark', side_effect=_RunBenchmark):
+      process = multiprocessing.get_context('fork').Process(
+          target=pkb.RunBenchmarkTask, args=(spec, sample_queue))
+      process.start()
+      process.join()
+    self.assertEqual(0, process.exitcode)
+    samples = sample_queue.get_nowait()
+    self.assertEqual([('benchmark', 'm')],
+                     [(s['test'], s['metric']) for s in samples])
+    self.assertTrue(sample_queue.empty())
+    self.assertIsNone(publisher._sample_queue)
+
+
 class TestMakeFailedRunSample(unittest.TestCase):
 
   @mock.patch('perfkitbenchmarker.sample.Sample')
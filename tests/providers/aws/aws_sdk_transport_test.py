@@ -0,0 +1,55 @@
+# Copyright 2026 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.providers.aws.aws_sdk_transport."""
+
+import unittest
+
+from perfkitbenchmarker import command_transport
+from perfkitbenchmarker.providers.aws import aws_sdk_transport
+from perfkitbenchmarker.providers.aws import util
+from tests import pkb_common_test_case
+
+
+class AwsSdkTransportTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def testFilters(self):
+    self.assertEqual(
+        [{'Name': 'tag:Name', 'Values': ['a', 'b']}],
+        aws_sdk_transport._Filters(['Name=tag:Name,Values=a,b']))
+
+  def testTags(self):
+    self.assertEqual(
+        [{'Key': 'owner', 'Value': 'me'}, {'Key': 'run', 'Value': 'a,b'}],
+        aws_sdk_transport._Tags(util.FormatTags({'owner': 'me',
+                                                 'run': 'a,b'})))
+
+  def testUnsupportedShorthand(self):
+    with self.assertRaises(command_transport.UnsupportedCommandError):
+      aws_sdk_transport._Filters(['Name=a'])
+
+  def testParsesCliPrefix(self):
+    parsed = command_transport.ParseCommand(
+        util.AWS_PREFIX + ['ec2', 'describe-instances', '--region=r',
+                           '--instance-ids=i-1'])
+    self.assertEqual(['ec2', 'describe-instances'], parsed.args)
+    self.assertEqual(['json'], parsed.flags['output'])
+
+  def testUnsupportedFlagFallsBackToCli(self):
+    self.assertIsNone(command_transport.Issue(
+        util.AWS_PREFIX + ['ec2', 'describe-instances', '--region=r',
+                           '--query=Reservations']))
+
+
+if __name__ == '__main__':
+  unittest.main()
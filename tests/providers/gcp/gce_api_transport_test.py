@@ -0,0 +1,208 @@
+# Copyright 2026 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.providers.gcp.gce_api_transport."""
+
+import json
+import threading
+import unittest
+
+from absl import flags
+from google.auth import credentials
+from google.auth import exceptions as auth_exceptions
+from google.auth.transport import requests as auth_requests
+import mock
+from perfkitbenchmarker import command_transport
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import vm_util
+from perfkitbenchmarker.providers.gcp import gce_api_transport
+import requests
+from six.moves import BaseHTTPServer
+from tests import pkb_common_test_case
+
+FLAGS = flags.FLAGS
+
+_ZONE_PATH = '/compute/v1/projects/p/zones/z'
+_OPERATION = {'name': 'op-1', 'status': 'RUNNING',
+              'targetLink': 'https://compute/disks/disk-1'}
+
+
+class _MockComputeHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """Serves a disk and its operations from a dict of disks by path."""
+
+  def _Reply(self, code, content):
+    body = json.dumps(content).encode('utf-8')
+    self.send_response(code)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def _ReadBody(self):
+    length = int(self.headers.get('Content-Length') or 0)
+    return json.loads(self.rfile.read(length)) if length else None
+
+  def do_GET(self):  # pylint: disable=invalid-name
+    self.server.requests.append(('GET', self.path, None))
+    if self.path in self.server.disks:
+      self._Reply(200, self.server.disks[self.path])
+    else:
+      self._Reply(404, {'error': {
+          'code': 404,
+          'message': "The resource '%s' was not found" % self.path}})
+
+  def do_POST(self):  # pylint: disable=invalid-name
+    body = self._ReadBody()
+    self.server.requests.append(('POST', self.path, body))
+    if self.path.endswith('/wait'):
+      self._Reply(200, dict(_OPERATION, status=self.server.wait_status))
+      return
+    if self.path.endswith('/setLabels'):
+      disk = self.server.disks[self.path[:-len('/setLabels')]]
+      disk['labels'] = body['labels']
+    else:
+      self.server.disks[self.path + '/' + body['name']] = body
+    self._Reply(200, _OPERATION)
+
+  def do_DELETE(self):  # pylint: disable=invalid-name
+    self.server.requests.append(('DELETE', self.path, None))
+    del self.server.disks[self.path]
+    self._Reply(200, dict(_OPERATION, status='DONE'))
+
+  def log_message(self, *args):  # pylint: disable=arguments-differ
+    pass
+
+
+class GceApiTransportTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(GceApiTransportTestCase, self).setUp()
+    self.server = BaseHTTPServer.HTTPServer(('localhost', 0),
+                                            _MockComputeHandler)
+    self.server.disks = {
+        _ZONE_PATH + '/disks/disk-1': {
+            'name': 'disk-1', 'sizeGb': '10', 'labelFingerprint': 'f1',
+            'labels': {'owner': 'me'}},
+    }
+    self.server.requests = []
+    self.server.wait_status = 'DONE'
+    thread = threading.Thread(target=self.server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    self.addCleanup(self.server.server_close)
+    self.addCleanup(self.server.shutdown)
+    FLAGS.command_transport_endpoints = [
+        '%s=http://localhost:%d/compute/v1' % (gce_api_transport.API,
+                                               self.server.server_port)]
+    for patcher in (
+        mock.patch.dict(command_transport._clients, clear=True),
+        mock.patch('google.auth.default', return_value=(
+            credentials.AnonymousCredentials(), 'p'))):
+      patcher.start()
+      self.addCleanup(patcher.stop)
+
+  def _Issue(self, *args):
+    return command_transport.Issue(
+        ['gcloud', 'compute', 'disks'] + list(args) +
+        ['--format', 'json', '--project', 'p', '--quiet', '--zone', 'z'])
+
+  def testDescribe(self):
+    stdout, stderr, retcode = self._Issue('describe', 'disk-1')
+    self.assertEqual((0, ''), (retcode, stderr))
+    self.assertEqual('10', json.loads(stdout)['sizeGb'])
+
+  def testDescribeNotFound(self):
+    stdout, stderr, retcode = self._Issue('describe', 'disk-2')
+    self.assertEqual(('', 1), (stdout, retcode))
+    self.assertIn('ERROR: (gcloud.compute.disks.describe)', stderr)
+    self.assertIn('was not found', stderr)
+
+  def testAddLabels(self):
+    stdout, _, retcode = self._Issue('add-labels', 'disk-1', '--labels',
+                                     'run=abc,timeout=1h')
+    self.assertEqual(0, retcode)
+    self.assertEqual({'owner': 'me', 'run': 'abc', 'timeout': '1h'},
+                     json.loads(stdout)['labels'])
+    self.assertIn(
+        ('POST', _ZONE_PATH + '/disks/disk-1/setLabels',
+         {'labels': {'owner': 'me', 'run': 'abc', 'timeout': '1h'},
+          'labelFingerprint': 'f1'}),
+        self.server.requests)
+    self.assertIn(('POST', _ZONE_PATH + '/operations/op-1/wait', None),
+                  self.server.requests)
+
+  def testCreate(self):
+    stdout, _, retcode = self._Issue('create', 'disk-2', '--size', '20',
+                                     '--type', 'pd-ssd', '--labels', 'a=b')
+    self.assertEqual(0, retcode)
+    self.assertEqual([{
+        'name': 'disk-2',
+        'sizeGb': '20',
+        'type': 'projects/p/zones/z/diskTypes/pd-ssd',
+        'labels': {'a': 'b'},
+    }], json.loads(stdout))
+
+  def testDelete(self):
+    _, stderr, retcode = self._Issue('delete', 'disk-1')
+    self.assertEqual((0, 'Deleted [https://compute/disks/disk-1].\n'),
+                     (retcode, stderr))
+    self.assertNotIn(_ZONE_PATH + '/disks/disk-1', self.server.disks)
+
+  def testUnsupportedFlagFallsBackToCli(self):
+    self.assertIsNone(self._Issue('describe', 'disk-1', '--verbosity=debug'))
+    self.assertIsNone(command_transport.Issue(
+        ['gcloud', 'compute', 'disks', 'describe', 'disk-1', '--format',
+         'json']))
+    self.assertEqual([], self.server.requests)
+
+  def testNoCredentialsFallsBackToCli(self):
+    with mock.patch('google.auth.default',
+                    side_effect=auth_exceptions.DefaultCredentialsError(
+                        'no credentials')):
+      self.assertIsNone(self._Issue('describe', 'disk-1'))
+
+  def testRequestErrorsAreCommandFailures(self):
+    FLAGS.command_transport = command_transport.SDK
+    command_transport.Install()
+    self.addCleanup(vm_util.SetCommandTransport, None)
+    cmd = ['gcloud', 'compute', 'disks', 'describe', 'disk-1', '--format',
+           'json', '--project', 'p', '--zone', 'z']
+    for error in (auth_exceptions.RefreshError('token expired'),
+                  requests.ConnectionError('connection refused')):
+      with mock.patch.object(auth_requests.AuthorizedSession, 'request',
+                             side_effect=error):
+        stdout, stderr, retcode = vm_util.IssueCommand(
+            cmd, raise_on_failure=False)
+      self.assertEqual(('', 1), (stdout, retcode))
+      self.assertIn(str(error), stderr)
+    with mock.patch.object(auth_requests.AuthorizedSession, 'request',
+                           side_effect=requests.Timeout('timed out')):
+      with self.assertRaises(errors.VmUtil.IssueCommandTimeoutError):
+        vm_util.IssueCommand(cmd, raise_on_failure=False)
+
+  def testOperationWaitHasDeadline(self):
+    self.server.wait_status = 'RUNNING'
+    with self.assertRaises(errors.VmUtil.IssueCommandTimeoutError):
+      command_transport.Issue(
+          ['gcloud', 'compute', 'disks', 'add-labels', 'disk-1', '--labels',
+           'a=b', '--format', 'json', '--project', 'p', '--zone', 'z'],
+          timeout=0.5)
+
+  def testMissingLibrariesFallBackToCli(self):
+    with mock.patch.dict('sys.modules', {'google.auth': None}):
+      self.assertIsNone(self._Issue('describe', 'disk-1'))
+    self.assertEqual([], self.server.requests)
+
+
+if __name__ == '__main__':
+  unittest.main()
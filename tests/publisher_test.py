@@ -16,15 +16,18 @@
 import collections
 import csv
 import json
+import os
 import re
 import tempfile
 import unittest
 import uuid
 from absl import flags
+from absl.testing import flagsaver
 import mock
 
 from perfkitbenchmarker import pkb  # pylint: disable=unused-import
 from perfkitbenchmarker import publisher
+from perfkitbenchmarker import results_warehouse
 from perfkitbenchmarker import sample
 from perfkitbenchmarker import vm_util
 from perfkitbenchmarker.providers.gcp import util
@@ -108,6 +111,39 @@ class NewlineDelimitedJSONPublisherTestCase(unittest.TestCase):
                           {u'test': u'testb', u'labels': u'|key2:val2|'}],
                          result)
 
+  def testAppendsAfterFirstWrite(self):
+    self.instance.PublishSamples([{'test': 'testa', 'metadata': {}}])
+    publisher.NewlineDelimitedJSONPublisher(self.fp.name).PublishSamples(
+        [{'test': 'testb', 'metadata': {}}])
+    result = [json.loads(i)['test'] for i in self.fp]
+    self.assertListEqual(['testa', 'testb'], result)
+
+  @flagsaver.flagsaver(publish_batch_size=2)
+  def testWritesInBatches(self):
+    samples = [{'test': 'test%d' % i, 'metadata': {}} for i in range(5)]
+    self.instance.PublishSamples(samples)
+    result = [json.loads(i)['test'] for i in self.fp]
+    self.assertListEqual(['test0', 'test1', 'test2', 'test3', 'test4'],
+                         result)
+
+
+class SQLitePublisherTestCase(unittest.TestCase):
+
+  @flagsaver.flagsaver(publish_batch_size=2)
+  def testPublishSamples(self):
+    path = os.path.join(tempfile.mkdtemp(), 'results.db')
+    samples = [{'test': 'test', 'metric': 'metric', 'value': float(i),
+                'unit': 'ms', 'metadata': {'key': 'value'},
+                'sample_uri': str(i), 'run_uri': 'run'} for i in range(5)]
+    instance = publisher.SQLitePublisher(path)
+    instance.PublishSamples(samples)
+    instance.PublishSamples(samples)
+    with results_warehouse.Warehouse(path) as warehouse:
+      stored = list(warehouse.GetSamples())
+    self.assertEqual([s['value'] for s in samples],
+                     [s['value'] for s in stored])
+    self.assertEqual({'key': 'value'}, stored[0]['metadata'])
+
 
 class BigQueryPublisherTestCase(unittest.TestCase):
 
@@ -240,6 +276,46 @@ class SampleCollectorTestCase(unittest.TestCase):
         },
         self.instance.samples[0])
 
+  def testAddSamples_MetadataProviders(self):
+
+    class _SpecProvider(publisher.MetadataProvider):
+      DEPENDS_ON_SAMPLE_METADATA = False
+      calls = 0
+
+      def AddMetadata(self, metadata, benchmark_spec):
+        _SpecProvider.calls += 1
+        return dict(metadata, spec='spec', foo='overridden')
+
+    class _SampleProvider(publisher.MetadataProvider):
+      calls = 0
+
+      def AddMetadata(self, metadata, benchmark_spec):
+        _SampleProvider.calls += 1
+        return dict(metadata, keys=','.join(sorted(metadata)))
+
+    self.instance.metadata_providers = [_SpecProvider(), _SampleProvider()]
+    shared = {'foo': 'bar', 'a': 1}
+    samples = [sample.Sample('widgets', i, 'oz', shared) for i in range(3)]
+    samples.append(sample.Sample('widgets', 3, 'oz', {'b': 2}))
+    samples.append(sample.Sample('widgets', 4, 'oz'))
+    self.instance.AddSamples(samples, self.benchmark, self.benchmark_spec)
+    metadata = [s['metadata'] for s in self.instance.samples]
+    self.assertEqual(
+        {'foo': 'overridden', 'a': 1, 'spec': 'spec', 'keys': 'a,foo,spec'},
+        metadata[0])
+    self.assertEqual(['foo', 'a', 'spec', 'keys'], list(metadata[0]))
+    self.assertIs(metadata[0], metadata[2])
+    self.assertEqual({'b': 2, 'spec': 'spec', 'foo': 'overridden',
+                      'keys': 'b,foo,spec'}, metadata[3])
+    self.assertEqual({'spec': 'spec', 'foo': 'overridden',
+                      'keys': 'foo,spec'}, metadata[4])
+    self.assertEqual(1, _SpecProvider.calls)
+    self.assertEqual(3, _SampleProvider.calls)
+    self.assertEqual({'foo': 'bar', 'a': 1}, shared)
+    sample_uris = set(s['sample_uri'] for s in self.instance.samples)
+    self.assertEqual(5, len(sample_uris))
+    self.assertEqual(4, uuid.UUID(sample_uris.pop()).version)
+
 
 class DefaultMetadataProviderTestCase(unittest.TestCase):
 
@@ -390,6 +466,19 @@ class CSVPublisherTestCase(unittest.TestCase):
     self.assertEqual(['key1', 'key3'], reader.fieldnames[-2:])
     self.assertEqual(3, len(rows))
 
+  def testKeepsRowsWrittenEarlier(self):
+    instance = publisher.CSVPublisher(self.tf.name)
+    instance.PublishSamples([{'test': 'testa', 'metric': '1', 'value': 1.0,
+                              'unit': 'MB', 'metadata': {'key1': 'value1'}}])
+    instance.PublishSamples([{'test': 'testb', 'metric': '2', 'value': 2.0,
+                              'unit': 'MB', 'metadata': {'key2': 'value2'}}])
+    self.tf.seek(0)
+    reader = csv.DictReader(self.tf)
+    rows = list(reader)
+    self.assertEqual(['key1', 'key2'], reader.fieldnames[-2:])
+    self.assertEqual([('1', 'value1', ''), ('2', '', 'value2')],
+                     [(r['metric'], r['key1'], r['key2']) for r in rows])
+
 
 class InfluxDBPublisherTestCase(unittest.TestCase):
 
@@ -534,6 +623,142 @@ class InfluxDBPublisherTestCase(unittest.TestCase):
     mock_create_db.assert_called_once()
     mock_write_data.assert_called_once_with(expected_output)
 
+  @flagsaver.flagsaver(publish_batch_size=2, publish_retries=1,
+                       publish_retry_interval=0)
+  @mock.patch.object(publisher.InfluxDBPublisher, '_WriteData')
+  @mock.patch.object(publisher.InfluxDBPublisher, '_CreateDB')
+  def testPublishRetriesBatches(self, mock_create_db, mock_write_data):
+    mock_write_data.__name__ = '_WriteData'
+    mock_write_data.side_effect = [IOError(), None, None]
+    self.test_db._Publish(['a', 'b', 'c'])
+    mock_create_db.assert_called_once()
+    self.assertEqual(
+        [mock.call('a\nb'), mock.call('a\nb'), mock.call('c')],
+        mock_write_data.call_args_list)
+
+
+class ElasticsearchPublisherTestCase(unittest.TestCase):
+
+  @flagsaver.flagsaver(publish_batch_size=2)
+  def testPublishSamplesInBulk(self):
+    elasticsearch = mock.MagicMock()
+    with mock.patch.dict('sys.modules', {
+        'elasticsearch': elasticsearch,
+        'elasticsearch.helpers': elasticsearch.helpers}):
+      instance = publisher.ElasticsearchPublisher(
+          es_uri='http://localhost:9200', es_index='perfkit',
+          es_type='result')
+      instance.PublishSamples([
+          {'sample_uri': str(i), 'timestamp': 0, 'metadata': {'a.b': 1}}
+          for i in range(3)])
+    bulk = elasticsearch.helpers.bulk
+    self.assertEqual(2, bulk.call_count)
+    actions = bulk.call_args_list[0][0][1]
+    self.assertEqual(['0', '1'], [a['_id'] for a in actions])
+    self.assertEqual({'sample_uri': '0',
+                      'timestamp': '1970-01-01 00:00:00.000000',
+                      'metadata': {'a_b': 1}}, actions[0]['_source'])
+    self.assertEqual('index', actions[0]['_op_type'])
+
+
+class SampleCollectorPublishTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.publishers = [mock.Mock(), mock.Mock()]
+    self.instance = publisher.SampleCollector(
+        publishers=self.publishers, publishers_from_flags=False,
+        add_default_publishers=False)
+    self.instance.samples = [{'test': 'testa'}]
+
+  def _VerifyPublished(self):
+    for p in self.publishers:
+      p.PublishSamples.assert_called_once_with([{'test': 'testa'}])
+      self.assertEqual(1, len(self.instance.publish_latencies[p]))
+    self.assertEqual([], self.instance.samples)
+
+  def testPublishSamples(self):
+    self.instance.PublishSamples()
+    self._VerifyPublished()
+
+  @flagsaver.flagsaver(publish_max_concurrency=2)
+  def testPublishSamplesConcurrently(self):
+    self.instance.PublishSamples()
+    self._VerifyPublished()
+
+  def testPublishSamplesAfterFailure(self):
+    self.publishers[0].PublishSamples.side_effect = IOError()
+    with self.assertRaises(IOError):
+      self.instance.PublishSamples()
+    self.publishers[1].PublishSamples.assert_called_once_with(
+        [{'test': 'testa'}])
+    self.assertEqual([], self.instance.samples)
+
+
+class QueuePublisherTestCase(unittest.TestCase):
+
+  def testPublishSamples(self):
+    sample_queue = six.moves.queue.Queue()
+    publisher.QueuePublisher(sample_queue).PublishSamples(
+        iter([{'test': 'testa'}]))
+    self.assertEqual([{'test': 'testa'}], sample_queue.get_nowait())
+
+
+class RepublishJSONSamplesTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.path = os.path.join(tempfile.mkdtemp(), 'results.json')
+    samples = [{'test': test, 'metric': metric, 'value': 1.0,
+                'run_uri': run_uri, 'sample_uri': '%s-%s-%s' % (
+                    run_uri, test, metric),
+                'timestamp': timestamp, 'metadata': {'key': 'value'}}
+               for timestamp, run_uri in enumerate(['run1', 'run2'])
+               for test in ('testa', 'testb') for metric in ('m1', 'm2')]
+    # The second copy of the first sample is a duplicate.
+    samples.append(samples[0])
+    publisher.NewlineDelimitedJSONPublisher(self.path).PublishSamples(samples)
+    self.publisher = mock.Mock()
+    p = mock.patch.object(publisher.SampleCollector, '_PublishersFromFlags',
+                          return_value=[self.publisher])
+    p.start()
+    self.addCleanup(p.stop)
+
+  def _Republished(self):
+    return [s['sample_uri'] for call in self.publisher.PublishSamples.mock_calls
+            for s in call[1][0]]
+
+  @flagsaver.flagsaver(republish_block_size=3)
+  def testRepublishesOnceInBlocks(self):
+    self.assertEqual(8, publisher.RepublishJSONSamples(self.path))
+    self.assertEqual(3, self.publisher.PublishSamples.call_count)
+    self.assertEqual(8, len(set(self._Republished())))
+    sample = self.publisher.PublishSamples.mock_calls[0][1][0][0]
+    self.assertEqual({'key': 'value'}, sample['metadata'])
+    self.assertNotIn('labels', sample)
+
+  @flagsaver.flagsaver(republish_run_uris=['run2'], republish_tests=['testa'],
+                       republish_start_time=1, republish_end_time=2)
+  def testFilters(self):
+    publisher.RepublishJSONSamples(self.path)
+    self.assertEqual(['run2-testa-m1', 'run2-testa-m2'], self._Republished())
+
+  @flagsaver.flagsaver(republish_block_size=4, republish_index=True,
+                       republish_run_uris=['run2'])
+  def testIndexSkipsBlocks(self):
+    publisher.RepublishJSONSamples(self.path)
+    self.assertTrue(os.path.exists(self.path + '.index'))
+    self.publisher.reset_mock()
+    with mock.patch.object(publisher, '_ParseJSONLines',
+                           wraps=publisher._ParseJSONLines) as parse:
+      self.assertEqual(4, publisher.RepublishJSONSamples(self.path))
+    self.assertEqual(1, parse.call_count)
+    self.assertEqual(['run2-testa-m1', 'run2-testa-m2', 'run2-testb-m1',
+                      'run2-testb-m2'], self._Republished())
+
+  def testParseLabels(self):
+    self.assertEqual({}, publisher._ParseLabels(''))
+    self.assertEqual({'a': 'b:c', 'd': ''},
+                     publisher._ParseLabels('|a:b:c|,|d:|'))
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,111 @@
+# Copyright 2026 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.results_warehouse."""
+
+import json
+import os
+import tempfile
+import unittest
+
+from perfkitbenchmarker import results_warehouse
+import six
+
+
+def _Sample(run_uri, index, value, metric='latency', metadata=None):
+  return {'test': 'fio', 'metric': metric, 'value': value, 'unit': 'ms',
+          'metadata': metadata if metadata is not None else {'disk': 'ssd'},
+          'timestamp': 1000.0 + index, 'run_uri': run_uri,
+          'sample_uri': '%s-%s-%d' % (run_uri, metric, index),
+          'product_name': 'PerfKitBenchmarker', 'official': False,
+          'owner': 'tester'}
+
+
+class WarehouseTestCase(unittest.TestCase):
+
+  def setUp(self):
+    super(WarehouseTestCase, self).setUp()
+    self.path = os.path.join(tempfile.mkdtemp(), 'results.db')
+    self.warehouse = results_warehouse.Warehouse(self.path)
+    self.addCleanup(self.warehouse.Close)
+    metadata = {'disk': 'ssd'}
+    self.samples = (
+        [_Sample('run1', i, float(i), metadata=metadata) for i in range(10)] +
+        [_Sample('run2', i, 2.0 * i, metadata=metadata) for i in range(10)] +
+        [_Sample('run2', 0, 5.0, metric='iops', metadata={'disk': 'hdd'})])
+    self.warehouse.AddSamples(self.samples)
+
+  def testAddSamplesSkipsStoredSamples(self):
+    self.assertEqual(0, self.warehouse.AddSamples(self.samples[:5]))
+    self.assertEqual(1, self.warehouse.AddSamples(
+        [_Sample('run3', 0, 1.0)]))
+    self.assertEqual(22, len(list(self.warehouse.GetSamples())))
+
+  def testGetSamplesRoundTrips(self):
+    samples = list(self.warehouse.GetSamples(metrics=['iops']))
+    self.assertEqual([self.samples[-1]], samples)
+    self.assertEqual(self.samples[:10],
+                     list(self.warehouse.GetSamples(run_uris=['run1'])))
+
+  def testGetSamplesTimeRange(self):
+    samples = self.warehouse.GetSamples(
+        run_uris=['run1'], start_time=1002.0, end_time=1004.0)
+    self.assertEqual([2.0, 3.0], [s['value'] for s in samples])
+
+  def testMetadataStoredOnce(self):
+    with results_warehouse.Warehouse(self.path) as warehouse:
+      count = warehouse._connection.execute(
+          'SELECT COUNT(*) FROM metadata').fetchone()[0]
+    self.assertEqual(2, count)
+
+  def testSummarize(self):
+    summaries = self.warehouse.Summarize(metrics=['latency'], by_run=True)
+    self.assertEqual(['run1', 'run2'], [s['run_uri'] for s in summaries])
+    self.assertEqual(10, summaries[0]['count'])
+    self.assertEqual(5.0, summaries[0]['p50'])
+    self.assertEqual(9.0, summaries[0]['p99'])
+    self.assertEqual(18.0, summaries[1]['max'])
+    self.assertEqual(
+        20, self.warehouse.Summarize(metrics=['latency'])[0]['count'])
+
+  def testCompare(self):
+    changes = self.warehouse.Compare(['run1'], ['run2'], threshold=50)
+    self.assertEqual(1, len(changes))
+    self.assertEqual('latency', changes[0]['metric'])
+    self.assertEqual(5.0, changes[0]['baseline'])
+    self.assertEqual(10.0, changes[0]['candidate'])
+    self.assertEqual(100.0, changes[0]['change'])
+    self.assertEqual([], self.warehouse.Compare(['run1'], ['run2'],
+                                                threshold=150))
+
+  def testMainSummary(self):
+    output = six.StringIO()
+    results_warehouse.main(
+        [self.path, 'summary', '--metrics=latency', '--by_run'], output)
+    lines = output.getvalue().splitlines()
+    self.assertEqual(
+        ['test', 'metric', 'unit', 'run_uri', 'count', 'min', 'average',
+         'stddev', 'p50', 'p90', 'p99', 'max'], lines[0].split())
+    self.assertEqual(['fio', 'latency', 'ms', 'run1', '10', '0', '4.5'],
+                     lines[1].split()[:7])
+    self.assertEqual(3, len(lines))
+
+  def testMainExport(self):
+    output = six.StringIO()
+    results_warehouse.main([self.path, 'export', '--metrics=iops'], output)
+    lines = output.getvalue().splitlines()
+    self.assertEqual([self.samples[-1]], [json.loads(line) for line in lines])
+
+
+if __name__ == '__main__':
+  unittest.main()
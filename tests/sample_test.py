@@ -13,8 +13,10 @@
 # limitations under the License.
 
 
+import json
 import unittest
 
+import numpy as np
 from perfkitbenchmarker import sample
 from six.moves import range
 
@@ -83,5 +85,101 @@ class TestPercentileCalculator(unittest.TestCase):
       sample.PercentileCalculator([3], percentiles=['a'])
 
 
+class TestVectorizedPercentileCalculator(unittest.TestCase):
+
+  def testMatchesPythonPath(self):
+    numbers = np.random.RandomState(0).exponential(10., 5000)
+    percentiles = [0, 0.1, 1, 50, 99, 99.9, 100]
+    expected = sample.PercentileCalculator(list(numbers[:10]),
+                                           percentiles=percentiles)
+    actual = sample.PercentileCalculator(numbers[:10],
+                                         percentiles=percentiles)
+    self.assertCountEqual(expected, actual)
+    for key in expected:
+      self.assertAlmostEqual(expected[key], actual[key])
+
+    python_result = sample.PercentileCalculator(
+        list(numbers), percentiles=percentiles)
+    sorted_numbers = sorted(numbers)
+    self.assertEqual(python_result['p50'], sorted_numbers[2500])
+    self.assertEqual(python_result['p100'], sorted_numbers[-1])
+    self.assertAlmostEqual(python_result['stddev'],
+                           np.std(numbers, ddof=1))
+
+  def testIntegerArray(self):
+    percentiles = sample.PercentileCalculator(
+        np.arange(0, 1001), percentiles=[0, 1, 99.9, 100])
+    self.assertEqual(percentiles, {
+        'p0': 0, 'p1': 10, 'p99.9': 999, 'p100': 1000,
+        'average': 500, 'stddev': percentiles['stddev']})
+    self.assertIsInstance(percentiles['p1'], int)
+
+  def testSingleNumber(self):
+    percentiles = sample.PercentileCalculator(np.array([3.]), percentiles=[50])
+    self.assertEqual(percentiles, {'p50': 3., 'average': 3., 'stddev': 0})
+
+  def testOutOfRangePercentile(self):
+    with self.assertRaises(ValueError):
+      sample.PercentileCalculator(np.array([3]), percentiles=[101])
+
+
+class PercentileSketchTestCase(unittest.TestCase):
+
+  def assertWithinBound(self, expected, sketch, percentiles):
+    actual = sketch.GetPercentiles(percentiles)
+    self.assertCountEqual(expected, actual)
+    for percentile in percentiles:
+      key = 'p%s' % percentile
+      self.assertLessEqual(
+          abs(actual[key] - expected[key]),
+          sketch.relative_accuracy * abs(expected[key]) + 1e-12, key)
+    self.assertAlmostEqual(actual['average'], expected['average'])
+    self.assertAlmostEqual(actual['stddev'], expected['stddev'])
+
+  def testErrorBound(self):
+    numbers = np.random.RandomState(1).lognormal(0, 3, 20000)
+    sketch = sample.PercentileSketch(relative_accuracy=0.01)
+    sketch.AddMany(numbers)
+    self.assertWithinBound(
+        sample.PercentileCalculator(numbers), sketch, sample.PERCENTILES_LIST)
+
+  def testZeroAndNegativeNumbers(self):
+    numbers = [-5., -0.5, 0., 0., 1., 2., 30.]
+    sketch = sample.PercentileSketch(relative_accuracy=0.02)
+    for number in numbers:
+      sketch.Add(number)
+    percentiles = [0, 10, 30, 50, 70, 100]
+    self.assertWithinBound(
+        sample.PercentileCalculator(numbers, percentiles), sketch, percentiles)
+    self.assertEqual(sketch.min, -5.)
+    self.assertEqual(sketch.max, 30.)
+
+  def testMerge(self):
+    numbers = np.random.RandomState(2).exponential(3., 3000)
+    merged = sample.PercentileSketch()
+    for part in np.array_split(numbers, 3):
+      sketch = sample.PercentileSketch()
+      sketch.AddMany(part)
+      merged.Merge(sketch)
+    self.assertEqual(merged.count, 3000)
+    self.assertWithinBound(
+        sample.PercentileCalculator(numbers), merged, sample.PERCENTILES_LIST)
+
+  def testMergeDifferentAccuracies(self):
+    with self.assertRaises(ValueError):
+      sample.PercentileSketch(0.01).Merge(sample.PercentileSketch(0.02))
+
+  def testSerialization(self):
+    sketch = sample.PercentileSketch()
+    sketch.AddMany([1, 2, 3, -4, 0])
+    restored = sample.PercentileSketch.FromDict(
+        json.loads(json.dumps(sketch.ToDict())))
+    self.assertEqual(sketch.GetPercentiles(), restored.GetPercentiles())
+
+  def testEmpty(self):
+    with self.assertRaises(ValueError):
+      sample.PercentileSketch().GetPercentiles()
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -14,14 +14,21 @@
 
 """Tests for the object_storage_service benchmark worker process."""
 
+import importlib
 import itertools
 import random
+import sys
+import struct
 import time
 import unittest
+import zlib
 
+from absl.testing import absltest
 import mock
+import six
 
 from perfkitbenchmarker.scripts.object_storage_api_test_scripts import object_storage_api_tests
+from perfkitbenchmarker.scripts.object_storage_api_test_scripts import object_storage_interface
 
 
 class TestSizeDistributionIterator(unittest.TestCase):
@@ -71,6 +78,89 @@ class TestMaxSizeInDistribution(unittest.TestCase):
                      10)
 
 
+class TestGenerateWritePayload(absltest.TestCase):
+
+  def setUp(self):
+    super(TestGenerateWritePayload, self).setUp()
+    self.addCleanup(object_storage_api_tests._payload_cache.clear)
+
+  def testSizeAndCaching(self):
+    payload = object_storage_api_tests.GenerateWritePayload(100000, 0)
+    self.assertIsInstance(payload, bytes)
+    self.assertLen(payload, 100000)
+    self.assertIs(payload,
+                  object_storage_api_tests.GenerateWritePayload(100000, 0))
+
+  def testIncompressible(self):
+    payload = object_storage_api_tests.GenerateWritePayload(1000000, 0)
+    self.assertGreater(len(zlib.compress(payload)), 0.99 * len(payload))
+
+  def testCompressibility(self):
+    payload = object_storage_api_tests.GenerateWritePayload(1000000, 0.75)
+    self.assertLen(payload, 1000000)
+    ratio = len(zlib.compress(payload)) / len(payload)
+    self.assertGreater(ratio, 0.2)
+    self.assertLess(ratio, 0.3)
+
+  def testBlocksAreNotDuplicated(self):
+    block_size = object_storage_api_tests.PAYLOAD_BLOCK_SIZE
+    payload = object_storage_api_tests.GenerateWritePayload(4 * block_size, 0.5)
+    blocks = {payload[i:i + block_size]
+              for i in range(0, len(payload), block_size)}
+    self.assertLen(blocks, 4)
+
+  def testPartialBlock(self):
+    payload = object_storage_api_tests.GenerateWritePayload(10, 0.5)
+    self.assertLen(payload, 10)
+
+
+class TestWriteBinaryStreams(absltest.TestCase):
+
+  def testFormat(self):
+    out = six.BytesIO()
+    object_storage_api_tests.WriteBinaryStreams(
+        [{'stream_num': 3, 'start_times': [1.5, 2.5], 'latencies': [0.5, 1.],
+          'sizes': [10, 20]}], out)
+    data = out.getvalue()
+    header = object_storage_api_tests.BINARY_STREAM_HEADER
+    self.assertEqual(header.unpack_from(data),
+                     (object_storage_api_tests.BINARY_STREAM_MAGIC, 3, 2))
+    self.assertEqual(struct.unpack_from('<2d2d2q', data, header.size),
+                     (1.5, 2.5, 0.5, 1., 10, 20))
+    self.assertLen(data, header.size + 48)
+
+
+class TestGcsService(absltest.TestCase):
+
+  def setUp(self):
+    super(TestGcsService, self).setUp()
+    # gcs.py is run on the VM next to a providers package, and the storage
+    # client is replaced so that no request is sent.
+    self.storage = mock.Mock()
+    providers = mock.Mock(object_storage_interface=object_storage_interface)
+    modules = mock.patch.dict(sys.modules, {
+        'providers': providers,
+        'google.cloud.storage': self.storage,
+    })
+    modules.start()
+    self.addCleanup(modules.stop)
+    sys.modules.pop(
+        'perfkitbenchmarker.scripts.object_storage_api_test_scripts.gcs', None)
+    self.gcs = importlib.import_module(
+        'perfkitbenchmarker.scripts.object_storage_api_test_scripts.gcs')
+    self.addCleanup(object_storage_api_tests._payload_cache.clear)
+
+  def testWriteObjectFromBufferUploadsPayload(self):
+    payload = object_storage_api_tests.GenerateWritePayload(1000, 0)
+    service = self.gcs.GcsService()
+    service.WriteObjectFromBuffer('bucket', 'object', six.BytesIO(payload),
+                                  100)
+    blob = self.storage.blob.Blob.return_value
+    uploaded = blob.upload_from_string.call_args[0][0]
+    self.assertLen(uploaded, 100)
+    self.assertEqual(payload[:100], uploaded)
+
+
 class TestPrefixCounterIterator(unittest.TestCase):
 
   def testIterator(self):
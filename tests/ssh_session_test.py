@@ -0,0 +1,115 @@
+# Copyright 2020 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.ssh_session.
+
+A local bash process stands in for the remote shell started over ssh.
+"""
+
+import threading
+import time
+import unittest
+
+from absl import flags
+from perfkitbenchmarker import errors
+from perfkitbenchmarker import ssh_session
+from tests import pkb_common_test_case
+
+FLAGS = flags.FLAGS
+
+_LOCAL_SHELL = ['bash']
+
+
+class SshSessionTestCase(unittest.TestCase):
+
+  def setUp(self):
+    super(SshSessionTestCase, self).setUp()
+    self.session = ssh_session.SshSession(_LOCAL_SHELL)
+    self.addCleanup(self.session.Close)
+
+  def testStdoutStderrAndReturnCode(self):
+    stdout, stderr, retcode = self.session.Run(
+        'echo out; echo err >&2; exit 3')
+    self.assertEqual(('out\n', 'err\n', 3), (stdout, stderr, retcode))
+
+  def testOutputWithoutTrailingNewline(self):
+    self.assertEqual(('a', '', 0), self.session.Run('printf a'))
+
+  def testSessionIsReusedAndIsolated(self):
+    self.session.Run('cd /tmp; export FOO=bar')
+    stdout, _, _ = self.session.Run('echo "$FOO"')
+    self.assertEqual('\n', stdout)
+    self.assertTrue(self.session.alive)
+
+  def testQuotingIsPreserved(self):
+    stdout, _, _ = self.session.Run('echo "a  b" \'$HOME\'')
+    self.assertEqual('a  b $HOME\n', stdout)
+
+  def testTimeout(self):
+    with self.assertRaises(errors.VmUtil.IssueCommandTimeoutError):
+      self.session.Run('sleep 10', timeout=0.2)
+    self.assertFalse(self.session.alive)
+
+  def testLostConnectionReturns255(self):
+    # Killing the session's own shell simulates a dropped connection.
+    _, _, retcode = self.session.Run('kill -9 $PPID')
+    self.assertEqual(255, retcode)
+    self.assertFalse(self.session.alive)
+
+
+class SshSessionPoolTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(SshSessionPoolTestCase, self).setUp()
+    self.addCleanup(ssh_session._pools.clear)
+
+  def testPoolReplacesDeadSession(self):
+    pool = ssh_session.GetSessionPool('vm0', _LOCAL_SHELL)
+    self.addCleanup(pool.Close)
+    pool.RunCommand('kill -9 $PPID')
+    self.assertEqual(('ok\n', '', 0), pool.RunCommand('echo ok'))
+
+  def testGetSessionPoolIsCachedPerVm(self):
+    pool = ssh_session.GetSessionPool('vm0', _LOCAL_SHELL)
+    self.assertIs(pool, ssh_session.GetSessionPool('vm0', _LOCAL_SHELL))
+    self.assertIsNot(pool, ssh_session.GetSessionPool('vm1', _LOCAL_SHELL))
+
+  def testLatencyExcludesWaitForSession(self):
+    pool = ssh_session.SshSessionPool(_LOCAL_SHELL, max_sessions=1)
+    self.addCleanup(pool.Close)
+    thread = threading.Thread(target=pool.RunCommand, args=('sleep 0.5',))
+    thread.start()
+    # Wait until the sleep holds the only session.
+    while pool._semaphore.acquire(False):
+      pool._semaphore.release()
+      time.sleep(0.01)
+    pool.RunCommand('true')
+    thread.join()
+    self.assertEqual(2, len(pool.latencies))
+    self.assertLess(min(pool.latencies), 0.4)
+
+  def testLatencySamples(self):
+    pool = ssh_session.GetSessionPool('vm0', _LOCAL_SHELL)
+    pool.RunCommand('true')
+    pool.RunCommand('true')
+    ssh_session.CloseSessionPool('vm0')
+    samples = ssh_session.GetCommandLatencySamples(['vm0', 'vm1'])
+    metrics = {s.metric: s for s in samples}
+    self.assertEqual(2, metrics['SSH Command Count'].value)
+    self.assertIn('SSH Command Latency p99', metrics)
+    self.assertEqual('ms', metrics['SSH Command Latency max'].unit)
+    self.assertEqual('vm0', metrics['SSH Command Count'].metadata['vm_name'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,89 @@
+# Copyright 2026 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.status_poller."""
+
+import threading
+import unittest
+
+from absl.testing import flagsaver
+import mock
+from perfkitbenchmarker import status_poller
+from tests import pkb_common_test_case
+
+
+def _Describe(keys):
+  return {key: key.upper() for key in keys if key != 'missing'}
+
+
+class StatusPollerTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def _GetConcurrently(self, poller, keys):
+    results = {}
+
+    def _Get(key):
+      results[key] = poller.Get(key)
+
+    threads = [threading.Thread(target=_Get, args=(key,)) for key in keys]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    return results
+
+  def testConcurrentLookupsShareOneCall(self):
+    describe = mock.Mock(side_effect=_Describe)
+    poller = status_poller.StatusPoller(describe, 0.5, 100)
+    keys = ['vm%d' % i for i in range(20)] + ['missing']
+    results = self._GetConcurrently(poller, keys)
+    describe.assert_called_once()
+    self.assertCountEqual(keys, describe.call_args[0][0])
+    self.assertEqual('VM3', results['vm3'])
+    self.assertIsNone(results['missing'])
+
+  def testMaxBatchSize(self):
+    describe = mock.Mock(side_effect=_Describe)
+    poller = status_poller.StatusPoller(describe, 0.5, 3)
+    results = self._GetConcurrently(poller, ['a', 'b', 'c', 'd', 'a'])
+    self.assertEqual(2, poller.num_calls)
+    self.assertEqual([['a', 'b', 'c'], ['d']],
+                     sorted(call[0][0] for call in describe.call_args_list))
+    self.assertEqual({'a': 'A', 'b': 'B', 'c': 'C', 'd': 'D'}, results)
+
+  def testSequentialLookupsStartNewPolls(self):
+    describe = mock.Mock(side_effect=_Describe)
+    poller = status_poller.StatusPoller(describe, 0, 100)
+    self.assertEqual('A', poller.Get('a'))
+    self.assertEqual('A', poller.Get('a'))
+    self.assertEqual(2, describe.call_count)
+
+  def testErrorIsRaisedToEveryLookup(self):
+    poller = status_poller.StatusPoller(
+        mock.Mock(side_effect=ValueError('boom')), 0, 100)
+    with self.assertRaisesRegex(ValueError, 'boom'):
+      poller.Get('a')
+
+  @flagsaver.flagsaver(status_poll_interval=2, status_poll_max_batch_size=7)
+  def testGetPoller(self):
+    with mock.patch.dict(status_poller._pollers, clear=True):
+      poller = status_poller.GetPoller(('AWS', 'us-east-1'), _Describe)
+      self.assertIs(poller,
+                    status_poller.GetPoller(('AWS', 'us-east-1'), None))
+      self.assertIsNot(poller,
+                       status_poller.GetPoller(('AWS', 'us-west-1'), None))
+    self.assertEqual(2, poller._interval)
+    self.assertEqual(7, poller._max_batch_size)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,181 @@
+# Copyright 2020 PerfKitBenchmarker Authors. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for perfkitbenchmarker.traces.base_collector."""
+
+import gzip
+import os
+import tempfile
+import unittest
+
+from absl import flags
+import mock
+
+from perfkitbenchmarker.traces import base_collector
+from tests import pkb_common_test_case
+
+FLAGS = flags.FLAGS
+
+
+class _TestCollector(base_collector.BaseCollector):
+
+  def _CollectorName(self):
+    return 'test'
+
+  def _InstallCollector(self, vm):
+    pass
+
+  def _CollectorRunCommand(self, vm, collector_file):
+    return 'collect > {0}'.format(collector_file)
+
+  def _ReduceCommand(self, collector_file):
+    return 'grep Average {0}'.format(collector_file)
+
+  def Analyze(self, sender, benchmark_spec, samples):
+    pass
+
+
+class _TestStreamParser(object):
+
+  def __init__(self):
+    self.labels = None
+
+  def Parse(self, lines):
+    rows = []
+    for line in lines:
+      if self.labels is None:
+        self.labels = line.split(',')[1:]
+      else:
+        values = [float(v) for v in line.split(',')]
+        rows.append((values[0], values[1:]))
+    return rows
+
+
+class BaseCollectorTestCase(pkb_common_test_case.PkbCommonTestCase):
+
+  def setUp(self):
+    super(BaseCollectorTestCase, self).setUp()
+    self.output_directory = tempfile.mkdtemp()
+    self.collector = _TestCollector(output_directory=self.output_directory)
+    self.collector._pid_files['vm0'] = ('123', '/tmp/pkb/vm0-test.stdout')
+    self.vm = mock.Mock()
+    self.vm.name = 'vm0'
+
+  def testStopOnVmFetchesRawFile(self):
+    self.collector._StopOnVm(self.vm, 'default_0')
+    self.vm.RemoteCommand.assert_called_once_with('kill 123',
+                                                  ignore_failure=True)
+    self.vm.PullFile.assert_called_once_with(self.output_directory,
+                                             '/tmp/pkb/vm0-test.stdout')
+    self.assertEqual({'default_0': '/tmp/pkb/vm0-test.stdout'},
+                     self.collector._role_mapping)
+
+  def testStopOnVmReducesAndCompresses(self):
+    FLAGS.trace_remote_reduction = True
+    FLAGS.trace_compression = base_collector.TRACE_COMPRESSION_GZIP
+    self.collector._StopOnVm(self.vm, 'default_0')
+    self.vm.RemoteCommand.assert_called_with(
+        'grep Average /tmp/pkb/vm0-test.stdout > '
+        '/tmp/pkb/vm0-test.stdout.reduced && '
+        'mv /tmp/pkb/vm0-test.stdout.reduced /tmp/pkb/vm0-test.stdout && '
+        'gzip -f /tmp/pkb/vm0-test.stdout')
+    self.vm.PullFile.assert_called_once_with(self.output_directory,
+                                             '/tmp/pkb/vm0-test.stdout.gz')
+    self.assertEqual({'default_0': '/tmp/pkb/vm0-test.stdout.gz'},
+                     self.collector._role_mapping)
+
+  def testOpenOutputFile(self):
+    with open(os.path.join(self.output_directory, 'raw.stdout'), 'w') as f:
+      f.write('raw\n')
+    with gzip.open(os.path.join(self.output_directory, 'gz.stdout.gz'),
+                   'wt') as f:
+      f.write('compressed\n')
+    with self.collector._OpenOutputFile('/tmp/pkb/raw.stdout') as f:
+      self.assertEqual('raw\n', f.read())
+    with self.collector._OpenOutputFile('/tmp/pkb/gz.stdout.gz') as f:
+      self.assertEqual('compressed\n', f.read())
+
+  @mock.patch('perfkitbenchmarker.vm_util.RunThreaded')
+  def testStopOnVmsBoundsConcurrency(self, mock_run_threaded):
+    FLAGS.trace_max_concurrent_vms = 7
+    self.collector.StopOnVms(None, {'default': [self.vm]}, 'event')
+    self.assertEqual(
+        7, mock_run_threaded.call_args[1]['max_concurrent_threads'])
+
+  def testPollOnVmBuffersCompleteRows(self):
+    FLAGS.trace_streaming = True
+    FLAGS.trace_streaming_buffer_rows = 2
+    self.collector._CreateStreamParser = _TestStreamParser
+    self.collector._pid_files.clear()
+    self.vm.RemoteCommand.return_value = ('123\n', '')
+    self.collector._StartOnVm(self.vm)
+    self.collector.live_buffer = base_collector._LiveTraceBuffer('test', 2)
+    self.vm.RemoteCommand.side_effect = [('time,cpu\n1,10\n2,2', ''),
+                                         ('0\n3,30\n4,40\n', '')]
+    self.collector._PollOnVm(self.vm)
+    self.assertEqual((['cpu'], [(1.0, [10.0])]),
+                     self.collector.live_buffer.GetRows('vm0'))
+    self.collector._PollOnVm(self.vm)
+    self.assertEqual('tail -c +18 /tmp/pkb/vm0-test.stdout',
+                     self.vm.RemoteCommand.call_args[0][0])
+    self.assertEqual((['cpu'], [(3.0, [30.0]), (4.0, [40.0])]),
+                     self.collector.live_buffer.GetRows('vm0'))
+
+  def testPollOnVmWithoutParserReportsSize(self):
+    FLAGS.trace_streaming = True
+    self.collector._pid_files.clear()
+    self.vm.RemoteCommand.return_value = ('123\n', '')
+    self.collector._StartOnVm(self.vm)
+    self.collector.live_buffer = base_collector._LiveTraceBuffer('test', 2)
+    self.vm.RemoteCommand.return_value = ('4096\n', '')
+    self.collector._PollOnVm(self.vm)
+    self.vm.RemoteCommand.assert_called_with(
+        'stat -c %s /tmp/pkb/vm0-test.stdout', ignore_failure=True,
+        suppress_warning=True)
+    self.assertEqual(
+        [('pkb_trace_bytes_total', 'counter',
+          (('collector', 'test'), ('vm', 'vm0')), 4096)],
+        self.collector.live_buffer.Snapshot()[:1])
+
+  def testFormatPrometheus(self):
+    live_buffer = base_collector._LiveTraceBuffer('test', 10)
+    with mock.patch('time.time', return_value=100):
+      live_buffer.Add('vm0', 10, ['cpu "0"'], [(90, [1.5])])
+    self.assertEqual(
+        '# TYPE pkb_trace_bytes_total counter\n'
+        'pkb_trace_bytes_total{collector="test",vm="vm0"} 10.0\n'
+        '# TYPE pkb_trace_last_update_timestamp_seconds gauge\n'
+        'pkb_trace_last_update_timestamp_seconds{collector="test",vm="vm0"} '
+        '100.0\n'
+        '# TYPE pkb_trace_row_timestamp_seconds gauge\n'
+        'pkb_trace_row_timestamp_seconds{collector="test",vm="vm0"} 90.0\n'
+        '# TYPE pkb_trace_value gauge\n'
+        'pkb_trace_value{collector="test",vm="vm0",metric="cpu \\"0\\""} '
+        '1.5\n',
+        base_collector._FormatPrometheus([live_buffer]))
+
+  @mock.patch('perfkitbenchmarker.vm_util.RunThreaded')
+  def testStreamingStopsWithLastVm(self, _):
+    FLAGS.trace_streaming = True
+    FLAGS.trace_streaming_interval = 3600
+    self.collector.StartOnVms(None, [], '')
+    self.assertTrue(self.collector._stream_thread.is_alive())
+    self.collector._streaming_vms['vm0'] = self.vm
+    self.collector.StopOnVms(None, {'default': [self.vm]}, 'event')
+    self.assertIsNone(self.collector._stream_thread)
+    self.assertTrue(os.path.exists(
+        os.path.join(self.output_directory, 'test_live.prom')))
+
+
+if __name__ == '__main__':
+  unittest.main()
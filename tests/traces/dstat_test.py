@@ -13,9 +13,11 @@
 # limitations under the License.
 """Tests for perfkitbenchmarker.traces.dstat."""
 
+import functools
 import os
 import unittest
 from absl import flags
+import mock
 
 from perfkitbenchmarker import events
 from perfkitbenchmarker.sample import Sample
@@ -105,6 +107,63 @@ class DstatTestCase(pkb_common_test_case.PkbCommonTestCase):
     self.assertEqual(
         expected.metadata, self.samples[0].metadata)
 
+  def testAnalyzeCompactEntireFile(self):
+    FLAGS.dstat_publish_mode = dstat.DSTAT_PUBLISH_COMPACT
+    events.AddEvent('sender', 'event', 1475708693, 1475709076,
+                    {'label1': 123})
+    self.collector.Analyze('testSender', None, self.samples)
+    self.assertEqual(61, len(self.samples))
+    usr = self.samples[0]
+    self.assertEqual('usr__total cpu usage', usr.metric)
+    self.assertAlmostEqual(10.063689295039159, usr.value)
+    self.assertEqual(123, usr.metadata['label1'])
+    self.assertEqual('test_vm0', usr.metadata['vm_role'])
+    self.assertLessEqual(usr.metadata['dstat_min'], usr.metadata['dstat_p50'])
+    self.assertLessEqual(usr.metadata['dstat_p99'], usr.metadata['dstat_max'])
+
+  def testAnalyzeCompactTimeseries(self):
+    FLAGS.dstat_publish_regex = 'total cpu usage'
+    events.AddEvent('sender', 'event', 1475708693, 1475708696, {})
+    self.collector.Analyze('testSender', None, self.samples)
+    # Per row samples are published for every row of the file, while the
+    # timeseries only holds the rows within the event.
+    rows_samples = [s for s in self.samples
+                    if s.metric == 'usr__total cpu usage' and
+                    1475708693 < s.metadata.get('dstat_epoch', 0) < 1475708696]
+
+    FLAGS.dstat_publish_mode = dstat.DSTAT_PUBLISH_COMPACT
+    compact_samples = []
+    with mock.patch.object(dstat.dstat, 'ParseCsvFileInChunks',
+                           side_effect=functools.partial(
+                               dstat.dstat.ParseCsvFileInChunks,
+                               chunk_rows=2)):
+      self.collector.Analyze('testSender', None, compact_samples)
+    timeseries = [s for s in compact_samples if s.metric.endswith('timeseries')]
+    # One timeseries per statistic matching the regex instead of one per row.
+    self.assertEqual(6, len(timeseries))
+    usr = timeseries[0]
+    self.assertEqual('usr__total cpu usage timeseries', usr.metric)
+    self.assertEqual(3, len(usr.metadata['values']))
+    self.assertEqual([s.value for s in rows_samples], usr.metadata['values'])
+    self.assertEqual([s.metadata['dstat_epoch'] for s in rows_samples],
+                     usr.metadata['dstat_epochs'])
+
+  def testStreamParserAcrossPolls(self):
+    path = os.path.join(os.path.dirname(__file__), '..', 'data',
+                        'dstat-result.csv')
+    with open(path) as f:
+      lines = f.read().splitlines()
+    parser = dstat._StreamParser()
+    self.assertEqual([], parser.Parse(lines[:3]))
+    self.assertIsNone(parser.labels)
+    rows = parser.Parse(lines[3:9]) + parser.Parse(lines[9:])
+    self.assertEqual('usr__total cpu usage', parser.labels[0])
+    self.assertLen(rows, len(lines) - 7)
+    timestamp, values = rows[0]
+    self.assertEqual(1475708693.291, timestamp)
+    self.assertEqual(6.4, values[0])
+    self.assertLen(values, len(parser.labels))
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -13,6 +13,8 @@
 # limitations under the License.
 """Tests for mpstat utility."""
 import os
+import subprocess
+import tempfile
 import unittest
 
 
@@ -57,5 +59,20 @@ class MpstatTestCase(unittest.TestCase):
             sample.metadata['mpstat_cpu_id'] == 0):
         self.assertEqual(11.21, sample.value)
 
+  def testRemoteReductionKeepsAnalyzedOutput(self):
+    path = os.path.join(
+        os.path.dirname(__file__), '../data', 'mpstat_output.txt')
+    collector = mpstat.MpstatCollector(output_directory=tempfile.gettempdir())
+    reduced = subprocess.check_output(
+        collector._ReduceCommand(path), shell=True).decode()
+    metadata = {'event': 'mpstat'}
+    self.assertLess(len(reduced), len(self.contents))
+
+    def _Strip(samples):
+      return [(s.metric, s.value, s.unit, s.metadata) for s in samples]
+    self.assertEqual(_Strip(mpstat._MpstatResults(metadata, self.contents)),
+                     _Strip(mpstat._MpstatResults(metadata, reduced)))
+
+
 if __name__ == '__main__':
   unittest.main()
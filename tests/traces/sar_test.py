@@ -56,5 +56,14 @@ class SarTestCase(unittest.TestCase):
     last_sample = samples[-1]
     self.assertEqual('average_steal', last_sample.metric)
 
+  def testStreamParser(self):
+    lines = self.contents.splitlines()
+    parser = sar._StreamParser()
+    rows = parser.Parse(lines[:4]) + parser.Parse(lines[4:])
+    self.assertEqual(['%user', '%nice', '%system', '%iowait', '%steal',
+                      '%idle'], parser.labels)
+    self.assertEqual(10, len(rows))
+    self.assertEqual((None, [99.85, 0.0, 0.0, 0.0, 0.15, 0.0]), rows[0])
+
 if __name__ == '__main__':
   unittest.main()